@@ -1,6 +1,8 @@
+import bisect
 import numpy as np
-import time
 import sys
+import time
+import engines
 
 # Parámetros por defecto
 NUM_PARTICULAS = 100
@@ -13,24 +15,156 @@ VELOCIDAD_INICIAL_MAX = 20.0
 COEF_RESTITUCION_PARED = 0.8
 COEF_RESTITUCION_PARTICULA = 0.9
 SEMILLA = 42
+BROADPHASE = 'bruteforce'
+BROADPHASES = ('bruteforce', 'grid')
+
+def construir_grilla(posiciones, tam_celda):
+    """Construir la lista de celdas (counting sort) para la fase amplia"""
+    num_celdas_x = max(1, int(ANCHO_MUNDO // tam_celda))
+    num_celdas_y = max(1, int(ALTO_MUNDO // tam_celda))
+
+    # Las correcciones de solapamiento pueden dejar partículas fuera del mundo
+    celda_x = np.clip((posiciones[:, 0] * num_celdas_x / ANCHO_MUNDO).astype(np.int64), 0, num_celdas_x - 1)
+    celda_y = np.clip((posiciones[:, 1] * num_celdas_y / ALTO_MUNDO).astype(np.int64), 0, num_celdas_y - 1)
+    celdas = celda_y * num_celdas_x + celda_x
+
+    conteo = np.bincount(celdas, minlength=num_celdas_x * num_celdas_y)
+    inicio = np.zeros(num_celdas_x * num_celdas_y + 1, dtype=np.int64)
+    np.cumsum(conteo, out=inicio[1:])
+    orden = np.argsort(celdas, kind='stable')
+
+    return celda_x, celda_y, inicio, orden, num_celdas_x, num_celdas_y
+
+def celda_de(posicion, num_celdas_x, num_celdas_y):
+    """Celda (limitada a la grilla) en la que cae una posición"""
+    cx = min(max(int(posicion[0] * num_celdas_x / ANCHO_MUNDO), 0), num_celdas_x - 1)
+    cy = min(max(int(posicion[1] * num_celdas_y / ALTO_MUNDO), 0), num_celdas_y - 1)
+    return cy * num_celdas_x + cx
+
+def colisiones_grilla(posiciones, velocidades, perfil=None):
+    """Fase amplia de lista de celdas con los mismos pares y orden (i, j) que el doble bucle.
 
-def run_simulation(num_particulas=NUM_PARTICULAS, num_pasos=NUM_PASOS, semilla=SEMILLA):
-    print(f"Iniciando benchmark con {num_particulas} partículas, {num_pasos} pasos, semilla {semilla}")
+    Devuelve (colisiones_particula_particula, pares_revisados). Con perfil,
+    suma la construcción de la grilla a la fase amplia; el recorrido queda
+    en la fase estrecha.
+    """
+    inicio_fase = time.perf_counter() if perfil is not None else 0.0
+    celda_x, celda_y, inicio, orden, num_celdas_x, num_celdas_y = construir_grilla(posiciones, 2 * RADIO_PARTICULA)
+    celda = (celda_y * num_celdas_x + celda_x).tolist()
+    inicio, orden = inicio.tolist(), orden.tolist()
+    # Cada celda es un tramo ordenado de orden (el counting sort es estable);
+    # sólo las celdas que ganan o pierden partículas tienen su propia lista
+    tocadas = {}
+    if perfil is not None:
+        perfil[engines.FASE_AMPLIA] += time.perf_counter() - inicio_fase
+
+    def miembros(c):
+        """Partículas actuales de la celda c, en orden"""
+        if c in tocadas:
+            return tocadas[c]
+        return orden[inicio[c]:inicio[c + 1]]
+
+    def tocar(c):
+        """Lista propia de la celda c, para agregar o quitar partículas"""
+        if c not in tocadas:
+            tocadas[c] = orden[inicio[c]:inicio[c + 1]]
+        return tocadas[c]
 
     colisiones_particula_particula = 0
-    colisiones_con_pared = 0
+    pares_revisados = 0
+    for i in range(len(celda)):
+        ultimo = i
+        candidatos = None
+        while True:
+            if candidatos is None:
+                # Miembros actuales de las 9 celdas vecinas de i, en orden; sólo
+                # cambian cuando una corrección de solapamiento mueve a alguien de celda
+                cx, cy = celda[i] % num_celdas_x, celda[i] // num_celdas_x
+                candidatos = sorted(
+                    k
+                    for vy in range(max(cy - 1, 0), min(cy + 2, num_celdas_y))
+                    for vx in range(max(cx - 1, 0), min(cx + 2, num_celdas_x))
+                    for k in miembros(vy * num_celdas_x + vx)
+                )
+                siguiente = bisect.bisect_right(candidatos, ultimo)
+            if siguiente == len(candidatos):
+                break
+            j = candidatos[siguiente]
+            siguiente += 1
+
+            pares_revisados += 1
+            if resolver_par(i, j, posiciones, velocidades, perfil):
+                colisiones_particula_particula += 1
+                for p in (i, j):
+                    nueva = celda_de(posiciones[p], num_celdas_x, num_celdas_y)
+                    if nueva != celda[p]:
+                        vieja = tocar(celda[p])
+                        del vieja[bisect.bisect_left(vieja, p)]
+                        bisect.insort(tocar(nueva), p)
+                        celda[p] = nueva
+                        candidatos = None
+            ultimo = j
+
+    return colisiones_particula_particula, pares_revisados
+
+def resolver_par(i, j, posiciones, velocidades, perfil=None):
+    """Fase estrecha: resolver la colisión entre i y j, devuelve True si chocaron"""
+    dist_vec_check = posiciones[i] - posiciones[j]
+    dist_sq_check = np.sum(dist_vec_check**2)
+
+    if dist_sq_check < (2 * RADIO_PARTICULA)**2:
+        pos1, vel1 = posiciones[i], velocidades[i]
+        pos2, vel2 = posiciones[j], velocidades[j]
+        dist_vec = dist_vec_check
+        dist_mag_sq = dist_sq_check
+        if not(dist_mag_sq == 0 or np.dot(dist_vec, vel1 - vel2) > 0):
+            dist_mag = np.sqrt(dist_mag_sq)
+            normal_vec = dist_vec / dist_mag
+            v1_normal = np.dot(vel1, normal_vec)
+            v2_normal = np.dot(vel2, normal_vec)
+            velocidades[i] += (v2_normal - v1_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
+            velocidades[j] += (v1_normal - v2_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
+            overlap = 2 * RADIO_PARTICULA - dist_mag
+            if overlap > 0:
+                correction = overlap / 2 * normal_vec
+                posiciones[i] -= correction
+                posiciones[j] += correction
+                if perfil is not None:
+                    perfil[engines.CORRECCIONES] += 1
+            return True
+    return False
 
+def estado_inicial(num_particulas, semilla):
+    """Posiciones y velocidades iniciales, comunes a todos los motores"""
     np.random.seed(semilla)
     posiciones = np.random.rand(num_particulas, 2) * [ANCHO_MUNDO - 2*RADIO_PARTICULA, ALTO_MUNDO - 2*RADIO_PARTICULA] + RADIO_PARTICULA
     velocidades = (np.random.rand(num_particulas, 2) - 0.5) * (2 * VELOCIDAD_INICIAL_MAX)
+    return posiciones, velocidades
 
-    start_time = time.time()
+def _medir(perfil, fase, desde):
+    """Sumar a la fase el tiempo desde la marca anterior; devuelve la marca nueva"""
+    ahora = time.perf_counter()
+    perfil[fase] += ahora - desde
+    return ahora
 
-    for paso in range(num_pasos):
-        if (paso + 1) % (num_pasos // 10) == 0 and (num_pasos // 10) > 0:
-            print(f"  Progreso: {paso + 1} / {num_pasos} pasos completados...")
+def simular(posiciones, velocidades, num_pasos, broadphase=BROADPHASE, callback=None, progress_every=0, perfil=None):
+    """Avanzar num_pasos pasos; devuelve (colisiones_particula_particula, colisiones_con_pared, pares_revisados).
+
+    Con perfil (engines.nuevo_perfil) suma los segundos de cada fase del paso.
+    """
+    colisiones_particula_particula = 0
+    colisiones_con_pared = 0
+    pares_revisados = 0
+    num_particulas = len(posiciones)
+    medir = perfil is not None
+    marca = 0.0
 
+    for paso in range(num_pasos):
+        if medir:
+            marca = time.perf_counter()
         posiciones += velocidades * DT
+        if medir:
+            marca = _medir(perfil, engines.INTEGRACION, marca)
 
         for i in range(num_particulas):
             pared_colisiono = False
@@ -54,46 +188,53 @@ def run_simulation(num_particulas=NUM_PARTICULAS, num_pasos=NUM_PASOS, semilla=S
             
             if pared_colisiono:
                 colisiones_con_pared += 1
+        if medir:
+            marca = _medir(perfil, engines.PAREDES, marca)
+            amplia = perfil[engines.FASE_AMPLIA]
 
-        for i in range(num_particulas):
-            for j in range(i + 1, num_particulas):
-                dist_vec_check = posiciones[i] - posiciones[j]
-                dist_sq_check = np.sum(dist_vec_check**2)
-                
-                if dist_sq_check < (2 * RADIO_PARTICULA)**2:
-                    pos1, vel1 = posiciones[i], velocidades[i]
-                    pos2, vel2 = posiciones[j], velocidades[j]
-                    dist_vec = dist_vec_check
-                    dist_mag_sq = dist_sq_check
-                    if not(dist_mag_sq == 0 or np.dot(dist_vec, vel1 - vel2) > 0):
+        if broadphase == 'grid':
+            colisiones, revisados = colisiones_grilla(posiciones, velocidades, perfil)
+            colisiones_particula_particula += colisiones
+            pares_revisados += revisados
+        else:
+            for i in range(num_particulas):
+                for j in range(i + 1, num_particulas):
+                    if resolver_par(i, j, posiciones, velocidades, perfil):
                         colisiones_particula_particula += 1
-                        dist_mag = np.sqrt(dist_mag_sq)
-                        normal_vec = dist_vec / dist_mag
-                        v1_normal = np.dot(vel1, normal_vec)
-                        v2_normal = np.dot(vel2, normal_vec)
-                        velocidades[i] += (v2_normal - v1_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
-                        velocidades[j] += (v1_normal - v2_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
-                        overlap = 2 * RADIO_PARTICULA - dist_mag
-                        if overlap > 0:
-                            correction = overlap / 2 * normal_vec
-                            posiciones[i] -= correction
-                            posiciones[j] += correction
-
-    end_time = time.time()
-    total_time = end_time - start_time
+            pares_revisados += num_particulas * (num_particulas - 1) // 2
+        if medir:
+            # colisiones_grilla ya sumó la construcción de la grilla a la fase amplia
+            perfil[engines.FASE_ESTRECHA] += time.perf_counter() - marca - (perfil[engines.FASE_AMPLIA] - amplia)
+
+        if callback is not None and progress_every > 0 and (paso + 1) % progress_every == 0:
+            callback(paso + 1, colisiones_particula_particula, colisiones_con_pared)
+
+    return colisiones_particula_particula, colisiones_con_pared, pares_revisados
+
+def mostrar_progreso(num_pasos):
+    """Callback de progreso para los scripts de línea de comandos"""
+    return lambda paso, *_: print(f"  Progreso: {paso} / {num_pasos} pasos completados...")
+
+def run_simulation(num_particulas=NUM_PARTICULAS, num_pasos=NUM_PASOS, semilla=SEMILLA, broadphase=BROADPHASE):
+    print(f"Iniciando benchmark con {num_particulas} partículas, {num_pasos} pasos, semilla {semilla}, broadphase {broadphase}")
+
+    resultado = engines.get_engine('benchmark').run(
+        {'num_particulas': num_particulas, 'num_pasos': num_pasos, 'semilla': semilla, 'broadphase': broadphase},
+        callback=mostrar_progreso(num_pasos),
+        progress_every=num_pasos // 10
+    )
 
     print("-" * 30)
     print(f"SIMULACIÓN BASE")
-    print(f"Simulación completada en {total_time:.4f} segundos, con semilla {semilla}.")
-    print(f"Total pasos: {num_pasos}, Partículas: {num_particulas}")
-    print(f"Total colisiones Partícula-Partícula: {colisiones_particula_particula}")
-    print(f"Total colisiones con Pared: {colisiones_con_pared}")
+    print(resultado.reporte())
     print("-" * 30)
+    return resultado
 
 def mostrar_ayuda():
-    print("Uso: python benchmark.py [NUM_PARTICULAS] [NUM_PASOS] [SEMILLA]")
-    print("Ejemplo: python benchmark.py 200 2000 42")
-    print("Parámetros por defecto: NUM_PARTICULAS=100, NUM_PASOS=1000, SEMILLA=42")
+    print("Uso: python benchmark.py [NUM_PARTICULAS] [NUM_PASOS] [SEMILLA] [BROADPHASE]")
+    print("Ejemplo: python benchmark.py 200 2000 42 grid")
+    print("Parámetros por defecto: NUM_PARTICULAS=100, NUM_PASOS=1000, SEMILLA=42, BROADPHASE=bruteforce")
+    print("BROADPHASE: bruteforce (todos los pares) o grid (lista de celdas)")
 
 if __name__ == "__main__":
     if len(sys.argv) == 2 and sys.argv[1] in ['-h', '--help', 'help']:
@@ -101,17 +242,22 @@ if __name__ == "__main__":
     elif len(sys.argv) == 1:
         # Usar valores por defecto
         run_simulation()
-    elif len(sys.argv) == 4:
+    elif len(sys.argv) in (4, 5):
         try:
             num_particulas = int(sys.argv[1])
             num_pasos = int(sys.argv[2])
             semilla = int(sys.argv[3])
+            broadphase = sys.argv[4] if len(sys.argv) == 5 else BROADPHASE
             
             if num_particulas <= 0 or num_pasos <= 0:
                 print("Error: NUM_PARTICULAS y NUM_PASOS deben ser números positivos")
                 sys.exit(1)
+
+            if broadphase not in BROADPHASES:
+                print(f"Error: BROADPHASE debe ser uno de {', '.join(BROADPHASES)}")
+                sys.exit(1)
                 
-            run_simulation(num_particulas, num_pasos, semilla)
+            run_simulation(num_particulas, num_pasos, semilla, broadphase)
         except ValueError:
             print("Error: Todos los argumentos deben ser números enteros")
             mostrar_ayuda()
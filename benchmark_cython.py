@@ -1,36 +1,46 @@
-import numpy as np
-import time
 import sys
 import engine_cython
+import engines
+# Mismo mundo y misma física que benchmark.py
+from benchmark import (NUM_PARTICULAS, ANCHO_MUNDO, ALTO_MUNDO, RADIO_PARTICULA, DT, NUM_PASOS,
+                       COEF_RESTITUCION_PARED, COEF_RESTITUCION_PARTICULA, SEMILLA, mostrar_progreso)
 
 # Parámetros por defecto
-NUM_PARTICULAS = 100
-ANCHO_MUNDO = 800.0
-ALTO_MUNDO = 600.0
-RADIO_PARTICULA = 5.0
-DT = 0.1
-NUM_PASOS = 1000
-VELOCIDAD_INICIAL_MAX = 20.0
-COEF_RESTITUCION_PARED = 0.8
-COEF_RESTITUCION_PARTICULA = 0.9
-SEMILLA = 42
-
-def run_simulation_cython(num_particulas=NUM_PARTICULAS, num_pasos=NUM_PASOS, semilla=SEMILLA):
-    print(f"Iniciando benchmark con Cython - {num_particulas} partículas, {num_pasos} pasos, semilla {semilla}")
+BROADPHASE = 'bruteforce'
+BROADPHASES = ('bruteforce', 'grid')
+KERNEL = 'memoryview'
+KERNELS = ('memoryview', 'referencia')
+NUM_HILOS = 1
 
+def simular(posiciones, velocidades, num_pasos, broadphase=BROADPHASE, num_hilos=NUM_HILOS, callback=None, progress_every=0, perfil=None):
+    """Kernel memoryview: todo el paso (integración, paredes y colisiones) en una sola llamada nativa"""
+    return engine_cython.run_steps(
+        posiciones,
+        velocidades,
+        num_pasos,
+        {
+            'ancho_mundo': ANCHO_MUNDO,
+            'alto_mundo': ALTO_MUNDO,
+            'radio_particula': RADIO_PARTICULA,
+            'dt': DT,
+            'coef_restitucion_pared': COEF_RESTITUCION_PARED,
+            'coef_restitucion_particula': COEF_RESTITUCION_PARTICULA,
+            'broadphase': broadphase,
+            'num_threads': num_hilos
+        },
+        callback=callback,
+        progress_every=progress_every if callback is not None else 0,
+        perfil=perfil
+    )
+
+def simular_referencia(posiciones, velocidades, num_pasos, callback=None, progress_every=0):
+    """Kernel original: bucle de pasos en Python y run_collision_cython por paso"""
     colisiones_particula_particula = 0
     colisiones_con_pared = 0
-    
-    np.random.seed(semilla)
-    posiciones = np.random.rand(num_particulas, 2) * [ANCHO_MUNDO - 2*RADIO_PARTICULA, ALTO_MUNDO - 2*RADIO_PARTICULA] + RADIO_PARTICULA
-    velocidades = (np.random.rand(num_particulas, 2) - 0.5) * (2 * VELOCIDAD_INICIAL_MAX)
-
-    start_time = time.time()
+    pares_revisados = 0
+    num_particulas = len(posiciones)
 
     for paso in range(num_pasos):
-        if (paso + 1) % (num_pasos // 10) == 0 and (num_pasos // 10) > 0:
-            print(f"  Progreso: {paso + 1} / {num_pasos} pasos completados...")
-
         posiciones += velocidades * DT
 
         for i in range(num_particulas):
@@ -53,7 +63,7 @@ def run_simulation_cython(num_particulas=NUM_PARTICULAS, num_pasos=NUM_PASOS, se
                 pared_colisiono = True
             if pared_colisiono:
                 colisiones_con_pared += 1
-        
+    
         colisiones_particula_particula += engine_cython.run_collision_cython(
             posiciones,
             velocidades,
@@ -61,22 +71,43 @@ def run_simulation_cython(num_particulas=NUM_PARTICULAS, num_pasos=NUM_PASOS, se
             RADIO_PARTICULA,
             COEF_RESTITUCION_PARTICULA
         )
+        pares_revisados += num_particulas * (num_particulas - 1) // 2
 
-    end_time = time.time()
-    total_time = end_time - start_time
+        if callback is not None and progress_every > 0 and (paso + 1) % progress_every == 0:
+            callback(paso + 1, colisiones_particula_particula, colisiones_con_pared)
+
+    return colisiones_particula_particula, colisiones_con_pared, pares_revisados
+
+def run_simulation_cython(num_particulas=NUM_PARTICULAS, num_pasos=NUM_PASOS, semilla=SEMILLA, broadphase=BROADPHASE, kernel=KERNEL, num_hilos=NUM_HILOS):
+    print(f"Iniciando benchmark con Cython - {num_particulas} partículas, {num_pasos} pasos, semilla {semilla}, broadphase {broadphase}, kernel {kernel}, hilos {num_hilos}")
+
+    resultado = engines.get_engine('benchmark_cython').run(
+        {
+            'num_particulas': num_particulas,
+            'num_pasos': num_pasos,
+            'semilla': semilla,
+            'broadphase': broadphase,
+            'kernel': kernel,
+            'num_threads': num_hilos
+        },
+        callback=mostrar_progreso(num_pasos),
+        progress_every=num_pasos // 10
+    )
 
     print("-" * 30)
     print(f"SIMULACIÓN OPTIMIZADA (CON CYTHON)")
-    print(f"Simulación completada en {total_time:.4f} segundos, con semilla {semilla}.")
-    print(f"Total pasos: {num_pasos}, partículas: {num_particulas} ")
-    print(f"Total colisiones Partícula-Partícula: {colisiones_particula_particula}")
-    print(f"Total colisiones con Pared: {colisiones_con_pared}")
+    print(resultado.reporte())
     print("-" * 30)
+    return resultado
 
 def mostrar_ayuda():
-    print("Uso: python benchmark_cython.py [NUM_PARTICULAS] [NUM_PASOS] [SEMILLA]")
-    print("Ejemplo: python benchmark_cython.py 200 2000 42")
-    print("Parámetros por defecto: NUM_PARTICULAS=100, NUM_PASOS=1000, SEMILLA=42")
+    print("Uso: python benchmark_cython.py [NUM_PARTICULAS] [NUM_PASOS] [SEMILLA] [BROADPHASE] [KERNEL] [NUM_HILOS]")
+    print("Ejemplo: python benchmark_cython.py 200 2000 42 bruteforce referencia")
+    print("Ejemplo: python benchmark_cython.py 20000 1000 42 grid memoryview 0")
+    print("Parámetros por defecto: NUM_PARTICULAS=100, NUM_PASOS=1000, SEMILLA=42, BROADPHASE=bruteforce, KERNEL=memoryview, NUM_HILOS=1")
+    print("BROADPHASE: bruteforce (todos los pares) o grid (lista de celdas)")
+    print("KERNEL: memoryview (sin GIL) o referencia (versión original con arrays NumPy, sólo bruteforce)")
+    print("NUM_HILOS: hilos OpenMP para la búsqueda de pares (1 = serie, 0 = OMP_NUM_THREADS o todos los núcleos); sólo kernel memoryview")
 
 if __name__ == "__main__":
     if len(sys.argv) == 2 and sys.argv[1] in ['-h', '--help', 'help']:
@@ -84,17 +115,40 @@ if __name__ == "__main__":
     elif len(sys.argv) == 1:
         # Usar valores por defecto
         run_simulation_cython()
-    elif len(sys.argv) == 4:
+    elif len(sys.argv) in (4, 5, 6, 7):
         try:
             num_particulas = int(sys.argv[1])
             num_pasos = int(sys.argv[2])
             semilla = int(sys.argv[3])
+            broadphase = sys.argv[4] if len(sys.argv) >= 5 else BROADPHASE
+            kernel = sys.argv[5] if len(sys.argv) >= 6 else KERNEL
+            num_hilos = int(sys.argv[6]) if len(sys.argv) == 7 else NUM_HILOS
             
             if num_particulas <= 0 or num_pasos <= 0:
                 print("Error: NUM_PARTICULAS y NUM_PASOS deben ser números positivos")
                 sys.exit(1)
+
+            if num_hilos < 0:
+                print("Error: NUM_HILOS no puede ser negativo")
+                sys.exit(1)
+
+            if broadphase not in BROADPHASES:
+                print(f"Error: BROADPHASE debe ser uno de {', '.join(BROADPHASES)}")
+                sys.exit(1)
+
+            if kernel not in KERNELS:
+                print(f"Error: KERNEL debe ser uno de {', '.join(KERNELS)}")
+                sys.exit(1)
+
+            if broadphase == 'grid' and kernel == 'referencia':
+                print("Error: el kernel de referencia sólo existe para BROADPHASE bruteforce")
+                sys.exit(1)
+
+            if kernel == 'referencia' and num_hilos != 1:
+                print("Error: el kernel de referencia no admite NUM_HILOS distinto de 1")
+                sys.exit(1)
                 
-            run_simulation_cython(num_particulas, num_pasos, semilla)
+            run_simulation_cython(num_particulas, num_pasos, semilla, broadphase, kernel, num_hilos)
         except ValueError:
             print("Error: Todos los argumentos deben ser números enteros")
             mostrar_ayuda()
@@ -0,0 +1,97 @@
+import sys
+import engine_numba
+import engines
+# Mismo mundo y misma física que benchmark.py
+from benchmark import (NUM_PARTICULAS, ANCHO_MUNDO, ALTO_MUNDO, RADIO_PARTICULA, DT, NUM_PASOS,
+                       COEF_RESTITUCION_PARED, COEF_RESTITUCION_PARTICULA, SEMILLA, mostrar_progreso)
+
+# Parámetros por defecto
+BROADPHASE = 'bruteforce'
+BROADPHASES = ('bruteforce', 'grid')
+
+def parametros(broadphase=BROADPHASE):
+    """Diccionario params de engine_numba.run_steps con las constantes de este módulo"""
+    return {
+        'ancho_mundo': ANCHO_MUNDO,
+        'alto_mundo': ALTO_MUNDO,
+        'radio_particula': RADIO_PARTICULA,
+        'dt': DT,
+        'coef_restitucion_pared': COEF_RESTITUCION_PARED,
+        'coef_restitucion_particula': COEF_RESTITUCION_PARTICULA,
+        'broadphase': broadphase
+    }
+
+def simular(posiciones, velocidades, num_pasos, broadphase=BROADPHASE, callback=None, progress_every=0, perfil=None):
+    """Avanzar num_pasos pasos con engine_numba.run_steps"""
+    return engine_numba.run_steps(
+        posiciones,
+        velocidades,
+        num_pasos,
+        parametros(broadphase),
+        callback=callback,
+        progress_every=progress_every,
+        perfil=perfil
+    )
+
+def simular_lote(posiciones, velocidades, num_pasos, broadphase=BROADPHASE, callback=None, progress_every=0):
+    """Avanzar num_pasos pasos de un lote (B, N, 2) con engine_numba.run_steps_batch"""
+    return engine_numba.run_steps_batch(
+        posiciones,
+        velocidades,
+        num_pasos,
+        parametros(broadphase),
+        callback=callback,
+        progress_every=progress_every
+    )
+
+def run_simulation_numba(num_particulas=NUM_PARTICULAS, num_pasos=NUM_PASOS, semilla=SEMILLA, broadphase=BROADPHASE):
+    print(f"Iniciando benchmark con Numba - {num_particulas} partículas, {num_pasos} pasos, semilla {semilla}, broadphase {broadphase}")
+
+    resultado = engines.get_engine('benchmark_numba').run(
+        {'num_particulas': num_particulas, 'num_pasos': num_pasos, 'semilla': semilla, 'broadphase': broadphase},
+        callback=mostrar_progreso(num_pasos),
+        progress_every=num_pasos // 10
+    )
+
+    print("-" * 30)
+    print(f"SIMULACIÓN COMPILADA (CON NUMBA)")
+    print(resultado.reporte())
+    print("-" * 30)
+    return resultado
+
+def mostrar_ayuda():
+    print("Uso: python benchmark_numba.py [NUM_PARTICULAS] [NUM_PASOS] [SEMILLA] [BROADPHASE]")
+    print("Ejemplo: python benchmark_numba.py 200 2000 42 grid")
+    print("Parámetros por defecto: NUM_PARTICULAS=100, NUM_PASOS=1000, SEMILLA=42, BROADPHASE=bruteforce")
+    print("BROADPHASE: bruteforce (todos los pares) o grid (lista de celdas)")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] in ['-h', '--help', 'help']:
+        mostrar_ayuda()
+    elif len(sys.argv) == 1:
+        # Usar valores por defecto
+        run_simulation_numba()
+    elif len(sys.argv) in (4, 5):
+        try:
+            num_particulas = int(sys.argv[1])
+            num_pasos = int(sys.argv[2])
+            semilla = int(sys.argv[3])
+            broadphase = sys.argv[4] if len(sys.argv) == 5 else BROADPHASE
+            
+            if num_particulas <= 0 or num_pasos <= 0:
+                print("Error: NUM_PARTICULAS y NUM_PASOS deben ser números positivos")
+                sys.exit(1)
+
+            if broadphase not in BROADPHASES:
+                print(f"Error: BROADPHASE debe ser uno de {', '.join(BROADPHASES)}")
+                sys.exit(1)
+                
+            run_simulation_numba(num_particulas, num_pasos, semilla, broadphase)
+        except ValueError:
+            print("Error: Todos los argumentos deben ser números enteros")
+            mostrar_ayuda()
+            sys.exit(1)
+    else:
+        print("Error: Número incorrecto de argumentos")
+        mostrar_ayuda()
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,118 @@
+import sys
+import time
+import engine_numpy
+import engines
+# Mismo mundo y misma física que benchmark.py
+from benchmark import (NUM_PARTICULAS, ANCHO_MUNDO, ALTO_MUNDO, RADIO_PARTICULA, DT, NUM_PASOS,
+                       COEF_RESTITUCION_PARED, COEF_RESTITUCION_PARTICULA, SEMILLA, mostrar_progreso, _medir)
+
+# Parámetros por defecto
+BROADPHASE = 'grid'
+BROADPHASES = ('bruteforce', 'grid')
+
+def simular(posiciones, velocidades, num_pasos, broadphase=BROADPHASE, callback=None, progress_every=0, perfil=None):
+    """Avanzar num_pasos pasos; devuelve (colisiones_particula_particula, colisiones_con_pared, pares_revisados).
+
+    Con perfil (engines.nuevo_perfil) suma los segundos de cada fase del paso.
+    """
+    colisiones_particula_particula = 0
+    colisiones_con_pared = 0
+    pares_revisados = 0
+    num_particulas = len(posiciones)
+    medir = perfil is not None
+    marca = 0.0
+
+    for paso in range(num_pasos):
+        if medir:
+            marca = time.perf_counter()
+        posiciones += velocidades * DT
+        if medir:
+            marca = _medir(perfil, engines.INTEGRACION, marca)
+
+        colisiones_con_pared += engine_numpy.reflejar_paredes(
+            posiciones,
+            velocidades,
+            ANCHO_MUNDO,
+            ALTO_MUNDO,
+            RADIO_PARTICULA,
+            COEF_RESTITUCION_PARED
+        )
+        if medir:
+            marca = _medir(perfil, engines.PAREDES, marca)
+
+        if broadphase == 'grid':
+            pares_i, pares_j = engine_numpy.pares_grilla(posiciones, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO)
+        else:
+            pares_i, pares_j = engine_numpy.pares_fuerza_bruta(num_particulas)
+        pares_revisados += len(pares_i)
+        if medir:
+            marca = _medir(perfil, engines.FASE_AMPLIA, marca)
+
+        colisiones_particula_particula += engine_numpy.resolver_colisiones(
+            posiciones,
+            velocidades,
+            pares_i,
+            pares_j,
+            RADIO_PARTICULA,
+            COEF_RESTITUCION_PARTICULA,
+            perfil
+        )
+        if medir:
+            _medir(perfil, engines.FASE_ESTRECHA, marca)
+
+        if callback is not None and progress_every > 0 and (paso + 1) % progress_every == 0:
+            callback(paso + 1, colisiones_particula_particula, colisiones_con_pared)
+
+    return colisiones_particula_particula, colisiones_con_pared, pares_revisados
+
+def run_simulation_numpy(num_particulas=NUM_PARTICULAS, num_pasos=NUM_PASOS, semilla=SEMILLA, broadphase=BROADPHASE):
+    print(f"Iniciando benchmark con NumPy vectorizado - {num_particulas} partículas, {num_pasos} pasos, semilla {semilla}, broadphase {broadphase}")
+
+    resultado = engines.get_engine('benchmark_numpy').run(
+        {'num_particulas': num_particulas, 'num_pasos': num_pasos, 'semilla': semilla, 'broadphase': broadphase},
+        callback=mostrar_progreso(num_pasos),
+        progress_every=num_pasos // 10
+    )
+
+    print("-" * 30)
+    print(f"SIMULACIÓN VECTORIZADA (CON NUMPY)")
+    print(resultado.reporte())
+    print("-" * 30)
+    return resultado
+
+def mostrar_ayuda():
+    print("Uso: python benchmark_numpy.py [NUM_PARTICULAS] [NUM_PASOS] [SEMILLA] [BROADPHASE]")
+    print("Ejemplo: python benchmark_numpy.py 200 2000 42 grid")
+    print("Parámetros por defecto: NUM_PARTICULAS=100, NUM_PASOS=1000, SEMILLA=42, BROADPHASE=grid")
+    print("BROADPHASE: bruteforce (todos los pares) o grid (lista de celdas)")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] in ['-h', '--help', 'help']:
+        mostrar_ayuda()
+    elif len(sys.argv) == 1:
+        # Usar valores por defecto
+        run_simulation_numpy()
+    elif len(sys.argv) in (4, 5):
+        try:
+            num_particulas = int(sys.argv[1])
+            num_pasos = int(sys.argv[2])
+            semilla = int(sys.argv[3])
+            broadphase = sys.argv[4] if len(sys.argv) == 5 else BROADPHASE
+            
+            if num_particulas <= 0 or num_pasos <= 0:
+                print("Error: NUM_PARTICULAS y NUM_PASOS deben ser números positivos")
+                sys.exit(1)
+
+            if broadphase not in BROADPHASES:
+                print(f"Error: BROADPHASE debe ser uno de {', '.join(BROADPHASES)}")
+                sys.exit(1)
+                
+            run_simulation_numpy(num_particulas, num_pasos, semilla, broadphase)
+        except ValueError:
+            print("Error: Todos los argumentos deben ser números enteros")
+            mostrar_ayuda()
+            sys.exit(1)
+    else:
+        print("Error: Número incorrecto de argumentos")
+        mostrar_ayuda()
+        sys.exit(1)
\ No newline at end of file
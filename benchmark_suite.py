@@ -0,0 +1,250 @@
+"""
+Suite de benchmarks de los motores registrados en engines
+
+Recorre motor × broadphase × partículas × hilos, y para cada combinación
+hace corridas de calentamiento (compilación JIT, cachés) y luego varias
+corridas medidas. Cada medición es el execution_time del SimulationResult
+(sólo el bucle de pasos, con perf_counter). Se informa mediana, cuartiles e
+IQR del tiempo, pasos por segundo y pares revisados por segundo sobre la
+mediana.
+
+El resultado se guarda en JSON. Con --baseline se compara contra una corrida
+anterior: una combinación es una regresión si su mediana empeora más que
+--umbral y su primer cuartil queda por encima del tercer cuartil de la
+línea base (los rangos no se solapan). Con regresiones el script termina
+con código 1.
+
+Uso:
+    python benchmark_suite.py
+    python benchmark_suite.py --motores benchmark_numba,benchmark_cython --particulas 1000,10000,50000 \\
+        --broadphase grid --hilos 1,2,4 --salida suite.json
+    python benchmark_suite.py --baseline suite.json --umbral 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+import numpy as np
+
+import engines
+
+PARTICULAS = (100, 1000, 10000, 50000)
+PASOS = 100
+REPETICIONES = 5
+CALENTAMIENTO = 1
+UMBRAL = 0.10
+# Una combinación cuyo calentamiento supera (o se estima que superará) este
+# tiempo no se repite, y no se prueban tamaños mayores con el mismo motor,
+# broadphase e hilos
+MAX_SEGUNDOS = 30.0
+SALIDA = 'benchmark_suite.json'
+
+def _lista(texto, tipo=str):
+    return [tipo(valor) for valor in texto.split(',') if valor.strip()]
+
+def _clave(entrada):
+    return (entrada['engine'], entrada['broadphase'], entrada['num_particulas'],
+            entrada['num_pasos'], entrada['threads'])
+
+def medir(engine, params, repeticiones, calentamiento, max_segundos):
+    """Tiempos de repeticiones corridas tras calentamiento; None en tiempos si el calentamiento fue muy lento"""
+    resultado = None
+    for _ in range(max(1, calentamiento)):
+        resultado = engine.run(params)
+    if resultado.execution_time > max_segundos:
+        return resultado, None
+
+    tiempos = []
+    for _ in range(repeticiones):
+        medido = engine.run(params)
+        if (medido.particle_collisions, medido.wall_collisions) != \
+                (resultado.particle_collisions, resultado.wall_collisions):
+            raise RuntimeError(f"{engine.name} no es determinista con {params}")
+        tiempos.append(medido.execution_time)
+    return resultado, tiempos
+
+def resumir(engine, params, threads, resultado, tiempos):
+    """Entrada de la suite para una combinación"""
+    entrada = {
+        'engine': engine.name,
+        'engine_version': engine.version(),
+        'broadphase': params['broadphase'],
+        'num_particulas': params['num_particulas'],
+        'num_pasos': params['num_pasos'],
+        'threads': threads,
+        'particle_collisions': resultado.particle_collisions,
+        'wall_collisions': resultado.wall_collisions,
+        'pair_checks': resultado.pair_checks,
+        'setup_time': resultado.setup_time
+    }
+    if tiempos is None:
+        entrada.update(skipped=True, warmup_time=resultado.execution_time)
+        return entrada
+
+    q1, mediana, q3 = (float(valor) for valor in np.percentile(tiempos, [25, 50, 75]))
+    entrada.update(
+        skipped=False,
+        times=tiempos,
+        median=mediana,
+        q1=q1,
+        q3=q3,
+        iqr=q3 - q1,
+        min=min(tiempos),
+        steps_per_second=params['num_pasos'] / mediana if mediana > 0 else None,
+        pair_checks_per_second=(resultado.pair_checks / mediana
+                                if resultado.pair_checks is not None and mediana > 0 else None)
+    )
+    return entrada
+
+def ejecutar_suite(motores, broadphases, particulas, pasos, hilos, repeticiones, calentamiento, max_segundos):
+    entradas = []
+    for nombre in motores:
+        engine = engines.get_engine(nombre)
+        # Los motores sin parámetro de hilos se miden una sola vez por tamaño
+        combinaciones = [(broadphase, threads) for broadphase in broadphases if broadphase in engine.broadphases
+                         for threads in (hilos if engine.threads_param else [None])]
+        try:
+            for broadphase, threads in combinaciones:
+                anterior = None
+                for num_particulas in sorted(particulas):
+                    # En la caja fija el costo crece a lo sumo con N²: no arrancar una
+                    # corrida que ya se sabe demasiado lenta
+                    if anterior is not None:
+                        estimado = anterior[1] * (num_particulas / anterior[0]) ** 2
+                        if estimado > max_segundos:
+                            print(f"{nombre:<18} {broadphase:<10} N={num_particulas:<6} omitido "
+                                  f"(estimado {estimado:.0f}s > {max_segundos}s)")
+                            break
+                    params = {'num_particulas': num_particulas, 'num_pasos': pasos,
+                              'semilla': engines.SEMILLA, 'broadphase': broadphase}
+                    if threads is not None:
+                        params[engine.threads_param] = threads
+                    resultado, tiempos = medir(engine, params, repeticiones, calentamiento, max_segundos)
+                    entrada = resumir(engine, params, threads, resultado, tiempos)
+                    entradas.append(entrada)
+                    mostrar_entrada(entrada)
+                    anterior = (num_particulas, resultado.execution_time)
+                    if entrada['skipped']:
+                        print(f"  calentamiento de {resultado.execution_time:.1f}s > {max_segundos}s: "
+                              f"no se prueban tamaños mayores")
+                        break
+        except ImportError as e:
+            # Backend no instalado o extensión sin compilar en este host
+            print(f"{nombre}: no disponible ({e})")
+    return entradas
+
+def mostrar_entrada(entrada):
+    hilos = '-' if entrada['threads'] is None else entrada['threads']
+    prefijo = (f"{entrada['engine']:<18} {entrada['broadphase']:<10} N={entrada['num_particulas']:<6} "
+               f"hilos={hilos:<3}")
+    if entrada['skipped']:
+        print(f"{prefijo} omitido")
+        return
+    pares = entrada['pair_checks_per_second']
+    print(f"{prefijo} mediana {entrada['median']:.4f}s (IQR {entrada['iqr']:.4f}s)  "
+          f"{entrada['steps_per_second']:.1f} pasos/s"
+          + (f"  {pares:.3g} pares/s" if pares is not None else ''))
+
+def comparar(entradas, baseline, umbral):
+    """Regresiones y mejoras de entradas contra las de la línea base"""
+    base = {_clave(entrada): entrada for entrada in baseline['results'] if not entrada.get('skipped')}
+    regresiones, mejoras = [], []
+    for entrada in entradas:
+        anterior = base.get(_clave(entrada))
+        if entrada['skipped'] or anterior is None:
+            continue
+        cambio = entrada['median'] / anterior['median'] - 1
+        comparacion = {
+            'key': list(_clave(entrada)),
+            'median': entrada['median'],
+            'baseline_median': anterior['median'],
+            'change': cambio,
+            'engine_changed': entrada['engine_version'] != anterior.get('engine_version')
+        }
+        if cambio > umbral and entrada['q1'] > anterior['q3']:
+            regresiones.append(comparacion)
+        elif cambio < -umbral and entrada['q3'] < anterior['q1']:
+            mejoras.append(comparacion)
+    return regresiones, mejoras
+
+def metadatos(args):
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'engine_versions': engines.engine_versions(),
+        'config': {
+            'engines': args.motores,
+            'broadphases': args.broadphase,
+            'particles': args.particulas,
+            'steps': args.pasos,
+            'threads': args.hilos,
+            'repeats': args.repeticiones,
+            'warmup': args.calentamiento
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Suite de benchmarks de los motores de simulación')
+    parser.add_argument('--motores', type=_lista, default=engines.available_engines(),
+                        help='Motores separados por coma (por defecto, todos los registrados)')
+    parser.add_argument('--broadphase', type=_lista, default=['bruteforce', 'grid'],
+                        help='Broadphases separadas por coma')
+    parser.add_argument('--particulas', type=lambda texto: _lista(texto, int), default=list(PARTICULAS),
+                        help='Números de partículas separados por coma')
+    parser.add_argument('--pasos', type=int, default=PASOS, help='Pasos por corrida')
+    parser.add_argument('--hilos', type=lambda texto: _lista(texto, int), default=[1],
+                        help='Hilos a probar en los motores paralelos (0 = todos los núcleos)')
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES, help='Corridas medidas por combinación')
+    parser.add_argument('--calentamiento', type=int, default=CALENTAMIENTO, help='Corridas previas sin medir')
+    parser.add_argument('--max-segundos', type=float, default=MAX_SEGUNDOS,
+                        help='Calentamiento máximo antes de dejar de crecer en tamaño')
+    parser.add_argument('--salida', default=SALIDA, help='Archivo JSON de resultados')
+    parser.add_argument('--baseline', default=None, help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--umbral', type=float, default=UMBRAL,
+                        help='Empeoramiento relativo de la mediana que cuenta como regresión')
+    args = parser.parse_args()
+
+    if args.pasos <= 0 or args.repeticiones <= 0:
+        parser.error('--pasos y --repeticiones deben ser positivos')
+    for nombre in args.motores:
+        engines.get_engine(nombre)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    entradas = ejecutar_suite(args.motores, args.broadphase, args.particulas, args.pasos, args.hilos,
+                              args.repeticiones, args.calentamiento, args.max_segundos)
+    salida = {'meta': metadatos(args), 'results': entradas}
+
+    codigo = 0
+    if baseline is not None:
+        regresiones, mejoras = comparar(entradas, baseline, args.umbral)
+        salida['comparison'] = {'baseline': args.baseline, 'threshold': args.umbral,
+                                'regressions': regresiones, 'improvements': mejoras}
+        print("-" * 30)
+        for titulo, lista in (('REGRESIÓN', regresiones), ('Mejora', mejoras)):
+            for comparacion in lista:
+                nota = ' (cambió el código del motor)' if comparacion['engine_changed'] else ''
+                print(f"{titulo}: {' '.join(str(valor) for valor in comparacion['key'])}: "
+                      f"{comparacion['baseline_median']:.4f}s -> {comparacion['median']:.4f}s "
+                      f"({comparacion['change']:+.1%}){nota}")
+        print(f"{len(regresiones)} regresiones, {len(mejoras)} mejoras respecto de {args.baseline}")
+        codigo = 1 if regresiones else 0
+
+    with open(args.salida, 'w') as f:
+        json.dump(salida, f, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+    sys.exit(codigo)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,605 @@
+"""
+Descomposición espacial de una simulación en franjas, una por proceso
+
+El dominio ANCHO_MUNDO × ALTO_MUNDO se corta en franjas verticales que al
+empezar tienen el mismo número de partículas. Cada franja (run_strip, en un
+proceso propio, local o dentro de un worker) integra y rebota contra las
+paredes sus partículas. El coordinador (Coordinator) recibe de cada franja
+las partículas que cambiaron de franja y las que están a menos de halo de
+sus bordes, y devuelve a cada una sus inmigrantes y su halo. La
+comunicación es por TCP (multiprocessing.connection) con una clave por
+simulación: se prueba igual con procesos locales por loopback que con
+workers en otras máquinas. Los mensajes son un encabezado JSON seguido de
+los bytes de cada arreglo, sin pickle, así que una conexión no puede
+ejecutar código en el otro extremo.
+
+A un worker se le pide una franja con una solicitud firmada con HMAC con
+un secreto compartido (STRIP_SECRET), que el worker también usa para
+derivar la clave de la conexión: la clave no viaja. El worker sólo se
+conecta a coordinadores en los hosts que tiene permitidos (el de su
+orquestador), y el coordinador escucha sólo en la interfaz con la que
+los workers llegan a él.
+
+La fase de colisiones de benchmark.py resuelve los pares en orden (i, j) y
+cada corrección cambia los pares siguientes, así que no se puede repartir
+sin más. Cada franja ejecuta esa misma fase, en orden de índice global,
+sobre sus partículas y su halo. El resultado de sus partículas es el de la
+fase global si se cumplen dos condiciones que la franja comprueba:
+
+- Ninguna partícula se movió más de HOLGURA radios por correcciones.
+  Entonces dos partículas que al empezar la fase estaban a más de
+  2·radio + 2·holgura no pueden chocar, y cada grupo de partículas
+  conectadas a menos de esa distancia evoluciona como si estuviera solo.
+- Ningún grupo que toque el borde exterior del halo (y que por lo tanto
+  puede seguir fuera de él) llega a la zona de guarda junto a la franja,
+  la que alcanza la grilla de una partícula propia. Así los pares que la
+  fase global revisa con i propio están todos en la franja, con su estado
+  correcto.
+
+Si alguna franja no las cumple, ese paso se repite entero: el coordinador
+junta el estado de las franjas y la primera ejecuta engine_numba.colisiones
+sobre todas las partículas. Con eso los conteos (colisiones entre
+partículas, con paredes y pares revisados) son los de benchmark_numba con
+grid para la misma semilla. El reparto conviene con gases diluidos, donde
+los grupos de contacto son chicos frente al halo; con muchas partículas
+superpuestas casi todos los pasos terminan siendo globales.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from multiprocessing import AuthenticationError, get_context
+from multiprocessing.connection import Client, Listener
+from urllib.parse import urlparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRANJAS = 2
+# Ancho del halo a cada lado de una franja, en unidades del mundo
+HALO = 120.0
+# Desplazamiento máximo por correcciones en un paso, en radios de partícula
+HOLGURA = 0.5
+# Segundos que el coordinador espera a que se conecten todas las franjas
+TIMEOUT_CONEXION = 60
+# Segundos durante los que un worker acepta una solicitud de franja firmada
+VIGENCIA_SOLICITUD = 60
+# Cabecera HTTP con la firma de una solicitud de franja
+CABECERA_FIRMA = 'X-Strip-Signature'
+# Tipos de arreglo que viajan entre el coordinador y las franjas
+_TIPOS = ('<f8', '<i8', '|b1')
+
+def parametros():
+    """params de engine_numba con las constantes de benchmark.py (las de todos los motores)"""
+    import benchmark
+    return {
+        'ancho_mundo': benchmark.ANCHO_MUNDO,
+        'alto_mundo': benchmark.ALTO_MUNDO,
+        'radio_particula': benchmark.RADIO_PARTICULA,
+        'dt': benchmark.DT,
+        'coef_restitucion_pared': benchmark.COEF_RESTITUCION_PARED,
+        'coef_restitucion_particula': benchmark.COEF_RESTITUCION_PARTICULA,
+        'broadphase': 'grid'
+    }
+
+def distancias(radio):
+    """(holgura, alcance, guarda) para partículas de ese radio.
+
+    alcance es la distancia inicial a partir de la cual dos partículas no
+    pueden chocar en el paso; guarda, la franja exterior desde la que una
+    partícula puede caer en las celdas vecinas de una propia.
+    """
+    holgura = HOLGURA * radio
+    return holgura, 2 * radio + 2 * holgura, 4 * radio + 2 * holgura
+
+def halo_minimo(radio):
+    """Halo más angosto con el que un grupo de contacto cabe entre el borde exterior y la guarda"""
+    _, alcance, guarda = distancias(radio)
+    return guarda + alcance
+
+def cortes(x, num_franjas):
+    """Cortes internos entre franjas que reparten las posiciones x en partes iguales"""
+    return np.quantile(x, np.arange(1, num_franjas) / num_franjas)
+
+def _dueno(x, limites):
+    return np.searchsorted(limites, x, side='right')
+
+def _sin_demora(conexion):
+    """TCP_NODELAY: Connection manda encabezado y datos por separado, y Nagle demoraría el segundo envío"""
+    with socket.fromfd(conexion.fileno(), socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return conexion
+
+def _enviar(conexion, mensaje):
+    """Mandar dicts, listas, tuplas, escalares y ndarrays en un solo mensaje, sin pickle.
+
+    El mensaje es el largo del encabezado JSON, el encabezado y los bytes de
+    cada arreglo alineados a 8 bytes; las tuplas llegan como listas.
+    """
+    arreglos = []
+    tablas = []
+    inicio = 0
+
+    def codificar(valor):
+        nonlocal inicio
+        if isinstance(valor, np.ndarray):
+            arreglo = np.ascontiguousarray(valor)
+            arreglos.append(arreglo)
+            tablas.append((arreglo.dtype.str, arreglo.shape, inicio))
+            inicio += -(-arreglo.nbytes // 8) * 8
+            return {'__arreglo__': len(arreglos) - 1}
+        if isinstance(valor, dict):
+            return {clave: codificar(v) for clave, v in valor.items()}
+        if isinstance(valor, (list, tuple)):
+            return [codificar(v) for v in valor]
+        if isinstance(valor, np.generic):
+            return valor.item()
+        return valor
+
+    encabezado = json.dumps({'mensaje': codificar(mensaje), 'arreglos': tablas}).encode()
+    base = -(-(8 + len(encabezado)) // 8) * 8
+    datos = bytearray(base + inicio)
+    struct.pack_into('<Q', datos, 0, len(encabezado))
+    datos[8:8 + len(encabezado)] = encabezado
+    for arreglo, (_, _, desde) in zip(arreglos, tablas):
+        datos[base + desde:base + desde + arreglo.nbytes] = memoryview(arreglo.reshape(-1).view(np.uint8))
+    conexion.send_bytes(datos)
+
+def _recibir(conexion):
+    """Mensaje de _enviar; ValueError si trae un tipo de arreglo que no es de _TIPOS"""
+    datos = bytearray(conexion.recv_bytes())
+    largo, = struct.unpack_from('<Q', datos)
+    encabezado = json.loads(datos[8:8 + largo])
+    base = -(-(8 + largo) // 8) * 8
+    arreglos = []
+    for tipo, forma, desde in encabezado['arreglos']:
+        if tipo not in _TIPOS:
+            raise ValueError(f"Tipo de arreglo no admitido: {tipo}")
+        # Sobre el bytearray recibido: escribibles, sin otra copia
+        arreglos.append(np.ndarray(forma, np.dtype(tipo), datos, base + desde))
+
+    def decodificar(valor):
+        if isinstance(valor, dict):
+            if '__arreglo__' in valor:
+                return arreglos[valor['__arreglo__']]
+            return {clave: decodificar(v) for clave, v in valor.items()}
+        if isinstance(valor, list):
+            return [decodificar(v) for v in valor]
+        return valor
+
+    return decodificar(encabezado['mensaje'])
+
+def _clave(secreto, nonce):
+    """authkey de la conexión con el coordinador, derivada del secreto compartido y el nonce de la solicitud"""
+    return hmac.new(secreto.encode(), b'franja:' + nonce, hashlib.sha256).digest()
+
+def firmar(secreto, cuerpo):
+    """Firma (HMAC-SHA256 en hexadecimal) del cuerpo de una solicitud de franja"""
+    return hmac.new(secreto.encode(), cuerpo, hashlib.sha256).hexdigest()
+
+def _ips(host):
+    try:
+        return {info[4][0] for info in socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError):
+        return set()
+
+def abrir_solicitud(cuerpo, firma, secreto, coordinadores):
+    """Validar una solicitud de solicitar_franjas; devuelve ((host, puerto), authkey).
+
+    cuerpo son los bytes recibidos y firma, su cabecera CABECERA_FIRMA.
+    coordinadores son los hosts desde los que se aceptan coordinadores; los
+    nombres se resuelven en cada solicitud. Lanza PermissionError si falta
+    el secreto, la firma no corresponde, la solicitud venció o el
+    coordinador no está en un host permitido, y ValueError si está mal
+    formada.
+    """
+    if not secreto:
+        raise PermissionError("Este worker no acepta franjas: no tiene el secreto compartido (STRIP_SECRET)")
+    if not firma or not hmac.compare_digest(firmar(secreto, cuerpo), firma):
+        raise PermissionError("Firma inválida en la solicitud de franja")
+    try:
+        datos = json.loads(cuerpo)
+        host, puerto = datos['coordinator'].rsplit(':', 1)
+        direccion = (host, int(puerto))
+        nonce = bytes.fromhex(datos['nonce'])
+        emitida = float(datos['timestamp'])
+    except (KeyError, ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f"Solicitud de franja mal formada: {e}")
+    if abs(time.time() - emitida) > VIGENCIA_SOLICITUD:
+        raise PermissionError("La solicitud de franja venció")
+    permitidas = set().union(*(_ips(permitido) for permitido in coordinadores))
+    if not _ips(host) & permitidas:
+        raise PermissionError(f"Coordinador en un host no permitido: {host}")
+    return direccion, _clave(secreto, nonce)
+
+class _Franja:
+    """Estado de una franja dentro de su proceso, con sus partículas ordenadas por índice global"""
+
+    def __init__(self, datos):
+        self.franja = datos['franja']
+        self.limites = datos['limites']
+        self.params = datos['params']
+        self.halo = datos['halo']
+        self.indices = datos['indices']
+        self.posiciones = datos['posiciones']
+        self.velocidades = datos['velocidades']
+        self.x0 = self.limites[self.franja - 1] if self.franja > 0 else -np.inf
+        self.x1 = self.limites[self.franja] if self.franja < len(self.limites) else np.inf
+        self.holgura, self.alcance, self.guarda = distancias(self.params['radio_particula'])
+        # Resultado de la última fase de colisiones hasta que el coordinador lo confirma
+        self.tentativo = None
+
+    def avanzar(self):
+        """Integración y paredes; devuelve las partículas que salen y las que pueden ser halo de otra franja"""
+        import engine_numba
+
+        self.confirmar()
+        paredes = engine_numba.integrar_y_paredes(self.posiciones, self.velocidades, self.params)
+        x = self.posiciones[:, 0]
+        salen = _dueno(x, self.limites) != self.franja
+        envio = salen | (x < self.x0 + self.halo) | (x >= self.x1 - self.halo)
+        mensaje = {
+            'paredes': paredes,
+            'indices': self.indices[envio],
+            'posiciones': self.posiciones[envio],
+            'velocidades': self.velocidades[envio]
+        }
+        quedan = ~salen
+        self.indices = self.indices[quedan]
+        self.posiciones = self.posiciones[quedan]
+        self.velocidades = self.velocidades[quedan]
+        return mensaje
+
+    def colisionar(self, recibido):
+        """Fase de colisiones sobre las propias y el halo; el resultado queda pendiente de confirmar"""
+        import engine_numba
+
+        indices, posiciones, velocidades = recibido['inmigrantes']
+        if len(indices):
+            indices = np.concatenate([self.indices, indices])
+            orden = np.argsort(indices, kind='stable')
+            self.indices = indices[orden]
+            self.posiciones = np.concatenate([self.posiciones, posiciones])[orden]
+            self.velocidades = np.concatenate([self.velocidades, velocidades])[orden]
+
+        indices_halo, posiciones_halo, velocidades_halo = recibido['halo']
+        orden = np.argsort(np.concatenate([self.indices, indices_halo]), kind='stable')
+        propias = orden < len(self.indices)
+        posiciones = np.concatenate([self.posiciones, posiciones_halo])[orden]
+        velocidades = np.concatenate([self.velocidades, velocidades_halo])[orden]
+        recorrido = np.zeros(len(orden))
+
+        colisiones, revisados = engine_numba.colisiones_franja(posiciones, velocidades, propias, recorrido,
+                                                               self.params)
+        # Una sola franja tiene todas las partículas: su fase es la global
+        valida = (len(self.limites) == 0
+                  or (recorrido.max(initial=0) <= self.holgura and self._aislada(posiciones_halo)))
+        self.tentativo = (posiciones[propias], velocidades[propias])
+        return {'valida': bool(valida), 'colisiones': colisiones, 'revisados': revisados}
+
+    def _aislada(self, posiciones):
+        """¿Ningún grupo de contacto que pueda seguir fuera del halo llega a la guarda de la franja?
+
+        posiciones son las del halo al empezar la fase de colisiones. Los
+        grupos se propagan desde las partículas a menos de alcance del borde
+        exterior del halo; una cadena que llega a las propias pasa
+        necesariamente por la guarda, porque cada salto es menor que su ancho.
+        """
+        import engine_numpy
+
+        if not len(posiciones):
+            return True
+        x = posiciones[:, 0]
+        alcanzadas = (x < self.x0 - self.halo + self.alcance) | (x >= self.x1 + self.halo - self.alcance)
+        if alcanzadas.any():
+            i, j = engine_numpy.pares_grilla(posiciones, self.alcance / 2, self.params['ancho_mundo'],
+                                             self.params['alto_mundo'])
+            cerca = ((posiciones[i] - posiciones[j]) ** 2).sum(axis=1) < self.alcance ** 2
+            i, j = i[cerca], j[cerca]
+            while True:
+                nuevas = alcanzadas[i] != alcanzadas[j]
+                if not nuevas.any():
+                    break
+                alcanzadas[i[nuevas]] = True
+                alcanzadas[j[nuevas]] = True
+        en_guarda = (x >= self.x0 - self.guarda) & (x < self.x1 + self.guarda)
+        return not (alcanzadas & en_guarda).any()
+
+    def confirmar(self):
+        if self.tentativo is not None:
+            self.posiciones, self.velocidades = self.tentativo
+            self.tentativo = None
+
+    def descartar(self):
+        """Estado previo a la fase de colisiones, para resolverla en forma global"""
+        self.tentativo = None
+        return self.indices, self.posiciones, self.velocidades
+
+    def fijar(self, estado):
+        self.posiciones, self.velocidades = estado
+
+    def estado(self):
+        self.confirmar()
+        return self.indices, self.posiciones, self.velocidades
+
+def run_strip(direccion, clave):
+    """Proceso de una franja: conectarse al coordinador y atender sus órdenes hasta 'terminar'.
+
+    direccion es (host, puerto) o 'host:puerto'; clave, la authkey del
+    coordinador en bytes o en hexadecimal.
+    """
+    import engine_numba
+
+    if isinstance(direccion, str):
+        host, puerto = direccion.rsplit(':', 1)
+        direccion = (host, int(puerto))
+    if isinstance(clave, str):
+        clave = bytes.fromhex(clave)
+
+    franja = None
+    with Client(tuple(direccion), authkey=clave) as conexion:
+        _sin_demora(conexion)
+        while True:
+            try:
+                orden, datos = _recibir(conexion)
+            except EOFError:
+                # El coordinador se cerró (simulación cancelada o con error)
+                return
+            if orden == 'cargar':
+                franja = _Franja(datos)
+            elif orden == 'avanzar':
+                _enviar(conexion, franja.avanzar())
+            elif orden == 'colisionar':
+                _enviar(conexion, franja.colisionar(datos))
+            elif orden == 'global':
+                _enviar(conexion, franja.descartar())
+            elif orden == 'resolver':
+                posiciones, velocidades = datos
+                colisiones, revisados = engine_numba.colisiones(posiciones, velocidades, franja.params)
+                _enviar(conexion, (posiciones, velocidades, colisiones, revisados))
+            elif orden == 'fijar':
+                franja.fijar(datos)
+            elif orden == 'recoger':
+                _enviar(conexion, franja.estado())
+            elif orden == 'terminar':
+                return
+            else:
+                raise ValueError(f"Orden desconocida del coordinador: {orden}")
+
+class Coordinator:
+    """Coordinador de una simulación repartida en num_franjas franjas.
+
+    Escucha en (host, port), con port 0 para uno libre, y las franjas se
+    conectan con run_strip((host, coordinator.port), coordinator.authkey).
+    Sin authkey usa una aleatoria. Las franjas siguen conectadas entre
+    llamadas a simular() hasta close().
+    """
+
+    def __init__(self, num_franjas, params, halo=HALO, host='127.0.0.1', port=0, authkey=None):
+        if num_franjas < 1:
+            raise ValueError("Hace falta al menos una franja")
+        minimo = halo_minimo(params['radio_particula'])
+        if halo < minimo:
+            raise ValueError(f"El halo debe ser de al menos {minimo} (es {halo})")
+        self.num_franjas = num_franjas
+        self.params = params
+        self.halo = halo
+        self.authkey = authkey or os.urandom(16)
+        self.conexiones = []
+        self.procesos = []
+        self.pasos_globales = 0
+        self._listener = Listener((host, port), authkey=self.authkey)
+        self._cerrado = False
+
+    @property
+    def port(self):
+        return self._listener.address[1]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def aceptar(self, timeout=TIMEOUT_CONEXION):
+        """Esperar a que se conecten todas las franjas; TimeoutError si no llegan a tiempo"""
+        def esperar():
+            while len(self.conexiones) < self.num_franjas and not self._cerrado:
+                try:
+                    self.conexiones.append(_sin_demora(self._listener.accept()))
+                except (AuthenticationError, EOFError, ConnectionError) as e:
+                    if not self._cerrado:
+                        logger.warning(f"Conexión rechazada en el coordinador: {e}")
+                except OSError:
+                    return
+
+        hilo = threading.Thread(target=esperar, daemon=True)
+        hilo.start()
+        hilo.join(timeout)
+        if len(self.conexiones) < self.num_franjas:
+            conectadas = len(self.conexiones)
+            self.close()
+            hilo.join()
+            raise TimeoutError(f"Sólo se conectaron {conectadas} de {self.num_franjas} franjas en {timeout}s")
+
+    def simular(self, posiciones, velocidades, num_pasos, callback=None, progress_every=0):
+        """Avanzar num_pasos pasos repartidos en las franjas y dejar el estado final en posiciones y velocidades.
+
+        Devuelve (colisiones_particula_particula, colisiones_con_pared,
+        pares_revisados) con la misma interfaz de callback que
+        engine_numba.run_steps.
+        """
+        limites = cortes(posiciones[:, 0], self.num_franjas)
+        duenos = _dueno(posiciones[:, 0], limites)
+        for franja, conexion in enumerate(self.conexiones):
+            propias = np.nonzero(duenos == franja)[0]
+            _enviar(conexion, ('cargar', {
+                'franja': franja,
+                'limites': limites,
+                'params': self.params,
+                'halo': self.halo,
+                'indices': propias,
+                'posiciones': posiciones[propias],
+                'velocidades': velocidades[propias]
+            }))
+
+        colisiones_particula_particula = 0
+        colisiones_con_pared = 0
+        pares_revisados = 0
+        globales = self.pasos_globales
+        for paso in range(1, num_pasos + 1):
+            envios = self._a_todas('avanzar')
+            colisiones_con_pared += sum(envio['paredes'] for envio in envios)
+            for conexion, datos in zip(self.conexiones, self._repartir(envios, limites)):
+                _enviar(conexion, ('colisionar', datos))
+            informes = [_recibir(conexion) for conexion in self.conexiones]
+
+            if all(informe['valida'] for informe in informes):
+                colisiones_particula_particula += sum(informe['colisiones'] for informe in informes)
+                pares_revisados += sum(informe['revisados'] for informe in informes)
+            else:
+                colisiones, revisados = self._paso_global(posiciones.shape[0])
+                colisiones_particula_particula += colisiones
+                pares_revisados += revisados
+
+            if callback is not None and progress_every > 0 and paso % progress_every == 0:
+                callback(paso, colisiones_particula_particula, colisiones_con_pared)
+
+        for indices, pos, vel in self._a_todas('recoger'):
+            posiciones[indices] = pos
+            velocidades[indices] = vel
+        logger.info(f"{num_pasos} pasos en {self.num_franjas} franjas, "
+                    f"{self.pasos_globales - globales} resueltos en forma global")
+        return colisiones_particula_particula, colisiones_con_pared, pares_revisados
+
+    def _a_todas(self, orden, datos=None):
+        for conexion in self.conexiones:
+            _enviar(conexion, (orden, datos))
+        return [_recibir(conexion) for conexion in self.conexiones]
+
+    def _repartir(self, envios, limites):
+        """Inmigrantes y halo de cada franja a partir de lo que mandaron todas"""
+        indices = np.concatenate([envio['indices'] for envio in envios])
+        posiciones = np.concatenate([envio['posiciones'] for envio in envios])
+        velocidades = np.concatenate([envio['velocidades'] for envio in envios])
+        origen = np.repeat(np.arange(self.num_franjas), [len(envio['indices']) for envio in envios])
+        x = posiciones[:, 0]
+        duenos = _dueno(x, limites)
+        bordes = np.concatenate([[-np.inf], limites, [np.inf]])
+
+        for franja in range(self.num_franjas):
+            inmigrantes = (duenos == franja) & (origen != franja)
+            halo = (duenos != franja) & (x >= bordes[franja] - self.halo) & (x < bordes[franja + 1] + self.halo)
+            yield {
+                'inmigrantes': (indices[inmigrantes], posiciones[inmigrantes], velocidades[inmigrantes]),
+                'halo': (indices[halo], posiciones[halo], velocidades[halo])
+            }
+
+    def _paso_global(self, num_particulas):
+        """Resolver la fase de colisiones del paso con todas las partículas en la primera franja"""
+        previos = self._a_todas('global')
+        posiciones = np.empty((num_particulas, 2))
+        velocidades = np.empty((num_particulas, 2))
+        for indices, pos, vel in previos:
+            posiciones[indices] = pos
+            velocidades[indices] = vel
+
+        _enviar(self.conexiones[0], ('resolver', (posiciones, velocidades)))
+        posiciones, velocidades, colisiones, revisados = _recibir(self.conexiones[0])
+        for conexion, (indices, _, _) in zip(self.conexiones, previos):
+            _enviar(conexion, ('fijar', (posiciones[indices], velocidades[indices])))
+        self.pasos_globales += 1
+        return colisiones, revisados
+
+    def close(self):
+        """Terminar las franjas conectadas y dejar de escuchar"""
+        if self._cerrado:
+            return
+        self._cerrado = True
+        for conexion in self.conexiones:
+            try:
+                _enviar(conexion, ('terminar', None))
+                conexion.close()
+            except OSError:
+                pass
+        # Despertar un accept() pendiente: cerrar el socket no lo interrumpe
+        host, port = self._listener.address
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+        except OSError:
+            pass
+        self._listener.close()
+        for proceso in self.procesos:
+            proceso.join(timeout=10)
+            if proceso.is_alive():
+                proceso.terminate()
+
+def lanzar_franjas(coordinador):
+    """Un proceso local por franja, conectado al coordinador por loopback"""
+    contexto = get_context('spawn')
+    for _ in range(coordinador.num_franjas):
+        proceso = contexto.Process(target=run_strip, args=(('127.0.0.1', coordinador.port), coordinador.authkey),
+                                   daemon=True)
+        proceso.start()
+        coordinador.procesos.append(proceso)
+
+def _ip_hacia(url):
+    """IP local con la que este host llega al de url (sin mandar nada)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect((urlparse(url).hostname, 9))
+        return s.getsockname()[0]
+
+def solicitar_franjas(coordinador, urls, host, secreto, nonce, timeout=10):
+    """Pedir a cada worker de urls (uno por franja, pueden repetirse) que ejecute una franja.
+
+    host es la dirección con la que los workers llegan al coordinador. La
+    solicitud va firmada con secreto, y con él y nonce cada worker deriva
+    la authkey del coordinador.
+    """
+    import requests
+
+    for url in urls:
+        cuerpo = json.dumps({'coordinator': f"{host}:{coordinador.port}", 'nonce': nonce.hex(),
+                             'timestamp': time.time()}).encode()
+        response = requests.post(f"{url.rstrip('/')}/strips", data=cuerpo, timeout=timeout,
+                                 headers={'Content-Type': 'application/json',
+                                          CABECERA_FIRMA: firmar(secreto, cuerpo)})
+        response.raise_for_status()
+
+def iniciar(num_franjas, halo=HALO, workers=None, host=None, secreto=None):
+    """Coordinador con todas sus franjas conectadas.
+
+    Sin workers, las franjas son procesos locales. Con workers (URLs, una
+    por franja o repartidas en orden), cada worker ejecuta una franja en su
+    pool y el coordinador escucha sólo en host, la dirección con la que los
+    workers llegan a él (por defecto, la IP local de la ruta hacia el
+    primero). Las solicitudes se firman con secreto, por defecto
+    $STRIP_SECRET; sin él, ValueError.
+    """
+    if workers:
+        secreto = secreto or os.getenv('STRIP_SECRET')
+        if not secreto:
+            raise ValueError("Las franjas en workers necesitan el secreto compartido STRIP_SECRET")
+        urls = [workers[k % len(workers)] for k in range(num_franjas)]
+        host = host or _ip_hacia(urls[0])
+        nonce = os.urandom(16)
+        coordinador = Coordinator(num_franjas, parametros(), halo, host=host, authkey=_clave(secreto, nonce))
+    else:
+        coordinador = Coordinator(num_franjas, parametros(), halo)
+    try:
+        if workers:
+            solicitar_franjas(coordinador, urls, host, secreto, nonce)
+        else:
+            lanzar_franjas(coordinador)
+        coordinador.aceptar()
+    except Exception:
+        coordinador.close()
+        raise
+    return coordinador
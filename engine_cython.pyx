@@ -1,6 +1,39 @@
 import numpy as np
 cimport numpy as cnp
 import cython
+from cython.parallel cimport parallel
+cimport openmp
+from libc.math cimport sqrt
+from libc.stdlib cimport malloc, free
+
+# Índices del arreglo de perfil; mismo orden que engines.FASES
+cdef enum:
+    INTEGRACION = 0
+    PAREDES = 1
+    FASE_AMPLIA = 2
+    FASE_ESTRECHA = 3
+    CORRECCIONES = 4
+
+# Vecinos a menos de 2R que la búsqueda paralela guarda por partícula; una
+# partícula con más se resuelve con la búsqueda sobre las celdas actuales
+cdef enum:
+    MAX_VECINOS = 16
+
+cdef extern from *:
+    """
+    /* Barrera huérfana: se liga a la región paralela que la llama */
+    static void _barrera(void) {
+    #pragma omp barrier
+    }
+    """
+    void _barrera() nogil
+
+
+cdef inline double _medir(double* perfil, int fase, double desde) noexcept nogil:
+    # Suma a la fase el tiempo desde la marca anterior y devuelve la nueva marca
+    cdef double ahora = openmp.omp_get_wtime()
+    perfil[fase] += ahora - desde
+    return ahora
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
@@ -29,22 +62,779 @@ def run_collision_cython(cnp.ndarray[cnp.float64_t, ndim=2] posiciones,
                 vel1 = velocidades[i]
                 vel2 = velocidades[j]
 
-                if not(dist_vec_check[0] * (vel1[0] - vel2[0]) + dist_vec_check[1] * (vel1[1] - vel2[1]) > 0):
+                # Dos partículas en el mismo punto no tienen normal: como en
+                # benchmark.resolver_par, no es un choque
+                if not(dist_sq_check == 0 or
+                       dist_vec_check[0] * (vel1[0] - vel2[0]) + dist_vec_check[1] * (vel1[1] - vel2[1]) > 0):
                     colisiones_particula_particula += 1
 
                     dist_mag = np.sqrt(dist_sq_check)
-                    if dist_mag > 0:
-                        normal_vec = dist_vec_check / dist_mag
+                    normal_vec = dist_vec_check / dist_mag
+
+                    v1_normal = vel1[0] * normal_vec[0] + vel1[1] * normal_vec[1]
+                    v2_normal = vel2[0] * normal_vec[0] + vel2[1] * normal_vec[1]
+
+                    velocidades[i] += (v2_normal - v1_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
+                    velocidades[j] += (v1_normal - v2_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
+
+                    overlap = 2 * RADIO_PARTICULA - dist_mag
+                    correction = 0.5 * overlap * normal_vec
+                    posiciones[i] += correction
+                    posiciones[j] -= correction
+
+    return colisiones_particula_particula
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef inline int _resolver_par(double[:, ::1] posiciones,
+                              double[:, ::1] velocidades,
+                              int i, int j,
+                              double RADIO_PARTICULA,
+                              double COEF_RESTITUCION_PARTICULA,
+                              long long* correcciones) noexcept nogil:
+    # Misma aritmética que run_collision_cython para obtener los mismos conteos.
+    # correcciones cuenta los pares a los que se les corrigió el solapamiento
+    cdef double dx = posiciones[i, 0] - posiciones[j, 0]
+    cdef double dy = posiciones[i, 1] - posiciones[j, 1]
+    cdef double dist_sq_check = dx * dx + dy * dy
+    cdef double dist_mag, nx, ny, v1_normal, v2_normal, overlap
+
+    if dist_sq_check >= (2 * RADIO_PARTICULA) * (2 * RADIO_PARTICULA):
+        return 0
+    if dist_sq_check == 0 or dx * (velocidades[i, 0] - velocidades[j, 0]) + dy * (velocidades[i, 1] - velocidades[j, 1]) > 0:
+        return 0
+
+    dist_mag = sqrt(dist_sq_check)
+    nx = dx / dist_mag
+    ny = dy / dist_mag
+
+    v1_normal = velocidades[i, 0] * nx + velocidades[i, 1] * ny
+    v2_normal = velocidades[j, 0] * nx + velocidades[j, 1] * ny
+
+    velocidades[i, 0] += (v2_normal - v1_normal) * nx * COEF_RESTITUCION_PARTICULA
+    velocidades[i, 1] += (v2_normal - v1_normal) * ny * COEF_RESTITUCION_PARTICULA
+    velocidades[j, 0] += (v1_normal - v2_normal) * nx * COEF_RESTITUCION_PARTICULA
+    velocidades[j, 1] += (v1_normal - v2_normal) * ny * COEF_RESTITUCION_PARTICULA
+
+    overlap = 2 * RADIO_PARTICULA - dist_mag
+    posiciones[i, 0] += 0.5 * overlap * nx
+    posiciones[i, 1] += 0.5 * overlap * ny
+    posiciones[j, 0] -= 0.5 * overlap * nx
+    posiciones[j, 1] -= 0.5 * overlap * ny
+    correcciones[0] += 1
+    return 1
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _colisiones_fuerza_bruta(double[:, ::1] posiciones,
+                                  double[:, ::1] velocidades,
+                                  int NUM_PARTICULAS,
+                                  double RADIO_PARTICULA,
+                                  double COEF_RESTITUCION_PARTICULA,
+                                  long long* correcciones) noexcept nogil:
+    cdef int i, j
+    cdef int colisiones_particula_particula = 0
+
+    for i in range(NUM_PARTICULAS):
+        for j in range(i + 1, NUM_PARTICULAS):
+            colisiones_particula_particula += _resolver_par(
+                posiciones, velocidades, i, j,
+                RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, correcciones)
+
+    return colisiones_particula_particula
+
+
+def run_collision_memoryview(double[:, ::1] posiciones,
+                             double[:, ::1] velocidades,
+                             int NUM_PARTICULAS,
+                             double RADIO_PARTICULA,
+                             double COEF_RESTITUCION_PARTICULA):
+    """Versión de run_collision_cython sin objetos Python en el bucle.
+
+    Trabaja sobre memoryviews double[:, ::1] y escalares C (libc sqrt), sin
+    reservar arrays por par y liberando el GIL. Da los mismos conteos que
+    run_collision_cython, que se conserva como referencia para comparar.
+    """
+    cdef int colisiones_particula_particula
+    cdef long long correcciones = 0
+
+    with nogil:
+        colisiones_particula_particula = _colisiones_fuerza_bruta(
+            posiciones, velocidades, NUM_PARTICULAS,
+            RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, &correcciones)
+
+    return colisiones_particula_particula
+
+
+cdef struct Celdas:
+    # Lista de celdas: counting sort al construirla y listas enlazadas por
+    # celda que se mantienen al día cuando una corrección mueve una partícula
+    int num_celdas_x
+    int num_celdas_y
+    double ancho_mundo
+    double alto_mundo
+    int* celda
+    int* inicio
+    int* llenado
+    int* orden
+    int* cabeza
+    int* siguiente
+    int* anterior
+    # Variante paralela: pares a menos de 2R en la foto inicial (hasta
+    # MAX_VECINOS por i, desde i * MAX_VECINOS), candidatos j > i de las
+    # celdas vecinas de cada i en esa foto, partículas movidas por
+    # correcciones y celdas que tocaron
+    int* conteo_pares
+    int* candidatos
+    int* pares
+    char* movida
+    char* sucia
+    # Pares evaluados en la fase estrecha y correcciones de solapamiento (métricas)
+    long long pares_revisados
+    long long correcciones
+
+
+@cython.cdivision(True)
+cdef inline int _celda_de(double x, double y, Celdas* c) noexcept nogil:
+    cdef int cx = <int>(x * c.num_celdas_x / c.ancho_mundo)
+    cdef int cy = <int>(y * c.num_celdas_y / c.alto_mundo)
+    # Las correcciones de solapamiento pueden dejar partículas fuera del mundo
+    cx = min(max(cx, 0), c.num_celdas_x - 1)
+    cy = min(max(cy, 0), c.num_celdas_y - 1)
+    return cy * c.num_celdas_x + cx
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _construir_celdas(double[:, ::1] posiciones, int NUM_PARTICULAS, Celdas* c) noexcept nogil:
+    cdef int num_celdas = c.num_celdas_x * c.num_celdas_y
+    cdef int i, k, celda, previo
+
+    # Counting sort de partículas por celda
+    for celda in range(num_celdas + 1):
+        c.inicio[celda] = 0
+    for i in range(NUM_PARTICULAS):
+        c.celda[i] = _celda_de(posiciones[i, 0], posiciones[i, 1], c)
+        c.inicio[c.celda[i] + 1] += 1
+    for celda in range(num_celdas):
+        c.inicio[celda + 1] += c.inicio[celda]
+        c.llenado[celda] = c.inicio[celda]
+    for i in range(NUM_PARTICULAS):
+        celda = c.celda[i]
+        c.orden[c.llenado[celda]] = i
+        c.llenado[celda] += 1
+
+    # Encadenar los miembros de cada celda
+    for celda in range(num_celdas):
+        previo = -1
+        c.cabeza[celda] = -1
+        for k in range(c.inicio[celda], c.inicio[celda + 1]):
+            i = c.orden[k]
+            c.anterior[i] = previo
+            c.siguiente[i] = -1
+            if previo == -1:
+                c.cabeza[celda] = i
+            else:
+                c.siguiente[previo] = i
+            previo = i
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _reubicar(double[:, ::1] posiciones, int p, Celdas* c) noexcept nogil:
+    cdef int nueva = _celda_de(posiciones[p, 0], posiciones[p, 1], c)
+    cdef int vieja = c.celda[p]
+
+    if nueva == vieja:
+        return
+    if c.anterior[p] == -1:
+        c.cabeza[vieja] = c.siguiente[p]
+    else:
+        c.siguiente[c.anterior[p]] = c.siguiente[p]
+    if c.siguiente[p] != -1:
+        c.anterior[c.siguiente[p]] = c.anterior[p]
+
+    c.anterior[p] = -1
+    c.siguiente[p] = c.cabeza[nueva]
+    if c.cabeza[nueva] != -1:
+        c.anterior[c.cabeza[nueva]] = p
+    c.cabeza[nueva] = p
+    c.celda[p] = nueva
+
+
+cdef inline int _siguiente_vecino(int i, int ultimo, Celdas* c) noexcept nogil:
+    # Menor j > ultimo entre los miembros actuales de las 9 celdas vecinas de i
+    cdef int cx = c.celda[i] % c.num_celdas_x
+    cdef int cy = c.celda[i] // c.num_celdas_x
+    cdef int vx, vy, p
+    cdef int mejor = -1
+
+    for vy in range(max(cy - 1, 0), min(cy + 2, c.num_celdas_y)):
+        for vx in range(max(cx - 1, 0), min(cx + 2, c.num_celdas_x)):
+            p = c.cabeza[vy * c.num_celdas_x + vx]
+            while p != -1:
+                if p > ultimo and (mejor == -1 or p < mejor):
+                    mejor = p
+                p = c.siguiente[p]
+
+    return mejor
+
+
+cdef int _colisiones_grilla(double[:, ::1] posiciones,
+                           double[:, ::1] velocidades,
+                           int NUM_PARTICULAS,
+                           double RADIO_PARTICULA,
+                           double COEF_RESTITUCION_PARTICULA,
+                           Celdas* c,
+                           double* perfil) noexcept nogil:
+    # Recorre, para cada i, los j > i de sus celdas vecinas en orden creciente,
+    # igual que el doble bucle. Como las correcciones mueven partículas entre
+    # celdas durante el recorrido, el siguiente j se busca siempre sobre la
+    # pertenencia actual; así los conteos coinciden con la fuerza bruta. Con
+    # perfil, construir las celdas es la fase amplia y el recorrido la estrecha.
+    cdef int i, j, ultimo
+    cdef int colisiones_particula_particula = 0
+    cdef double marca = 0
+
+    if perfil != NULL:
+        marca = openmp.omp_get_wtime()
+    _construir_celdas(posiciones, NUM_PARTICULAS, c)
+    if perfil != NULL:
+        marca = _medir(perfil, FASE_AMPLIA, marca)
+
+    for i in range(NUM_PARTICULAS):
+        ultimo = i
+        while True:
+            j = _siguiente_vecino(i, ultimo, c)
+            if j == -1:
+                break
+            c.pares_revisados += 1
+            if _resolver_par(posiciones, velocidades, i, j,
+                             RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, &c.correcciones):
+                colisiones_particula_particula += 1
+                _reubicar(posiciones, i, c)
+                _reubicar(posiciones, j, c)
+            ultimo = j
+
+    if perfil != NULL:
+        _medir(perfil, FASE_ESTRECHA, marca)
+    return colisiones_particula_particula
+
+
+cdef class _Grilla:
+    """Buffers de la lista de celdas, reservados una vez por simulación"""
+    cdef Celdas celdas
+    cdef int[::1] celda, inicio, llenado, orden, cabeza, siguiente, anterior
+    cdef int[::1] conteo_pares, candidatos, pares
+    cdef char[::1] movida, sucia
+
+    def __init__(self, int NUM_PARTICULAS, double RADIO_PARTICULA, double ANCHO_MUNDO, double ALTO_MUNDO):
+        cdef int num_celdas_x = max(1, <int>(ANCHO_MUNDO // (2 * RADIO_PARTICULA)))
+        cdef int num_celdas_y = max(1, <int>(ALTO_MUNDO // (2 * RADIO_PARTICULA)))
+        cdef int num_celdas = num_celdas_x * num_celdas_y
 
-                        v1_normal = vel1[0] * normal_vec[0] + vel1[1] * normal_vec[1]
-                        v2_normal = vel2[0] * normal_vec[0] + vel2[1] * normal_vec[1]
+        # Al menos un elemento para poder tomar la dirección con N = 0
+        self.celda = np.empty(NUM_PARTICULAS + 1, dtype=np.intc)
+        self.inicio = np.empty(num_celdas + 1, dtype=np.intc)
+        self.llenado = np.empty(num_celdas, dtype=np.intc)
+        self.orden = np.empty(NUM_PARTICULAS + 1, dtype=np.intc)
+        self.cabeza = np.empty(num_celdas, dtype=np.intc)
+        self.siguiente = np.empty(NUM_PARTICULAS + 1, dtype=np.intc)
+        self.anterior = np.empty(NUM_PARTICULAS + 1, dtype=np.intc)
+        self.conteo_pares = np.empty(NUM_PARTICULAS + 1, dtype=np.intc)
+        self.candidatos = np.empty(NUM_PARTICULAS + 1, dtype=np.intc)
+        self.pares = np.empty(MAX_VECINOS * NUM_PARTICULAS + 1, dtype=np.intc)
+        self.movida = np.empty(NUM_PARTICULAS + 1, dtype=np.int8)
+        self.sucia = np.empty(num_celdas, dtype=np.int8)
 
-                        velocidades[i] += (v2_normal - v1_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
-                        velocidades[j] += (v1_normal - v2_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
+        self.celdas.num_celdas_x = num_celdas_x
+        self.celdas.num_celdas_y = num_celdas_y
+        self.celdas.ancho_mundo = ANCHO_MUNDO
+        self.celdas.alto_mundo = ALTO_MUNDO
+        self.celdas.celda = &self.celda[0]
+        self.celdas.inicio = &self.inicio[0]
+        self.celdas.llenado = &self.llenado[0]
+        self.celdas.orden = &self.orden[0]
+        self.celdas.cabeza = &self.cabeza[0]
+        self.celdas.siguiente = &self.siguiente[0]
+        self.celdas.anterior = &self.anterior[0]
+        self.celdas.conteo_pares = &self.conteo_pares[0]
+        self.celdas.candidatos = &self.candidatos[0]
+        self.celdas.pares = &self.pares[0]
+        self.celdas.movida = &self.movida[0]
+        self.celdas.sucia = &self.sucia[0]
+        self.celdas.pares_revisados = 0
+        self.celdas.correcciones = 0
 
-                        overlap = 2 * RADIO_PARTICULA - dist_mag
-                        correction = 0.5 * overlap * normal_vec
-                        posiciones[i] += correction
-                        posiciones[j] -= correction
+
+def run_collision_cython_grid(double[:, ::1] posiciones,
+                              double[:, ::1] velocidades,
+                              int NUM_PARTICULAS,
+                              double RADIO_PARTICULA,
+                              double COEF_RESTITUCION_PARTICULA,
+                              double ANCHO_MUNDO,
+                              double ALTO_MUNDO):
+    """Igual que run_collision_cython pero con fase amplia de lista de celdas.
+
+    Las celdas miden al menos el diámetro de la partícula y se reconstruyen
+    con counting sort en cada llamada, así que sólo se revisan las 9 celdas
+    vecinas de cada partícula. Los pares se resuelven en el mismo orden (i, j)
+    que el doble bucle, por lo que los conteos coinciden para una misma semilla.
+    """
+    cdef _Grilla grilla = _Grilla(NUM_PARTICULAS, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO)
+    cdef int colisiones_particula_particula
+
+    with nogil:
+        colisiones_particula_particula = _colisiones_grilla(
+            posiciones, velocidades, NUM_PARTICULAS,
+            RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, &grilla.celdas, NULL)
 
     return colisiones_particula_particula
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _vecinos_cercanos(double[:, ::1] posiciones,
+                           int i,
+                           int NUM_PARTICULAS,
+                           double RADIOS_AL_CUADRADO,
+                           bint usar_grilla,
+                           Celdas* c,
+                           int* destino,
+                           int* candidatos) noexcept nogil:
+    # Vecinos j > i a menos de 2R en la foto de posiciones, tomados de las 9
+    # celdas (grid) o de todas las partículas (bruteforce). Los primeros
+    # MAX_VECINOS se escriben en destino ordenados por j; en candidatos, cuántos
+    # j > i se examinaron. Devuelve cuántos vecinos hay, aunque no quepan.
+    cdef int j, k, m, vx, vy, celda, desde_k, hasta_k
+    cdef int num_vecinos = 0
+    cdef int examinados = 0
+    cdef int cx = c.celda[i] % c.num_celdas_x
+    cdef int cy = c.celda[i] // c.num_celdas_x
+    cdef int desde_x = 0, hasta_x = 1, desde_y = 0, hasta_y = 1
+    cdef double dx, dy
+
+    if usar_grilla:
+        desde_x = max(cx - 1, 0)
+        hasta_x = min(cx + 2, c.num_celdas_x)
+        desde_y = max(cy - 1, 0)
+        hasta_y = min(cy + 2, c.num_celdas_y)
+
+    for vy in range(desde_y, hasta_y):
+        for vx in range(desde_x, hasta_x):
+            if usar_grilla:
+                celda = vy * c.num_celdas_x + vx
+                desde_k = c.inicio[celda]
+                hasta_k = c.inicio[celda + 1]
+            else:
+                desde_k = i + 1
+                hasta_k = NUM_PARTICULAS
+            for k in range(desde_k, hasta_k):
+                j = c.orden[k] if usar_grilla else k
+                if j <= i:
+                    continue
+                examinados += 1
+                dx = posiciones[i, 0] - posiciones[j, 0]
+                dy = posiciones[i, 1] - posiciones[j, 1]
+                if dx * dx + dy * dy >= RADIOS_AL_CUADRADO:
+                    continue
+                if num_vecinos < MAX_VECINOS:
+                    m = num_vecinos
+                    while m > 0 and destino[m - 1] > j:
+                        destino[m] = destino[m - 1]
+                        m -= 1
+                    destino[m] = j
+                num_vecinos += 1
+
+    candidatos[0] = examinados
+    return num_vecinos
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _candidatos_hasta(int i, int j, Celdas* c) noexcept nogil:
+    # Candidatos k de i con i < k <= j en la foto de las celdas (inicio/orden)
+    cdef int cx = c.celda[i] % c.num_celdas_x
+    cdef int cy = c.celda[i] // c.num_celdas_x
+    cdef int vx, vy, k, p, celda
+    cdef int total = 0
+
+    for vy in range(max(cy - 1, 0), min(cy + 2, c.num_celdas_y)):
+        for vx in range(max(cx - 1, 0), min(cx + 2, c.num_celdas_x)):
+            celda = vy * c.num_celdas_x + vx
+            for k in range(c.inicio[celda], c.inicio[celda + 1]):
+                p = c.orden[k]
+                if p > i and p <= j:
+                    total += 1
+    return total
+
+
+cdef inline bint _vecindad_limpia(int i, Celdas* c) noexcept nogil:
+    # True si ni i ni ninguna partícula de sus 9 celdas se movió en este paso
+    cdef int cx = c.celda[i] % c.num_celdas_x
+    cdef int cy = c.celda[i] // c.num_celdas_x
+    cdef int vx, vy
+
+    if c.movida[i]:
+        return False
+    for vy in range(max(cy - 1, 0), min(cy + 2, c.num_celdas_y)):
+        for vx in range(max(cx - 1, 0), min(cx + 2, c.num_celdas_x)):
+            if c.sucia[vy * c.num_celdas_x + vx]:
+                return False
+    return True
+
+
+cdef inline void _marcar_movida(double[:, ::1] posiciones, int p, Celdas* c) noexcept nogil:
+    # La celda de la que sale también cambia de miembros
+    c.sucia[c.celda[p]] = 1
+    _reubicar(posiciones, p, c)
+    c.movida[p] = 1
+    c.sucia[c.celda[p]] = 1
+
+
+cdef void _buscar_vecinos(double[:, ::1] posiciones,
+                          int desde,
+                          int hasta,
+                          int NUM_PARTICULAS,
+                          double RADIOS_AL_CUADRADO,
+                          bint usar_grilla,
+                          Celdas* c) noexcept nogil:
+    # Parte de un hilo de la búsqueda paralela: vecinos y candidatos de desde <= i < hasta
+    cdef int i
+    for i in range(desde, hasta):
+        c.conteo_pares[i] = _vecinos_cercanos(
+            posiciones, i, NUM_PARTICULAS, RADIOS_AL_CUADRADO, usar_grilla, c,
+            c.pares + <long long>i * MAX_VECINOS, c.candidatos + i)
+
+
+cdef long long _resolver_recolectados(double[:, ::1] posiciones,
+                                      double[:, ::1] velocidades,
+                                      int NUM_PARTICULAS,
+                                      double RADIO_PARTICULA,
+                                      double COEF_RESTITUCION_PARTICULA,
+                                      bint usar_grilla,
+                                      Celdas* c) noexcept nogil:
+    # Resolución serie y en orden (i, j) con los vecinos de la búsqueda
+    # paralela. Mientras ni i ni sus vecinas se hayan movido la lista
+    # recolectada es exacta; si no, o si i tiene más de MAX_VECINOS, se cae a
+    # la búsqueda sobre las celdas actuales como en _colisiones_grilla. Así los
+    # conteos no dependen del número de hilos y coinciden con la fuerza bruta.
+    #
+    # pares_revisados cuenta lo mismo que la versión en serie: todos los i<j
+    # con bruteforce y, con grid, cada candidato de las celdas vecinas que la
+    # búsqueda en serie habría visitado. Mientras la vecindad de i está limpia
+    # esos candidatos son los de la foto, contados en la búsqueda paralela;
+    # después se cuentan uno a uno como en _colisiones_grilla.
+    cdef int i, j, k, ultimo
+    cdef int* vecinos
+    cdef long long colisiones_particula_particula = 0
+
+    for i in range(NUM_PARTICULAS):
+        c.movida[i] = 0
+    for i in range(c.num_celdas_x * c.num_celdas_y):
+        c.sucia[i] = 0
+
+    if not usar_grilla:
+        c.pares_revisados += <long long>NUM_PARTICULAS * (NUM_PARTICULAS - 1) // 2
+
+    for i in range(NUM_PARTICULAS):
+        ultimo = i
+        if c.conteo_pares[i] <= MAX_VECINOS and _vecindad_limpia(i, c):
+            # Sólo un choque de i ensucia su vecindad: hasta el primero, la
+            # lista recolectada es exacta
+            vecinos = c.pares + <long long>i * MAX_VECINOS
+            j = -1
+            for k in range(c.conteo_pares[i]):
+                if _resolver_par(posiciones, velocidades, i, vecinos[k],
+                                 RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, &c.correcciones):
+                    j = vecinos[k]
+                    break
+            if j == -1:
+                if usar_grilla:
+                    c.pares_revisados += c.candidatos[i]
+                continue
+            if usar_grilla:
+                c.pares_revisados += _candidatos_hasta(i, j, c)
+            colisiones_particula_particula += 1
+            _marcar_movida(posiciones, i, c)
+            _marcar_movida(posiciones, j, c)
+            ultimo = j
+
+        while True:
+            j = _siguiente_vecino(i, ultimo, c)
+            if j == -1:
+                break
+            if usar_grilla:
+                c.pares_revisados += 1
+            if _resolver_par(posiciones, velocidades, i, j,
+                             RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, &c.correcciones):
+                colisiones_particula_particula += 1
+                _marcar_movida(posiciones, i, c)
+                _marcar_movida(posiciones, j, c)
+            ultimo = j
+
+    return colisiones_particula_particula
+
+
+cdef void _pasos_paralelos(double[:, ::1] posiciones,
+                           double[:, ::1] velocidades,
+                           int NUM_PARTICULAS,
+                           int num_pasos,
+                           bint integrar,
+                           double DT,
+                           double RADIO_PARTICULA,
+                           double ANCHO_MUNDO,
+                           double ALTO_MUNDO,
+                           double COEF_RESTITUCION_PARED,
+                           double COEF_RESTITUCION_PARTICULA,
+                           bint usar_grilla,
+                           Celdas* c,
+                           int num_threads,
+                           long long* colisiones_particula_particula,
+                           long long* colisiones_con_pared,
+                           double* perfil) noexcept nogil:
+    # num_pasos pasos dentro de una sola región paralela. Cada hilo integra,
+    # choca con las paredes y busca vecinos en su rango fijo de partículas; el
+    # hilo 0 arma las celdas y resuelve en serie, y los demás lo esperan en
+    # las barreras. Sin integrar, sólo la fase de colisiones (un paso). Con
+    # perfil mide el hilo 0: la búsqueda paralela es la fase amplia y la
+    # resolución la estrecha.
+    cdef double RADIOS_AL_CUADRADO = (2 * RADIO_PARTICULA) * (2 * RADIO_PARTICULA)
+    cdef int* paredes_por_hilo
+    cdef int tid, nt, desde, hasta, paso, h
+    cdef double marca
+
+    if num_threads <= 0:
+        num_threads = openmp.omp_get_max_threads()
+    paredes_por_hilo = <int*>malloc(num_threads * sizeof(int))
+
+    with parallel(num_threads=num_threads):
+        tid = openmp.omp_get_thread_num()
+        nt = openmp.omp_get_num_threads()
+        desde = <int>(<long long>NUM_PARTICULAS * tid // nt)
+        hasta = <int>(<long long>NUM_PARTICULAS * (tid + 1) // nt)
+        marca = 0
+
+        for paso in range(num_pasos):
+            if integrar:
+                paredes_por_hilo[tid] = _integrar_y_paredes(
+                    posiciones, velocidades, desde, hasta, DT, RADIO_PARTICULA, ANCHO_MUNDO,
+                    ALTO_MUNDO, COEF_RESTITUCION_PARED, perfil if tid == 0 else NULL)
+                _barrera()
+
+            if tid == 0:
+                if integrar:
+                    for h in range(nt):
+                        colisiones_con_pared[0] += paredes_por_hilo[h]
+                if perfil != NULL:
+                    marca = openmp.omp_get_wtime()
+                _construir_celdas(posiciones, NUM_PARTICULAS, c)
+            _barrera()
+
+            _buscar_vecinos(posiciones, desde, hasta, NUM_PARTICULAS, RADIOS_AL_CUADRADO, usar_grilla, c)
+            _barrera()
+
+            if tid == 0:
+                if perfil != NULL:
+                    marca = _medir(perfil, FASE_AMPLIA, marca)
+                colisiones_particula_particula[0] += _resolver_recolectados(
+                    posiciones, velocidades, NUM_PARTICULAS, RADIO_PARTICULA,
+                    COEF_RESTITUCION_PARTICULA, usar_grilla, c)
+                if perfil != NULL:
+                    _medir(perfil, FASE_ESTRECHA, marca)
+            _barrera()
+
+    free(paredes_por_hilo)
+
+
+def run_collision_cython_parallel(double[:, ::1] posiciones,
+                                  double[:, ::1] velocidades,
+                                  int NUM_PARTICULAS,
+                                  double RADIO_PARTICULA,
+                                  double COEF_RESTITUCION_PARTICULA,
+                                  double ANCHO_MUNDO,
+                                  double ALTO_MUNDO,
+                                  broadphase='grid',
+                                  int num_threads=0):
+    """Variante OpenMP: búsqueda de pares repartida entre hilos.
+
+    Los pares a menos de 2R se recolectan en paralelo y se resuelven después
+    en serie en orden (i, j), así que una misma semilla da los mismos conteos
+    con cualquier número de hilos, y los mismos que run_collision_cython.
+    num_threads=0 usa el valor por defecto de OpenMP (OMP_NUM_THREADS o
+    todos los núcleos).
+    """
+    if broadphase not in ('bruteforce', 'grid'):
+        raise ValueError(f"Broadphase desconocida: {broadphase}")
+
+    cdef _Grilla grilla = _Grilla(NUM_PARTICULAS, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO)
+    cdef long long colisiones_particula_particula = 0
+    cdef long long colisiones_con_pared = 0
+    cdef bint usar_grilla = broadphase == 'grid'
+
+    with nogil:
+        _pasos_paralelos(posiciones, velocidades, NUM_PARTICULAS, 1, False, 0, RADIO_PARTICULA,
+                         ANCHO_MUNDO, ALTO_MUNDO, 0, COEF_RESTITUCION_PARTICULA, usar_grilla,
+                         &grilla.celdas, num_threads, &colisiones_particula_particula,
+                         &colisiones_con_pared, NULL)
+
+    return colisiones_particula_particula
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _integrar_y_paredes(double[:, ::1] posiciones,
+                             double[:, ::1] velocidades,
+                             int desde,
+                             int hasta,
+                             double DT,
+                             double RADIO_PARTICULA,
+                             double ANCHO_MUNDO,
+                             double ALTO_MUNDO,
+                             double COEF_RESTITUCION_PARED,
+                             double* perfil) noexcept nogil:
+    # Misma secuencia que el bucle Python de benchmark_cython.py, para las
+    # partículas desde <= i < hasta
+    cdef int i
+    cdef bint pared_colisiono
+    cdef int colisiones_con_pared = 0
+    cdef double marca = 0
+
+    if perfil != NULL:
+        marca = openmp.omp_get_wtime()
+    for i in range(desde, hasta):
+        posiciones[i, 0] += velocidades[i, 0] * DT
+        posiciones[i, 1] += velocidades[i, 1] * DT
+    if perfil != NULL:
+        marca = _medir(perfil, INTEGRACION, marca)
+
+    for i in range(desde, hasta):
+        pared_colisiono = False
+        if posiciones[i, 0] - RADIO_PARTICULA < 0:
+            posiciones[i, 0] = RADIO_PARTICULA
+            velocidades[i, 0] *= -COEF_RESTITUCION_PARED
+            pared_colisiono = True
+        elif posiciones[i, 0] + RADIO_PARTICULA > ANCHO_MUNDO:
+            posiciones[i, 0] = ANCHO_MUNDO - RADIO_PARTICULA
+            velocidades[i, 0] *= -COEF_RESTITUCION_PARED
+            pared_colisiono = True
+        if posiciones[i, 1] - RADIO_PARTICULA < 0:
+            posiciones[i, 1] = RADIO_PARTICULA
+            velocidades[i, 1] *= -COEF_RESTITUCION_PARED
+            pared_colisiono = True
+        elif posiciones[i, 1] + RADIO_PARTICULA > ALTO_MUNDO:
+            posiciones[i, 1] = ALTO_MUNDO - RADIO_PARTICULA
+            velocidades[i, 1] *= -COEF_RESTITUCION_PARED
+            pared_colisiono = True
+        if pared_colisiono:
+            colisiones_con_pared += 1
+
+    if perfil != NULL:
+        _medir(perfil, PAREDES, marca)
+    return colisiones_con_pared
+
+
+def run_steps(double[:, ::1] posiciones,
+              double[:, ::1] velocidades,
+              int n_steps,
+              dict params,
+              callback=None,
+              int progress_every=0,
+              double[::1] perfil=None):
+    """Avanzar n_steps pasos completos (integración, paredes y colisiones) en C.
+
+    params debe tener 'ancho_mundo', 'alto_mundo', 'radio_particula', 'dt',
+    'coef_restitucion_pared' y 'coef_restitucion_particula'; 'broadphase'
+    ('bruteforce' o 'grid') y 'num_threads' son opcionales. Con num_threads
+    distinto de 1 los pasos corren dentro de una sola región paralela (una
+    por bloque entre llamadas a callback): integración y paredes repartidas
+    por hilo y la búsqueda de pares de run_collision_cython_parallel
+    (0 = valor por defecto de OpenMP). Sólo se vuelve a Python para llamar a
+    callback(pasos_completados, colisiones_particula_particula,
+    colisiones_con_pared) cada progress_every pasos.
+
+    Con perfil (arreglo de len(engines.FASES) + 1 ceros, ver
+    engines.nuevo_perfil) se acumulan los segundos de cada fase y, en la
+    última posición, las correcciones de solapamiento.
+
+    Devuelve (colisiones_particula_particula, colisiones_con_pared,
+    pares_revisados), donde pares_revisados cuenta los pares evaluados en la
+    fase estrecha.
+    """
+    cdef int NUM_PARTICULAS = posiciones.shape[0]
+    cdef double ANCHO_MUNDO = params['ancho_mundo']
+    cdef double ALTO_MUNDO = params['alto_mundo']
+    cdef double RADIO_PARTICULA = params['radio_particula']
+    cdef double DT = params['dt']
+    cdef double COEF_RESTITUCION_PARED = params['coef_restitucion_pared']
+    cdef double COEF_RESTITUCION_PARTICULA = params['coef_restitucion_particula']
+    broadphase = params.get('broadphase', 'bruteforce')
+    cdef int num_threads = params.get('num_threads', 1)
+
+    if broadphase not in ('bruteforce', 'grid'):
+        raise ValueError(f"Broadphase desconocida: {broadphase}")
+    if velocidades.shape[0] != NUM_PARTICULAS:
+        raise ValueError("posiciones y velocidades deben tener el mismo número de partículas")
+
+    cdef bint usar_grilla = broadphase == 'grid'
+    cdef _Grilla grilla = _Grilla(NUM_PARTICULAS, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO)
+    cdef long long colisiones_particula_particula = 0
+    cdef long long colisiones_con_pared = 0
+    cdef long long pares_fuerza_bruta = 0
+    cdef int paso = 0
+    cdef int bloque, k
+    cdef bint reportar = callback is not None and progress_every > 0
+    cdef double* tiempos = NULL
+    cdef long long correcciones = 0
+    cdef double marca
+
+    if perfil is not None:
+        if perfil.shape[0] <= CORRECCIONES:
+            raise ValueError("perfil debe tener una posición por fase más las correcciones")
+        tiempos = &perfil[0]
+
+    if not reportar:
+        progress_every = n_steps
+
+    while paso < n_steps:
+        bloque = min(progress_every, n_steps - paso)
+
+        if num_threads != 1:
+            # Una sola región paralela para todo el bloque
+            with nogil:
+                _pasos_paralelos(posiciones, velocidades, NUM_PARTICULAS, bloque, True, DT,
+                                 RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, COEF_RESTITUCION_PARED,
+                                 COEF_RESTITUCION_PARTICULA, usar_grilla, &grilla.celdas, num_threads,
+                                 &colisiones_particula_particula, &colisiones_con_pared, tiempos)
+        else:
+            with nogil:
+                for k in range(bloque):
+                    colisiones_con_pared += _integrar_y_paredes(
+                        posiciones, velocidades, 0, NUM_PARTICULAS, DT,
+                        RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, COEF_RESTITUCION_PARED, tiempos)
+                    if usar_grilla:
+                        colisiones_particula_particula += _colisiones_grilla(
+                            posiciones, velocidades, NUM_PARTICULAS,
+                            RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, &grilla.celdas, tiempos)
+                    else:
+                        if tiempos != NULL:
+                            marca = openmp.omp_get_wtime()
+                        colisiones_particula_particula += _colisiones_fuerza_bruta(
+                            posiciones, velocidades, NUM_PARTICULAS,
+                            RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, &correcciones)
+                        if tiempos != NULL:
+                            _medir(tiempos, FASE_ESTRECHA, marca)
+                        pares_fuerza_bruta += <long long>NUM_PARTICULAS * (NUM_PARTICULAS - 1) // 2
+
+        paso += bloque
+        if reportar and paso % progress_every == 0:
+            callback(paso, colisiones_particula_particula, colisiones_con_pared)
+
+    if tiempos != NULL:
+        tiempos[CORRECCIONES] += correcciones + grilla.celdas.correcciones
+
+    return (colisiones_particula_particula, colisiones_con_pared,
+            pares_fuerza_bruta + grilla.celdas.pares_revisados)
@@ -0,0 +1,522 @@
+"""
+Motor compilado con Numba (JIT), alternativa a engine_cython
+
+Para hosts donde no se puede compilar la extensión C. Implementa la misma
+semántica de paso que benchmark.run_simulation (mismos pares, mismo orden
+(i, j) y mismas correcciones), así que da los mismos conteos que el motor
+base para la misma semilla. La integración y las paredes se reparten entre
+hilos con prange; las colisiones son serie porque cada corrección afecta a
+los pares siguientes. run_steps_batch avanza un lote de simulaciones
+independientes (arreglos (B, N, 2)) repartiendo las simulaciones entre
+hilos, para barridos de muchas semillas con pocas partículas.
+
+Las funciones se compilan con cache=True: la primera ejecución guarda el
+código máquina en __pycache__ (o en NUMBA_CACHE_DIR) y los procesos
+siguientes lo cargan sin recompilar.
+
+integrar_y_paredes, colisiones y colisiones_franja exponen las dos mitades
+del paso por separado para el motor distribuido (domain.py), que las
+ejecuta en cada franja del dominio.
+
+El perfil por fases (arreglo de engines.nuevo_perfil) toma el reloj con
+objmode, que cuesta del orden de un microsegundo por marca; sin perfil el
+código compilado sólo evalúa una condición por paso.
+"""
+
+import time
+
+import numpy as np
+from numba import njit, objmode, prange
+
+# Posiciones del arreglo de perfil (engines.FASES y engines.CORRECCIONES)
+INTEGRACION, PAREDES, FASE_AMPLIA, FASE_ESTRECHA, CORRECCIONES = range(5)
+
+@njit(cache=True)
+def _reloj():
+    with objmode(ahora='float64'):
+        ahora = time.perf_counter()
+    return ahora
+
+@njit(cache=True)
+def _mover_particula(posiciones, velocidades, i, DT):
+    posiciones[i, 0] += velocidades[i, 0] * DT
+    posiciones[i, 1] += velocidades[i, 1] * DT
+
+@njit(cache=True)
+def _integrar_particula(posiciones, velocidades, i, DT, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, COEF_RESTITUCION_PARED):
+    """Avanzar la partícula i y rebotarla contra las paredes; True si chocó con alguna"""
+    _mover_particula(posiciones, velocidades, i, DT)
+    return _rebotar_particula(posiciones, velocidades, i, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO,
+                              COEF_RESTITUCION_PARED)
+
+@njit(cache=True)
+def _rebotar_particula(posiciones, velocidades, i, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, COEF_RESTITUCION_PARED):
+    pared_colisiono = False
+    if posiciones[i, 0] - RADIO_PARTICULA < 0:
+        posiciones[i, 0] = RADIO_PARTICULA
+        velocidades[i, 0] *= -COEF_RESTITUCION_PARED
+        pared_colisiono = True
+    elif posiciones[i, 0] + RADIO_PARTICULA > ANCHO_MUNDO:
+        posiciones[i, 0] = ANCHO_MUNDO - RADIO_PARTICULA
+        velocidades[i, 0] *= -COEF_RESTITUCION_PARED
+        pared_colisiono = True
+
+    if posiciones[i, 1] - RADIO_PARTICULA < 0:
+        posiciones[i, 1] = RADIO_PARTICULA
+        velocidades[i, 1] *= -COEF_RESTITUCION_PARED
+        pared_colisiono = True
+    elif posiciones[i, 1] + RADIO_PARTICULA > ALTO_MUNDO:
+        posiciones[i, 1] = ALTO_MUNDO - RADIO_PARTICULA
+        velocidades[i, 1] *= -COEF_RESTITUCION_PARED
+        pared_colisiono = True
+    return pared_colisiono
+
+@njit(cache=True, parallel=True)
+def _integrar_y_paredes(posiciones, velocidades, DT, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, COEF_RESTITUCION_PARED):
+    colisiones_con_pared = 0
+    for i in prange(posiciones.shape[0]):
+        if _integrar_particula(posiciones, velocidades, i, DT, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO,
+                               COEF_RESTITUCION_PARED):
+            colisiones_con_pared += 1
+    return colisiones_con_pared
+
+@njit(cache=True, parallel=True)
+def _mover(posiciones, velocidades, DT):
+    for i in prange(posiciones.shape[0]):
+        _mover_particula(posiciones, velocidades, i, DT)
+
+@njit(cache=True, parallel=True)
+def _paredes(posiciones, velocidades, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, COEF_RESTITUCION_PARED):
+    colisiones_con_pared = 0
+    for i in prange(posiciones.shape[0]):
+        if _rebotar_particula(posiciones, velocidades, i, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO,
+                              COEF_RESTITUCION_PARED):
+            colisiones_con_pared += 1
+    return colisiones_con_pared
+
+@njit(cache=True)
+def _resolver_par(posiciones, velocidades, i, j, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, perfil):
+    """Fase estrecha de benchmark.resolver_par con escalares; cuenta las correcciones en perfil"""
+    dx = posiciones[i, 0] - posiciones[j, 0]
+    dy = posiciones[i, 1] - posiciones[j, 1]
+    dist_sq = dx * dx + dy * dy
+
+    if dist_sq >= (2 * RADIO_PARTICULA) ** 2:
+        return False
+    if dist_sq == 0 or dx * (velocidades[i, 0] - velocidades[j, 0]) + dy * (velocidades[i, 1] - velocidades[j, 1]) > 0:
+        return False
+
+    dist_mag = np.sqrt(dist_sq)
+    nx = dx / dist_mag
+    ny = dy / dist_mag
+    v1_normal = velocidades[i, 0] * nx + velocidades[i, 1] * ny
+    v2_normal = velocidades[j, 0] * nx + velocidades[j, 1] * ny
+    velocidades[i, 0] += (v2_normal - v1_normal) * nx * COEF_RESTITUCION_PARTICULA
+    velocidades[i, 1] += (v2_normal - v1_normal) * ny * COEF_RESTITUCION_PARTICULA
+    velocidades[j, 0] += (v1_normal - v2_normal) * nx * COEF_RESTITUCION_PARTICULA
+    velocidades[j, 1] += (v1_normal - v2_normal) * ny * COEF_RESTITUCION_PARTICULA
+
+    overlap = 2 * RADIO_PARTICULA - dist_mag
+    if overlap > 0:
+        posiciones[i, 0] -= overlap / 2 * nx
+        posiciones[i, 1] -= overlap / 2 * ny
+        posiciones[j, 0] += overlap / 2 * nx
+        posiciones[j, 1] += overlap / 2 * ny
+        perfil[CORRECCIONES] += 1
+    return True
+
+@njit(cache=True)
+def _colisiones_fuerza_bruta(posiciones, velocidades, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, perfil):
+    """Todos los pares (i, j) en orden, con la fase estrecha de _resolver_par escrita en el bucle.
+
+    i vive en escalares durante su recorrido de j y sólo se escribe en los
+    arreglos cuando choca: los j > i no la leen en ese recorrido. Llamar a
+    _resolver_par por par costaba unas 40 veces más que la comparación.
+    """
+    diametro_sq = (2 * RADIO_PARTICULA) ** 2
+    colisiones_particula_particula = 0
+    num_particulas = posiciones.shape[0]
+    for i in range(num_particulas):
+        xi = posiciones[i, 0]
+        yi = posiciones[i, 1]
+        vxi = velocidades[i, 0]
+        vyi = velocidades[i, 1]
+        for j in range(i + 1, num_particulas):
+            dx = xi - posiciones[j, 0]
+            dy = yi - posiciones[j, 1]
+            dist_sq = dx * dx + dy * dy
+            if dist_sq >= diametro_sq:
+                continue
+            vxj = velocidades[j, 0]
+            vyj = velocidades[j, 1]
+            if dist_sq == 0 or dx * (vxi - vxj) + dy * (vyi - vyj) > 0:
+                continue
+
+            dist_mag = np.sqrt(dist_sq)
+            nx = dx / dist_mag
+            ny = dy / dist_mag
+            v1_normal = vxi * nx + vyi * ny
+            v2_normal = vxj * nx + vyj * ny
+            vxi += (v2_normal - v1_normal) * nx * COEF_RESTITUCION_PARTICULA
+            vyi += (v2_normal - v1_normal) * ny * COEF_RESTITUCION_PARTICULA
+            velocidades[j, 0] = vxj + (v1_normal - v2_normal) * nx * COEF_RESTITUCION_PARTICULA
+            velocidades[j, 1] = vyj + (v1_normal - v2_normal) * ny * COEF_RESTITUCION_PARTICULA
+
+            overlap = 2 * RADIO_PARTICULA - dist_mag
+            if overlap > 0:
+                xi -= overlap / 2 * nx
+                yi -= overlap / 2 * ny
+                posiciones[j, 0] += overlap / 2 * nx
+                posiciones[j, 1] += overlap / 2 * ny
+                perfil[CORRECCIONES] += 1
+            posiciones[i, 0] = xi
+            posiciones[i, 1] = yi
+            velocidades[i, 0] = vxi
+            velocidades[i, 1] = vyi
+            colisiones_particula_particula += 1
+    return colisiones_particula_particula
+
+@njit(cache=True)
+def _celda_de(x, y, num_celdas_x, num_celdas_y, ANCHO_MUNDO, ALTO_MUNDO):
+    # Las correcciones de solapamiento pueden dejar partículas fuera del mundo
+    cx = min(max(int(x * num_celdas_x / ANCHO_MUNDO), 0), num_celdas_x - 1)
+    cy = min(max(int(y * num_celdas_y / ALTO_MUNDO), 0), num_celdas_y - 1)
+    return cy * num_celdas_x + cx
+
+@njit(cache=True)
+def _reubicar(posiciones, p, celda, cabeza, siguiente, anterior, num_celdas_x, num_celdas_y, ANCHO_MUNDO, ALTO_MUNDO):
+    nueva = _celda_de(posiciones[p, 0], posiciones[p, 1], num_celdas_x, num_celdas_y, ANCHO_MUNDO, ALTO_MUNDO)
+    vieja = celda[p]
+    if nueva == vieja:
+        return
+    if anterior[p] == -1:
+        cabeza[vieja] = siguiente[p]
+    else:
+        siguiente[anterior[p]] = siguiente[p]
+    if siguiente[p] != -1:
+        anterior[siguiente[p]] = anterior[p]
+
+    anterior[p] = -1
+    siguiente[p] = cabeza[nueva]
+    if cabeza[nueva] != -1:
+        anterior[cabeza[nueva]] = p
+    cabeza[nueva] = p
+    celda[p] = nueva
+
+@njit(cache=True)
+def _colisiones_grilla(posiciones, velocidades, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO,
+                       celda, cabeza, siguiente, anterior, perfil):
+    """Lista de celdas con pertenencia dinámica, mismos pares y orden que el doble bucle"""
+    _construir_grilla(posiciones, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, celda, cabeza, siguiente, anterior)
+    return _recorrer_grilla(posiciones, velocidades, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, ANCHO_MUNDO,
+                            ALTO_MUNDO, celda, cabeza, siguiente, anterior, perfil,
+                            np.empty(0, dtype=np.bool_), np.empty(0))
+
+@njit(cache=True)
+def _construir_grilla(posiciones, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, celda, cabeza, siguiente, anterior):
+    """Fase amplia: cada celda como lista doblemente enlazada, en orden creciente de índice"""
+    num_celdas_x = max(1, int(ANCHO_MUNDO // (2 * RADIO_PARTICULA)))
+    num_celdas_y = max(1, int(ALTO_MUNDO // (2 * RADIO_PARTICULA)))
+    cabeza[:] = -1
+    for i in range(posiciones.shape[0] - 1, -1, -1):
+        celda[i] = _celda_de(posiciones[i, 0], posiciones[i, 1], num_celdas_x, num_celdas_y, ANCHO_MUNDO, ALTO_MUNDO)
+        anterior[i] = -1
+        siguiente[i] = cabeza[celda[i]]
+        if cabeza[celda[i]] != -1:
+            anterior[cabeza[celda[i]]] = i
+        cabeza[celda[i]] = i
+
+@njit(cache=True)
+def _recorrer_grilla(posiciones, velocidades, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO,
+                     celda, cabeza, siguiente, anterior, perfil, propias, recorrido):
+    """Pares (i, j) de celdas vecinas en orden, resueltos a medida que se encuentran.
+
+    Para una franja con su halo (ver domain), propias marca las partículas de
+    la franja: sólo se cuentan los pares cuyo i es propio, así cada par se
+    cuenta en una sola franja, y recorrido suma la distancia que cada
+    partícula se movió por correcciones. Con arreglos vacíos se cuentan todos
+    los pares y no se acumula nada.
+    """
+    num_particulas = posiciones.shape[0]
+    num_celdas_x = max(1, int(ANCHO_MUNDO // (2 * RADIO_PARTICULA)))
+    num_celdas_y = max(1, int(ALTO_MUNDO // (2 * RADIO_PARTICULA)))
+    contar_todas = propias.shape[0] == 0
+    acumular = recorrido.shape[0] > 0
+
+    colisiones_particula_particula = 0
+    pares_revisados = 0
+    for i in range(num_particulas):
+        contar = contar_todas or propias[i]
+        ultimo = i
+        while True:
+            # Menor j > ultimo entre los miembros actuales de las 9 celdas vecinas
+            cx = celda[i] % num_celdas_x
+            cy = celda[i] // num_celdas_x
+            j = -1
+            for vy in range(max(cy - 1, 0), min(cy + 2, num_celdas_y)):
+                for vx in range(max(cx - 1, 0), min(cx + 2, num_celdas_x)):
+                    p = cabeza[vy * num_celdas_x + vx]
+                    while p != -1:
+                        if p > ultimo and (j == -1 or p < j):
+                            j = p
+                        p = siguiente[p]
+            if j == -1:
+                break
+
+            if contar:
+                pares_revisados += 1
+            xi = posiciones[i, 0]
+            yi = posiciones[i, 1]
+            xj = posiciones[j, 0]
+            yj = posiciones[j, 1]
+            if _resolver_par(posiciones, velocidades, i, j, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, perfil):
+                if contar:
+                    colisiones_particula_particula += 1
+                if acumular:
+                    recorrido[i] += np.sqrt((posiciones[i, 0] - xi) ** 2 + (posiciones[i, 1] - yi) ** 2)
+                    recorrido[j] += np.sqrt((posiciones[j, 0] - xj) ** 2 + (posiciones[j, 1] - yj) ** 2)
+                _reubicar(posiciones, i, celda, cabeza, siguiente, anterior, num_celdas_x, num_celdas_y, ANCHO_MUNDO, ALTO_MUNDO)
+                _reubicar(posiciones, j, celda, cabeza, siguiente, anterior, num_celdas_x, num_celdas_y, ANCHO_MUNDO, ALTO_MUNDO)
+            ultimo = j
+
+    return colisiones_particula_particula, pares_revisados
+
+@njit(cache=True)
+def _simular_bloque(posiciones, velocidades, num_pasos, ANCHO_MUNDO, ALTO_MUNDO, RADIO_PARTICULA, DT,
+                    COEF_RESTITUCION_PARED, COEF_RESTITUCION_PARTICULA, usar_grilla, medir, perfil):
+    """Avanzar num_pasos pasos; con medir, suma en perfil los segundos de cada fase"""
+    num_particulas = posiciones.shape[0]
+    num_celdas = max(1, int(ANCHO_MUNDO // (2 * RADIO_PARTICULA))) * max(1, int(ALTO_MUNDO // (2 * RADIO_PARTICULA)))
+    celda = np.empty(num_particulas, dtype=np.int64)
+    cabeza = np.empty(num_celdas, dtype=np.int64)
+    siguiente = np.empty(num_particulas, dtype=np.int64)
+    anterior = np.empty(num_particulas, dtype=np.int64)
+
+    colisiones_particula_particula = 0
+    colisiones_con_pared = 0
+    pares_revisados = 0
+    marca = 0.0
+    for _ in range(num_pasos):
+        if medir:
+            # Integración y paredes por separado para medirlas; sin perfil van en una sola pasada
+            marca = _reloj()
+            _mover(posiciones, velocidades, DT)
+            ahora = _reloj()
+            perfil[INTEGRACION] += ahora - marca
+            colisiones_con_pared += _paredes(
+                posiciones, velocidades, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, COEF_RESTITUCION_PARED)
+            marca = _reloj()
+            perfil[PAREDES] += marca - ahora
+        else:
+            colisiones_con_pared += _integrar_y_paredes(
+                posiciones, velocidades, DT, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, COEF_RESTITUCION_PARED)
+
+        if usar_grilla:
+            _construir_grilla(posiciones, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, celda, cabeza, siguiente, anterior)
+            if medir:
+                ahora = _reloj()
+                perfil[FASE_AMPLIA] += ahora - marca
+                marca = ahora
+            colisiones, revisados = _recorrer_grilla(
+                posiciones, velocidades, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO,
+                celda, cabeza, siguiente, anterior, perfil, np.empty(0, dtype=np.bool_), np.empty(0))
+            colisiones_particula_particula += colisiones
+            pares_revisados += revisados
+        else:
+            colisiones_particula_particula += _colisiones_fuerza_bruta(
+                posiciones, velocidades, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, perfil)
+            pares_revisados += num_particulas * (num_particulas - 1) // 2
+        if medir:
+            perfil[FASE_ESTRECHA] += _reloj() - marca
+
+    return colisiones_particula_particula, colisiones_con_pared, pares_revisados
+
+@njit(cache=True, parallel=True)
+def _simular_lote(posiciones, velocidades, num_pasos, ANCHO_MUNDO, ALTO_MUNDO, RADIO_PARTICULA, DT,
+                  COEF_RESTITUCION_PARED, COEF_RESTITUCION_PARTICULA, usar_grilla, contadores):
+    """Simulaciones independientes de un lote (B, N, 2), repartidas entre hilos.
+
+    Cada simulación avanza en serie con la misma secuencia que _simular_bloque
+    y suma sus contadores en su fila de contadores (B, 3).
+    """
+    num_simulaciones = posiciones.shape[0]
+    num_particulas = posiciones.shape[1]
+    num_celdas = max(1, int(ANCHO_MUNDO // (2 * RADIO_PARTICULA))) * max(1, int(ALTO_MUNDO // (2 * RADIO_PARTICULA)))
+
+    for b in prange(num_simulaciones):
+        pos = posiciones[b]
+        vel = velocidades[b]
+        # Los lotes no llevan perfil: sólo para las correcciones de _resolver_par
+        perfil = np.zeros(CORRECCIONES + 1)
+        celda = np.empty(num_particulas, dtype=np.int64)
+        cabeza = np.empty(num_celdas, dtype=np.int64)
+        siguiente = np.empty(num_particulas, dtype=np.int64)
+        anterior = np.empty(num_particulas, dtype=np.int64)
+
+        for _ in range(num_pasos):
+            for i in range(num_particulas):
+                if _integrar_particula(pos, vel, i, DT, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO, COEF_RESTITUCION_PARED):
+                    contadores[b, 1] += 1
+            if usar_grilla:
+                colisiones, revisados = _colisiones_grilla(
+                    pos, vel, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO,
+                    celda, cabeza, siguiente, anterior, perfil)
+                contadores[b, 0] += colisiones
+                contadores[b, 2] += revisados
+            else:
+                contadores[b, 0] += _colisiones_fuerza_bruta(pos, vel, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA,
+                                                             perfil)
+                contadores[b, 2] += num_particulas * (num_particulas - 1) // 2
+
+def run_steps(posiciones, velocidades, n_steps, params, callback=None, progress_every=0, perfil=None):
+    """Simular n_steps pasos completos, con la misma interfaz que engine_cython.run_steps.
+
+    params debe tener 'ancho_mundo', 'alto_mundo', 'radio_particula', 'dt',
+    'coef_restitucion_pared' y 'coef_restitucion_particula'; 'broadphase'
+    ('bruteforce' o 'grid') es opcional. Si se pasa callback y
+    progress_every > 0 se llama callback(paso, colisiones_particula_particula,
+    colisiones_con_pared) cada progress_every pasos.
+
+    Devuelve (colisiones_particula_particula, colisiones_con_pared,
+    pares_revisados), donde pares_revisados cuenta los pares evaluados en la
+    fase estrecha. Con perfil (arreglo de engines.nuevo_perfil) suma en él
+    los segundos de integración, paredes, fase amplia (construir la grilla)
+    y fase estrecha (recorrer y resolver pares), y las correcciones de
+    solapamiento.
+    """
+    broadphase = params.get('broadphase', 'bruteforce')
+    if broadphase not in ('bruteforce', 'grid'):
+        raise ValueError(f"Broadphase desconocida: {broadphase}")
+    if posiciones.shape != velocidades.shape:
+        raise ValueError("posiciones y velocidades deben tener el mismo número de partículas")
+
+    medir = perfil is not None
+    if not medir:
+        perfil = np.zeros(CORRECCIONES + 1)
+
+    reportar = callback is not None and progress_every > 0
+    if not reportar:
+        progress_every = n_steps
+
+    colisiones_particula_particula = 0
+    colisiones_con_pared = 0
+    pares_revisados = 0
+    paso = 0
+    while paso < n_steps:
+        bloque = min(progress_every, n_steps - paso)
+        pp, pared, revisados = _simular_bloque(
+            posiciones, velocidades, bloque,
+            float(params['ancho_mundo']), float(params['alto_mundo']), float(params['radio_particula']),
+            float(params['dt']), float(params['coef_restitucion_pared']), float(params['coef_restitucion_particula']),
+            broadphase == 'grid', medir, perfil
+        )
+        colisiones_particula_particula += pp
+        colisiones_con_pared += pared
+        pares_revisados += revisados
+
+        paso += bloque
+        if reportar and paso % progress_every == 0:
+            callback(paso, colisiones_particula_particula, colisiones_con_pared)
+
+    return colisiones_particula_particula, colisiones_con_pared, pares_revisados
+
+def run_steps_batch(posiciones, velocidades, n_steps, params, callback=None, progress_every=0):
+    """Simular n_steps pasos de B simulaciones independientes a la vez.
+
+    posiciones y velocidades son arreglos (B, N, 2) y params es el mismo
+    diccionario que en run_steps. Cada simulación da los mismos conteos que
+    run_steps con su estado inicial. Si se pasa callback y progress_every > 0
+    se llama callback(paso, colisiones_particula_particula,
+    colisiones_con_pared) cada progress_every pasos, con los totales del lote.
+
+    Devuelve (colisiones_particula_particula, colisiones_con_pared,
+    pares_revisados) como arreglos de B contadores, uno por simulación.
+    """
+    broadphase = params.get('broadphase', 'bruteforce')
+    if broadphase not in ('bruteforce', 'grid'):
+        raise ValueError(f"Broadphase desconocida: {broadphase}")
+    if posiciones.ndim != 3 or posiciones.shape[2] != 2 or posiciones.shape != velocidades.shape:
+        raise ValueError("posiciones y velocidades deben ser arreglos (B, N, 2) del mismo tamaño")
+
+    reportar = callback is not None and progress_every > 0
+    if not reportar:
+        progress_every = n_steps
+
+    contadores = np.zeros((posiciones.shape[0], 3), dtype=np.int64)
+    paso = 0
+    while paso < n_steps:
+        bloque = min(progress_every, n_steps - paso)
+        _simular_lote(
+            posiciones, velocidades, bloque,
+            float(params['ancho_mundo']), float(params['alto_mundo']), float(params['radio_particula']),
+            float(params['dt']), float(params['coef_restitucion_pared']), float(params['coef_restitucion_particula']),
+            broadphase == 'grid', contadores
+        )
+
+        paso += bloque
+        if reportar and paso % progress_every == 0:
+            callback(paso, int(contadores[:, 0].sum()), int(contadores[:, 1].sum()))
+
+    return contadores[:, 0], contadores[:, 1], contadores[:, 2]
+
+def _grilla_vacia(num_particulas, params):
+    num_celdas = (max(1, int(params['ancho_mundo'] // (2 * params['radio_particula'])))
+                  * max(1, int(params['alto_mundo'] // (2 * params['radio_particula']))))
+    return (np.empty(num_particulas, dtype=np.int64), np.empty(num_celdas, dtype=np.int64),
+            np.empty(num_particulas, dtype=np.int64), np.empty(num_particulas, dtype=np.int64))
+
+def integrar_y_paredes(posiciones, velocidades, params):
+    """Integración y paredes de un paso (la primera mitad de run_steps); devuelve las colisiones con pared"""
+    return int(_integrar_y_paredes(
+        posiciones, velocidades, float(params['dt']), float(params['radio_particula']),
+        float(params['ancho_mundo']), float(params['alto_mundo']), float(params['coef_restitucion_pared'])))
+
+def colisiones(posiciones, velocidades, params):
+    """Fase de colisiones de un paso con grilla (la segunda mitad de run_steps).
+
+    Devuelve (colisiones_particula_particula, pares_revisados).
+    """
+    celda, cabeza, siguiente, anterior = _grilla_vacia(posiciones.shape[0], params)
+    colisiones_particula_particula, pares_revisados = _colisiones_grilla(
+        posiciones, velocidades, float(params['radio_particula']), float(params['coef_restitucion_particula']),
+        float(params['ancho_mundo']), float(params['alto_mundo']), celda, cabeza, siguiente, anterior,
+        np.zeros(CORRECCIONES + 1))
+    return int(colisiones_particula_particula), int(pares_revisados)
+
+def colisiones_franja(posiciones, velocidades, propias, recorrido, params):
+    """Fase de colisiones de una franja con su halo, en el orden de índice de los arreglos.
+
+    propias marca las partículas de la franja; los contadores sólo incluyen
+    los pares cuyo primer índice es propio. recorrido (float64, uno por
+    partícula) acumula lo que cada una se movió por correcciones. Devuelve
+    (colisiones_particula_particula, pares_revisados).
+    """
+    celda, cabeza, siguiente, anterior = _grilla_vacia(posiciones.shape[0], params)
+    radio = float(params['radio_particula'])
+    ancho = float(params['ancho_mundo'])
+    alto = float(params['alto_mundo'])
+    _construir_grilla(posiciones, radio, ancho, alto, celda, cabeza, siguiente, anterior)
+    colisiones_particula_particula, pares_revisados = _recorrer_grilla(
+        posiciones, velocidades, radio, float(params['coef_restitucion_particula']), ancho, alto,
+        celda, cabeza, siguiente, anterior, np.zeros(CORRECCIONES + 1), propias, recorrido)
+    return int(colisiones_particula_particula), int(pares_revisados)
+
+def precompilar():
+    """Compilar (o cargar de la caché) todas las variantes con una simulación mínima"""
+    import benchmark_numba
+
+    for broadphase in benchmark_numba.BROADPHASES:
+        params = benchmark_numba.parametros(broadphase)
+        # Dos partículas que chocan en el primer paso
+        posiciones = np.array([[100.0, 100.0], [100.0 + params['radio_particula'], 100.0]])
+        velocidades = np.array([[1.0, 0.0], [-1.0, 0.0]])
+        run_steps(posiciones, velocidades, 1, params)
+        run_steps(posiciones, velocidades, 1, params, perfil=np.zeros(CORRECCIONES + 1))
+        run_steps_batch(posiciones[None].copy(), velocidades[None].copy(), 1, params)
+    integrar_y_paredes(posiciones, velocidades, params)
+    colisiones(posiciones, velocidades, params)
+    colisiones_franja(posiciones, velocidades, np.ones(2, dtype=np.bool_), np.zeros(2), params)
+
+if __name__ == "__main__":
+    # Usado al construir la imagen del worker para llenar la caché de JIT
+    precompilar()
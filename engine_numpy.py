@@ -0,0 +1,124 @@
+"""
+Motor vectorizado con NumPy (sin bucles Python por partícula)
+
+Alternativa a engine_cython para máquinas donde no se puede compilar la
+extensión. Las colisiones de un paso se resuelven simultáneamente a partir
+del estado al inicio de la fase de colisiones (scatter-add, promediando los
+impulsos de las partículas con varios contactos), en vez de par a par como
+en benchmark.py, así que los conteos son estadísticamente
+equivalentes pero no idénticos a los de los otros motores.
+"""
+
+import numpy as np
+
+from engines import CORRECCIONES
+
+# Vecindario "media estrella": cada par de celdas vecinas se visita una vez
+DESPLAZAMIENTOS_VECINOS = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+def reflejar_paredes(posiciones, velocidades, ANCHO_MUNDO, ALTO_MUNDO, RADIO_PARTICULA, COEF_RESTITUCION_PARED):
+    """Rebote contra las paredes con máscaras; devuelve el número de partículas que chocaron"""
+    x, y = posiciones[:, 0], posiciones[:, 1]
+
+    izquierda = x - RADIO_PARTICULA < 0
+    derecha = ~izquierda & (x + RADIO_PARTICULA > ANCHO_MUNDO)
+    abajo = y - RADIO_PARTICULA < 0
+    arriba = ~abajo & (y + RADIO_PARTICULA > ALTO_MUNDO)
+
+    x[izquierda] = RADIO_PARTICULA
+    x[derecha] = ANCHO_MUNDO - RADIO_PARTICULA
+    y[abajo] = RADIO_PARTICULA
+    y[arriba] = ALTO_MUNDO - RADIO_PARTICULA
+
+    choque_x = izquierda | derecha
+    choque_y = abajo | arriba
+    velocidades[choque_x, 0] *= -COEF_RESTITUCION_PARED
+    velocidades[choque_y, 1] *= -COEF_RESTITUCION_PARED
+
+    return int(np.count_nonzero(choque_x | choque_y))
+
+def pares_fuerza_bruta(num_particulas):
+    """Todos los pares i<j (memoria O(N²), sólo para N pequeño)"""
+    return np.triu_indices(num_particulas, 1)
+
+def pares_grilla(posiciones, RADIO_PARTICULA, ANCHO_MUNDO, ALTO_MUNDO):
+    """Pares candidatos i<j de celdas vecinas, ordenados igual que el doble bucle"""
+    tam_celda = 2 * RADIO_PARTICULA
+    num_celdas_x = max(1, int(ANCHO_MUNDO // tam_celda))
+    num_celdas_y = max(1, int(ALTO_MUNDO // tam_celda))
+
+    celda_x = np.clip((posiciones[:, 0] * num_celdas_x / ANCHO_MUNDO).astype(np.int64), 0, num_celdas_x - 1)
+    celda_y = np.clip((posiciones[:, 1] * num_celdas_y / ALTO_MUNDO).astype(np.int64), 0, num_celdas_y - 1)
+    claves = celda_y * num_celdas_x + celda_x
+
+    orden = np.argsort(claves, kind='stable')
+    conteo = np.bincount(claves, minlength=num_celdas_x * num_celdas_y)
+    inicio = np.cumsum(conteo) - conteo
+
+    pares_i, pares_j = [], []
+    for dx, dy in DESPLAZAMIENTOS_VECINOS:
+        vecina_x = celda_x + dx
+        vecina_y = celda_y + dy
+        validas = np.nonzero((vecina_x >= 0) & (vecina_x < num_celdas_x) & (vecina_y < num_celdas_y))[0]
+        vecinas = vecina_y[validas] * num_celdas_x + vecina_x[validas]
+
+        # Expandir cada partícula contra todos los ocupantes de su celda vecina
+        cantidad = conteo[vecinas]
+        i = np.repeat(validas, cantidad)
+        desplazamiento = np.arange(i.size) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+        j = orden[np.repeat(inicio[vecinas], cantidad) + desplazamiento]
+
+        if dx == 0 and dy == 0:
+            distintos = i < j
+            i, j = i[distintos], j[distintos]
+        pares_i.append(np.minimum(i, j))
+        pares_j.append(np.maximum(i, j))
+
+    pares_i = np.concatenate(pares_i)
+    pares_j = np.concatenate(pares_j)
+    orden_pares = np.lexsort((pares_j, pares_i))
+    return pares_i[orden_pares], pares_j[orden_pares]
+
+def resolver_colisiones(posiciones, velocidades, pares_i, pares_j, RADIO_PARTICULA, COEF_RESTITUCION_PARTICULA,
+                        perfil=None):
+    """Fase estrecha vectorizada; devuelve el número de colisiones partícula-partícula.
+
+    Con perfil (engines.nuevo_perfil) cuenta además las correcciones de solapamiento.
+    """
+    dist_vec = posiciones[pares_i] - posiciones[pares_j]
+    dist_sq = np.einsum('ij,ij->i', dist_vec, dist_vec)
+    acercandose = np.einsum('ij,ij->i', dist_vec, velocidades[pares_i] - velocidades[pares_j]) <= 0
+    chocan = (dist_sq < (2 * RADIO_PARTICULA)**2) & (dist_sq > 0) & acercandose
+
+    i, j = pares_i[chocan], pares_j[chocan]
+    if i.size == 0:
+        return 0
+
+    dist_mag = np.sqrt(dist_sq[chocan])
+    normal_vec = dist_vec[chocan] / dist_mag[:, None]
+    v1_normal = np.einsum('ij,ij->i', velocidades[i], normal_vec)
+    v2_normal = np.einsum('ij,ij->i', velocidades[j], normal_vec)
+
+    delta_v = (v2_normal - v1_normal)[:, None] * normal_vec * COEF_RESTITUCION_PARTICULA
+    overlap = 2 * RADIO_PARTICULA - dist_mag
+    correction = (overlap / 2)[:, None] * normal_vec
+    if perfil is not None:
+        perfil[CORRECCIONES] += np.count_nonzero(overlap > 0)
+
+    # Una partícula con varios contactos recibe el promedio de sus impulsos;
+    # sumarlos sin más hace crecer la energía en sistemas densos
+    num_particulas = len(posiciones)
+    contactos = np.bincount(i, minlength=num_particulas) + np.bincount(j, minlength=num_particulas)
+    escala = 1.0 / np.maximum(contactos, 1)[:, None]
+    velocidades += _acumular(i, j, delta_v, num_particulas) * escala
+    posiciones -= _acumular(i, j, correction, num_particulas) * escala
+
+    return int(i.size)
+
+def _acumular(indices_i, indices_j, valores, num_particulas):
+    """Scatter-add: suma cada valor en su partícula i y lo resta en su partícula j"""
+    return np.stack([
+        np.bincount(indices_i, weights=valores[:, k], minlength=num_particulas)
+        - np.bincount(indices_j, weights=valores[:, k], minlength=num_particulas)
+        for k in range(2)
+    ], axis=1)
@@ -0,0 +1,547 @@
+"""
+Registro de motores de simulación
+
+Cada motor implementa Engine.run(params) -> SimulationResult, donde params
+son los 'parameters' de una tarea (num_particulas, num_pasos, semilla,
+broadphase y opciones propias del motor). El worker busca el motor por el
+tipo de tarea con get_engine, así que un backend nuevo sólo tiene que
+registrarse con @register_engine en un módulo importado al arrancar
+(ver --engine-module en worker_service).
+
+Los módulos de cada backend (engine_cython, engine_numba, ...) se importan
+al ejecutar, no al registrar: un host sin la extensión compilada o sin Numba
+sigue pudiendo usar el resto de motores.
+
+Engine.run_batch ejecuta la misma configuración con muchas semillas; los
+motores que implementan simular_lote (Numba) avanzan todo el lote junto.
+
+El motor 'distributed' reparte una sola simulación en franjas del dominio,
+cada una en su proceso (ver domain.py).
+"""
+
+import hashlib
+import importlib
+import json
+import importlib.util
+import math
+import os
+import time
+import numpy as np
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+NUM_PARTICULAS = 100
+NUM_PASOS = 1000
+SEMILLA = 42
+
+_ENGINES = {}
+
+# Perfil por fases (Engine.run(..., profile=True)): los motores acumulan en un
+# arreglo float64 los segundos de cada fase y, en la última posición, las
+# correcciones de solapamiento de la fase estrecha
+FASES = ('integration', 'walls', 'broad_phase', 'narrow_phase')
+INTEGRACION, PAREDES, FASE_AMPLIA, FASE_ESTRECHA, CORRECCIONES = range(len(FASES) + 1)
+
+class SimulationCancelled(Exception):
+    """Lanzada desde el callback de progreso para detener una simulación"""
+    pass
+
+class CheckpointMismatch(ValueError):
+    """El checkpoint corresponde a otra simulación (motor, versión o parámetros)"""
+    pass
+
+@dataclass
+class SimulationResult:
+    """Resultado de una simulación, serializable directamente a JSON.
+
+    execution_time mide sólo el bucle de pasos; setup_time, la preparación
+    previa (estado inicial, compilación JIT). pair_checks cuenta los pares
+    evaluados en la fase estrecha (None si el motor no lo informa): todos
+    los i<j con bruteforce y los candidatos de las celdas vecinas con grid,
+    el mismo número con cualquier cantidad de hilos, así que pares por
+    segundo se puede comparar entre motores e hilos. profile es el desglose
+    por fases si se pidió (ver nuevo_perfil).
+    """
+    engine: str
+    total_particles: int
+    total_steps: int
+    seed: int
+    broadphase: str
+    execution_time: float
+    particle_collisions: int
+    wall_collisions: int
+    setup_time: float = 0.0
+    pair_checks: Optional[int] = None
+    steps_per_second: float = 0.0
+    pair_checks_per_second: Optional[float] = None
+    options: dict = field(default_factory=dict)
+    profile: Optional[dict] = None
+
+    def __post_init__(self):
+        if self.execution_time > 0:
+            self.steps_per_second = self.total_steps / self.execution_time
+            if self.pair_checks is not None:
+                self.pair_checks_per_second = self.pair_checks / self.execution_time
+
+    def to_dict(self):
+        return asdict(self)
+
+    def reporte(self):
+        """Resumen en el formato que imprimen los scripts benchmark*.py"""
+        detalle = ''.join(f", {clave}: {valor}" for clave, valor in self.options.items())
+        lineas = [
+            f"Simulación completada en {self.execution_time:.4f} segundos, con semilla {self.seed}.",
+            f"Total pasos: {self.total_steps}, Partículas: {self.total_particles}",
+            f"Broadphase: {self.broadphase}{detalle}",
+            f"Total colisiones Partícula-Partícula: {self.particle_collisions}",
+            f"Total colisiones con Pared: {self.wall_collisions}",
+            f"Pasos por segundo: {self.steps_per_second:.1f}"
+        ]
+        if self.pair_checks is not None:
+            lineas.append(f"Pares revisados: {self.pair_checks} ({self.pair_checks_per_second or 0:.0f} por segundo)")
+        if self.profile:
+            lineas.append("Fases: " + ", ".join(
+                f"{fase} {segundos:.4f}s" for fase, segundos in self.profile['phases'].items()))
+            lineas.append("Contadores: " + ", ".join(
+                f"{contador} {valor}" for contador, valor in self.profile['counters'].items()))
+        return '\n'.join(lineas)
+
+class Engine:
+    """Interfaz común de los motores; las subclases implementan simular()"""
+    name = None
+    broadphases = ('bruteforce', 'grid')
+    default_broadphase = 'bruteforce'
+    # Módulos cuyo código determina los resultados (además de engines y el módulo de la clase)
+    source_modules = ()
+    # Parámetro de la tarea con el número de hilos, si el motor es paralelo
+    threads_param = None
+
+    @classmethod
+    def version(cls):
+        """Huella del código del motor: cambia al editar o recompilar cualquiera de sus módulos"""
+        huella = hashlib.sha256()
+        for modulo in ('engines', 'benchmark', cls.__module__) + tuple(cls.source_modules):
+            spec = importlib.util.find_spec(modulo)
+            if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+                continue
+            with open(spec.origin, 'rb') as f:
+                huella.update(modulo.encode() + b'\0' + f.read())
+        return huella.hexdigest()[:16]
+
+    def run(self, params, callback=None, progress_every=0, checkpoint_every=0, checkpoint_path=None,
+            resume_path=None, trajectory=None, profile=False):
+        """Ejecutar la simulación descrita por params.
+
+        Si se pasa callback y progress_every > 0 se llama
+        callback(paso, colisiones_particula_particula, colisiones_con_pared)
+        en cada paso múltiplo de progress_every, contado desde el inicio de la
+        simulación aunque se reanude o avance en tramos más cortos.
+
+        Con checkpoint_path y checkpoint_every > 0 la simulación avanza en
+        tramos de checkpoint_every pasos y guarda el estado al final de cada
+        uno (ver save_checkpoint). Con resume_path continúa desde ese
+        checkpoint; lanza CheckpointMismatch si es de otra simulación.
+
+        trajectory es un trajectory.TrajectoryWriter opcional: se le pasa el
+        estado cada trajectory.every pasos (incluido el inicial). Quien lo
+        crea debe cerrarlo.
+
+        Con profile=True los motores miden cada fase del paso y el resultado
+        trae el desglose en profile. Sin él, el costo es una comparación por
+        paso y un contador por colisión.
+        """
+        import benchmark
+
+        num_particulas, num_pasos, broadphase, opciones = self._validar(params)
+        semilla = int(params.get('semilla', SEMILLA))
+        descripcion = {
+            'engine': self.name,
+            'version': self.version(),
+            'num_particulas': num_particulas,
+            'num_pasos': num_pasos,
+            'semilla': semilla,
+            'broadphase': broadphase,
+            'opciones': opciones
+        }
+
+        setup_start = time.perf_counter()
+        paso = 0
+        totales = [0, 0, 0]
+        if resume_path:
+            posiciones, velocidades, paso, totales = load_checkpoint(resume_path, descripcion)
+        else:
+            posiciones, velocidades = benchmark.estado_inicial(num_particulas, semilla)
+        paso_inicial = paso
+        perfil = nuevo_perfil() if profile else None
+        self.preparar(opciones)
+
+        # Cortes en los múltiplos de checkpoint_every y de trajectory.every
+        cortes = [num_pasos]
+        if checkpoint_path and checkpoint_every > 0:
+            cortes.append(checkpoint_every)
+        if trajectory is not None:
+            cortes.append(trajectory.every)
+            if trajectory.wants(paso):
+                trajectory.write(paso, posiciones, velocidades)
+
+        start_time = time.perf_counter()
+        while paso < num_pasos:
+            reportar, intervalo = None, progress_every
+            if callback is not None and progress_every > 0:
+                # Los motores cuentan los pasos desde el inicio del tramo: con un
+                # intervalo que divide a paso y a progress_every avisan en todos
+                # los múltiplos absolutos de progress_every del tramo
+                intervalo = math.gcd(progress_every, paso)
+
+                def reportar(p, pp, pared, inicio=paso, base=tuple(totales)):
+                    if (inicio + p) % progress_every == 0:
+                        callback(inicio + p, base[0] + pp, base[1] + pared)
+
+            bloque = min(corte - paso % corte for corte in cortes)
+            bloque = min(bloque, num_pasos - paso)
+            contadores = self.simular(
+                posiciones, velocidades, bloque, broadphase, opciones, reportar, intervalo, perfil)
+
+            # Los motores pueden devolver también los pares revisados
+            totales[0] += int(contadores[0])
+            totales[1] += int(contadores[1])
+            totales[2] = None if len(contadores) < 3 or totales[2] is None else totales[2] + int(contadores[2])
+            paso += bloque
+            if trajectory is not None and trajectory.wants(paso):
+                trajectory.write(paso, posiciones, velocidades)
+            if checkpoint_path and checkpoint_every > 0 and paso % checkpoint_every == 0 and paso < num_pasos:
+                save_checkpoint(checkpoint_path, descripcion, posiciones, velocidades, paso, totales)
+        total_time = time.perf_counter() - start_time
+
+        if paso_inicial:
+            opciones = dict(opciones, resumed_from_step=paso_inicial)
+        return SimulationResult(
+            engine=self.name,
+            total_particles=num_particulas,
+            total_steps=num_pasos,
+            seed=semilla,
+            broadphase=broadphase,
+            execution_time=total_time,
+            particle_collisions=totales[0],
+            wall_collisions=totales[1],
+            setup_time=start_time - setup_start,
+            pair_checks=totales[2],
+            options=opciones,
+            profile=resumen_perfil(perfil, totales) if profile else None
+        )
+
+    def run_batch(self, params, semillas, callback=None, progress_every=0):
+        """Ejecutar la simulación de params con cada semilla; un SimulationResult por semilla.
+
+        Los motores que implementan simular_lote avanzan todas las
+        simulaciones juntas en arreglos (B, N, 2); en ese caso execution_time
+        y setup_time de cada resultado son la parte proporcional del lote. El
+        resto las ejecuta una tras otra. callback recibe los pasos completados
+        sumando todas las simulaciones del lote.
+        """
+        import benchmark
+
+        if type(self).simular_lote is Engine.simular_lote:
+            resultados = []
+            for k, semilla in enumerate(semillas):
+                reportar = None
+                if callback is not None:
+                    reportar = lambda paso, pp, pared, previos=k * int(params.get('num_pasos', NUM_PASOS)): \
+                        callback(previos + paso, pp, pared)
+                resultados.append(self.run(dict(params, semilla=semilla), reportar, progress_every))
+            return resultados
+
+        num_particulas, num_pasos, broadphase, opciones = self._validar(params)
+        semillas = [int(semilla) for semilla in semillas]
+        if not semillas:
+            return []
+
+        setup_start = time.perf_counter()
+        estados = [benchmark.estado_inicial(num_particulas, semilla) for semilla in semillas]
+        posiciones = np.stack([posiciones for posiciones, _ in estados])
+        velocidades = np.stack([velocidades for _, velocidades in estados])
+        self.preparar(opciones)
+
+        reportar = None
+        if callback is not None:
+            reportar = lambda paso, pp, pared: callback(paso * len(semillas), pp, pared)
+
+        start_time = time.perf_counter()
+        contadores = self.simular_lote(
+            posiciones, velocidades, num_pasos, broadphase, opciones, reportar, progress_every)
+        total_time = time.perf_counter() - start_time
+        setup_time = start_time - setup_start
+
+        return [
+            SimulationResult(
+                engine=self.name,
+                total_particles=num_particulas,
+                total_steps=num_pasos,
+                seed=semilla,
+                broadphase=broadphase,
+                execution_time=total_time / len(semillas),
+                particle_collisions=int(contadores[0][k]),
+                wall_collisions=int(contadores[1][k]),
+                setup_time=setup_time / len(semillas),
+                pair_checks=int(contadores[2][k]) if len(contadores) > 2 else None,
+                options=dict(opciones, batch_size=len(semillas))
+            )
+            for k, semilla in enumerate(semillas)
+        ]
+
+    def _validar(self, params):
+        num_particulas = int(params.get('num_particulas', NUM_PARTICULAS))
+        num_pasos = int(params.get('num_pasos', NUM_PASOS))
+        broadphase = params.get('broadphase', self.default_broadphase)
+
+        if num_particulas <= 0 or num_pasos <= 0:
+            raise ValueError("num_particulas y num_pasos deben ser números positivos")
+        if broadphase not in self.broadphases:
+            raise ValueError(f"Broadphase desconocida: {broadphase}")
+        return num_particulas, num_pasos, broadphase, self.opciones(params, broadphase)
+
+    def opciones(self, params, broadphase):
+        """Validar las opciones propias del motor; devuelve las que se usarán"""
+        return {}
+
+    def preparar(self, opciones=None):
+        """Trabajo previo que no debe contar en el tiempo medido (compilación JIT, procesos, ...)"""
+        pass
+
+    def simular(self, posiciones, velocidades, num_pasos, broadphase, opciones, callback, progress_every,
+                perfil=None):
+        """Avanzar num_pasos pasos.
+
+        Devuelve (colisiones_particula_particula, colisiones_con_pared) y,
+        opcionalmente, pares_revisados como tercer elemento. Si perfil no es
+        None, sumar en él los tiempos por fase (ver nuevo_perfil).
+        """
+        raise NotImplementedError
+
+    def simular_lote(self, posiciones, velocidades, num_pasos, broadphase, opciones, callback, progress_every):
+        """Opcional: avanzar num_pasos pasos de un lote de simulaciones (B, N, 2).
+
+        Devuelve los mismos contadores que simular(), cada uno como una
+        secuencia de B valores.
+        """
+        raise NotImplementedError
+
+def nuevo_perfil():
+    """Acumulador del perfil por fases: segundos de cada una de FASES y correcciones al final"""
+    return np.zeros(len(FASES) + 1)
+
+def resumen_perfil(perfil, totales):
+    """Desglose para SimulationResult.profile a partir del acumulador y los contadores del motor"""
+    return {
+        'phases': {fase: float(perfil[k]) for k, fase in enumerate(FASES)},
+        'counters': {
+            'pairs_tested': totales[2],
+            'pairs_colliding': totales[0],
+            'overlap_corrections': int(perfil[CORRECCIONES])
+        }
+    }
+
+def save_checkpoint(path, descripcion, posiciones, velocidades, paso, contadores):
+    """Guardar el estado de una simulación en un .npz sin comprimir.
+
+    descripcion identifica la simulación (motor, versión del código y
+    parámetros) y se guarda como JSON. contadores es
+    [colisiones_particula_particula, colisiones_con_pared, pares_revisados],
+    con pares_revisados None si el motor no los informa. Las simulaciones no
+    usan el generador aleatorio después del estado inicial, así que la
+    semilla de descripcion basta para reproducirlas. La escritura es
+    atómica: un corte a mitad deja el checkpoint anterior.
+    """
+    temporal = f"{path}.tmp"
+    with open(temporal, 'wb') as f:
+        np.savez(
+            f,
+            descripcion=np.array(json.dumps(descripcion, sort_keys=True)),
+            posiciones=posiciones,
+            velocidades=velocidades,
+            paso=np.int64(paso),
+            contadores=np.array([-1 if valor is None else valor for valor in contadores], dtype=np.int64)
+        )
+    os.replace(temporal, path)
+
+def load_checkpoint(path, descripcion=None):
+    """Leer un checkpoint: (posiciones, velocidades, paso, contadores).
+
+    Si se pasa descripcion, lanza CheckpointMismatch cuando no coincide con
+    la guardada.
+    """
+    with np.load(path) as datos:
+        guardada = json.loads(str(datos['descripcion']))
+        if descripcion is not None and guardada != json.loads(json.dumps(descripcion, sort_keys=True)):
+            raise CheckpointMismatch(f"El checkpoint {path} es de otra simulación: {guardada}")
+        contadores = [int(valor) for valor in datos['contadores']]
+        if contadores[2] < 0:
+            contadores[2] = None
+        return datos['posiciones'].copy(), datos['velocidades'].copy(), int(datos['paso']), contadores
+
+def checkpoint_step(path):
+    """Paso guardado en un checkpoint"""
+    with np.load(path) as datos:
+        return int(datos['paso'])
+
+def register_engine(cls):
+    """Decorador de clase: registra el motor con su atributo name"""
+    if not cls.name:
+        raise ValueError(f"El motor {cls.__name__} no define name")
+    _ENGINES[cls.name] = cls
+    return cls
+
+def get_engine(name):
+    """Instancia del motor registrado como name"""
+    if name not in _ENGINES:
+        raise ValueError(f"Tipo de tarea desconocido: {name}")
+    return _ENGINES[name]()
+
+def available_engines():
+    return sorted(_ENGINES)
+
+def engine_versions():
+    """Versión del código de cada motor registrado"""
+    return {name: cls.version() for name, cls in sorted(_ENGINES.items())}
+
+def load_engine_modules(modulos):
+    """Importar módulos externos que registran motores adicionales"""
+    for modulo in modulos:
+        importlib.import_module(modulo)
+
+@register_engine
+class PythonEngine(Engine):
+    """Motor base de benchmark.py (Python puro)"""
+    name = 'benchmark'
+
+    def simular(self, posiciones, velocidades, num_pasos, broadphase, opciones, callback, progress_every,
+                perfil=None):
+        import benchmark
+        return benchmark.simular(posiciones, velocidades, num_pasos, broadphase, callback, progress_every, perfil)
+
+@register_engine
+class CythonEngine(Engine):
+    """Motor Cython: kernel memoryview (run_steps) o el kernel de referencia"""
+    name = 'benchmark_cython'
+    source_modules = ('benchmark_cython', 'engine_cython')
+    kernels = ('memoryview', 'referencia')
+    threads_param = 'num_threads'
+
+    def opciones(self, params, broadphase):
+        kernel = params.get('kernel', 'memoryview')
+        num_hilos = int(params.get('num_threads', 1))
+
+        if kernel not in self.kernels:
+            raise ValueError(f"Kernel desconocido: {kernel}")
+        if num_hilos < 0:
+            raise ValueError("num_threads no puede ser negativo")
+        if kernel == 'referencia' and broadphase != 'bruteforce':
+            raise ValueError("El kernel de referencia sólo existe para broadphase bruteforce")
+        if kernel == 'referencia' and num_hilos != 1:
+            raise ValueError("El kernel de referencia no admite varios hilos")
+        return {'kernel': kernel, 'hilos': num_hilos}
+
+    def simular(self, posiciones, velocidades, num_pasos, broadphase, opciones, callback, progress_every,
+                perfil=None):
+        import benchmark_cython
+
+        if opciones['kernel'] == 'referencia':
+            if perfil is not None:
+                raise ValueError("El kernel de referencia no tiene perfil por fases")
+            return benchmark_cython.simular_referencia(posiciones, velocidades, num_pasos, callback, progress_every)
+        return benchmark_cython.simular(
+            posiciones, velocidades, num_pasos, broadphase, opciones['hilos'], callback, progress_every, perfil)
+
+@register_engine
+class NumpyEngine(Engine):
+    """Motor vectorizado de benchmark_numpy.py"""
+    name = 'benchmark_numpy'
+    source_modules = ('benchmark_numpy', 'engine_numpy')
+    default_broadphase = 'grid'
+
+    def simular(self, posiciones, velocidades, num_pasos, broadphase, opciones, callback, progress_every,
+                perfil=None):
+        import benchmark_numpy
+        return benchmark_numpy.simular(posiciones, velocidades, num_pasos, broadphase, callback, progress_every,
+                                       perfil)
+
+@register_engine
+class NumbaEngine(Engine):
+    """Motor JIT de benchmark_numba.py"""
+    name = 'benchmark_numba'
+    source_modules = ('benchmark_numba', 'engine_numba')
+
+    def preparar(self, opciones=None):
+        # Compilar (o cargar de la caché) antes de medir
+        import engine_numba
+        engine_numba.precompilar()
+
+    def simular(self, posiciones, velocidades, num_pasos, broadphase, opciones, callback, progress_every,
+                perfil=None):
+        import benchmark_numba
+        return benchmark_numba.simular(posiciones, velocidades, num_pasos, broadphase, callback, progress_every,
+                                       perfil)
+
+    def simular_lote(self, posiciones, velocidades, num_pasos, broadphase, opciones, callback, progress_every):
+        import benchmark_numba
+        return benchmark_numba.simular_lote(posiciones, velocidades, num_pasos, broadphase, callback, progress_every)
+
+@register_engine
+class DistributedEngine(Engine):
+    """Una simulación repartida en franjas del dominio entre procesos (domain.py).
+
+    Opciones: strips (número de franjas), halo (ancho del halo de cada
+    franja) y strip_workers (URLs de workers que ejecutan las franjas; sin
+    ellas, procesos locales). coordinator_host es la dirección con la que
+    esos workers llegan a este proceso; las solicitudes a los workers se
+    firman con $STRIP_SECRET. Da los mismos conteos que benchmark_numba con
+    grid.
+    """
+    name = 'distributed'
+    broadphases = ('grid',)
+    default_broadphase = 'grid'
+    source_modules = ('domain', 'engine_numba', 'engine_numpy')
+
+    def __init__(self):
+        self._coordinador = None
+
+    def opciones(self, params, broadphase):
+        import benchmark
+        import domain
+
+        num_franjas = int(params.get('strips', domain.FRANJAS))
+        halo = float(params.get('halo', domain.HALO))
+        workers = list(params.get('strip_workers') or [])
+
+        if num_franjas < 1:
+            raise ValueError("strips debe ser al menos 1")
+        if halo < domain.halo_minimo(benchmark.RADIO_PARTICULA):
+            raise ValueError(f"halo debe ser al menos {domain.halo_minimo(benchmark.RADIO_PARTICULA)}")
+        opciones = {'franjas': num_franjas, 'halo': halo}
+        if workers:
+            opciones.update(workers=workers, coordinador=params.get('coordinator_host'))
+        return opciones
+
+    def preparar(self, opciones=None):
+        # Las franjas se conectan antes de medir y siguen hasta el final de run()
+        import domain
+        self.cerrar()
+        self._coordinador = domain.iniciar(opciones['franjas'], opciones['halo'], opciones.get('workers'),
+                                           opciones.get('coordinador'))
+
+    def run(self, params, *args, **kwargs):
+        try:
+            return super().run(params, *args, **kwargs)
+        finally:
+            self.cerrar()
+
+    def cerrar(self):
+        if self._coordinador is not None:
+            self._coordinador.close()
+            self._coordinador = None
+
+    def simular(self, posiciones, velocidades, num_pasos, broadphase, opciones, callback, progress_every,
+                perfil=None):
+        if perfil is not None:
+            raise ValueError("El motor distribuido no tiene perfil por fases")
+        return self._coordinador.simular(posiciones, velocidades, num_pasos, callback, progress_every)
@@ -0,0 +1,191 @@
+"""
+Métricas en el formato de texto de Prometheus para /metrics
+
+Contadores, gauges e histogramas con etiquetas, sin dependencias. Los hilos
+que atienden requests o terminan tareas no toman ningún lock: cada
+actualización se agrega a una deque (append es atómico) y se consolida en
+los valores cuando alguien lee las métricas. Si nadie las lee, la deque se
+consolida sola al pasar de MAX_PENDIENTES, sólo si el lock está libre.
+
+Los gauges que reflejan estado (profundidad de cola, ocupación del pool) se
+calculan con una función en el momento de leerlos, en vez de actualizarse
+en cada cambio.
+"""
+
+import math
+import threading
+from collections import deque
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Actualizaciones sin consolidar antes de que quien actualiza intente hacerlo
+MAX_PENDIENTES = 10000
+
+# Segundos de una tarea, de una simulación corta a una de horas
+BUCKETS_DURACION = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+# Pasos por segundo, de Python puro con muchas partículas a Cython con pocas
+BUCKETS_PASOS_POR_SEGUNDO = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+def size_label(num_particulas):
+    """Etiqueta 'size' de una simulación: la potencia de 10 que acota su número de partículas"""
+    try:
+        num_particulas = int(num_particulas)
+    except (TypeError, ValueError):
+        return 'unknown'
+    return str(10 ** max(0, math.ceil(math.log10(max(num_particulas, 1)))))
+
+def _formatear(valor):
+    if valor == math.inf:
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(nombres, valores, extra=()):
+    pares = list(zip(nombres, valores)) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + '}'
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, registro, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._registro = registro
+        self._valores = {}
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} usa las etiquetas {self.etiquetas}, no {tuple(etiquetas)}")
+        return tuple(str(etiquetas[nombre]) for nombre in self.etiquetas)
+
+    def _encabezado(self):
+        return [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+
+    def _lineas(self):
+        return [f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_formatear(valor)}'
+                for clave, valor in sorted(self._valores.items())]
+
+class Counter(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, valor=1, **etiquetas):
+        if valor < 0:
+            raise ValueError("Un contador sólo puede crecer")
+        self._registro._anotar(self, self._clave(etiquetas), valor)
+
+    def _aplicar(self, clave, valor):
+        self._valores[clave] = self._valores.get(clave, 0) + valor
+
+class Gauge(_Metrica):
+    """Valor que sube y baja; con funcion, se calcula al leer las métricas.
+
+    funcion devuelve un número si el gauge no tiene etiquetas, o un dict de
+    tupla de valores de etiquetas a número.
+    """
+    tipo = 'gauge'
+
+    def __init__(self, registro, nombre, ayuda, etiquetas=(), funcion=None):
+        super().__init__(registro, nombre, ayuda, etiquetas)
+        self.funcion = funcion
+
+    def set(self, valor, **etiquetas):
+        self._registro._anotar(self, self._clave(etiquetas), valor)
+
+    def _aplicar(self, clave, valor):
+        self._valores[clave] = valor
+
+    def _lineas(self):
+        if self.funcion is None:
+            return super()._lineas()
+        valores = self.funcion()
+        if not isinstance(valores, dict):
+            valores = {(): valores}
+        return [f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_formatear(valor)}'
+                for clave, valor in sorted(valores.items()) if valor is not None]
+
+class Histogram(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, registro, nombre, ayuda, buckets, etiquetas=()):
+        super().__init__(registro, nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, valor, **etiquetas):
+        self._registro._anotar(self, self._clave(etiquetas), valor)
+
+    def _aplicar(self, clave, valor):
+        # [conteo por bucket (no acumulado), suma]
+        conteos, suma = self._valores.get(clave) or ([0] * len(self.buckets), 0.0)
+        for k, limite in enumerate(self.buckets):
+            if valor <= limite:
+                conteos[k] += 1
+                break
+        self._valores[clave] = (conteos, suma + valor)
+
+    def _lineas(self):
+        lineas = []
+        for clave, (conteos, suma) in sorted(self._valores.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                extra = [('le', _formatear(limite))]
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, extra)} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_formatear(suma)}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}')
+        return lineas
+
+class Registry:
+    """Conjunto de métricas de un servicio; render() produce el texto de /metrics"""
+
+    def __init__(self):
+        self._metricas = []
+        self._pendientes = deque()
+        # Sólo lo toman render() y la consolidación oportunista
+        self._lock = threading.Lock()
+
+    def _agregar(self, metrica):
+        if any(otra.nombre == metrica.nombre for otra in self._metricas):
+            raise ValueError(f"Métrica duplicada: {metrica.nombre}")
+        self._metricas.append(metrica)
+        return metrica
+
+    def counter(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Counter(self, nombre, ayuda, etiquetas))
+
+    def gauge(self, nombre, ayuda, etiquetas=(), funcion=None):
+        return self._agregar(Gauge(self, nombre, ayuda, etiquetas, funcion))
+
+    def histogram(self, nombre, ayuda, buckets, etiquetas=()):
+        return self._agregar(Histogram(self, nombre, ayuda, buckets, etiquetas))
+
+    def _anotar(self, metrica, clave, valor):
+        self._pendientes.append((metrica, clave, valor))
+        if len(self._pendientes) > MAX_PENDIENTES and self._lock.acquire(blocking=False):
+            try:
+                self._consolidar()
+            finally:
+                self._lock.release()
+
+    def _consolidar(self):
+        while True:
+            try:
+                metrica, clave, valor = self._pendientes.popleft()
+            except IndexError:
+                return
+            metrica._aplicar(clave, valor)
+
+    def render(self):
+        with self._lock:
+            self._consolidar()
+            lineas = []
+            for metrica in self._metricas:
+                lineas.extend(metrica._encabezado())
+                lineas.extend(metrica._lineas())
+        return '\n'.join(lineas) + '\n'
@@ -4,121 +4,829 @@ Orquestador de simulaciones distribuidas
 Maneja múltiples workers y ejecuta tareas de simulación
 """
 
+import base64
 import json
+import math
 import time
+import glob
+import hashlib
+import heapq
+import sqlite3
+import itertools
 import requests
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import yaml
 from datetime import datetime
-from flask import Flask, jsonify, request
+from urllib.parse import urlparse
+from flask import Flask, Response, jsonify, request
 from typing import Dict, List, Optional
 import os
 
+import metrics
+
+# Directorio del log (configurable para ejecutar fuera del contenedor)
+LOG_DIR = os.getenv('LOG_DIR', '/app/logs')
+
 # Configuración de logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('/app/logs/orchestrator.log'),
+        logging.FileHandler(os.path.join(LOG_DIR, 'orchestrator.log')),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+RESULTS_DIR = os.getenv('RESULTS_DIR', '/app/results')
+NETWORK_CONFIG = 'configs/network.yaml'
+
+# Tipos de tarea que no son un motor: un barrido de parámetros y un lote de
+# simulaciones que se envía en una sola llamada al worker
+TIPO_SWEEP = 'sweep'
+TIPO_LOTE = 'batch'
+# Motor que el orquestador coordina él mismo, con una franja del dominio por worker
+TIPO_DISTRIBUIDA = 'distributed'
+
+# Métricas de /metrics; los gauges de colas y workers se calculan al leerlas
+METRICAS = metrics.Registry()
+TAREAS_INICIADAS = METRICAS.counter('orchestrator_tasks_started_total', 'Intentos de tarea enviados a un worker',
+                                    ('type',))
+TAREAS_COMPLETADAS = METRICAS.counter('orchestrator_tasks_completed_total', 'Tareas completadas', ('type',))
+TAREAS_FALLIDAS = METRICAS.counter('orchestrator_tasks_failed_total', 'Intentos de tarea que fallaron', ('type',))
+TAREAS_REINTENTADAS = METRICAS.counter('orchestrator_tasks_retried_total', 'Tareas replanificadas tras un fallo',
+                                       ('type',))
+TAREAS_DESCARTADAS = METRICAS.counter('orchestrator_tasks_dropped_total',
+                                      'Tareas descartadas tras agotar los reintentos', ('type',))
+TAREAS_EN_CACHE = METRICAS.counter('orchestrator_cache_hits_total', 'Tareas resueltas desde la caché de resultados',
+                                   ('type',))
+DURACION_TAREAS = METRICAS.histogram('orchestrator_task_duration_seconds',
+                                     'Segundos desde el envío al worker hasta tener el resultado',
+                                     metrics.BUCKETS_DURACION, ('type', 'size'))
+PASOS = METRICAS.counter('orchestrator_simulation_steps_total', 'Pasos simulados por los workers', ('type',))
+PASOS_POR_SEGUNDO = METRICAS.histogram('orchestrator_simulation_steps_per_second',
+                                       'Pasos por segundo de cada simulación', metrics.BUCKETS_PASOS_POR_SEGUNDO,
+                                       ('type', 'size'))
+
+def _tamano(task: Dict) -> str:
+    """Etiqueta 'size' de una tarea: la de su simulación más grande si es un lote"""
+    if task.get('type') == TIPO_LOTE:
+        runs = task.get('parameters', {}).get('runs', [])
+        tamanos = [run.get('parameters', {}).get('num_particulas') for run in runs]
+        tamanos = [tamano for tamano in tamanos if tamano is not None]
+        return metrics.size_label(max(tamanos)) if tamanos else metrics.size_label(None)
+    return metrics.size_label(task.get('parameters', {}).get('num_particulas'))
+
 class WorkerManager:
+    # Health checks: pings simultáneos, timeouts de conexión y lectura, y
+    # espera entre pings a un worker caído (se duplica hasta el máximo)
+    PING_THREADS = 16
+    PING_TIMEOUT = (2, 5)
+    BACKOFF_INICIAL = 30
+    BACKOFF_MAXIMO = 600
+    # Un worker registrado por heartbeat se quita si no envía uno en este tiempo
+    HEARTBEAT_TIMEOUT = 60
+
     def __init__(self):
         self.workers = {}
         self.worker_status = {}
         self.task_queue = []
         self.completed_tasks = []
         self.running_tasks = {}
+        self.last_check = None
+        # Conexiones keep-alive reutilizadas por todos los pings
+        self.session = requests.Session()
+        adaptador = requests.adapters.HTTPAdapter(pool_connections=self.PING_THREADS,
+                                                  pool_maxsize=self.PING_THREADS)
+        self.session.mount('http://', adaptador)
+        self._pinger = ThreadPoolExecutor(max_workers=self.PING_THREADS, thread_name_prefix='health')
+        self._ronda = None
+        self._ronda_lock = threading.Lock()
+        self._lock = threading.Lock()
         
-    def register_worker(self, worker_id: str, host: str, port: int):
-        """Registrar un nuevo worker"""
-        self.workers[worker_id] = {
-            'host': host,
-            'port': port,
-            'url': f'http://{host}:{port}',
-            'last_ping': None,
-            'status': 'unknown'
-        }
-        self.worker_status[worker_id] = 'offline'
+    def register_worker(self, worker_id: str, host: str, port: int, dynamic: bool = False):
+        """Registrar un nuevo worker.
+
+        Los workers dinámicos se registran con heartbeats y se quitan si
+        dejan de enviarlos; los de la configuración sólo pasan a offline.
+        """
+        with self._lock:
+            self.workers[worker_id] = {
+                'host': host,
+                'port': port,
+                'url': f'http://{host}:{port}',
+                'last_ping': None,
+                'status': 'unknown',
+                'failures': 0,
+                'next_ping': 0.0,
+                'dynamic': dynamic,
+                'last_heartbeat': None
+            }
+            self.worker_status[worker_id] = 'offline'
         logger.info(f"Worker registrado: {worker_id} en {host}:{port}")
 
+    def heartbeat(self, worker_id: str, url: str, datos: Dict) -> bool:
+        """Registrar o actualizar un worker con su heartbeat; devuelve si es nuevo.
+
+        datos es el cuerpo del heartbeat: 'capacity' (cores, procesos, slots
+        libres, motores), 'pool' y 'engine_versions'.
+        """
+        partes = urlparse(url)
+        if partes.scheme != 'http' or not partes.hostname:
+            raise ValueError(f"URL de worker inválida: {url}")
+        puerto = partes.port or 80
+        anterior = self.workers.get(worker_id)
+        nuevo = anterior is None or (anterior['host'], anterior['port']) != (partes.hostname, puerto)
+        if nuevo:
+            self.register_worker(worker_id, partes.hostname, puerto, dynamic=True)
+
+        worker = self.workers[worker_id]
+        worker.update(
+            capacity=datos.get('capacity'),
+            pool=datos.get('pool'),
+            engine_versions=datos.get('engine_versions'),
+            last_heartbeat=time.time(),
+            last_ping=datetime.now(),
+            failures=0,
+            next_ping=0.0
+        )
+        self._marcar(worker_id, 'online')
+        return nuevo
+
+    def remove_worker(self, worker_id: str) -> bool:
+        """Quitar un worker; devuelve si existía"""
+        with self._lock:
+            existia = self.workers.pop(worker_id, None) is not None
+            self.worker_status.pop(worker_id, None)
+        if existia:
+            logger.info(f"Worker quitado: {worker_id}")
+        return existia
+
+    def expired_workers(self) -> List[str]:
+        """Workers dinámicos sin heartbeat en HEARTBEAT_TIMEOUT segundos"""
+        limite = time.time() - self.HEARTBEAT_TIMEOUT
+        return [worker_id for worker_id, worker in list(self.workers.items())
+                if worker.get('dynamic') and (worker.get('last_heartbeat') or 0) < limite]
+
+    def supports(self, worker_id: str, task: Dict) -> bool:
+        """¿El worker tiene los motores de la tarea? (sí, si todavía no los informó)"""
+        motores = (self.workers.get(worker_id) or {}).get('engine_versions')
+        if motores is None:
+            return True
+        if task.get('type') == TIPO_LOTE:
+            tipos = {run.get('type', 'benchmark') for run in task.get('parameters', {}).get('runs', [])}
+        else:
+            tipos = {task.get('type', 'benchmark')}
+        return tipos <= set(motores)
+
     def ping_worker(self, worker_id: str) -> bool:
         """Hacer ping a un worker específico"""
-        if worker_id not in self.workers:
+        worker = self.workers.get(worker_id)
+        if worker is None:
             return False
-            
-        worker = self.workers[worker_id]
         try:
-            response = requests.get(
-                f"{worker['url']}/ping", 
-                timeout=5
-            )
+            response = self.session.get(f"{worker['url']}/ping", timeout=self.PING_TIMEOUT)
             if response.status_code == 200:
-                self.workers[worker_id]['last_ping'] = datetime.now()
-                self.worker_status[worker_id] = 'online'
+                worker['last_ping'] = datetime.now()
+                datos = response.json()
+                worker['pool'] = datos.get('pool')
+                worker['engine_versions'] = datos.get('engine_versions')
+                worker['failures'] = 0
+                worker['next_ping'] = 0.0
+                self._marcar(worker_id, 'online')
                 logger.debug(f"Worker {worker_id} respondió correctamente")
                 return True
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.debug(f"Worker {worker_id} no responde: {e}")
-        
-        self.worker_status[worker_id] = 'offline'
+
+        # Backoff exponencial: un worker caído no demora cada ronda con su timeout
+        worker['failures'] = worker.get('failures', 0) + 1
+        espera = min(self.BACKOFF_MAXIMO, self.BACKOFF_INICIAL * 2 ** (worker['failures'] - 1))
+        worker['next_ping'] = time.time() + espera
+        self._marcar(worker_id, 'offline')
         return False
 
-    def ping_all_workers(self):
-        """Hacer ping a todos los workers"""
-        logger.info("Haciendo ping a todos los workers...")
-        online_count = 0
-        for worker_id in self.workers:
-            if self.ping_worker(worker_id):
-                online_count += 1
-        
+    def _marcar(self, worker_id: str, estado: str):
+        # Un ping en curso no debe revivir a un worker quitado mientras tanto
+        with self._lock:
+            if worker_id in self.workers:
+                self.worker_status[worker_id] = estado
+
+    def ping_all_workers(self, forzar: bool = False):
+        """Hacer ping a todos los workers a la vez; devuelve cuántos están online.
+
+        Los workers caídos sólo se vuelven a probar cuando vence su backoff,
+        salvo con forzar.
+        """
+        ahora = time.time()
+        # Un heartbeat reciente ya dice que el worker está vivo
+        pendientes = [worker_id for worker_id, worker in list(self.workers.items())
+                      if (forzar or worker.get('next_ping', 0) <= ahora)
+                      and not (worker.get('last_heartbeat') or 0) > ahora - self.HEARTBEAT_TIMEOUT / 2]
+        logger.info(f"Haciendo ping a {len(pendientes)}/{len(self.workers)} workers...")
+        list(self._pinger.map(self.ping_worker, pendientes))
+        self.last_check = datetime.now()
+
+        online_count = len(self.get_available_workers())
         logger.info(f"Workers online: {online_count}/{len(self.workers)}")
         return online_count
 
+    def ping_all_async(self, forzar: bool = False, esperar: bool = False) -> bool:
+        """Lanzar una ronda de pings en segundo plano si no hay otra en curso.
+
+        Devuelve si se lanzó una ronda nueva; con esperar, vuelve cuando
+        termina la ronda en curso.
+        """
+        with self._ronda_lock:
+            iniciada = not self.checking()
+            if iniciada:
+                self._ronda = threading.Thread(target=self.ping_all_workers, args=(forzar,), daemon=True)
+                self._ronda.start()
+            ronda = self._ronda
+        if esperar:
+            ronda.join()
+        return iniciada
+
+    def checking(self) -> bool:
+        """¿Hay una ronda de pings en segundo plano en curso?"""
+        return self._ronda is not None and self._ronda.is_alive()
+
     def get_available_workers(self) -> List[str]:
         """Obtener lista de workers disponibles"""
         return [
-            worker_id for worker_id, status in self.worker_status.items() 
+            worker_id for worker_id, status in list(self.worker_status.items())
             if status == 'online'
         ]
 
-    def execute_task_on_worker(self, worker_id: str, task: Dict) -> Optional[Dict]:
-        """Ejecutar una tarea en un worker específico"""
-        if worker_id not in self.workers or self.worker_status[worker_id] != 'online':
+    def execute_task_on_worker(self, worker_id: str, task: Dict, task_timeout: float = 600,
+                               poll_interval: float = 2, checkpoint_path: str = None) -> Optional[Dict]:
+        """Ejecutar una tarea en un worker específico.
+
+        La tarea se envía a POST /jobs y se consulta GET /jobs/<id> cada
+        poll_interval segundos, sin mantener una conexión abierta mientras
+        corre la simulación. Pasado task_timeout se cancela en el worker.
+        Con checkpoint_path, cada checkpoint nuevo del job se descarga a ese
+        archivo para poder reanudar la tarea en cualquier worker.
+        """
+        # Copia del registro: el worker puede quitarse (DELETE o heartbeat vencido) mientras corre la tarea
+        worker = self.workers.get(worker_id)
+        if worker is None or self.worker_status.get(worker_id) != 'online':
             logger.error(f"Worker {worker_id} no está disponible")
             return None
 
-        worker = self.workers[worker_id]
+        url = worker['url']
         try:
             logger.info(f"Ejecutando tarea en {worker_id}: {task}")
             
-            response = requests.post(
-                f"{worker['url']}/execute",
-                json=task,
-                timeout=300  # 5 minutos timeout
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Tarea completada en {worker_id}")
-                return result
-            else:
-                logger.error(f"Error en worker {worker_id}: {response.status_code}")
+            response = requests.post(f"{url}/jobs", json=task, timeout=10)
+            if response.status_code != 202:
+                logger.error(f"Error en worker {worker_id}: {response.status_code} {response.text}")
                 return None
+            job_id = response.json()['job_id']
+
+            ultimo_checkpoint = 0
+            limite = time.time() + task_timeout
+            while time.time() < limite:
+                time.sleep(poll_interval)
+                response = requests.get(f"{url}/jobs/{job_id}", timeout=10)
+                if response.status_code != 200:
+                    logger.error(f"Error consultando job {job_id} en {worker_id}: {response.status_code}")
+                    return None
+                job = response.json()
+                if checkpoint_path and (job.get('checkpoint_step') or 0) > ultimo_checkpoint:
+                    ultimo_checkpoint = (self._descargar_checkpoint(worker_id, url, job_id, checkpoint_path)
+                                         or ultimo_checkpoint)
+                if job['status'] in ('completed', 'failed', 'cancelled'):
+                    result = job['result']
+                    if not result.get('success'):
+                        logger.error(f"Tarea {task.get('id')} falló en {worker_id}: {result.get('error')}")
+                        return None
+                    logger.info(f"Tarea completada en {worker_id}")
+                    return result
+
+            logger.error(f"Timeout de {task_timeout}s para la tarea {task.get('id')} en {worker_id}, cancelando")
+            requests.delete(f"{url}/jobs/{job_id}", timeout=10)
+            return None
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error ejecutando tarea en {worker_id}: {e}")
             return None
 
+    def _descargar_checkpoint(self, worker_id: str, url: str, job_id: str, checkpoint_path: str) -> Optional[int]:
+        """Guardar el último checkpoint de un job; devuelve su paso (None si no se pudo)"""
+        try:
+            response = requests.get(f"{url}/jobs/{job_id}/checkpoint", timeout=60)
+            if response.status_code != 200:
+                return None
+            os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+            temporal = f"{checkpoint_path}.tmp"
+            with open(temporal, 'wb') as f:
+                f.write(response.content)
+            os.replace(temporal, checkpoint_path)
+            paso = int(response.headers.get('X-Checkpoint-Step', 0))
+            logger.info(f"Checkpoint del job {job_id} en {worker_id}: paso {paso}")
+            return paso
+        except (requests.exceptions.RequestException, OSError) as e:
+            logger.warning(f"No se pudo descargar el checkpoint del job {job_id} en {worker_id}: {e}")
+            return None
+
+class CostModel:
+    """Costo estimado de las tareas y throughput aprendido de cada worker.
+
+    El costo se mide en pares revisados: N(N-1)/2 por paso con fuerza bruta y
+    unas PARES_POR_PARTICULA_GRID por partícula y paso con la lista de celdas.
+    El throughput (pares por segundo) se aprende por (worker, motor,
+    broadphase) con una media móvil exponencial de las duraciones observadas.
+    En las tareas distribuidas es el throughput de una franja: la tarea se
+    reparte en parameters['strips'] franjas que corren a la vez.
+    """
+
+    PARES_POR_PARTICULA_GRID = 10
+
+    # Throughput inicial por motor (pares/s) mientras no haya observaciones
+    THROUGHPUT_INICIAL = {
+        'benchmark': 2e5,
+        'benchmark_cython': 2e8,
+        'benchmark_numpy': 2e6,
+        'benchmark_numba': 2e8,
+        # Por franja: numba más el intercambio de halos de cada paso
+        TIPO_DISTRIBUIDA: 5e7
+    }
+    BROADPHASE_POR_DEFECTO = {'benchmark_numpy': 'grid', TIPO_DISTRIBUIDA: 'grid'}
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.throughput = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, task: Dict):
+        task_type = task.get('type', 'benchmark')
+        broadphase = task.get('parameters', {}).get(
+            'broadphase', self.BROADPHASE_POR_DEFECTO.get(task_type, 'bruteforce'))
+        return task_type, broadphase
+
+    def _franjas(self, task: Dict) -> int:
+        """Franjas en que se reparte la tarea (1 si no es distribuida)"""
+        if task.get('type') != TIPO_DISTRIBUIDA:
+            return 1
+        import domain
+        return max(1, int(task.get('parameters', {}).get('strips', domain.FRANJAS)))
+
+    def cost(self, task: Dict) -> float:
+        """Pares revisados estimados para toda la simulación (o todo el lote)"""
+        parameters = task.get('parameters', {})
+        if task.get('type') == TIPO_LOTE:
+            return sum(self.cost(run) for run in parameters.get('runs', []))
+        num_particulas = parameters.get('num_particulas', 100)
+        num_pasos = parameters.get('num_pasos', 1000)
+        if self._clave(task)[1] == 'grid':
+            return float(num_particulas * self.PARES_POR_PARTICULA_GRID * num_pasos)
+        return float(num_particulas * (num_particulas - 1) / 2 * num_pasos)
+
+    def predict(self, worker_id: str, task: Dict) -> float:
+        """Segundos estimados de la tarea en el worker"""
+        if task.get('type') == TIPO_LOTE:
+            return sum(self.predict(worker_id, run) for run in task.get('parameters', {}).get('runs', []))
+        clave = self._clave(task)
+        with self._lock:
+            throughput = self.throughput.get((worker_id,) + clave)
+            if throughput is None:
+                # Sin datos del worker: promedio de los demás, o el valor inicial
+                otros = [valor for (_, *resto), valor in self.throughput.items() if tuple(resto) == clave]
+                throughput = sum(otros) / len(otros) if otros else self.THROUGHPUT_INICIAL.get(clave[0], 1e6)
+        return self.cost(task) / (throughput * self._franjas(task))
+
+    def observe(self, worker_id: str, task: Dict, duration: float, workers: Optional[List[str]] = None):
+        """Actualizar el throughput del worker con la duración de una tarea.
+
+        En una tarea distribuida el throughput observado se reparte entre sus
+        franjas y se acredita a cada worker de workers (los de las franjas;
+        sin workers, sólo a worker_id).
+        """
+        if duration <= 0:
+            return
+        observado = self.cost(task) / duration / self._franjas(task)
+        with self._lock:
+            for worker in dict.fromkeys(workers or [worker_id]):
+                clave = (worker,) + self._clave(task)
+                previo = self.throughput.get(clave)
+                self.throughput[clave] = (observado if previo is None
+                                          else (1 - self.alpha) * previo + self.alpha * observado)
+
+    def load_history(self, store: 'ResultStore', limite: int = 10000):
+        """Aprender de los últimos resultados guardados en ejecuciones anteriores"""
+        filas = store.history(limite)
+        for worker_id, task_type, parameters, duration in filas:
+            self.observe(worker_id, {'type': task_type, 'parameters': parameters}, duration)
+        logger.info(f"Modelo de costo: {len(self.throughput)} throughputs aprendidos de {len(filas)} resultados")
+
+class ResultStore:
+    """Resultados de las tareas en una tabla SQLite indexada (sólo se agregan filas).
+
+    Cada fila guarda el result_data completo que antes iba a un archivo
+    result_<task>_<timestamp>.json, más columnas indexadas para filtrar por
+    tarea, worker, tipo, sweep y fecha. Las simulaciones de un lote se
+    insertan todas en una sola transacción.
+    """
+
+    FILTROS = ('task_id', 'worker_id', 'task_type', 'sweep_id')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conexion = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, task_id TEXT, worker_id TEXT, task_type TEXT, "
+                "parameters TEXT, sweep_id TEXT, cached INTEGER, start_time TEXT, end_time TEXT, "
+                "duration REAL, data TEXT)")
+            for columna in self.FILTROS + ('end_time',):
+                self._conexion.execute(f"CREATE INDEX IF NOT EXISTS results_{columna} ON results ({columna})")
+            self._conexion.execute("CREATE TABLE IF NOT EXISTS imported_files (name TEXT PRIMARY KEY)")
+
+    @staticmethod
+    def _fila(result_data: Dict):
+        result = result_data.get('result') or {}
+        return (
+            result_data.get('task_id'),
+            result_data.get('worker_id'),
+            result.get('task_type'),
+            json.dumps(result.get('parameters', {}), sort_keys=True),
+            result_data.get('sweep_id'),
+            1 if result_data.get('cached') else 0,
+            result_data.get('start_time'),
+            result_data.get('end_time'),
+            # La duración medida en el worker no incluye el intervalo de consulta
+            result.get('duration_seconds', result_data.get('duration')),
+            json.dumps(result_data)
+        )
+
+    def insert(self, result_data: Dict):
+        self.insert_many([result_data])
+
+    def insert_many(self, results: List[Dict]):
+        with self._lock, self._conexion:
+            self._conexion.executemany(
+                "INSERT INTO results (task_id, worker_id, task_type, parameters, sweep_id, cached, "
+                "start_time, end_time, duration, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._fila(result_data) for result_data in results])
+
+    def query(self, filtros: Dict = None, parameters: Dict = None, since: str = None, until: str = None,
+              limit: int = 100, offset: int = 0):
+        """Resultados que cumplen los filtros, del más reciente al más antiguo.
+
+        filtros admite las columnas de FILTROS; parameters compara valores
+        dentro de los parámetros de la tarea; since y until acotan end_time
+        (ISO 8601). Devuelve (total, resultados de la página).
+        """
+        condiciones, valores = [], []
+        for columna, valor in (filtros or {}).items():
+            if columna not in self.FILTROS:
+                raise ValueError(f"Filtro desconocido: {columna}")
+            condiciones.append(f"{columna} = ?")
+            valores.append(valor)
+        for nombre, valor in (parameters or {}).items():
+            condiciones.append("json_extract(parameters, ?) = ?")
+            valores.extend([f'$."{nombre}"', valor])
+        if since:
+            condiciones.append("end_time >= ?")
+            valores.append(since)
+        if until:
+            condiciones.append("end_time <= ?")
+            valores.append(until)
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+        with self._lock:
+            total = self._conexion.execute(f"SELECT COUNT(*) FROM results{donde}", valores).fetchone()[0]
+            filas = self._conexion.execute(
+                f"SELECT data FROM results{donde} ORDER BY id DESC LIMIT ? OFFSET ?",
+                valores + [limit, offset]).fetchall()
+        return total, [json.loads(data) for (data,) in filas]
+
+    def history(self, limite: int) -> List:
+        """(worker_id, task_type, parameters, duration) de los últimos resultados no tomados de la caché"""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT worker_id, task_type, parameters, duration FROM results "
+                "WHERE cached = 0 AND duration > 0 ORDER BY id DESC LIMIT ?", (limite,)).fetchall()
+        return [(worker_id, task_type, json.loads(parameters), duration)
+                for worker_id, task_type, parameters, duration in reversed(filas)]
+
+    def import_files(self, directorio: str):
+        """Importar (una sola vez) los result_*.json de versiones anteriores"""
+        archivos = sorted(glob.glob(os.path.join(directorio, 'result_*.json')), key=os.path.getmtime)
+        with self._lock:
+            importados = {nombre for (nombre,) in self._conexion.execute("SELECT name FROM imported_files")}
+        nuevos, results = [], []
+        for archivo in archivos:
+            nombre = os.path.basename(archivo)
+            if nombre in importados:
+                continue
+            try:
+                with open(archivo) as f:
+                    results.append(json.load(f))
+                nuevos.append((nombre,))
+            except (OSError, ValueError):
+                continue
+        if not nuevos:
+            return
+        self.insert_many(results)
+        with self._lock, self._conexion:
+            self._conexion.executemany("INSERT OR IGNORE INTO imported_files VALUES (?)", nuevos)
+        logger.info(f"Importados {len(nuevos)} resultados de archivos JSON")
+
+def _valores_sweep(valor) -> List:
+    """Valores de un parámetro de sweep: lista, rango {start, stop, step} o valor único"""
+    if isinstance(valor, dict):
+        return list(range(valor.get('start', 0), valor['stop'], valor.get('step', 1)))
+    if isinstance(valor, list):
+        return valor
+    return [valor]
+
+def expand_sweep(task: Dict) -> List[Dict]:
+    """Simulaciones de un sweep: producto cartesiano de sus parámetros.
+
+    'engine' (uno o varios motores) pasa a ser el tipo de cada simulación; la
+    semilla varía más rápido, así que las simulaciones de una misma
+    configuración quedan contiguas.
+    """
+    parameters = dict(task.get('parameters', {}))
+    motores = _valores_sweep(parameters.pop('engine', 'benchmark'))
+    nombres = [nombre for nombre in parameters if nombre != 'semilla'] + ['semilla']
+    valores = [_valores_sweep(parameters.get(nombre, 42 if nombre == 'semilla' else None)) for nombre in nombres]
+
+    return [
+        {'type': motor, 'parameters': dict(zip(nombres, combinacion))}
+        for motor in motores
+        for combinacion in itertools.product(*valores)
+    ]
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    """Percentil p (0-100) con interpolación lineal sobre valores ordenados"""
+    posicion = (len(ordenados) - 1) * p / 100
+    abajo = math.floor(posicion)
+    arriba = min(abajo + 1, len(ordenados) - 1)
+    return ordenados[abajo] + (ordenados[arriba] - ordenados[abajo]) * (posicion - abajo)
+
+class SweepAggregator:
+    """Estadísticas de un sweep, agregadas a medida que llegan los lotes.
+
+    Las simulaciones se agrupan por configuración (motor y parámetros salvo
+    la semilla); de cada métrica se guarda media, desviación estándar,
+    mínimo, máximo y percentiles. El resumen se reescribe en un único
+    archivo sweep_<id>.json en lugar de un resultado por simulación.
+    """
+
+    METRICAS = ('particle_collisions', 'wall_collisions', 'execution_time', 'steps_per_second')
+    PERCENTILES = (5, 25, 50, 75, 95)
+
+    def __init__(self, sweep_id: str, total_runs: int, directorio: str):
+        self.sweep_id = sweep_id
+        self.total_runs = total_runs
+        self.filename = os.path.join(directorio, f"sweep_{sweep_id}.json")
+        self.grupos = {}
+        self.errores = []
+        self._lock = threading.Lock()
+
+    def add(self, results: List[Dict]):
+        """Incorporar los resultados de un lote y actualizar el resumen"""
+        with self._lock:
+            for entrada in results:
+                parameters = dict(entrada.get('parameters', {}))
+                semilla = parameters.pop('semilla', None)
+                if not entrada.get('success'):
+                    self.errores.append({'task_type': entrada.get('task_type'), 'semilla': semilla,
+                                         'error': entrada.get('error')})
+                    continue
+                clave = json.dumps([entrada['task_type'], parameters], sort_keys=True)
+                grupo = self.grupos.setdefault(clave, {
+                    'engine': entrada['task_type'],
+                    'parameters': parameters,
+                    'valores': {metrica: [] for metrica in self.METRICAS}
+                })
+                for metrica in self.METRICAS:
+                    grupo['valores'][metrica].append(entrada['metrics'][metrica])
+            resumen = self._resumen()
+        self._guardar(resumen)
+
+    def completed_runs(self) -> int:
+        return sum(len(grupo['valores'][self.METRICAS[0]]) for grupo in self.grupos.values()) + len(self.errores)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return self._resumen()
+
+    def _resumen(self) -> Dict:
+        completadas = self.completed_runs()
+        return {
+            'sweep_id': self.sweep_id,
+            'status': 'completed' if completadas >= self.total_runs else 'running',
+            'total_runs': self.total_runs,
+            'completed_runs': completadas,
+            'failed_runs': len(self.errores),
+            'groups': [
+                {
+                    'engine': grupo['engine'],
+                    'parameters': grupo['parameters'],
+                    'runs': len(grupo['valores'][self.METRICAS[0]]),
+                    'metrics': {metrica: self._estadisticas(valores) for metrica, valores in grupo['valores'].items()}
+                }
+                for grupo in self.grupos.values()
+            ],
+            'errors': self.errores[-20:]
+        }
+
+    def _estadisticas(self, valores: List[float]) -> Dict:
+        n = len(valores)
+        media = sum(valores) / n
+        varianza = sum((valor - media) ** 2 for valor in valores) / (n - 1) if n > 1 else 0.0
+        ordenados = sorted(valores)
+        estadisticas = {'mean': media, 'stddev': math.sqrt(varianza), 'min': ordenados[0], 'max': ordenados[-1]}
+        for p in self.PERCENTILES:
+            estadisticas[f'p{p}'] = _percentil(ordenados, p)
+        return estadisticas
+
+    def _guardar(self, resumen: Dict):
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        temporal = self.filename + '.tmp'
+        with open(temporal, 'w') as f:
+            json.dump(resumen, f, indent=2)
+        os.replace(temporal, self.filename)
+
+class ResultCache:
+    """Caché de resultados direccionada por contenido, guardada en SQLite.
+
+    Una simulación es determinista dados su tipo, sus parámetros (con la
+    semilla) y el código del motor, así que la clave es un hash de esos tres
+    datos; la versión del motor la informa cada worker en /ping. Se
+    descartan las entradas de más de max_age_days días y, por encima de
+    max_entries, las usadas hace más tiempo.
+    """
+
+    # Cada cuántas inserciones se aplica el descarte
+    DESCARTE_CADA = 100
+
+    def __init__(self, path: str, max_entries: int = 100000, max_age_days: float = 30):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self._insertadas = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conexion = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, task_type TEXT, engine_version TEXT, result TEXT, "
+                "created REAL, last_used REAL)")
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.evict()
+
+    @staticmethod
+    def key(task_type: str, parameters: Dict, engine_version: str) -> str:
+        contenido = json.dumps([task_type, parameters, engine_version], sort_keys=True)
+        return hashlib.sha256(contenido.encode()).hexdigest()
+
+    def get(self, task_type: str, parameters: Dict, engine_versions) -> Optional[Dict]:
+        """Resultado guardado para alguna de las versiones del motor (None si no hay)"""
+        claves = [self.key(task_type, parameters, version) for version in engine_versions if version]
+        if not claves:
+            return None
+        with self._lock, self._conexion:
+            fila = self._conexion.execute(
+                f"SELECT key, result FROM results WHERE key IN ({','.join('?' * len(claves))}) "
+                "AND created >= ? LIMIT 1",
+                claves + [time.time() - self.max_age]).fetchone()
+            if fila is None:
+                return None
+            self._conexion.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), fila[0]))
+        return json.loads(fila[1])
+
+    def put(self, task_type: str, parameters: Dict, engine_version: str, result: Dict):
+        self.put_many([(task_type, parameters, engine_version, result)])
+
+    def put_many(self, entradas: List):
+        """Guardar varios (task_type, parameters, engine_version, result) en una transacción"""
+        ahora = time.time()
+        filas = [
+            (self.key(task_type, parameters, version), task_type, version, json.dumps(result), ahora, ahora)
+            for task_type, parameters, version, result in entradas if version
+        ]
+        if not filas:
+            return
+        with self._lock, self._conexion:
+            self._conexion.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", filas)
+            self._insertadas += len(filas)
+            descartar = self._insertadas >= self.DESCARTE_CADA
+        if descartar:
+            self.evict()
+
+    def evict(self):
+        """Descartar entradas vencidas y, si sobran, las usadas hace más tiempo"""
+        with self._lock, self._conexion:
+            self._insertadas = 0
+            self._conexion.execute("DELETE FROM results WHERE created < ?", (time.time() - self.max_age,))
+            total = self._conexion.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if total > self.max_entries:
+                self._conexion.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY last_used LIMIT ?)", (total - self.max_entries,))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self._conexion.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {'entries': total, 'max_entries': self.max_entries, 'max_age_days': self.max_age / 86400}
+
+class TaskQueue:
+    """Cola de tareas: menor 'priority' primero y, a igual prioridad, mayor costo primero"""
+
+    def __init__(self):
+        self._heap = []
+        self._contador = itertools.count()
+        self._condicion = threading.Condition()
+
+    def put(self, item: Dict):
+        """Encolar un item {'task': ..., 'intentos': ..., 'costo': ...}"""
+        with self._condicion:
+            clave = (item['task'].get('priority', 1), -item.get('costo', 0), next(self._contador))
+            heapq.heappush(self._heap, clave + (item,))
+            self._condicion.notify()
+
+    def get(self, timeout: float = None) -> Optional[Dict]:
+        """Sacar el siguiente item, esperando hasta timeout segundos (None si no hay)"""
+        with self._condicion:
+            if not self._condicion.wait_for(lambda: self._heap, timeout=timeout):
+                return None
+            return heapq.heappop(self._heap)[-1]
+
+    def take(self, condicion) -> Optional[Dict]:
+        """Sacar, sin esperar, el primer item en orden de despacho que cumple condicion"""
+        with self._condicion:
+            candidatos = sorted(range(len(self._heap)), key=lambda k: self._heap[k][:3])
+            for k in candidatos:
+                if condicion(self._heap[k][-1]):
+                    entrada = self._heap[k]
+                    self._heap[k] = self._heap[-1]
+                    self._heap.pop()
+                    heapq.heapify(self._heap)
+                    return entrada[-1]
+            return None
+
+    def steal(self) -> Optional[Dict]:
+        """Sacar el último item en orden de despacho (el que menos espera perder)"""
+        with self._condicion:
+            if not self._heap:
+                return None
+            ultimo = max(range(len(self._heap)), key=lambda k: self._heap[k][:3])
+            entrada = self._heap[ultimo]
+            self._heap[ultimo] = self._heap[-1]
+            self._heap.pop()
+            heapq.heapify(self._heap)
+            return entrada[-1]
+
+    def items(self) -> List[Dict]:
+        """Items en espera, en el orden en que se van a despachar"""
+        with self._condicion:
+            return [entrada[-1] for entrada in sorted(self._heap, key=lambda entrada: entrada[:3])]
+
+    def pending(self) -> List[Dict]:
+        return [item['task'] for item in self.items()]
+
+    def __len__(self):
+        with self._condicion:
+            return len(self._heap)
+
 class TaskScheduler:
     def __init__(self, worker_manager: WorkerManager):
         self.worker_manager = worker_manager
         self.tasks = []
+        self.include_output = True
+        self.task_timeout = 600
+        self.max_retries = 3
+        self.retry_delay = 60
+        self.worker_config = {}
+        self.cache_config = {}
+        self.queue = TaskQueue()
+        self.worker_queues = {}
+        self.running = {}
+        self._fin_previsto = {}
+        self.store = ResultStore(os.path.join(RESULTS_DIR, 'results.db'))
+        self.store.import_files(RESULTS_DIR)
+        self.cost_model = CostModel()
+        self.cost_model.load_history(self.store)
+        self.sweeps = {}
+        self._despachadores = {}
+        self._lock = threading.Lock()
+        # Dirección con la que los workers llegan al coordinador de las tareas distribuidas
+        self.coordinator_host = os.getenv('COORDINATOR_HOST')
         self.load_tasks_from_config()
+        self.cache = self._crear_cache()
         
     def load_tasks_from_config(self):
         """Cargar tareas desde archivo de configuración"""
@@ -126,6 +834,13 @@ class TaskScheduler:
             with open('/app/configs/tasks.yaml', 'r') as f:
                 config = yaml.safe_load(f)
                 self.tasks = config.get('tasks', [])
+                orchestrator_config = config.get('orchestrator') or {}
+                self.include_output = orchestrator_config.get('include_output', True)
+                self.task_timeout = orchestrator_config.get('task_timeout', 600)
+                self.max_retries = orchestrator_config.get('max_retries', 3)
+                self.retry_delay = orchestrator_config.get('retry_delay', 60)
+                self.worker_config = config.get('workers') or {}
+                self.cache_config = orchestrator_config.get('cache') or {}
             logger.info(f"Cargadas {len(self.tasks)} tareas desde configuración")
         except FileNotFoundError:
             logger.warning("Archivo de configuración no encontrado, usando tareas por defecto")
@@ -169,33 +884,341 @@ class TaskScheduler:
             }
         ]
 
+    def _crear_cache(self) -> Optional[ResultCache]:
+        if not self.cache_config.get('enabled', True):
+            return None
+        try:
+            return ResultCache(
+                self.cache_config.get('path', os.path.join(RESULTS_DIR, 'cache.db')),
+                self.cache_config.get('max_entries', 100000),
+                self.cache_config.get('max_age_days', 30))
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"No se pudo abrir la caché de resultados, se desactiva: {e}")
+            return None
+
+    def _usa_cache(self, task: Dict) -> bool:
+        # Una tarea con trayectoria se ejecuta siempre: el resultado son sus archivos.
+        # Tampoco una con perfil: los tiempos por fase son de esta corrida
+        return (self.cache is not None and task.get('cache', True)
+                and not task.get('trajectory') and not task.get('profile'))
+
+    def _engine_versions(self, task_type: str) -> set:
+        """Versiones del motor que informan los workers online"""
+        return {
+            (self.worker_manager.workers.get(worker_id, {}).get('engine_versions') or {}).get(task_type)
+            for worker_id in self.worker_manager.get_available_workers()
+        } - {None}
+
+    def _cached(self, task: Dict) -> Optional[Dict]:
+        if not self._usa_cache(task):
+            return None
+        return self.cache.get(task.get('type', 'benchmark'), task.get('parameters', {}),
+                              self._engine_versions(task.get('type', 'benchmark')))
+
+    # Un lote de sweep agrupa simulaciones hasta unos LOTE_SEGUNDOS estimados
+    LOTE_SEGUNDOS = 10
+    LOTE_MAXIMO = 100
+
     def distribute_tasks(self):
-        """Distribuir tareas entre workers disponibles"""
-        available_workers = self.worker_manager.get_available_workers()
-        
-        if not available_workers:
-            logger.warning("No hay workers disponibles")
+        """Planificar todas las tareas sobre los workers online (LPT) y despacharlas"""
+        tareas = []
+        en_cache = 0
+        for task in self.tasks:
+            if task.get('type') == TIPO_SWEEP:
+                tareas.extend(self._expand_sweep(task))
+                continue
+            result = self._cached(task)
+            if result is None:
+                tareas.append(task)
+                continue
+            # Resultado ya calculado con la misma versión del motor
+            en_cache += 1
+            TAREAS_EN_CACHE.inc(type=task.get('type', 'benchmark'))
+            self._save_result({
+                'task_id': task['id'],
+                'worker_id': result.get('worker_id'),
+                'start_time': datetime.now().isoformat(),
+                'end_time': datetime.now().isoformat(),
+                'duration': 0.0,
+                'cached': True,
+                'result': result
+            })
+        if en_cache:
+            logger.info(f"{en_cache} tareas resueltas desde la caché de resultados")
+        self._plan([{'task': task, 'intentos': 0} for task in tareas])
+        self.start_dispatchers()
+
+    def _expand_sweep(self, task: Dict) -> List[Dict]:
+        """Convertir un sweep en lotes de simulaciones de la misma configuración"""
+        runs = expand_sweep(task)
+        aggregator = self.sweeps[task['id']] = SweepAggregator(task['id'], len(runs), RESULTS_DIR)
+
+        # Las simulaciones ya calculadas se agregan directamente desde la caché
+        if self._usa_cache(task):
+            pendientes, en_cache = [], []
+            for run in runs:
+                entrada = self.cache.get(run['type'], run['parameters'], self._engine_versions(run['type']))
+                if entrada is None:
+                    pendientes.append(run)
+                else:
+                    en_cache.append(entrada)
+            if en_cache:
+                aggregator.add(en_cache)
+                logger.info(f"Sweep {task['id']}: {len(en_cache)} simulaciones desde la caché")
+            runs = pendientes
+
+        maximo = task.get('batch_size', self.LOTE_MAXIMO)
+
+        lotes, actual, segundos = [], [], 0.0
+        for run in runs:
+            prevision = self.cost_model.predict(None, run)
+            misma_configuracion = actual and actual[-1]['type'] == run['type'] and all(
+                actual[-1]['parameters'].get(k) == v for k, v in run['parameters'].items() if k != 'semilla')
+            if actual and (not misma_configuracion or len(actual) >= maximo
+                           or segundos + prevision > self.LOTE_SEGUNDOS):
+                lotes.append(actual)
+                actual, segundos = [], 0.0
+            actual.append(run)
+            segundos += prevision
+        if actual:
+            lotes.append(actual)
+
+        logger.info(f"Sweep {task['id']}: {len(runs)} simulaciones en {len(lotes)} lotes")
+        return [
+            {
+                'id': f"{task['id']}_lote{k}",
+                'type': TIPO_LOTE,
+                'sweep': task['id'],
+                'cache': task.get('cache', True),
+                'parameters': {'runs': lote},
+                'priority': task.get('priority', 1)
+            }
+            for k, lote in enumerate(lotes)
+        ]
+
+    def _plan(self, items: List[Dict]):
+        """Asignar items con LPT: de mayor a menor costo (dentro de cada prioridad),
+        cada uno al worker que según el modelo de costo lo termina antes"""
+        for item in items:
+            item['costo'] = self.cost_model.cost(item['task'])
+
+        workers = self.worker_manager.get_available_workers()
+        if not workers:
+            # Sin workers online quedan en la cola general; el primero que aparezca las toma
+            for item in items:
+                self.queue.put(item)
+            logger.warning(f"No hay workers disponibles, {len(items)} tareas en espera")
             return
-            
-        logger.info(f"Distribuyendo {len(self.tasks)} tareas entre {len(available_workers)} workers")
-        
-        # Distribuir tareas de forma round-robin
-        for i, task in enumerate(self.tasks):
-            worker_id = available_workers[i % len(available_workers)]
-            
-            # Ejecutar tarea en thread separado
-            thread = threading.Thread(
-                target=self._execute_task_async,
-                args=(worker_id, task)
-            )
-            thread.daemon = True
-            thread.start()
-
-    def _execute_task_async(self, worker_id: str, task: Dict):
-        """Ejecutar tarea de forma asíncrona"""
+
+        # Momento (en segundos desde ahora) en que queda libre cada slot
+        libre = {}
+        for worker_id in workers:
+            slots = self.worker_slots(worker_id)
+            libre[worker_id] = [self.backlog(worker_id) / slots] * slots
+
+        sin_motor = 0
+        for item in sorted(items, key=lambda item: (item['task'].get('priority', 1), -item['costo'])):
+            candidatos = [w for w in workers if self.worker_manager.supports(w, item['task'])]
+            if not candidatos:
+                # Ningún worker online tiene el motor: esperar a uno que lo tenga
+                self.queue.put(item)
+                sin_motor += 1
+                continue
+            fin, worker_id = min(
+                (min(libre[w]) + self.cost_model.predict(w, item['task']), w) for w in candidatos)
+            slot = libre[worker_id].index(min(libre[worker_id]))
+            libre[worker_id][slot] = fin
+            self._worker_queue(worker_id).put(item)
+
+        if sin_motor:
+            logger.warning(f"{sin_motor} tareas en espera de un worker con su motor")
+        logger.info(f"Planificadas {len(items) - sin_motor} tareas; fin estimado por worker: "
+                    + ", ".join(f"{w}={max(libre[w]):.1f}s" for w in workers))
+
+    def _worker_queue(self, worker_id: str) -> TaskQueue:
+        with self._lock:
+            if worker_id not in self.worker_manager.workers:
+                # Un slot de un worker recién quitado: una cola vacía que no se guarda
+                return self.worker_queues.get(worker_id) or TaskQueue()
+            return self.worker_queues.setdefault(worker_id, TaskQueue())
+
+    def backlog(self, worker_id: str) -> float:
+        """Segundos estimados de trabajo pendiente del worker (en cola y en ejecución)"""
+        ahora = time.time()
+        pendiente = sum(self.cost_model.predict(worker_id, item['task'])
+                        for item in self._worker_queue(worker_id).items())
+        with self._lock:
+            pendiente += sum(max(0.0, fin - ahora) for w, fin in self._fin_previsto.values() if w == worker_id)
+        return pendiente
+
+    def _ocupados(self, worker_id: str) -> int:
+        """Slots del worker en uso: sus tareas y las franjas reservadas en él (con self._lock tomado)"""
+        return sum(1 for w in self.running.values() if w == worker_id)
+
+    def worker_slots(self, worker_id: str) -> int:
+        """Tareas simultáneas para un worker: configuración, o el tamaño de su pool"""
+        configurado = (self.worker_config.get(worker_id) or {}).get('max_concurrent_tasks')
+        if configurado:
+            return configurado
+        pool = self.worker_manager.workers.get(worker_id, {}).get('pool') or {}
+        return max(1, pool.get('processes', 1))
+
+    def start_dispatchers(self):
+        """Arrancar un hilo por slot de cada worker registrado (idempotente)"""
+        with self._lock:
+            for worker_id in list(self.worker_manager.workers):
+                hilos = self._despachadores.setdefault(worker_id, [])
+                for slot in range(len(hilos), self.worker_slots(worker_id)):
+                    hilo = threading.Thread(target=self._dispatch_loop, args=(worker_id, slot))
+                    hilo.daemon = True
+                    # Registrado antes de arrancar: el hilo corre mientras esté en la lista
+                    hilos.append(hilo)
+                    hilo.start()
+
+    def _next_item(self, worker_id: str) -> Optional[Dict]:
+        """Siguiente tarea para un slot libre: la cola propia, la general o una robada"""
+        item = self._worker_queue(worker_id).get(timeout=0)
+        if item is None:
+            item = self.queue.take(lambda item: self.worker_manager.supports(worker_id, item['task']))
+        if item is None:
+            item = self._steal(worker_id)
+        return item
+
+    def _steal(self, worker_id: str) -> Optional[Dict]:
+        """Robar la última tarea del worker más cargado si aquí termina antes"""
+        candidatos = []
+        for otro, cola in list(self.worker_queues.items()):
+            if otro == worker_id or not len(cola):
+                continue
+            if self.worker_manager.worker_status.get(otro) != 'online':
+                espera = float('inf')
+            else:
+                espera = self.backlog(otro) / self.worker_slots(otro)
+            candidatos.append((espera, otro, cola))
+
+        for espera, otro, cola in sorted(candidatos, key=lambda candidato: candidato[:2], reverse=True):
+            item = cola.steal()
+            if item is None:
+                continue
+            if (self.worker_manager.supports(worker_id, item['task'])
+                    and self.cost_model.predict(worker_id, item['task']) < espera):
+                logger.info(f"{worker_id} roba la tarea {item['task']['id']} de {otro}")
+                return item
+            cola.put(item)
+        return None
+
+    def remove_worker(self, worker_id: str):
+        """Quitar un worker: sus slots terminan y su cola se replanifica en los demás"""
+        self.worker_manager.remove_worker(worker_id)
+        with self._lock:
+            self._despachadores.pop(worker_id, None)
+            cola = self.worker_queues.pop(worker_id, None)
+        items = []
+        while cola is not None:
+            item = cola.get(timeout=0)
+            if item is None:
+                break
+            items.append(item)
+        if items:
+            logger.info(f"Replanificando {len(items)} tareas de {worker_id}")
+            self._plan(items)
+
+    def _dispatch_loop(self, worker_id: str, slot: int):
+        """Slot de un worker: tomar la siguiente tarea cuando está libre"""
+        # Termina cuando el worker se quita (remove_worker descarta sus hilos)
+        while threading.current_thread() in self._despachadores.get(worker_id, ()):
+            if self.worker_manager.worker_status.get(worker_id) != 'online':
+                time.sleep(5)
+                continue
+
+            with self._lock:
+                lleno = self._ocupados(worker_id) >= self.worker_slots(worker_id)
+            if lleno:
+                # Franjas de una tarea distribuida ocupan slots de este worker
+                time.sleep(1)
+                continue
+
+            item = self._next_item(worker_id)
+            if item is None:
+                # Esperar trabajo propio; cada tanto volver a mirar la cola general y robar
+                item = self._worker_queue(worker_id).get(timeout=2)
+                if item is None:
+                    continue
+            task = item['task']
+
+            with self._lock:
+                lleno = self._ocupados(worker_id) >= self.worker_slots(worker_id)
+                if not lleno:
+                    self.running[task['id']] = worker_id
+                    self._fin_previsto[task['id']] = (worker_id,
+                                                      time.time() + self.cost_model.predict(worker_id, task))
+            if lleno:
+                # Una reserva de franjas tomó el slot mientras se elegía la tarea
+                self._worker_queue(worker_id).put(item)
+                continue
+            checkpoint_previo = self._checkpoint_mtime(task)
+            try:
+                completada = self._execute_task(worker_id, task)
+            finally:
+                with self._lock:
+                    self.running.pop(task['id'], None)
+                    self._fin_previsto.pop(task['id'], None)
+
+            if not completada:
+                if worker_id not in self.worker_manager.workers:
+                    # El worker se quitó mientras corría la tarea: no cuenta como intento
+                    logger.warning(f"{worker_id} se quitó durante la tarea {task['id']}, se replanifica")
+                    self._plan([item])
+                else:
+                    self._retry(item, avanzo=self._checkpoint_mtime(task) != checkpoint_previo)
+
+    def _retry(self, item: Dict, avanzo: bool = False):
+        """Replanificar una tarea fallida tras retry_delay, hasta max_retries reintentos.
+
+        Un intento que dejó un checkpoint nuevo no cuenta como reintento: la
+        tarea avanzó y se reanuda desde ahí.
+        """
+        task = item['task']
+        intentos = item['intentos'] if avanzo else item['intentos'] + 1
+        if intentos > self.max_retries:
+            logger.error(f"Tarea {task['id']} descartada tras {item['intentos'] + 1} intentos")
+            TAREAS_DESCARTADAS.inc(type=task.get('type', 'benchmark'))
+            return
+        TAREAS_REINTENTADAS.inc(type=task.get('type', 'benchmark'))
+        logger.warning(f"Reintentando tarea {task['id']} en {self.retry_delay}s")
+        temporizador = threading.Timer(
+            self.retry_delay, self._plan, args=([{'task': task, 'intentos': intentos}],))
+        temporizador.daemon = True
+        temporizador.start()
+
+    def _checkpoint_path(self, task: Dict) -> Optional[str]:
+        """Copia local del último checkpoint de una tarea con checkpoint_every"""
+        if not task.get('checkpoint_every') or task.get('type') in (TIPO_LOTE, TIPO_SWEEP, TIPO_DISTRIBUIDA):
+            return None
+        return os.path.join(RESULTS_DIR, 'checkpoints', f"{task['id']}.npz")
+
+    def _checkpoint_mtime(self, task: Dict) -> Optional[float]:
+        path = self._checkpoint_path(task)
+        return os.path.getmtime(path) if path and os.path.exists(path) else None
+
+    def _execute_task(self, worker_id: str, task: Dict) -> bool:
+        """Ejecutar una tarea en un worker y guardar su resultado"""
         try:
+            envio = dict(task, include_output=self.include_output)
+            checkpoint_path = self._checkpoint_path(task)
+            if checkpoint_path and os.path.exists(checkpoint_path):
+                # Reanudar desde el último checkpoint descargado
+                with open(checkpoint_path, 'rb') as f:
+                    envio['resume'] = {'data': base64.b64encode(f.read()).decode('ascii')}
+                logger.info(f"Reanudando tarea {task['id']} en {worker_id} desde su checkpoint")
+
+            TAREAS_INICIADAS.inc(type=task.get('type', 'benchmark'))
             start_time = datetime.now()
-            result = self.worker_manager.execute_task_on_worker(worker_id, task)
+            if task.get('type') == TIPO_DISTRIBUIDA:
+                result = self._execute_distributed(worker_id, task)
+            else:
+                result = self.worker_manager.execute_task_on_worker(
+                    worker_id, envio, self.task_timeout, checkpoint_path=checkpoint_path)
             end_time = datetime.now()
             
             if result:
@@ -209,28 +1232,219 @@ class TaskScheduler:
                     'result': result
                 }
                 
-                self._save_result(result_data)
+                if task.get('type') == TIPO_LOTE:
+                    self._save_batch(worker_id, task, result)
+                else:
+                    self._save_result(result_data)
+                    if self._usa_cache(task):
+                        self.cache.put(task.get('type', 'benchmark'), task.get('parameters', {}),
+                                       result.get('engine_version'), result)
+                    if checkpoint_path and os.path.exists(checkpoint_path):
+                        os.remove(checkpoint_path)
+                    # Una tarea reanudada sólo midió una parte de los pasos
+                    if 'resumed_from_step' not in result.get('metrics', {}).get('options', {}):
+                        # La duración medida en el worker no incluye el intervalo de consulta
+                        duracion = result.get('duration_seconds', result_data['duration'])
+                        if task.get('type') == TIPO_DISTRIBUIDA:
+                            # Las franjas que se usaron de verdad, cada una en su worker
+                            self.cost_model.observe(worker_id, dict(task, parameters=result['parameters']),
+                                                    duracion, workers=result.get('strip_workers'))
+                        else:
+                            self.cost_model.observe(worker_id, task, duracion)
+                self._medir_resultado(task, result, result_data['duration'])
                 logger.info(f"Tarea {task['id']} completada exitosamente en {worker_id}")
+                return True
             else:
                 logger.error(f"Tarea {task['id']} falló en {worker_id}")
+                TAREAS_FALLIDAS.inc(type=task.get('type', 'benchmark'))
+                return False
                 
         except Exception as e:
             logger.error(f"Error ejecutando tarea {task['id']}: {e}")
+            TAREAS_FALLIDAS.inc(type=task.get('type', 'benchmark'))
+            return False
+
+    def _execute_distributed(self, worker_id: str, task: Dict) -> Optional[Dict]:
+        """Coordinar desde aquí una simulación repartida en franjas del dominio.
+
+        Las franjas van a worker_id y a slots libres de los workers online
+        con el motor (ver _reservar_franjas); con menos slots libres que
+        franjas se usan menos franjas. El orquestador enruta los halos y las migraciones de
+        cada paso (ver domain.py). Devuelve la respuesta con el formato de la
+        de un worker, o None si la simulación falló.
+        """
+        import domain
+        import engines
+
+        parameters = task.get('parameters', {})
+        num_franjas = int(parameters.get('strips', domain.FRANJAS))
+        url = (self.worker_manager.workers.get(worker_id) or {}).get('url')
+        if not url:
+            logger.error(f"{worker_id} se quitó antes de la tarea distribuida {task['id']}")
+            return None
+        # La primera franja usa el slot de la tarea; las demás reservan el suyo
+        reservas = self._reservar_franjas(worker_id, task, num_franjas - 1)
+        try:
+            workers = [worker_id] + [w for w, _ in reservas]
+            urls = [url] + [u for _, u in reservas]
+            if len(workers) < num_franjas:
+                # Los conteos no dependen del número de franjas
+                logger.warning(f"Tarea {task['id']}: sólo {len(workers)} de {num_franjas} franjas tienen slot libre")
+
+            params = dict(parameters, strips=len(workers), strip_workers=urls)
+            if self.coordinator_host:
+                params['coordinator_host'] = self.coordinator_host
+            logger.info(f"Tarea {task['id']}: {len(workers)} franjas en {', '.join(workers)}")
+
+            engine = engines.get_engine(TIPO_DISTRIBUIDA)
+            start_time = datetime.now()
+            try:
+                resultado = engine.run(params)
+            except Exception as e:
+                logger.error(f"Simulación distribuida {task['id']} falló: {e}")
+                return None
+            end_time = datetime.now()
+        finally:
+            with self._lock:
+                for k in range(len(reservas)):
+                    self.running.pop(f"{task['id']}#{k + 1}", None)
+                    self._fin_previsto.pop(f"{task['id']}#{k + 1}", None)
+
+        response = {
+            'success': True,
+            'worker_id': worker_id,
+            'task_id': task['id'],
+            'task_type': TIPO_DISTRIBUIDA,
+            # Las franjas que se usaron, para que el modelo de costo las cuente al releer el historial
+            'parameters': dict(parameters, strips=len(workers)),
+            'strip_workers': workers,
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            'duration_seconds': (end_time - start_time).total_seconds(),
+            # La versión que informan los workers, que son los que ejecutan el motor
+            'engine_version': ((self.worker_manager.workers.get(worker_id, {}).get('engine_versions') or {})
+                               .get(TIPO_DISTRIBUIDA) or engine.version()),
+            'metrics': resultado.to_dict()
+        }
+        if self.include_output:
+            response['stdout'] = resultado.reporte()
+        return response
+
+    def _reservar_franjas(self, worker_id: str, task: Dict, cantidad: int) -> List:
+        """Reservar hasta cantidad slots libres para las franjas de una tarea distribuida.
+
+        Las reservas van en running y _fin_previsto como una tarea más (con
+        clave '<id>#<k>'), así los despachadores, backlog y _plan cuentan el
+        slot como ocupado. Se reparten de a una entre los workers online con
+        el motor, de menor a mayor carga y worker_id al final. Devuelve los
+        pares (worker, url) reservados.
+        """
+        candidatos = sorted((w for w in self.worker_manager.get_available_workers()
+                             if w != worker_id and self.worker_manager.supports(w, task)), key=self.backlog)
+        candidatos.append(worker_id)
+        previsto = time.time() + self.cost_model.predict(worker_id, task)
+
+        reservas = []
+        with self._lock:
+            libres = {w: self.worker_slots(w) - self._ocupados(w) for w in candidatos}
+            urls = {w: (self.worker_manager.workers.get(w) or {}).get('url') for w in candidatos}
+            while len(reservas) < cantidad:
+                ronda = [w for w in candidatos if libres[w] > 0 and urls[w]][:cantidad - len(reservas)]
+                if not ronda:
+                    break
+                for w in ronda:
+                    libres[w] -= 1
+                    reservas.append((w, urls[w]))
+                    clave = f"{task['id']}#{len(reservas)}"
+                    self.running[clave] = w
+                    self._fin_previsto[clave] = (w, previsto)
+        return reservas
+
+    def _medir_resultado(self, task: Dict, result: Dict, duracion: float):
+        """Actualizar las métricas de una tarea completada"""
+        task_type = task.get('type', 'benchmark')
+        TAREAS_COMPLETADAS.inc(type=task_type)
+        DURACION_TAREAS.observe(duracion, type=task_type, size=_tamano(task))
+        if task_type == TIPO_LOTE:
+            simulaciones = [(entrada['task_type'], entrada['metrics'])
+                            for entrada in result.get('results', []) if entrada.get('success')]
+        else:
+            simulaciones = [(task_type, result.get('metrics') or {})]
+        for tipo, metricas in simulaciones:
+            if 'total_steps' not in metricas:
+                continue
+            # Una simulación reanudada sólo avanzó desde el checkpoint
+            pasos = metricas['total_steps'] - (metricas.get('options') or {}).get('resumed_from_step', 0)
+            PASOS.inc(pasos, type=tipo)
+            if metricas.get('execution_time'):
+                PASOS_POR_SEGUNDO.observe(pasos / metricas['execution_time'], type=tipo,
+                                          size=metrics.size_label(metricas.get('total_particles')))
+
+    def queue_depths(self) -> Dict:
+        """Tareas en espera en la cola general y en la de cada worker"""
+        profundidades = {('unassigned',): len(self.queue)}
+        for worker_id, cola in list(self.worker_queues.items()):
+            profundidades[(worker_id,)] = len(cola)
+        return profundidades
+
+    def _save_batch(self, worker_id: str, task: Dict, result: Dict):
+        """Guardar los resultados de un lote, agregarlos a su sweep y aprender de cada simulación"""
+        results = []
+        for entrada in result.get('results', []):
+            duracion = None
+            if entrada.get('success'):
+                metrics = entrada['metrics']
+                duracion = metrics['execution_time'] + metrics['setup_time']
+                run = {'type': entrada['task_type'], 'parameters': entrada['parameters']}
+                self.cost_model.observe(worker_id, run, duracion)
+            results.append({
+                'task_id': task['id'],
+                'sweep_id': task.get('sweep'),
+                'worker_id': worker_id,
+                'start_time': result.get('start_time'),
+                'end_time': result.get('end_time'),
+                'duration': duracion,
+                'result': entrada
+            })
+        self.store.insert_many(results)
+        if self._usa_cache(task):
+            self.cache.put_many([
+                (entrada['task_type'], entrada['parameters'], entrada.get('engine_version'), entrada)
+                for entrada in result.get('results', []) if entrada.get('success')
+            ])
+        if task.get('sweep') in self.sweeps:
+            self.sweeps[task['sweep']].add(result.get('results', []))
 
     def _save_result(self, result_data: Dict):
-        """Guardar resultado en archivo"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"/app/results/result_{result_data['task_id']}_{timestamp}.json"
-        
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        
-        with open(filename, 'w') as f:
-            json.dump(result_data, f, indent=2)
+        """Guardar resultado en el almacén de resultados"""
+        self.store.insert(result_data)
 
 # Instancias globales
 worker_manager = WorkerManager()
 task_scheduler = TaskScheduler(worker_manager)
 
+def _pools_online(campo: str) -> Dict:
+    """Un valor por worker online a partir de la ocupación de su pool del último ping"""
+    valores = {}
+    for worker_id in worker_manager.get_available_workers():
+        pool = worker_manager.workers.get(worker_id, {}).get('pool')
+        if pool and pool.get('processes'):
+            valores[(worker_id,)] = (pool['running'] / pool['processes'] if campo == 'utilization'
+                                     else pool.get(campo))
+    return valores
+
+METRICAS.gauge('orchestrator_queue_depth', 'Tareas en espera por cola (unassigned es la cola general)',
+               ('queue',), funcion=task_scheduler.queue_depths)
+METRICAS.gauge('orchestrator_tasks_running', 'Tareas ejecutándose en algún worker',
+               funcion=lambda: sum(1 for clave in list(task_scheduler.running) if '#' not in clave))
+METRICAS.gauge('orchestrator_workers', 'Workers registrados por estado', ('status',),
+               funcion=lambda: {(estado,): list(worker_manager.worker_status.values()).count(estado)
+                                for estado in ('online', 'offline')})
+METRICAS.gauge('orchestrator_worker_pool_utilization', 'Fracción de procesos ocupados de cada worker online',
+               ('worker',), funcion=lambda: _pools_online('utilization'))
+METRICAS.gauge('orchestrator_worker_available_slots', 'Tareas que cada worker online todavía acepta',
+               ('worker',), funcion=lambda: _pools_online('available_slots'))
+
 # Flask app para API REST
 app = Flask(__name__)
 
@@ -238,25 +1452,136 @@ app = Flask(__name__)
 def get_status():
     """Obtener estado del orquestador"""
     return jsonify({
-        'workers': worker_manager.worker_status,
+        'workers': dict(worker_manager.worker_status),
+        'last_check': worker_manager.last_check.isoformat() if worker_manager.last_check else None,
         'total_workers': len(worker_manager.workers),
         'online_workers': len(worker_manager.get_available_workers()),
-        'tasks_total': len(task_scheduler.tasks)
+        'tasks_total': len(task_scheduler.tasks),
+        'tasks_queued': len(task_scheduler.queue) + sum(len(q) for q in list(task_scheduler.worker_queues.values())),
+        'tasks_running': dict(task_scheduler.running),
+        'cache': task_scheduler.cache.stats() if task_scheduler.cache else None
+    })
+
+@app.route('/metrics')
+def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(METRICAS.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/queue')
+def get_queue():
+    """Tareas en espera por worker, en orden de despacho, con el trabajo estimado"""
+    def resumen(cola, worker_id=None):
+        return [
+            {
+                'id': item['task']['id'],
+                'type': item['task'].get('type'),
+                'priority': item['task'].get('priority', 1),
+                'cost': item['costo'],
+                'predicted_seconds': task_scheduler.cost_model.predict(worker_id, item['task']) if worker_id else None
+            }
+            for item in cola.items()
+        ]
+
+    return jsonify({
+        'unassigned': resumen(task_scheduler.queue),
+        'workers': {
+            worker_id: {
+                'backlog_seconds': task_scheduler.backlog(worker_id),
+                'tasks': resumen(cola, worker_id)
+            }
+            for worker_id, cola in list(task_scheduler.worker_queues.items())
+        }
     })
 
+@app.route('/results')
+def get_results():
+    """Resultados guardados, filtrados y paginados.
+
+    Filtros: task_id, worker_id, task_type, sweep_id, since y until (ISO
+    8601, sobre end_time) y param.<nombre> para los parámetros de la tarea.
+    Paginación con limit (máximo 1000) y offset.
+    """
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'limit y offset deben ser enteros'}), 400
+
+    filtros = {columna: request.args[columna] for columna in ResultStore.FILTROS if columna in request.args}
+    parameters = {}
+    for clave, valor in request.args.items():
+        if clave.startswith('param.'):
+            # Los parámetros se comparan con su tipo JSON (100 no es '100')
+            try:
+                parameters[clave[len('param.'):]] = json.loads(valor)
+            except ValueError:
+                parameters[clave[len('param.'):]] = valor
+
+    total, results = task_scheduler.store.query(
+        filtros, parameters, request.args.get('since'), request.args.get('until'), limit, offset)
+    return jsonify({'total': total, 'limit': limit, 'offset': offset, 'results': results})
+
+@app.route('/sweeps')
+def get_sweeps():
+    """Resumen estadístico de cada sweep"""
+    return jsonify({sweep_id: sweep.summary() for sweep_id, sweep in list(task_scheduler.sweeps.items())})
+
+@app.route('/sweeps/<sweep_id>')
+def get_sweep(sweep_id):
+    sweep = task_scheduler.sweeps.get(sweep_id)
+    if sweep is None:
+        return jsonify({'error': f'Sweep desconocido: {sweep_id}'}), 404
+    return jsonify(sweep.summary())
+
 @app.route('/workers')
 def get_workers():
     """Obtener información de workers"""
     return jsonify(worker_manager.workers)
 
+@app.route('/workers/register', methods=['POST'])
+def register_worker():
+    """Alta o heartbeat de un worker: {'worker_id', 'url', 'capacity', 'pool', 'engine_versions'}"""
+    datos = request.get_json(silent=True) or {}
+    worker_id = datos.get('worker_id')
+    url = datos.get('url')
+    if not worker_id or not url:
+        return jsonify({'error': "El heartbeat necesita 'worker_id' y 'url'"}), 400
+    try:
+        nuevo = worker_manager.heartbeat(worker_id, url, datos)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Slots para un worker nuevo o que ahora tiene más procesos
+    task_scheduler.start_dispatchers()
+    return jsonify({
+        'worker_id': worker_id,
+        'registered': nuevo,
+        'heartbeat_timeout': worker_manager.HEARTBEAT_TIMEOUT
+    }), 201 if nuevo else 200
+
+@app.route('/workers/<worker_id>', methods=['DELETE'])
+def unregister_worker(worker_id):
+    """Baja de un worker: sus tareas en espera se replanifican en los demás"""
+    if worker_id not in worker_manager.workers:
+        return jsonify({'error': f'Worker desconocido: {worker_id}'}), 404
+    task_scheduler.remove_worker(worker_id)
+    return jsonify({'worker_id': worker_id, 'removed': True})
+
 @app.route('/ping_all')
 def ping_all():
-    """Hacer ping a todos los workers"""
-    online_count = worker_manager.ping_all_workers()
+    """Lanzar una ronda de pings a todos los workers y devolver el último estado conocido.
+
+    No espera la ronda: el estado es el de la anterior, con su fecha en
+    last_check. Con ?wait=true espera a que termine.
+    """
+    esperar = request.args.get('wait', '').lower() in ('1', 'true')
+    iniciada = worker_manager.ping_all_async(forzar=True, esperar=esperar)
     return jsonify({
-        'online_workers': online_count,
+        'online_workers': len(worker_manager.get_available_workers()),
         'total_workers': len(worker_manager.workers),
-        'status': worker_manager.worker_status
+        'status': dict(worker_manager.worker_status),
+        'last_check': worker_manager.last_check.isoformat() if worker_manager.last_check else None,
+        'check_started': iniciada,
+        'checking': worker_manager.checking()
     })
 
 @app.route('/execute_tasks', methods=['POST'])
@@ -268,37 +1593,51 @@ def execute_tasks():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def periodic_health_check():
+def periodic_health_check(intervalo: float = 30):
     """Verificación periódica de salud de workers"""
     while True:
         try:
+            for worker_id in worker_manager.expired_workers():
+                logger.warning(f"Worker {worker_id} sin heartbeat hace más de "
+                               f"{worker_manager.HEARTBEAT_TIMEOUT}s, se quita")
+                task_scheduler.remove_worker(worker_id)
             worker_manager.ping_all_workers()
-            time.sleep(30)  # Ping cada 30 segundos
+            time.sleep(intervalo)
         except Exception as e:
             logger.error(f"Error en health check: {e}")
             time.sleep(60)
 
+def load_network_config(path: str) -> Dict:
+    """Workers fijos y timeouts de configs/network.yaml.
+
+    La IP de cada worker se puede reemplazar con la variable de entorno
+    <WORKER_ID>_IP (p. ej. WORKER1_IP). Sin archivo no hay workers fijos:
+    se registran solos con heartbeats.
+    """
+    if not path or not os.path.exists(path):
+        logger.info("Sin configuración de red: sólo workers registrados por heartbeat")
+        return {}
+    with open(path, 'r') as f:
+        config = (yaml.safe_load(f) or {}).get('network') or {}
+
+    for worker_id, datos in (config.get('workers') or {}).items():
+        host = os.getenv(f'{worker_id.upper()}_IP', datos.get('ip', 'localhost'))
+        worker_manager.register_worker(worker_id, host, int(datos.get('port', 8000)))
+    return config.get('timeouts') or {}
+
 def main():
     """Función principal"""
     logger.info("Iniciando Orquestador de Simulaciones")
     
-    # Obtener IPs de workers desde variables de entorno
-    worker1_ip = os.getenv('WORKER1_IP', 'localhost')
-    worker2_ip = os.getenv('WORKER2_IP', 'localhost')  
-    worker3_ip = os.getenv('WORKER3_IP', 'localhost')
-    
-    logger.info(f"Configurando workers:")
-    logger.info(f"  Worker 1: {worker1_ip}:8001")
-    logger.info(f"  Worker 2: {worker2_ip}:8002")
-    logger.info(f"  Worker 3: {worker3_ip}:8003")
-    
-    # Registrar workers
-    worker_manager.register_worker('worker1', worker1_ip, 8001)
-    worker_manager.register_worker('worker2', worker2_ip, 8002)
-    worker_manager.register_worker('worker3', worker3_ip, 8003)
+    # Workers fijos de la configuración de red; el resto se registra con POST /workers/register
+    timeouts = load_network_config(os.getenv('NETWORK_CONFIG', NETWORK_CONFIG))
+    if timeouts.get('ping_timeout'):
+        worker_manager.PING_TIMEOUT = (min(2, timeouts['ping_timeout']), timeouts['ping_timeout'])
+    intervalo = timeouts.get('health_check_interval', 30)
+    worker_manager.HEARTBEAT_TIMEOUT = max(worker_manager.HEARTBEAT_TIMEOUT, 2 * intervalo)
     
     # Iniciar thread de health check
-    health_thread = threading.Thread(target=periodic_health_check)
+    health_thread = threading.Thread(target=periodic_health_check, args=(intervalo,))
     health_thread.daemon = True
     health_thread.start()
     
@@ -308,6 +1647,7 @@ def main():
     
     # Hacer ping inicial
     worker_manager.ping_all_workers()
+    task_scheduler.start_dispatchers()
     
     # Iniciar servidor Flask
     logger.info("Iniciando servidor API en puerto 5000")
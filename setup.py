@@ -1,9 +1,26 @@
-from setuptools import setup
+import sys
+from setuptools import setup, Extension
 from Cython.Build import cythonize
 import numpy
 
+# OpenMP para la variante paralela (prange) de engine_cython
+if sys.platform == 'win32':
+    openmp_compile_args = ['/openmp']
+    openmp_link_args = []
+else:
+    openmp_compile_args = ['-fopenmp']
+    openmp_link_args = ['-fopenmp']
+
+extensions = [
+    Extension(
+        'engine_cython',
+        ['engine_cython.pyx'],
+        extra_compile_args=openmp_compile_args,
+        extra_link_args=openmp_link_args
+    )
+]
 
 setup(
-    ext_modules=cythonize("engine_cython.pyx"),
+    ext_modules=cythonize(extensions),
     include_dirs=[numpy.get_include()]
 )
\ No newline at end of file
@@ -1,162 +1,364 @@
-#Codigo de simulacion visual, ignorelo profesor, es solo para ver el contador de colisiones y como se comporta 
-import numpy as np
+#Codigo de simulacion visual, ignorelo profesor, es solo para ver el contador de colisiones y como se comporta
+"""
+Visualizador de la simulación de partículas
+
+La física corre en un proceso aparte, con cualquier motor registrado en
+engines o leyendo una trayectoria guardada (trajectory.py), y manda los
+cuadros por una cola. La ventana dibuja el último cuadro que llegó a FPS
+fijos: los pasos por segundo de la simulación no dependen de los cuadros por
+segundo, y un motor lento no congela la ventana.
+
+Cada cuadro se dibuja con un solo Surface.blits de un sprite pre-renderizado,
+así que miles de partículas siguen siendo interactivas.
+
+Con --salida no se abre ventana: se dibujan todos los cuadros y se guardan
+como secuencia PNG (un directorio) o como video (.mp4, .gif; requiere
+imageio).
+
+Uso:
+    python simulacion_partic.py
+    python simulacion_partic.py --motor benchmark_numba --num-particulas 3000 --pasos-por-segundo 0
+    python simulacion_partic.py --motor benchmark_cython --every 5 --salida cuadros/
+    python simulacion_partic.py --trayectoria worker_data/worker1/trajectories/<task_id>-<job_id>
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import queue
 import time
-import pygame
+
+import numpy as np
+
+import engines
+from benchmark import ANCHO_MUNDO, ALTO_MUNDO, RADIO_PARTICULA
 
 # --- Parámetros de la Simulación ---
+MOTOR = 'benchmark'
 NUM_PARTICULAS = 100
-ANCHO_MUNDO = 800.0
-ALTO_MUNDO = 600.0
-RADIO_PARTICULA = 5.0
-MASA_PARTICULA = 1.0
-DT = 0.1
 NUM_PASOS = 2000
-VELOCIDAD_INICIAL_MAX = 20.0
-COEF_RESTITUCION_PARED = 0.8
-COEF_RESTITUCION_PARTICULA = 0.9
-SEMILLA = 42 
+SEMILLA = 42
 
 # --- Parámetros de Visualización (Pygame) ---
 FPS = 60
+PASOS_POR_SEGUNDO = 60  # 0 = tan rápido como dé el motor
 BLANCO = (255, 255, 255)
 NEGRO = (0, 0, 0)
 ROJO = (255, 0, 0)
 AZUL = (0, 0, 255)
 COLOR_PARTICULA = AZUL
 COLOR_BORDE = NEGRO
-COLOR_TEXTO = (10, 10, 10) 
-
-# --- Inicialización de Pygame ---
-pygame.init()
-pantalla = pygame.display.set_mode((int(ANCHO_MUNDO), int(ALTO_MUNDO)))
-pygame.display.set_caption("Simulación de Partículas con Contador de Colisiones")
-reloj = pygame.time.Clock()
-fuente = pygame.font.Font(None, 30) 
-
-# --- Contadores de Colisiones ---
-colisiones_particula_particula = 0
-colisiones_con_pared = 0
-
-# --- Inicialización de las Partículas ---
-np.random.seed(SEMILLA)
-posiciones = np.random.rand(NUM_PARTICULAS, 2) * [ANCHO_MUNDO - 2*RADIO_PARTICULA, ALTO_MUNDO - 2*RADIO_PARTICULA] + RADIO_PARTICULA
-velocidades = (np.random.rand(NUM_PARTICULAS, 2) - 0.5) * (2 * VELOCIDAD_INICIAL_MAX)
-
-
-def resolver_colision_particulas(p1_idx, p2_idx, posiciones, velocidades):
-    global colisiones_particula_particula 
-    
-    pos1, vel1 = posiciones[p1_idx], velocidades[p1_idx]
-    pos2, vel2 = posiciones[p2_idx], velocidades[p2_idx]
-
-    dist_vec = pos2 - pos1
-    dist_mag_sq = np.sum(dist_vec**2)
-
-    if dist_mag_sq == 0 or dist_mag_sq > (2 * RADIO_PARTICULA)**2 or np.dot(dist_vec, vel1 - vel2) > 0:
-        return False 
-
-    colisiones_particula_particula += 1
-
-    dist_mag = np.sqrt(dist_mag_sq)
-    normal_vec = dist_vec / dist_mag
-
-    v1_normal = np.dot(vel1, normal_vec)
-    v2_normal = np.dot(vel2, normal_vec)
-
-    v1_normal_final = v2_normal
-    v2_normal_final = v1_normal
-
-    velocidades[p1_idx] += (v1_normal_final - v1_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
-    velocidades[p2_idx] += (v2_normal_final - v2_normal) * normal_vec * COEF_RESTITUCION_PARTICULA
-    
-    overlap = 2 * RADIO_PARTICULA - dist_mag
-    if overlap > 0:
-        correction = overlap / 2 * normal_vec
-        posiciones[p1_idx] -= correction
-        posiciones[p2_idx] += correction
-    return True 
-
-
-print("Iniciando simulación con visualización y contador de colisiones...")
-start_time = time.time()
-corriendo = True
-
-for paso in range(NUM_PASOS):
-    if not corriendo:
-        break
-
-    for evento in pygame.event.get():
-        if evento.type == pygame.QUIT:
-            corriendo = False
-
-    posiciones += velocidades * DT
-
-    for i in range(NUM_PARTICULAS):
-        pared_colisiono = False 
-        if posiciones[i, 0] - RADIO_PARTICULA < 0:
-            posiciones[i, 0] = RADIO_PARTICULA
-            velocidades[i, 0] *= -COEF_RESTITUCION_PARED
-            pared_colisiono = True
-        elif posiciones[i, 0] + RADIO_PARTICULA > ANCHO_MUNDO:
-            posiciones[i, 0] = ANCHO_MUNDO - RADIO_PARTICULA
-            velocidades[i, 0] *= -COEF_RESTITUCION_PARED
-            pared_colisiono = True
-
-        if posiciones[i, 1] - RADIO_PARTICULA < 0:
-            posiciones[i, 1] = RADIO_PARTICULA
-            velocidades[i, 1] *= -COEF_RESTITUCION_PARED
-            pared_colisiono = True
-        elif posiciones[i, 1] + RADIO_PARTICULA > ALTO_MUNDO:
-            posiciones[i, 1] = ALTO_MUNDO - RADIO_PARTICULA
-            velocidades[i, 1] *= -COEF_RESTITUCION_PARED
-            pared_colisiono = True
-        
-        if pared_colisiono:
-            colisiones_con_pared += 1 
-
-    for i in range(NUM_PARTICULAS):
-        for j in range(i + 1, NUM_PARTICULAS):
-            dist_vec_check = posiciones[i] - posiciones[j]
-            dist_sq_check = np.sum(dist_vec_check**2)
-            
-            if dist_sq_check < (2 * RADIO_PARTICULA)**2:
-                 resolver_colision_particulas(i, j, posiciones, velocidades) 
-
-
-    pantalla.fill(BLANCO)
-    pygame.draw.rect(pantalla, COLOR_BORDE, (0, 0, ANCHO_MUNDO, ALTO_MUNDO), 1)
-
-    for i in range(NUM_PARTICULAS):
-        pos_x = int(posiciones[i, 0])
-        pos_y = int(posiciones[i, 1])
-        pygame.draw.circle(pantalla, COLOR_PARTICULA, (pos_x, pos_y), int(RADIO_PARTICULA))
-
-    texto_col_particulas = fuente.render(f"Colisiones Partícula-Partícula: {colisiones_particula_particula}", True, COLOR_TEXTO)
-    texto_col_pared = fuente.render(f"Colisiones con Pared: {colisiones_con_pared}", True, COLOR_TEXTO)
-    texto_col_semilla = fuente.render(f"Semilla número: {SEMILLA}", True, COLOR_TEXTO)
-    pantalla.blit(texto_col_semilla, (10, 50)) 
-    pantalla.blit(texto_col_particulas, (10, 10))
-    pantalla.blit(texto_col_pared, (10, 30))
-
-
-    pygame.display.flip()
-    reloj.tick(FPS)
-
-    if (paso + 1) % (NUM_PASOS // 10) == 0 and (NUM_PASOS // 10) > 0 and corriendo: # Imprimir 10 veces durante la sim
-         print(f"Paso {paso+1}/{NUM_PASOS} - Colisiones P-P: {colisiones_particula_particula}, Colisiones Pared: {colisiones_con_pared}")
-
-
-end_time = time.time()
-total_time = end_time - start_time
-
-print("-" * 30)
-if corriendo:
-    print(f"Simulación completada en {total_time:.2f} segundos.")
-else:
-    print(f"Simulación terminada por el usuario después de {total_time:.2f} segundos.")
-
-print(f"Total colisiones Partícula-Partícula: {colisiones_particula_particula}")
-print(f"Total colisiones con Pared: {colisiones_con_pared}")
-print("-" * 30)
-
-pygame.quit()
\ No newline at end of file
+COLOR_TEXTO = (10, 10, 10)
+
+# Cuadros en tránsito entre el proceso de simulación y el de dibujo
+CUADROS_EN_COLA = 4
+
+EXTENSIONES_VIDEO = ('.mp4', '.gif', '.avi', '.mkv', '.webm')
+
+class _Emisor:
+    """Destino de Engine.run(trajectory=...): manda cada cuadro por la cola.
+
+    Con pasos_por_segundo > 0 frena la simulación a ese ritmo. Con descartar,
+    si la cola está llena el cuadro se pierde en lugar de esperar (la ventana
+    sólo muestra el último); el último paso nunca se descarta.
+    """
+
+    def __init__(self, cola, detener, every, num_pasos, pasos_por_segundo=0, descartar=False):
+        self.cola = cola
+        self.detener = detener
+        self.every = every
+        self.num_pasos = num_pasos
+        self.pasos_por_segundo = pasos_por_segundo
+        self.descartar = descartar
+        self.contadores = (0, 0)
+        self._inicio = time.time()
+
+    def reportar(self, paso, colisiones_particula_particula, colisiones_con_pared):
+        self.contadores = (colisiones_particula_particula, colisiones_con_pared)
+        if self.detener.is_set():
+            raise engines.SimulationCancelled(f"Visualización cerrada en el paso {paso}")
+
+    def wants(self, paso):
+        return paso % self.every == 0 or paso == self.num_pasos
+
+    def write(self, paso, posiciones, velocidades=None):
+        if self.detener.is_set():
+            raise engines.SimulationCancelled(f"Visualización cerrada en el paso {paso}")
+        if self.pasos_por_segundo > 0:
+            espera = self._inicio + paso / self.pasos_por_segundo - time.time()
+            if espera > 0:
+                time.sleep(espera)
+
+        cuadro = ('cuadro', paso, posiciones.astype(np.float32), *self.contadores)
+        if self.descartar and paso < self.num_pasos:
+            try:
+                self.cola.put_nowait(cuadro)
+            except queue.Full:
+                pass
+        else:
+            self.cola.put(cuadro)
+
+def _producir(fuente, every, pasos_por_segundo, descartar, cola, detener):
+    """Proceso de simulación: manda ('cuadro', ...), y al final ('fin', texto) o ('error', texto)"""
+    try:
+        if fuente.get('trayectoria'):
+            texto = _producir_trayectoria(fuente['trayectoria'], every, pasos_por_segundo, descartar, cola, detener)
+        else:
+            params = fuente['parameters']
+            emisor = _Emisor(cola, detener, every, int(params['num_pasos']), pasos_por_segundo, descartar)
+            resultado = engines.get_engine(fuente['motor']).run(
+                params, callback=emisor.reportar, progress_every=every, trajectory=emisor)
+            texto = resultado.reporte()
+        cola.put(('fin', texto))
+    except engines.SimulationCancelled as e:
+        cola.put(('fin', str(e)))
+    except Exception as e:
+        cola.put(('error', f"{type(e).__name__}: {e}"))
+
+def _producir_trayectoria(directorio, every, pasos_por_segundo, descartar, cola, detener):
+    """Reproducir los cuadros guardados de una trayectoria (sin contadores)"""
+    from trajectory import load_trajectory
+
+    trayectoria = load_trajectory(directorio)
+    pasos = trayectoria['pasos']
+    cuadros = [i for i in range(len(pasos)) if pasos[i] >= 0 and pasos[i] % every == 0]
+    if not cuadros:
+        raise ValueError(f"La trayectoria {directorio} no tiene cuadros escritos")
+
+    ultimo = int(pasos[cuadros[-1]])
+    emisor = _Emisor(cola, detener, every, ultimo, pasos_por_segundo, descartar)
+    emisor.contadores = (None, None)
+    for i in cuadros:
+        emisor.write(int(pasos[i]), trayectoria['posiciones'][i])
+    return f"Trayectoria {directorio}: {len(cuadros)} cuadros hasta el paso {ultimo}"
+
+class Renderer:
+    """Dibuja un cuadro: fondo, borde, partículas con un solo blits y contadores"""
+
+    def __init__(self, superficie, escala=1.0, semilla=None):
+        import pygame
+
+        self.pygame = pygame
+        self.superficie = superficie
+        self.escala = escala
+        self.semilla = semilla
+        self.fuente = pygame.font.Font(None, 30)
+
+        radio = max(1, int(round(RADIO_PARTICULA * escala)))
+        self.sprite = pygame.Surface((2 * radio + 1, 2 * radio + 1), pygame.SRCALPHA)
+        pygame.draw.circle(self.sprite, COLOR_PARTICULA, (radio, radio), radio)
+        self.sprite = self.sprite.convert_alpha() if pygame.display.get_surface() else self.sprite
+        self.radio = radio
+
+    def dibujar(self, paso, posiciones, colisiones_particula_particula, colisiones_con_pared):
+        pygame = self.pygame
+        self.superficie.fill(BLANCO)
+        pygame.draw.rect(self.superficie, COLOR_BORDE, self.superficie.get_rect(), 1)
+
+        # Todas las esquinas en NumPy y un solo blits: sin una llamada de dibujo por partícula
+        esquinas = (np.asarray(posiciones) * self.escala).astype(np.int32) - self.radio
+        self.superficie.blits(zip(itertools.repeat(self.sprite), esquinas.tolist()), doreturn=False)
+
+        lineas = [f"Paso: {paso}"]
+        if colisiones_particula_particula is not None:
+            lineas += [f"Colisiones Partícula-Partícula: {colisiones_particula_particula}",
+                       f"Colisiones con Pared: {colisiones_con_pared}"]
+        if self.semilla is not None:
+            lineas.append(f"Semilla número: {self.semilla}")
+        for i, linea in enumerate(lineas):
+            self.superficie.blit(self.fuente.render(linea, True, COLOR_TEXTO), (10, 10 + 20 * i))
+
+class _EscritorPNG:
+    def __init__(self, directorio):
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+        self.cuadros = 0
+
+    def agregar(self, superficie):
+        import pygame
+        pygame.image.save(superficie, os.path.join(self.directorio, f"cuadro_{self.cuadros:06d}.png"))
+        self.cuadros += 1
+
+    def cerrar(self):
+        pass
+
+class _EscritorVideo:
+    def __init__(self, archivo, fps):
+        try:
+            import imageio
+        except ImportError:
+            raise SystemExit("Para guardar video hace falta imageio (pip install imageio imageio-ffmpeg); "
+                             "o use un directorio como --salida para guardar PNGs")
+        self.escritor = imageio.get_writer(archivo, fps=fps)
+        self.cuadros = 0
+
+    def agregar(self, superficie):
+        import pygame
+        # surfarray es (ancho, alto, 3); los videos esperan (alto, ancho, 3)
+        self.escritor.append_data(pygame.surfarray.array3d(superficie).swapaxes(0, 1))
+        self.cuadros += 1
+
+    def cerrar(self):
+        self.escritor.close()
+
+def _tamano_ventana(escala):
+    return int(ANCHO_MUNDO * escala), int(ALTO_MUNDO * escala)
+
+def _mostrar_progreso(paso, num_pasos, particula_particula, pared, reportados):
+    """Imprimir 10 veces durante la simulación, como la versión original"""
+    if not num_pasos or num_pasos < 10:
+        return
+    decimo = paso * 10 // num_pasos
+    if decimo > reportados[0]:
+        reportados[0] = decimo
+        print(f"Paso {paso}/{num_pasos} - Colisiones P-P: {particula_particula}, Colisiones Pared: {pared}")
+
+def mostrar(cola, detener, escala, semilla, num_pasos, fps=FPS):
+    """Ventana interactiva: dibuja el último cuadro disponible a fps cuadros por segundo"""
+    import pygame
+
+    pygame.init()
+    pantalla = pygame.display.set_mode(_tamano_ventana(escala))
+    pygame.display.set_caption("Simulación de Partículas con Contador de Colisiones")
+    reloj = pygame.time.Clock()
+    renderer = Renderer(pantalla, escala, semilla)
+
+    ultimo = None
+    fin = None
+    reportados = [0]
+    while fin is None:
+        for evento in pygame.event.get():
+            if evento.type == pygame.QUIT:
+                detener.set()
+                fin = ('fin', None)
+
+        # Tomar todo lo que llegó y quedarse con el último cuadro
+        while fin is None:
+            try:
+                mensaje = cola.get_nowait()
+            except queue.Empty:
+                break
+            if mensaje[0] == 'cuadro':
+                ultimo = mensaje
+            else:
+                fin = mensaje
+
+        if ultimo is not None:
+            _, paso, posiciones, particula_particula, pared = ultimo
+            renderer.dibujar(paso, posiciones, particula_particula, pared)
+            _mostrar_progreso(paso, num_pasos, particula_particula, pared, reportados)
+            pygame.display.flip()
+        reloj.tick(fps)
+
+    pygame.quit()
+    return ultimo, fin
+
+def grabar(cola, salida, escala, semilla, num_pasos, fps=FPS):
+    """Modo headless: dibuja todos los cuadros en una superficie y los guarda"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+
+    pygame.init()
+    superficie = pygame.Surface(_tamano_ventana(escala))
+    renderer = Renderer(superficie, escala, semilla)
+    if os.path.splitext(salida)[1].lower() in EXTENSIONES_VIDEO:
+        escritor = _EscritorVideo(salida, fps)
+    else:
+        escritor = _EscritorPNG(salida)
+
+    ultimo = None
+    reportados = [0]
+    try:
+        while True:
+            mensaje = cola.get()
+            if mensaje[0] != 'cuadro':
+                break
+            ultimo = mensaje
+            _, paso, posiciones, particula_particula, pared = mensaje
+            renderer.dibujar(paso, posiciones, particula_particula, pared)
+            escritor.agregar(superficie)
+            _mostrar_progreso(paso, num_pasos, particula_particula, pared, reportados)
+    finally:
+        escritor.cerrar()
+        pygame.quit()
+    print(f"{escritor.cuadros} cuadros guardados en {salida}")
+    return ultimo, mensaje
+
+def main():
+    parser = argparse.ArgumentParser(description='Visualizador de la simulación de partículas')
+    parser.add_argument('--motor', default=MOTOR, help=f'Motor registrado en engines (por defecto, {MOTOR})')
+    parser.add_argument('--num-particulas', type=int, default=NUM_PARTICULAS)
+    parser.add_argument('--num-pasos', type=int, default=NUM_PASOS)
+    parser.add_argument('--semilla', type=int, default=SEMILLA)
+    parser.add_argument('--broadphase', default='bruteforce', choices=['bruteforce', 'grid'])
+    parser.add_argument('--trayectoria', default=None,
+                        help='Reproducir una trayectoria guardada en lugar de simular')
+    parser.add_argument('--every', type=int, default=1, help='Pasos entre cuadros dibujados')
+    parser.add_argument('--pasos-por-segundo', type=float, default=None,
+                        help=f'Ritmo de la simulación (por defecto {PASOS_POR_SEGUNDO} con ventana, '
+                             'sin límite con --salida; 0 = sin límite)')
+    parser.add_argument('--fps', type=int, default=FPS, help='Cuadros por segundo de la ventana o del video')
+    parser.add_argument('--escala', type=float, default=1.0, help='Píxeles por unidad del mundo')
+    parser.add_argument('--salida', default=None,
+                        help='Sin ventana: directorio para la secuencia PNG o archivo de video (.mp4, .gif)')
+    args = parser.parse_args()
+
+    if args.every <= 0:
+        parser.error('--every debe ser positivo')
+    pasos_por_segundo = args.pasos_por_segundo
+    if pasos_por_segundo is None:
+        pasos_por_segundo = 0 if args.salida else PASOS_POR_SEGUNDO
+
+    if args.trayectoria:
+        fuente = {'trayectoria': args.trayectoria}
+        num_pasos, semilla = None, None
+    else:
+        engines.get_engine(args.motor)
+        fuente = {
+            'motor': args.motor,
+            'parameters': {
+                'num_particulas': args.num_particulas,
+                'num_pasos': args.num_pasos,
+                'semilla': args.semilla,
+                'broadphase': args.broadphase
+            }
+        }
+        num_pasos, semilla = args.num_pasos, args.semilla
+
+    # El proceso de simulación arranca antes de inicializar pygame
+    cola = multiprocessing.Queue(CUADROS_EN_COLA)
+    detener = multiprocessing.Event()
+    proceso = multiprocessing.Process(
+        target=_producir, daemon=True,
+        args=(fuente, args.every, pasos_por_segundo, args.salida is None, cola, detener))
+    proceso.start()
+
+    print("Iniciando simulación con visualización y contador de colisiones...")
+    start_time = time.time()
+    try:
+        if args.salida:
+            ultimo, fin = grabar(cola, args.salida, args.escala, semilla, num_pasos, args.fps)
+        else:
+            ultimo, fin = mostrar(cola, detener, args.escala, semilla, num_pasos, args.fps)
+    finally:
+        detener.set()
+        proceso.join(timeout=2)
+        if proceso.is_alive():
+            proceso.terminate()
+    total_time = time.time() - start_time
+
+    print("-" * 30)
+    if fin[0] == 'error':
+        print(f"Error en la simulación: {fin[1]}")
+    elif fin[1] is None:
+        print(f"Simulación terminada por el usuario después de {total_time:.2f} segundos.")
+    else:
+        print(fin[1])
+    if ultimo is not None and ultimo[3] is not None:
+        print(f"Colisiones en el último cuadro (paso {ultimo[1]}): "
+              f"Partícula-Partícula {ultimo[3]}, Pared {ultimo[4]}")
+    print("-" * 30)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""
+Configuración común de las pruebas
+"""
+
+import os
+import tempfile
+
+# orchestrator.py abre su log y lee los resultados guardados al importarse;
+# fuera del contenedor no existen /app/logs ni /app/results
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp(prefix='logs-'))
+os.environ.setdefault('RESULTS_DIR', tempfile.mkdtemp(prefix='results-'))
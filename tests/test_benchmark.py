@@ -0,0 +1,78 @@
+"""
+Fase amplia con grilla de benchmark.py y engine_cython
+
+La grilla debe resolver los mismos pares, en el mismo orden, que el doble
+bucle de fuerza bruta: mismos conteos y mismo estado después de cada paso.
+"""
+
+import numpy as np
+import pytest
+
+import benchmark
+
+NUM_PARTICULAS = 400
+PASOS = 10
+
+def _estado(semilla=42):
+    """Estado inicial de run_simulation con esa semilla"""
+    np.random.seed(semilla)
+    posiciones = (np.random.rand(NUM_PARTICULAS, 2)
+                  * [benchmark.ANCHO_MUNDO - 2 * benchmark.RADIO_PARTICULA,
+                     benchmark.ALTO_MUNDO - 2 * benchmark.RADIO_PARTICULA]
+                  + benchmark.RADIO_PARTICULA)
+    velocidades = (np.random.rand(NUM_PARTICULAS, 2) - 0.5) * (2 * benchmark.VELOCIDAD_INICIAL_MAX)
+    return posiciones, velocidades
+
+def _fuerza_bruta(posiciones, velocidades):
+    colisiones = 0
+    for i in range(len(posiciones)):
+        for j in range(i + 1, len(posiciones)):
+            if benchmark.resolver_par(i, j, posiciones, velocidades):
+                colisiones += 1
+    return colisiones
+
+def test_grilla_igual_a_fuerza_bruta():
+    posiciones, velocidades = _estado()
+    pos_grilla, vel_grilla = posiciones.copy(), velocidades.copy()
+    total = 0
+    for _ in range(PASOS):
+        for pos, vel in ((posiciones, velocidades), (pos_grilla, vel_grilla)):
+            pos += vel * benchmark.DT
+        colisiones = _fuerza_bruta(posiciones, velocidades)
+        assert benchmark.colisiones_grilla(pos_grilla, vel_grilla)[0] == colisiones
+        np.testing.assert_array_equal(pos_grilla, posiciones)
+        np.testing.assert_array_equal(vel_grilla, velocidades)
+        total += colisiones
+    assert total > 0
+
+def test_grilla_densa_igual_a_fuerza_bruta():
+    # Muchas correcciones de solapamiento que pasan partículas de una celda a otra
+    posiciones, velocidades = _estado()
+    posiciones *= 0.15
+    pos_grilla, vel_grilla = posiciones.copy(), velocidades.copy()
+    colisiones = _fuerza_bruta(posiciones, velocidades)
+    assert benchmark.colisiones_grilla(pos_grilla, vel_grilla)[0] == colisiones > NUM_PARTICULAS
+    np.testing.assert_array_equal(pos_grilla, posiciones)
+    np.testing.assert_array_equal(vel_grilla, velocidades)
+
+def test_grilla_con_particulas_fuera_del_mundo():
+    # Las correcciones pueden sacar partículas del mundo: caen en la celda del borde
+    posiciones = np.array([[-3.0, 10.0], [4.0, 10.0], [805.0, 598.0], [796.0, 601.0]])
+    velocidades = np.array([[1.0, 0.0], [-1.0, 0.0], [-1.0, 0.0], [1.0, 0.0]])
+    pos_bruta, vel_bruta = posiciones.copy(), velocidades.copy()
+    assert benchmark.colisiones_grilla(posiciones, velocidades)[0] == _fuerza_bruta(pos_bruta, vel_bruta) == 2
+    np.testing.assert_array_equal(posiciones, pos_bruta)
+
+def test_cython_grilla_igual_a_fuerza_bruta():
+    engine_cython = pytest.importorskip('engine_cython')
+    posiciones, velocidades = _estado()
+    pos_grilla, vel_grilla = posiciones.copy(), velocidades.copy()
+    for _ in range(PASOS):
+        for pos, vel in ((posiciones, velocidades), (pos_grilla, vel_grilla)):
+            pos += vel * benchmark.DT
+        colisiones = engine_cython.run_collision_cython(
+            posiciones, velocidades, NUM_PARTICULAS, benchmark.RADIO_PARTICULA, benchmark.COEF_RESTITUCION_PARTICULA)
+        assert engine_cython.run_collision_cython_grid(
+            pos_grilla, vel_grilla, NUM_PARTICULAS, benchmark.RADIO_PARTICULA, benchmark.COEF_RESTITUCION_PARTICULA,
+            benchmark.ANCHO_MUNDO, benchmark.ALTO_MUNDO) == colisiones
+        np.testing.assert_array_equal(pos_grilla, posiciones)
@@ -0,0 +1,51 @@
+"""
+Estadísticas y detección de regresiones de benchmark_suite
+"""
+
+import pytest
+
+import benchmark_suite
+import engines
+
+def _entrada(mediana, q1, q3, version='v1', skipped=False, num_particulas=100):
+    return {'engine': 'benchmark', 'engine_version': version, 'broadphase': 'grid',
+            'num_particulas': num_particulas, 'num_pasos': 100, 'threads': None,
+            'skipped': skipped, 'median': mediana, 'q1': q1, 'q3': q3}
+
+def test_resumir_tiempos():
+    motor = engines.get_engine('benchmark')
+    params = {'num_particulas': 50, 'num_pasos': 10, 'semilla': 42, 'broadphase': 'grid'}
+    resultado = motor.run(params)
+    entrada = benchmark_suite.resumir(motor, params, None, resultado, [1.0, 2.0, 3.0, 4.0, 5.0])
+    assert (entrada['median'], entrada['q1'], entrada['q3'], entrada['iqr'], entrada['min']) == \
+        (3.0, 2.0, 4.0, 2.0, 1.0)
+    assert entrada['steps_per_second'] == pytest.approx(10 / 3)
+    assert entrada['pair_checks_per_second'] == pytest.approx(resultado.pair_checks / 3)
+    assert entrada['engine_version'] == motor.version()
+
+def test_calentamiento_demasiado_lento():
+    motor = engines.get_engine('benchmark')
+    params = {'num_particulas': 50, 'num_pasos': 10, 'semilla': 42, 'broadphase': 'grid'}
+    resultado, tiempos = benchmark_suite.medir(motor, params, 3, 1, max_segundos=0)
+    assert tiempos is None
+    entrada = benchmark_suite.resumir(motor, params, None, resultado, tiempos)
+    assert entrada['skipped'] and 'median' not in entrada
+
+def test_regresiones_y_mejoras():
+    baseline = {'results': [_entrada(1.0, 0.95, 1.05), _entrada(1.0, 0.95, 1.05, num_particulas=200),
+                            _entrada(1.0, 0.95, 1.05, num_particulas=300),
+                            _entrada(1.0, 0.9, 1.1, num_particulas=400, skipped=True)]}
+    entradas = [
+        _entrada(1.3, 1.2, 1.4, version='v2'),        # peor y sin solaparse: regresión
+        _entrada(1.3, 1.0, 1.6, num_particulas=200),  # peor pero los rangos se solapan
+        _entrada(0.7, 0.65, 0.75, num_particulas=300),
+        _entrada(2.0, 1.9, 2.1, num_particulas=400),  # sin línea base medida
+    ]
+    regresiones, mejoras = benchmark_suite.comparar(entradas, baseline, 0.1)
+    assert [(r['key'][2], r['engine_changed']) for r in regresiones] == [(100, True)]
+    assert regresiones[0]['change'] == pytest.approx(0.3)
+    assert [m['key'][2] for m in mejoras] == [300]
+
+def test_suite_omite_tamanos_demasiado_lentos(capsys):
+    entradas = benchmark_suite.ejecutar_suite(['benchmark'], ['grid'], [20, 40], 5, [1], 2, 1, max_segundos=0)
+    assert [(entrada['num_particulas'], entrada['skipped']) for entrada in entradas] == [(20, True)]
@@ -0,0 +1,83 @@
+"""
+Pruebas del motor distribuido en franjas del dominio
+"""
+
+import json
+import time
+from multiprocessing import Pipe
+
+import numpy as np
+import pytest
+
+pytest.importorskip('numba')
+
+import benchmark
+import domain
+import engines
+
+MEDIANA = {'num_particulas': 1000, 'num_pasos': 60, 'semilla': 42}
+
+def test_cortes_reparten_las_particulas():
+    x = np.random.default_rng(1).uniform(0, benchmark.ANCHO_MUNDO, 1001)
+    limites = domain.cortes(x, 4)
+    assert len(limites) == 3 and np.all(np.diff(limites) > 0)
+    assert np.all(np.abs(np.bincount(domain._dueno(x, limites)) - len(x) / 4) <= 1)
+
+def test_mensajes_sin_pickle():
+    envio, recepcion = Pipe()
+    posiciones = np.arange(12, dtype=np.float64).reshape(6, 2)
+    mensaje = ('colisionar', {'posiciones': posiciones, 'indices': np.array([3, 1], dtype=np.int64),
+                              'mascara': np.array([True, False, True]), 'paso': np.int64(7), 'vacio': []})
+    domain._enviar(envio, mensaje)
+    orden, datos = domain._recibir(recepcion)
+    assert orden == 'colisionar' and datos['paso'] == 7 and datos['vacio'] == []
+    assert np.array_equal(datos['posiciones'], posiciones) and datos['posiciones'].dtype == np.float64
+    assert datos['indices'].tolist() == [3, 1] and datos['mascara'].tolist() == [True, False, True]
+    # Escribibles: las franjas actualizan los arreglos recibidos
+    datos['posiciones'][0, 0] = -1.0
+
+def test_mensaje_con_tipo_no_admitido():
+    envio, recepcion = Pipe()
+    domain._enviar(envio, np.array(['a'], dtype=object).astype('U1'))
+    with pytest.raises(ValueError):
+        domain._recibir(recepcion)
+
+def _solicitud(secreto='secreto', coordinador='127.0.0.1:5000', emitida=None):
+    cuerpo = json.dumps({'coordinator': coordinador, 'nonce': 'ab' * 16,
+                         'timestamp': time.time() if emitida is None else emitida}).encode()
+    return cuerpo, domain.firmar(secreto, cuerpo)
+
+def test_solicitud_de_franja_valida():
+    cuerpo, firma = _solicitud()
+    direccion, clave = domain.abrir_solicitud(cuerpo, firma, 'secreto', ['localhost'])
+    assert direccion == ('127.0.0.1', 5000)
+    # Ambos extremos derivan la misma clave sin enviarla
+    assert clave == domain._clave('secreto', bytes.fromhex('ab' * 16)) and clave.hex() not in cuerpo.decode()
+
+@pytest.mark.parametrize('solicitud, secreto', [
+    (_solicitud(), None),
+    (_solicitud(secreto='otro'), 'secreto'),
+    (_solicitud(emitida=0), 'secreto'),
+    (_solicitud(coordinador='10.9.9.9:5000'), 'secreto'),
+])
+def test_solicitud_de_franja_rechazada(solicitud, secreto):
+    with pytest.raises(PermissionError):
+        domain.abrir_solicitud(*solicitud, secreto, ['127.0.0.1'])
+
+def test_franjas_en_workers_sin_secreto(monkeypatch):
+    monkeypatch.delenv('STRIP_SECRET', raising=False)
+    with pytest.raises(ValueError):
+        domain.iniciar(2, workers=['http://127.0.0.1:1'])
+
+@pytest.mark.parametrize('params', [{'strips': 0}, {'halo': 1.0}])
+def test_opciones_invalidas(params):
+    with pytest.raises(ValueError):
+        engines.get_engine('distributed').run(dict(MEDIANA, **params))
+
+@pytest.mark.parametrize('franjas', [1, 2, 4])
+def test_distribuido_igual_a_un_proceso(franjas):
+    referencia = engines.get_engine('benchmark_numba').run(dict(MEDIANA, broadphase='grid'))
+    resultado = engines.get_engine('distributed').run(dict(MEDIANA, strips=franjas))
+    assert (resultado.particle_collisions, resultado.wall_collisions, resultado.pair_checks) == \
+        (referencia.particle_collisions, referencia.wall_collisions, referencia.pair_checks)
+    assert resultado.options['franjas'] == franjas
@@ -0,0 +1,135 @@
+"""
+Núcleos de engine_cython
+
+Todos los núcleos resuelven los mismos pares en el mismo orden que
+run_collision_cython, la implementación de referencia: mismos conteos y
+mismo estado.
+"""
+
+import numpy as np
+import pytest
+
+import benchmark
+
+engine_cython = pytest.importorskip('engine_cython')
+
+NUM_PARTICULAS = 600
+RADIO = benchmark.RADIO_PARTICULA
+COEF = benchmark.COEF_RESTITUCION_PARTICULA
+
+def _estado(semilla=5):
+    rng = np.random.default_rng(semilla)
+    posiciones = rng.random((NUM_PARTICULAS, 2)) * [benchmark.ANCHO_MUNDO, benchmark.ALTO_MUNDO]
+    velocidades = (rng.random((NUM_PARTICULAS, 2)) - 0.5) * 40
+    return posiciones, velocidades
+
+def test_memoryview_igual_a_referencia():
+    posiciones, velocidades = _estado()
+    pos_vista, vel_vista = posiciones.copy(), velocidades.copy()
+    colisiones = engine_cython.run_collision_cython(posiciones, velocidades, NUM_PARTICULAS, RADIO, COEF)
+    assert engine_cython.run_collision_memoryview(pos_vista, vel_vista, NUM_PARTICULAS, RADIO, COEF) == colisiones
+    assert colisiones > 0
+    np.testing.assert_array_equal(pos_vista, posiciones)
+    np.testing.assert_array_equal(vel_vista, velocidades)
+
+def test_particulas_en_el_mismo_punto_no_chocan():
+    # Como en benchmark.resolver_par: sin normal no hay choque ni se tocan
+    posiciones = np.array([[100.0, 100.0], [100.0, 100.0], [200.0, 200.0], [205.0, 200.0]])
+    velocidades = np.array([[1.0, 0.0], [-1.0, 0.0], [1.0, 0.0], [-1.0, 0.0]])
+    pos_base, vel_base = posiciones.copy(), velocidades.copy()
+    esperado = sum(benchmark.resolver_par(i, j, pos_base, vel_base) for i in range(4) for j in range(i + 1, 4))
+    assert esperado == 1
+    for broadphase in ('bruteforce', 'grid'):
+        nucleos = [engine_cython.run_collision_cython, engine_cython.run_collision_memoryview,
+                   lambda *args: engine_cython.run_collision_cython_parallel(
+                       *args, benchmark.ANCHO_MUNDO, benchmark.ALTO_MUNDO, broadphase, 2)]
+        for nucleo in nucleos:
+            pos, vel = posiciones.copy(), velocidades.copy()
+            assert nucleo(pos, vel, 4, RADIO, COEF) == esperado
+            np.testing.assert_array_equal(pos[:2], posiciones[:2])
+            np.testing.assert_array_equal(vel[:2], velocidades[:2])
+
+PARAMS = {
+    'ancho_mundo': benchmark.ANCHO_MUNDO,
+    'alto_mundo': benchmark.ALTO_MUNDO,
+    'radio_particula': RADIO,
+    'dt': benchmark.DT,
+    'coef_restitucion_pared': benchmark.COEF_RESTITUCION_PARED,
+    'coef_restitucion_particula': COEF
+}
+
+def _pasos_referencia(posiciones, velocidades, num_pasos):
+    """Los pasos de benchmark_cython con el núcleo de referencia, en Python"""
+    colisiones_particula_particula = colisiones_con_pared = 0
+    for _ in range(num_pasos):
+        posiciones += velocidades * benchmark.DT
+        for i in range(len(posiciones)):
+            pared = False
+            for eje, limite in ((0, benchmark.ANCHO_MUNDO), (1, benchmark.ALTO_MUNDO)):
+                if posiciones[i, eje] - RADIO < 0:
+                    posiciones[i, eje] = RADIO
+                elif posiciones[i, eje] + RADIO > limite:
+                    posiciones[i, eje] = limite - RADIO
+                else:
+                    continue
+                velocidades[i, eje] *= -benchmark.COEF_RESTITUCION_PARED
+                pared = True
+            colisiones_con_pared += pared
+        colisiones_particula_particula += engine_cython.run_collision_cython(
+            posiciones, velocidades, len(posiciones), RADIO, COEF)
+    return colisiones_particula_particula, colisiones_con_pared
+
+@pytest.mark.parametrize('broadphase', ['bruteforce', 'grid'])
+def test_run_steps_igual_a_pasos_en_python(broadphase):
+    posiciones, velocidades = _estado()
+    pos_nativo, vel_nativo = posiciones.copy(), velocidades.copy()
+    esperado = _pasos_referencia(posiciones, velocidades, 20)
+    assert engine_cython.run_steps(pos_nativo, vel_nativo, 20, dict(PARAMS, broadphase=broadphase))[:2] == esperado
+    np.testing.assert_array_equal(pos_nativo, posiciones)
+    np.testing.assert_array_equal(vel_nativo, velocidades)
+
+def test_run_steps_informa_el_progreso():
+    posiciones, velocidades = _estado()
+    llamadas = []
+    total = engine_cython.run_steps(posiciones, velocidades, 25, PARAMS,
+                                    callback=lambda *args: llamadas.append(args), progress_every=10)
+    assert [paso for paso, _, _ in llamadas] == [10, 20]
+    assert llamadas[-1][1] <= total[0] and llamadas[-1][2] <= total[1]
+
+def test_run_steps_rechaza_broadphase_desconocida():
+    posiciones, velocidades = _estado()
+    with pytest.raises(ValueError):
+        engine_cython.run_steps(posiciones, velocidades, 1, dict(PARAMS, broadphase='octree'))
+
+@pytest.mark.parametrize('broadphase', ['bruteforce', 'grid'])
+def test_paralelo_igual_a_serie(broadphase):
+    posiciones, velocidades = _estado()
+    colisiones = engine_cython.run_collision_memoryview(posiciones.copy(), velocidades.copy(), NUM_PARTICULAS,
+                                                        RADIO, COEF)
+    for hilos in (1, 2, 4):
+        pos, vel = posiciones.copy(), velocidades.copy()
+        assert engine_cython.run_collision_cython_parallel(
+            pos, vel, NUM_PARTICULAS, RADIO, COEF, benchmark.ANCHO_MUNDO, benchmark.ALTO_MUNDO,
+            broadphase, hilos) == colisiones
+
+@pytest.mark.parametrize('broadphase', ['bruteforce', 'grid'])
+def test_run_steps_no_depende_de_los_hilos(broadphase):
+    resultados = []
+    for hilos in (1, 2, 4):
+        posiciones, velocidades = _estado()
+        conteos = engine_cython.run_steps(posiciones, velocidades, 20,
+                                          dict(PARAMS, broadphase=broadphase, num_threads=hilos))
+        resultados.append((conteos, posiciones.tobytes(), velocidades.tobytes()))
+    assert resultados[0] == resultados[1] == resultados[2]
+
+def test_run_steps_con_hilos_informa_el_progreso():
+    # Una región paralela por bloque entre llamadas: mismos avisos y conteos que en serie
+    resultados = []
+    for hilos in (1, 3):
+        posiciones, velocidades = _estado()
+        llamadas = []
+        total = engine_cython.run_steps(posiciones, velocidades, 25, dict(PARAMS, broadphase='grid', num_threads=hilos),
+                                        callback=lambda *args: llamadas.append(args), progress_every=10)
+        resultados.append((total, llamadas, posiciones.tobytes()))
+    assert [paso for paso, _, _ in resultados[1][1]] == [10, 20]
+    assert resultados[0] == resultados[1]
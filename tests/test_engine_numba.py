@@ -0,0 +1,120 @@
+"""
+Motor Numba de engine_numba
+
+Tiene la misma semántica de paso que benchmark.run_simulation, así que da
+los mismos conteos y el mismo estado que el motor base.
+"""
+
+import numpy as np
+import pytest
+
+import benchmark
+
+pytest.importorskip('numba')
+import engine_numba  # noqa: E402
+
+PARAMS = {
+    'ancho_mundo': benchmark.ANCHO_MUNDO,
+    'alto_mundo': benchmark.ALTO_MUNDO,
+    'radio_particula': benchmark.RADIO_PARTICULA,
+    'dt': benchmark.DT,
+    'coef_restitucion_pared': benchmark.COEF_RESTITUCION_PARED,
+    'coef_restitucion_particula': benchmark.COEF_RESTITUCION_PARTICULA
+}
+
+def _estado(num_particulas=200, semilla=11):
+    rng = np.random.default_rng(semilla)
+    posiciones = rng.random((num_particulas, 2)) * [benchmark.ANCHO_MUNDO, benchmark.ALTO_MUNDO]
+    velocidades = (rng.random((num_particulas, 2)) - 0.5) * 40
+    return posiciones, velocidades
+
+def _pasos_base(posiciones, velocidades, num_pasos):
+    """Los pasos de benchmark.run_simulation con fuerza bruta"""
+    radio = benchmark.RADIO_PARTICULA
+    colisiones_particula_particula = colisiones_con_pared = 0
+    for _ in range(num_pasos):
+        posiciones += velocidades * benchmark.DT
+        for i in range(len(posiciones)):
+            pared = False
+            for eje, limite in ((0, benchmark.ANCHO_MUNDO), (1, benchmark.ALTO_MUNDO)):
+                if posiciones[i, eje] - radio < 0:
+                    posiciones[i, eje] = radio
+                elif posiciones[i, eje] + radio > limite:
+                    posiciones[i, eje] = limite - radio
+                else:
+                    continue
+                velocidades[i, eje] *= -benchmark.COEF_RESTITUCION_PARED
+                pared = True
+            colisiones_con_pared += pared
+        for i in range(len(posiciones)):
+            for j in range(i + 1, len(posiciones)):
+                colisiones_particula_particula += benchmark.resolver_par(i, j, posiciones, velocidades)
+    return colisiones_particula_particula, colisiones_con_pared
+
+@pytest.mark.parametrize('broadphase', ['bruteforce', 'grid'])
+def test_igual_al_motor_base(broadphase):
+    posiciones, velocidades = _estado()
+    pos_numba, vel_numba = posiciones.copy(), velocidades.copy()
+    esperado = _pasos_base(posiciones, velocidades, 15)
+    assert esperado[0] > 0
+    resultado = engine_numba.run_steps(pos_numba, vel_numba, 15, dict(PARAMS, broadphase=broadphase))
+    assert tuple(int(valor) for valor in resultado[:2]) == esperado
+    np.testing.assert_allclose(pos_numba, posiciones, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(vel_numba, velocidades, rtol=0, atol=1e-9)
+
+def test_grilla_igual_a_fuerza_bruta():
+    resultados, revisados = [], []
+    for broadphase in ('bruteforce', 'grid'):
+        posiciones, velocidades = _estado(num_particulas=1500)
+        conteos = engine_numba.run_steps(posiciones, velocidades, 30, dict(PARAMS, broadphase=broadphase))
+        resultados.append((conteos[:2], posiciones.tobytes(), velocidades.tobytes()))
+        revisados.append(conteos[2])
+    assert resultados[0] == resultados[1]
+    assert revisados[0] == 1500 * 1499 // 2 * 30 and revisados[1] < revisados[0]
+
+def test_fuerza_bruta_igual_a_resolver_par():
+    # Estado denso: muchos choques y correcciones de solapamiento
+    posiciones, velocidades = _estado(num_particulas=400)
+    posiciones *= 0.1
+    pos_par, vel_par = posiciones.copy(), velocidades.copy()
+    perfil, perfil_par = np.zeros(engine_numba.CORRECCIONES + 1), np.zeros(engine_numba.CORRECCIONES + 1)
+    argumentos = (benchmark.RADIO_PARTICULA, benchmark.COEF_RESTITUCION_PARTICULA)
+    colisiones = engine_numba._colisiones_fuerza_bruta(posiciones, velocidades, *argumentos, perfil)
+    esperado = sum(engine_numba._resolver_par(pos_par, vel_par, i, j, *argumentos, perfil_par)
+                   for i in range(400) for j in range(i + 1, 400))
+    assert colisiones == esperado > 0
+    assert perfil[engine_numba.CORRECCIONES] == perfil_par[engine_numba.CORRECCIONES] > 0
+    np.testing.assert_array_equal(posiciones, pos_par)
+    np.testing.assert_array_equal(velocidades, vel_par)
+
+def test_precompilar_usa_los_parametros_del_benchmark(monkeypatch):
+    import benchmark_numba
+    usados = []
+    original = benchmark_numba.parametros
+    monkeypatch.setattr(benchmark_numba, 'parametros', lambda broadphase: usados.append(broadphase) or original(broadphase))
+    engine_numba.precompilar()
+    assert usados == list(benchmark_numba.BROADPHASES)
+
+def test_informa_el_progreso():
+    posiciones, velocidades = _estado()
+    llamadas = []
+    engine_numba.run_steps(posiciones, velocidades, 25, dict(PARAMS, broadphase='grid'),
+                           callback=lambda *args: llamadas.append(args), progress_every=10)
+    assert [paso for paso, _, _ in llamadas] == [10, 20]
+
+@pytest.mark.parametrize('broadphase', ['bruteforce', 'grid'])
+def test_lote_igual_a_simulaciones_sueltas(broadphase):
+    estados = [_estado(semilla=semilla) for semilla in (1, 2, 3)]
+    posiciones = np.stack([pos for pos, _ in estados])
+    velocidades = np.stack([vel for _, vel in estados])
+    lote = engine_numba.run_steps_batch(posiciones, velocidades, 15, dict(PARAMS, broadphase=broadphase))
+    for b, (pos, vel) in enumerate(estados):
+        suelta = engine_numba.run_steps(pos, vel, 15, dict(PARAMS, broadphase=broadphase))
+        assert tuple(int(contador[b]) for contador in lote) == tuple(int(valor) for valor in suelta)
+        np.testing.assert_array_equal(posiciones[b], pos)
+        np.testing.assert_array_equal(velocidades[b], vel)
+
+def test_lote_rechaza_arreglos_de_otra_forma():
+    posiciones, velocidades = _estado()
+    with pytest.raises(ValueError):
+        engine_numba.run_steps_batch(posiciones, velocidades, 1, PARAMS)
@@ -0,0 +1,52 @@
+"""
+Motor vectorizado de engine_numpy
+
+pares_grilla debe incluir todos los pares en contacto, sin repetir y en el
+orden del doble bucle, así que las colisiones resueltas con la grilla y con
+fuerza bruta dan el mismo resultado.
+"""
+
+import numpy as np
+
+import benchmark
+import engine_numpy
+
+RADIO = benchmark.RADIO_PARTICULA
+ANCHO = benchmark.ANCHO_MUNDO
+ALTO = benchmark.ALTO_MUNDO
+
+def _estado(num_particulas=1500, semilla=3):
+    rng = np.random.default_rng(semilla)
+    posiciones = rng.random((num_particulas, 2)) * [ANCHO, ALTO]
+    velocidades = (rng.random((num_particulas, 2)) - 0.5) * 40
+    return posiciones, velocidades
+
+def test_pares_grilla_incluye_los_pares_en_contacto():
+    posiciones, _ = _estado()
+    i, j = engine_numpy.pares_grilla(posiciones, RADIO, ANCHO, ALTO)
+    assert np.all(i < j)
+    pares = set(zip(i.tolist(), j.tolist()))
+    assert len(pares) == len(i)
+    assert list(zip(i.tolist(), j.tolist())) == sorted(pares)
+
+    todos_i, todos_j = engine_numpy.pares_fuerza_bruta(len(posiciones))
+    cerca = ((posiciones[todos_i] - posiciones[todos_j]) ** 2).sum(axis=1) < (2 * RADIO) ** 2
+    assert set(zip(todos_i[cerca].tolist(), todos_j[cerca].tolist())) <= pares
+    assert cerca.any()
+
+def test_colisiones_grilla_igual_a_fuerza_bruta():
+    posiciones, velocidades = _estado()
+    pos_grilla, vel_grilla = posiciones.copy(), velocidades.copy()
+    pares = engine_numpy.pares_fuerza_bruta(len(posiciones))
+    colisiones = engine_numpy.resolver_colisiones(posiciones, velocidades, *pares, RADIO, 0.9)
+    pares = engine_numpy.pares_grilla(pos_grilla, RADIO, ANCHO, ALTO)
+    assert engine_numpy.resolver_colisiones(pos_grilla, vel_grilla, *pares, RADIO, 0.9) == colisiones > 0
+    np.testing.assert_array_equal(pos_grilla, posiciones)
+    np.testing.assert_array_equal(vel_grilla, velocidades)
+
+def test_reflejar_paredes():
+    posiciones = np.array([[2.0, 300.0], [798.0, 597.0], [400.0, 300.0]])
+    velocidades = np.array([[-10.0, 0.0], [10.0, 10.0], [1.0, 1.0]])
+    assert engine_numpy.reflejar_paredes(posiciones, velocidades, ANCHO, ALTO, RADIO, 0.8) == 2
+    np.testing.assert_array_equal(posiciones, [[RADIO, 300.0], [ANCHO - RADIO, ALTO - RADIO], [400.0, 300.0]])
+    np.testing.assert_array_equal(velocidades, [[8.0, 0.0], [-8.0, -8.0], [1.0, 1.0]])
@@ -0,0 +1,242 @@
+"""
+Registro de motores y Engine.run
+"""
+
+import numpy as np
+import pytest
+
+import engines
+
+PEQUENA = {'num_particulas': 120, 'num_pasos': 30, 'semilla': 42}
+
+class _Quieto(engines.Engine):
+    """Motor de prueba: no mueve nada y cuenta los pasos como colisiones con pared"""
+    name = 'quieto'
+
+    def simular(self, posiciones, velocidades, num_pasos, broadphase, opciones, callback, progress_every,
+                perfil=None):
+        return 0, num_pasos
+
+@pytest.fixture
+def registro(monkeypatch):
+    monkeypatch.setattr(engines, '_ENGINES', dict(engines._ENGINES))
+    return engines._ENGINES
+
+def test_motores_registrados():
+    assert {'benchmark', 'benchmark_cython', 'benchmark_numpy', 'benchmark_numba'} <= set(engines.available_engines())
+
+def test_motor_desconocido():
+    with pytest.raises(ValueError):
+        engines.get_engine('no_existe')
+
+def test_registrar_motor(registro):
+    engines.register_engine(_Quieto)
+    resultado = engines.get_engine('quieto').run(PEQUENA)
+    assert (resultado.engine, resultado.wall_collisions, resultado.total_particles) == ('quieto', 30, 120)
+
+def test_registrar_motor_sin_nombre(registro):
+    with pytest.raises(ValueError):
+        engines.register_engine(type('SinNombre', (engines.Engine,), {}))
+
+def test_cargar_modulo_de_motores(registro, tmp_path, monkeypatch):
+    (tmp_path / 'motor_externo.py').write_text(
+        "import engines\n\n"
+        "@engines.register_engine\n"
+        "class Externo(engines.Engine):\n"
+        "    name = 'externo'\n\n"
+        "    def simular(self, posiciones, velocidades, num_pasos, *args):\n"
+        "        return 1, 2\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    engines.load_engine_modules(['motor_externo'])
+    assert 'externo' in engines.available_engines()
+
+@pytest.mark.parametrize('params', [
+    dict(PEQUENA, num_particulas=0),
+    dict(PEQUENA, num_pasos=-1),
+    dict(PEQUENA, broadphase='octree'),
+])
+def test_parametros_invalidos(params):
+    with pytest.raises(ValueError):
+        engines.get_engine('benchmark').run(params)
+
+@pytest.mark.parametrize('params', [
+    dict(PEQUENA, kernel='otro'),
+    dict(PEQUENA, num_threads=-1),
+    dict(PEQUENA, kernel='referencia', broadphase='grid'),
+    dict(PEQUENA, kernel='referencia', num_threads=2),
+])
+def test_opciones_invalidas_de_cython(params):
+    with pytest.raises(ValueError):
+        engines.get_engine('benchmark_cython').run(params)
+
+def test_misma_semilla_mismo_resultado():
+    motor = engines.get_engine('benchmark')
+    primero, segundo = motor.run(dict(PEQUENA, broadphase='grid')), motor.run(dict(PEQUENA, broadphase='grid'))
+    assert (primero.particle_collisions, primero.wall_collisions) == (segundo.particle_collisions,
+                                                                      segundo.wall_collisions)
+    otra = motor.run(dict(PEQUENA, broadphase='grid', semilla=7))
+    assert otra.seed == 7
+
+@pytest.mark.parametrize('nombre, modulo', [
+    ('benchmark', 'numpy'),
+    ('benchmark_numpy', 'numpy'),
+    ('benchmark_numba', 'numba'),
+    ('benchmark_cython', 'engine_cython'),
+])
+def test_grilla_igual_a_fuerza_bruta(nombre, modulo):
+    pytest.importorskip(modulo)
+    motor = engines.get_engine(nombre)
+    grilla = motor.run(dict(PEQUENA, broadphase='grid'))
+    fuerza_bruta = motor.run(dict(PEQUENA, broadphase='bruteforce'))
+    assert (grilla.particle_collisions, grilla.wall_collisions) == (fuerza_bruta.particle_collisions,
+                                                                    fuerza_bruta.wall_collisions)
+    num_particulas = PEQUENA['num_particulas']
+    assert fuerza_bruta.pair_checks == num_particulas * (num_particulas - 1) // 2 * PEQUENA['num_pasos']
+    assert grilla.pair_checks < fuerza_bruta.pair_checks
+
+def test_numba_igual_al_motor_base():
+    pytest.importorskip('numba')
+    base = engines.get_engine('benchmark').run(dict(PEQUENA, broadphase='grid'))
+    numba = engines.get_engine('benchmark_numba').run(dict(PEQUENA, broadphase='grid'))
+    assert (numba.particle_collisions, numba.wall_collisions) == (base.particle_collisions, base.wall_collisions)
+    assert numba.pair_checks == base.pair_checks
+
+@pytest.mark.parametrize('broadphase', ['bruteforce', 'grid'])
+def test_cython_no_depende_de_los_hilos(broadphase):
+    pytest.importorskip('engine_cython')
+    motor = engines.get_engine('benchmark_cython')
+    params = {'num_particulas': 1000, 'num_pasos': 40, 'semilla': 42, 'broadphase': broadphase}
+    resultados = [motor.run(dict(params, num_threads=hilos)) for hilos in (1, 2, 4)]
+    assert len({(r.particle_collisions, r.wall_collisions, r.pair_checks) for r in resultados}) == 1
+
+def test_metricas_de_rendimiento():
+    resultado = engines.SimulationResult(
+        engine='benchmark', total_particles=10, total_steps=50, seed=1, broadphase='grid',
+        execution_time=2.0, particle_collisions=3, wall_collisions=4, pair_checks=1000)
+    assert resultado.steps_per_second == 25.0
+    assert resultado.pair_checks_per_second == 500.0
+    assert 'Pares revisados: 1000' in resultado.reporte()
+    assert resultado.to_dict()['steps_per_second'] == 25.0
+
+def test_motor_sin_pares_revisados(registro):
+    engines.register_engine(_Quieto)
+    resultado = engines.get_engine('quieto').run(PEQUENA)
+    assert resultado.pair_checks is None and resultado.pair_checks_per_second is None
+    assert 'Pares revisados' not in resultado.reporte()
+
+@pytest.mark.parametrize('nombre, modulo', [('benchmark', 'numpy'), ('benchmark_numba', 'numba')])
+def test_lote_igual_a_simulaciones_sueltas(nombre, modulo):
+    pytest.importorskip(modulo)
+    motor = engines.get_engine(nombre)
+    params = dict(PEQUENA, num_particulas=80, broadphase='grid')
+    llamadas = []
+    lote = motor.run_batch(params, [1, 2, 3], callback=lambda *args: llamadas.append(args), progress_every=10)
+    sueltas = [motor.run(dict(params, semilla=semilla)) for semilla in (1, 2, 3)]
+    assert [resultado.seed for resultado in lote] == [1, 2, 3]
+    assert [(r.particle_collisions, r.wall_collisions, r.pair_checks) for r in lote] == \
+        [(r.particle_collisions, r.wall_collisions, r.pair_checks) for r in sueltas]
+    # El progreso cuenta los pasos de todo el lote
+    assert llamadas[-1][0] == 3 * PEQUENA['num_pasos']
+
+@pytest.mark.parametrize('nombre, modulo', [
+    ('benchmark', 'numpy'),
+    ('benchmark_numpy', 'numpy'),
+    ('benchmark_numba', 'numba'),
+    ('benchmark_cython', 'engine_cython'),
+])
+def test_perfil_por_fases(nombre, modulo):
+    pytest.importorskip(modulo)
+    motor = engines.get_engine(nombre)
+    sin_perfil = motor.run(dict(PEQUENA, broadphase='grid'))
+    con_perfil = motor.run(dict(PEQUENA, broadphase='grid'), profile=True)
+    assert sin_perfil.profile is None
+    assert (con_perfil.particle_collisions, con_perfil.wall_collisions, con_perfil.pair_checks) == \
+        (sin_perfil.particle_collisions, sin_perfil.wall_collisions, sin_perfil.pair_checks)
+    assert set(con_perfil.profile['phases']) == set(engines.FASES)
+    assert all(segundos >= 0 for segundos in con_perfil.profile['phases'].values())
+    contadores = con_perfil.profile['counters']
+    assert contadores['pairs_colliding'] == con_perfil.particle_collisions
+    assert contadores['pairs_tested'] == con_perfil.pair_checks
+    assert 'Fases:' in con_perfil.reporte()
+
+def test_perfil_de_cython_con_hilos():
+    pytest.importorskip('engine_cython')
+    motor = engines.get_engine('benchmark_cython')
+    serie = motor.run(dict(PEQUENA, broadphase='grid'))
+    paralelo = motor.run(dict(PEQUENA, broadphase='grid', num_threads=2), profile=True)
+    assert paralelo.profile['counters']['pairs_tested'] == serie.pair_checks
+
+def test_lote_vacio():
+    assert engines.get_engine('benchmark').run_batch(PEQUENA, []) == []
+
+def test_version_del_motor(registro, tmp_path, monkeypatch):
+    modulo = tmp_path / 'motor_versionado.py'
+    fuente = ("import engines\n\n"
+              "@engines.register_engine\n"
+              "class Versionado(engines.Engine):\n"
+              "    name = 'versionado'\n")
+    modulo.write_text(fuente)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    engines.load_engine_modules(['motor_versionado'])
+    version = engines.engine_versions()['versionado']
+    assert version == engines.get_engine('versionado').version()
+    modulo.write_text(fuente + "    # cambio\n")
+    assert engines.get_engine('versionado').version() != version
+
+def _conteos(resultado):
+    return resultado.particle_collisions, resultado.wall_collisions, resultado.pair_checks
+
+def test_checkpoints_no_cambian_el_resultado(tmp_path):
+    motor = engines.get_engine('benchmark')
+    params = dict(PEQUENA, broadphase='grid')
+    checkpoint = tmp_path / 'sim.npz'
+    con_checkpoints = motor.run(params, checkpoint_every=7, checkpoint_path=str(checkpoint))
+    assert _conteos(con_checkpoints) == _conteos(motor.run(params))
+    assert engines.checkpoint_step(str(checkpoint)) == 28
+
+def test_reanudar_desde_checkpoint(tmp_path):
+    motor = engines.get_engine('benchmark')
+    params = dict(PEQUENA, broadphase='grid')
+    checkpoint = str(tmp_path / 'sim.npz')
+
+    def cortar(paso, *_):
+        if paso == 25:
+            raise RuntimeError('corte')
+
+    with pytest.raises(RuntimeError):
+        motor.run(params, cortar, progress_every=5, checkpoint_every=10, checkpoint_path=checkpoint)
+    assert engines.checkpoint_step(checkpoint) == 20
+
+    reanudada = motor.run(params, resume_path=checkpoint)
+    assert reanudada.options['resumed_from_step'] == 20
+    assert _conteos(reanudada) == _conteos(motor.run(params))
+
+def test_progreso_en_pasos_absolutos(tmp_path):
+    # Tramos de checkpoint más cortos que progress_every y una reanudación a mitad de intervalo
+    motor = engines.get_engine('benchmark')
+    params = dict(PEQUENA, broadphase='grid')
+    checkpoint = str(tmp_path / 'sim.npz')
+    esperadas, en_tramos, reanudadas = [], [], []
+    motor.run(params, lambda *args: esperadas.append(args), progress_every=10)
+    motor.run(params, lambda *args: en_tramos.append(args), progress_every=10, checkpoint_every=7,
+              checkpoint_path=checkpoint)
+    assert [paso for paso, _, _ in esperadas] == [10, 20, 30]
+    assert en_tramos == esperadas
+    motor.run(params, lambda *args: reanudadas.append(args), progress_every=10, resume_path=checkpoint)
+    assert reanudadas == esperadas[-1:]
+
+def test_checkpoint_de_otra_simulacion(tmp_path):
+    motor = engines.get_engine('benchmark')
+    checkpoint = str(tmp_path / 'sim.npz')
+    motor.run(PEQUENA, checkpoint_every=10, checkpoint_path=checkpoint)
+    with pytest.raises(engines.CheckpointMismatch):
+        motor.run(dict(PEQUENA, semilla=7), resume_path=checkpoint)
+
+def test_checkpoint_sin_pares_revisados(tmp_path):
+    posiciones, velocidades = np.ones((3, 2)), np.zeros((3, 2))
+    checkpoint = str(tmp_path / 'sim.npz')
+    engines.save_checkpoint(checkpoint, {'engine': 'quieto'}, posiciones, velocidades, 5, [1, 2, None])
+    pos, vel, paso, contadores = engines.load_checkpoint(checkpoint, {'engine': 'quieto'})
+    np.testing.assert_array_equal(pos, posiciones)
+    assert (paso, contadores) == (5, [1, 2, None])
+    assert not list(tmp_path.glob('*.tmp'))
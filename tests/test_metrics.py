@@ -0,0 +1,75 @@
+"""
+Pruebas del formato de texto de /metrics
+"""
+
+import pytest
+
+import metrics
+
+def test_contador_con_etiquetas():
+    registro = metrics.Registry()
+    contador = registro.counter('tareas_total', 'Tareas', ('type',))
+    contador.inc(type='benchmark')
+    contador.inc(2, type='benchmark')
+    contador.inc(type='sweep')
+    assert registro.render().splitlines() == [
+        '# HELP tareas_total Tareas',
+        '# TYPE tareas_total counter',
+        'tareas_total{type="benchmark"} 3',
+        'tareas_total{type="sweep"} 1',
+    ]
+
+def test_contador_no_decrece():
+    contador = metrics.Registry().counter('tareas_total', 'Tareas')
+    with pytest.raises(ValueError):
+        contador.inc(-1)
+
+def test_etiquetas_equivocadas():
+    contador = metrics.Registry().counter('tareas_total', 'Tareas', ('type',))
+    with pytest.raises(ValueError):
+        contador.inc(size='100')
+
+def test_metrica_duplicada():
+    registro = metrics.Registry()
+    registro.counter('tareas_total', 'Tareas')
+    with pytest.raises(ValueError):
+        registro.gauge('tareas_total', 'Otra')
+
+def test_etiquetas_escapadas():
+    registro = metrics.Registry()
+    registro.gauge('estado', 'Estado', ('worker',)).set(1.5, worker='w"1\\\n')
+    assert 'estado{worker="w\\"1\\\\\\n"} 1.5' in registro.render().splitlines()
+
+def test_gauge_calculado_al_leer():
+    registro = metrics.Registry()
+    valores = {('online',): 2, ('offline',): None}
+    registro.gauge('workers', 'Workers', ('status',), funcion=lambda: valores)
+    assert registro.render().splitlines()[2:] == ['workers{status="online"} 2']
+    valores[('online',)] = 3
+    assert registro.render().splitlines()[2:] == ['workers{status="online"} 3']
+
+def test_histograma_acumulado():
+    registro = metrics.Registry()
+    histograma = registro.histogram('duracion_seconds', 'Duración', (1, 5))
+    for valor in (0.5, 2, 2, 10):
+        histograma.observe(valor)
+    assert registro.render().splitlines()[2:] == [
+        'duracion_seconds_bucket{le="1"} 1',
+        'duracion_seconds_bucket{le="5"} 3',
+        'duracion_seconds_bucket{le="+Inf"} 4',
+        'duracion_seconds_sum 14.5',
+        'duracion_seconds_count 4',
+    ]
+
+def test_consolidacion_sin_lectores(monkeypatch):
+    monkeypatch.setattr(metrics, 'MAX_PENDIENTES', 10)
+    registro = metrics.Registry()
+    contador = registro.counter('tareas_total', 'Tareas')
+    for _ in range(25):
+        contador.inc()
+    assert len(registro._pendientes) <= 10
+    assert registro.render().splitlines()[2] == 'tareas_total 25'
+
+@pytest.mark.parametrize('num_particulas, etiqueta', [(1, '1'), (100, '100'), (101, '1000'), ('x', 'unknown')])
+def test_etiqueta_de_tamano(num_particulas, etiqueta):
+    assert metrics.size_label(num_particulas) == etiqueta
@@ -0,0 +1,517 @@
+"""
+Cola de tareas y planificación del orquestador
+"""
+
+import base64
+import json
+import os
+import time
+
+import pytest
+
+import metrics
+import orchestrator
+
+def _item(task_id, priority=None, intentos=0, costo=0):
+    task = {'id': task_id, 'type': 'benchmark'}
+    if priority is not None:
+        task['priority'] = priority
+    return {'task': task, 'intentos': intentos, 'costo': costo}
+
+def _tarea(task_id, pares, **parameters):
+    """Tarea de fuerza bruta con 2 partículas: cuesta un par por paso"""
+    return {'id': task_id, 'type': 'benchmark', 'parameters': dict({'num_particulas': 2, 'num_pasos': pares}, **parameters)}
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    monkeypatch.setattr(orchestrator, 'RESULTS_DIR', str(tmp_path))
+    return orchestrator.TaskScheduler(orchestrator.WorkerManager())
+
+def test_cola_por_prioridad_y_orden_de_llegada():
+    cola = orchestrator.TaskQueue()
+    for task_id, priority in (('a', 2), ('b', 1), ('c', None), ('d', 0), ('e', 2)):
+        cola.put(_item(task_id, priority))
+    assert [task['id'] for task in cola.pending()] == ['d', 'b', 'c', 'a', 'e']
+    assert [cola.get()['task']['id'] for _ in range(5)] == ['d', 'b', 'c', 'a', 'e']
+    assert len(cola) == 0
+
+def test_cola_mayor_costo_primero_y_robo_del_ultimo():
+    cola = orchestrator.TaskQueue()
+    for task_id, priority, costo in (('a', 1, 5), ('b', 1, 9), ('c', 0, 1), ('d', 1, 5)):
+        cola.put(_item(task_id, priority, costo=costo))
+    assert [task['id'] for task in cola.pending()] == ['c', 'b', 'a', 'd']
+    assert cola.steal()['task']['id'] == 'd'
+    assert [task['id'] for task in cola.pending()] == ['c', 'b', 'a']
+
+def test_cola_vacia_devuelve_none():
+    inicio = time.time()
+    assert orchestrator.TaskQueue().get(timeout=0.1) is None
+    assert time.time() - inicio >= 0.1
+
+def test_slots_por_worker(scheduler):
+    scheduler.worker_manager.register_worker('w1', 'localhost', 8001)
+    scheduler.worker_manager.register_worker('w2', 'localhost', 8002)
+    scheduler.worker_manager.workers['w2']['pool'] = {'processes': 4}
+    scheduler.worker_config = {'w1': {'max_concurrent_tasks': 3}}
+    assert scheduler.worker_slots('w1') == 3
+    assert scheduler.worker_slots('w2') == 4
+    assert scheduler.worker_slots('otro') == 1
+
+def test_reintento_y_descarte(scheduler):
+    # Sin workers online la tarea replanificada vuelve a la cola general
+    scheduler.retry_delay = 0
+    scheduler.max_retries = 1
+    scheduler._retry(_item('a'))
+    reintento = scheduler.queue.get(timeout=5)
+    assert reintento['task']['id'] == 'a' and reintento['intentos'] == 1
+    scheduler._retry(reintento)
+    assert scheduler.queue.get(timeout=0.2) is None
+
+def test_costo_por_broadphase():
+    modelo = orchestrator.CostModel()
+    assert modelo.cost(_tarea('a', 10, num_particulas=100)) == 100 * 99 / 2 * 10
+    grilla = _tarea('b', 10, num_particulas=100, broadphase='grid')
+    assert modelo.cost(grilla) == 100 * modelo.PARES_POR_PARTICULA_GRID * 10
+    # benchmark_numpy usa la grilla si la tarea no dice otra cosa
+    assert modelo.cost(dict(_tarea('c', 10, num_particulas=100), type='benchmark_numpy')) == modelo.cost(grilla)
+
+def test_throughput_aprendido():
+    modelo = orchestrator.CostModel(alpha=0.5)
+    tarea = _tarea('a', 1000)
+    assert modelo.predict('w1', tarea) == 1000 / modelo.THROUGHPUT_INICIAL['benchmark']
+    modelo.observe('w1', tarea, 10.0)
+    assert modelo.predict('w1', tarea) == pytest.approx(10.0)
+    modelo.observe('w1', tarea, 30.0)
+    assert modelo.predict('w1', tarea) == pytest.approx(1000 / ((100 + 1000 / 30) / 2))
+    # Un worker sin datos usa el promedio de los demás
+    assert modelo.predict('w2', tarea) == modelo.predict('w1', tarea)
+
+def test_throughput_por_franja():
+    modelo = orchestrator.CostModel()
+    tarea = {'id': 'd', 'type': 'distributed', 'parameters': {'num_particulas': 100, 'num_pasos': 10, 'strips': 2}}
+    assert modelo.cost(tarea) == 100 * modelo.PARES_POR_PARTICULA_GRID * 10
+    assert modelo.predict('w1', tarea) == modelo.cost(tarea) / (modelo.THROUGHPUT_INICIAL['distributed'] * 2)
+    # Dos franjas en 1 s: cada worker hizo la mitad de los pares
+    modelo.observe('w1', tarea, 1.0, workers=['w1', 'w2'])
+    assert modelo.throughput == {('w1', 'distributed', 'grid'): 5000.0, ('w2', 'distributed', 'grid'): 5000.0}
+    assert modelo.predict('w1', tarea) == pytest.approx(1.0)
+    assert modelo.predict('w1', dict(tarea, parameters=dict(tarea['parameters'], strips=4))) == pytest.approx(0.5)
+
+def test_plan_lpt(scheduler):
+    for worker_id in ('w1', 'w2'):
+        scheduler.worker_manager.register_worker(worker_id, 'localhost', 8000)
+        scheduler.worker_manager.worker_status[worker_id] = 'online'
+        scheduler.cost_model.throughput[(worker_id, 'benchmark', 'bruteforce')] = 1.0
+    scheduler._plan([{'task': _tarea(task_id, pares), 'intentos': 0}
+                     for task_id, pares in (('t3', 3), ('t8', 8), ('t4', 4), ('t5', 5))])
+    # De mayor a menor costo, cada una al worker que la termina antes
+    assert [task['id'] for task in scheduler.worker_queues['w1'].pending()] == ['t8', 't3']
+    assert [task['id'] for task in scheduler.worker_queues['w2'].pending()] == ['t5', 't4']
+    assert scheduler.backlog('w1') == pytest.approx(11.0)
+
+def test_robo_de_tareas(scheduler):
+    for worker_id in ('w1', 'w2'):
+        scheduler.worker_manager.register_worker(worker_id, 'localhost', 8000)
+        scheduler.worker_manager.worker_status[worker_id] = 'online'
+        scheduler.cost_model.throughput[(worker_id, 'benchmark', 'bruteforce')] = 1.0
+    for task_id, pares in (('t1', 6), ('t2', 5)):
+        scheduler._worker_queue('w1').put({'task': _tarea(task_id, pares), 'intentos': 0, 'costo': pares})
+    # w2 está libre y termina t2 antes de que w1 llegue a ella
+    assert scheduler._next_item('w2')['task']['id'] == 't2'
+    assert scheduler._next_item('w2') is None
+
+def test_endpoint_queue(monkeypatch, scheduler):
+    monkeypatch.setattr(orchestrator, 'task_scheduler', scheduler)
+    scheduler.queue.put(_item('a', 3))
+    scheduler.queue.put(_item('b', 1))
+    respuesta = orchestrator.app.test_client().get('/queue').get_json()
+    assert [(task['id'], task['priority']) for task in respuesta['unassigned']] == [('b', 1), ('a', 3)]
+    assert respuesta['workers'] == {}
+
+def test_expandir_sweep():
+    runs = orchestrator.expand_sweep({'id': 's', 'type': 'sweep', 'parameters': {
+        'engine': ['benchmark', 'benchmark_numba'],
+        'num_particulas': [100, 200],
+        'semilla': {'start': 1, 'stop': 4},
+        'num_pasos': 50
+    }})
+    assert len(runs) == 2 * 2 * 3
+    assert runs[0] == {'type': 'benchmark', 'parameters': {'num_particulas': 100, 'num_pasos': 50, 'semilla': 1}}
+    # La semilla varía más rápido: cada configuración queda contigua
+    assert [run['parameters']['semilla'] for run in runs[:4]] == [1, 2, 3, 1]
+    assert runs[-1]['type'] == 'benchmark_numba' and runs[-1]['parameters']['num_particulas'] == 200
+
+def test_sweep_sin_semilla_usa_la_por_defecto():
+    runs = orchestrator.expand_sweep({'id': 's', 'type': 'sweep', 'parameters': {'num_particulas': 10}})
+    assert runs == [{'type': 'benchmark', 'parameters': {'num_particulas': 10, 'semilla': 42}}]
+
+def test_percentil():
+    valores = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert orchestrator._percentil(valores, 0) == 1.0
+    assert orchestrator._percentil(valores, 50) == 3.0
+    assert orchestrator._percentil(valores, 100) == 5.0
+    assert orchestrator._percentil(valores, 95) == pytest.approx(4.8)
+    assert orchestrator._percentil([7.0], 25) == 7.0
+
+def _entrada(semilla, colisiones, num_particulas=100, success=True):
+    entrada = {'task_type': 'benchmark', 'parameters': {'num_particulas': num_particulas, 'semilla': semilla},
+               'success': success}
+    if success:
+        entrada['metrics'] = {'particle_collisions': colisiones, 'wall_collisions': 1,
+                              'execution_time': 0.5, 'steps_per_second': 100.0}
+    else:
+        entrada['error'] = 'parámetros inválidos'
+    return entrada
+
+def test_agregador_de_sweep(tmp_path):
+    agregador = orchestrator.SweepAggregator('s', 5, str(tmp_path))
+    agregador.add([_entrada(1, 10), _entrada(2, 20)])
+    assert agregador.summary()['status'] == 'running'
+    agregador.add([_entrada(3, 30), _entrada(1, 5, num_particulas=200), _entrada(2, 0, success=False)])
+
+    resumen = json.loads((tmp_path / 'sweep_s.json').read_text())
+    assert resumen == agregador.summary()
+    assert (resumen['status'], resumen['completed_runs'], resumen['failed_runs']) == ('completed', 5, 1)
+    grupos = {grupo['parameters']['num_particulas']: grupo for grupo in resumen['groups']}
+    colisiones = grupos[100]['metrics']['particle_collisions']
+    assert grupos[100]['runs'] == 3 and grupos[200]['runs'] == 1
+    assert (colisiones['mean'], colisiones['stddev'], colisiones['min'], colisiones['max'], colisiones['p50']) == \
+        (20.0, 10.0, 10, 30, 20.0)
+    assert grupos[200]['metrics']['particle_collisions']['stddev'] == 0.0
+
+def test_sweep_en_lotes_por_configuracion(scheduler):
+    scheduler.cost_model.throughput[(None, 'benchmark', 'bruteforce')] = 1.0
+    lotes = scheduler._expand_sweep({'id': 's', 'type': 'sweep', 'batch_size': 3, 'priority': 2, 'parameters': {
+        'num_particulas': [2, 3], 'num_pasos': 1, 'semilla': {'stop': 4}}})
+    # 4 semillas por configuración, hasta 3 simulaciones por lote
+    assert [len(lote['parameters']['runs']) for lote in lotes] == [3, 1, 3, 1]
+    assert {lote['type'] for lote in lotes} == {orchestrator.TIPO_LOTE}
+    assert lotes[1]['id'] == 's_lote1' and lotes[1]['sweep'] == 's' and lotes[1]['priority'] == 2
+    assert scheduler.sweeps['s'].total_runs == 8
+    assert scheduler.cost_model.cost(lotes[0]) == 3.0
+
+@pytest.fixture
+def cache(tmp_path):
+    return orchestrator.ResultCache(str(tmp_path / 'cache.db'))
+
+def test_cache_acierto_y_fallo(cache):
+    parametros = {'num_particulas': 100, 'semilla': 1}
+    assert cache.get('benchmark', parametros, {'v1'}) is None
+    cache.put('benchmark', parametros, 'v1', {'metrics': {'particle_collisions': 7}})
+    assert cache.get('benchmark', dict(parametros), {'v1'}) == {'metrics': {'particle_collisions': 7}}
+    assert cache.get('benchmark', dict(parametros, semilla=2), {'v1'}) is None
+    assert cache.get('benchmark_numba', parametros, {'v1'}) is None
+    assert cache.stats()['entries'] == 1
+
+def test_cache_invalidada_por_la_version_del_motor(cache):
+    cache.put('benchmark', {'semilla': 1}, 'v1', {'resultado': 1})
+    assert cache.get('benchmark', {'semilla': 1}, {'v2'}) is None
+    # Mientras algún worker tenga la versión anterior, su resultado sigue sirviendo
+    assert cache.get('benchmark', {'semilla': 1}, {'v1', 'v2'}) == {'resultado': 1}
+    assert cache.get('benchmark', {'semilla': 1}, set()) is None
+    # Sin versión no se guarda
+    cache.put('benchmark', {'semilla': 2}, None, {'resultado': 2})
+    assert cache.stats()['entries'] == 1
+
+def test_cache_descarta_vencidas_y_menos_usadas(tmp_path, monkeypatch):
+    cache = orchestrator.ResultCache(str(tmp_path / 'cache.db'), max_entries=2, max_age_days=1)
+    ahora = time.time()
+    monkeypatch.setattr(orchestrator.time, 'time', lambda: ahora)
+    for semilla in (1, 2, 3):
+        ahora += 1
+        cache.put('benchmark', {'semilla': semilla}, 'v1', {'semilla': semilla})
+    ahora += 1
+    assert cache.get('benchmark', {'semilla': 1}, {'v1'}) is not None
+    cache.evict()
+    assert [cache.get('benchmark', {'semilla': semilla}, {'v1'}) is not None for semilla in (1, 2, 3)] == \
+        [True, False, True]
+    ahora += 2 * 86400
+    assert cache.get('benchmark', {'semilla': 3}, {'v1'}) is None
+    cache.evict()
+    assert cache.stats()['entries'] == 0
+
+def _distribuir_con_cache(scheduler, cache, monkeypatch):
+    """Distribuye a, b y c con el resultado de a en la caché; devuelve los resultados guardados"""
+    scheduler.cache = cache
+    scheduler.worker_manager.register_worker('w1', 'localhost', 8000)
+    scheduler.worker_manager.worker_status['w1'] = 'online'
+    scheduler.worker_manager.workers['w1']['engine_versions'] = {'benchmark': 'v1'}
+    guardados = []
+    monkeypatch.setattr(scheduler, '_save_result', guardados.append)
+    monkeypatch.setattr(scheduler, 'start_dispatchers', lambda: None)
+
+    cache.put('benchmark', {'num_particulas': 2, 'num_pasos': 1}, 'v1', {'worker_id': 'w0', 'success': True})
+    scheduler.tasks = [_tarea('a', 1), _tarea('b', 2), dict(_tarea('c', 1), cache=False)]
+    scheduler.distribute_tasks()
+    return guardados
+
+def test_tareas_resueltas_desde_la_cache(scheduler, cache, monkeypatch):
+    guardados = _distribuir_con_cache(scheduler, cache, monkeypatch)
+    assert [(resultado['task_id'], resultado['cached']) for resultado in guardados] == [('a', True)]
+    assert sorted(task['id'] for task in scheduler.worker_queues['w1'].pending()) == ['b', 'c']
+
+def _metrica(linea):
+    texto = orchestrator.app.test_client().get('/metrics').get_data(as_text=True)
+    return next((float(l.rsplit(' ', 1)[1]) for l in texto.splitlines() if l.startswith(linea + ' ')), 0)
+
+def test_metricas_del_orquestador(scheduler, cache, monkeypatch):
+    respuesta = orchestrator.app.test_client().get('/metrics')
+    assert respuesta.content_type == metrics.CONTENT_TYPE
+    assert 'orchestrator_queue_depth{queue="unassigned"}' in respuesta.get_data(as_text=True)
+    aciertos = _metrica('orchestrator_cache_hits_total{type="benchmark"}')
+    _distribuir_con_cache(scheduler, cache, monkeypatch)
+    assert _metrica('orchestrator_cache_hits_total{type="benchmark"}') == aciertos + 1
+
+def _result_data(task_id, worker_id='w1', task_type='benchmark', end_time='2026-01-01T00:00:00', cached=False,
+                 duration=1.0, sweep_id=None, **parameters):
+    return {'task_id': task_id, 'worker_id': worker_id, 'sweep_id': sweep_id, 'cached': cached,
+            'start_time': end_time, 'end_time': end_time, 'duration': duration,
+            'result': {'task_type': task_type, 'parameters': parameters, 'duration_seconds': duration}}
+
+@pytest.fixture
+def store(tmp_path):
+    store = orchestrator.ResultStore(str(tmp_path / 'results.db'))
+    store.insert_many([
+        _result_data('a', num_particulas=100, end_time='2026-01-01T00:00:00'),
+        _result_data('b', worker_id='w2', num_particulas=200, end_time='2026-01-02T00:00:00'),
+        _result_data('c', task_type='benchmark_numba', num_particulas=100, end_time='2026-01-03T00:00:00'),
+        _result_data('s_lote0', sweep_id='s', num_particulas=100, end_time='2026-01-04T00:00:00', cached=True),
+    ])
+    return store
+
+def _ids(consulta):
+    return [result_data['task_id'] for result_data in consulta[1]]
+
+def test_consulta_de_resultados(store):
+    assert _ids(store.query()) == ['s_lote0', 'c', 'b', 'a']
+    assert _ids(store.query({'worker_id': 'w2'})) == ['b']
+    assert _ids(store.query({'task_type': 'benchmark_numba'})) == ['c']
+    assert _ids(store.query({'sweep_id': 's'})) == ['s_lote0']
+    assert _ids(store.query(parameters={'num_particulas': 100})) == ['s_lote0', 'c', 'a']
+    # Los parámetros se comparan con su tipo
+    assert _ids(store.query(parameters={'num_particulas': '100'})) == []
+    assert _ids(store.query(since='2026-01-02', until='2026-01-03T12:00:00')) == ['c', 'b']
+    assert _ids(store.query({'task_type': 'benchmark'}, {'num_particulas': 100})) == ['s_lote0', 'a']
+    with pytest.raises(ValueError):
+        store.query({'data': 'x'})
+
+def test_paginacion_de_resultados(store):
+    total, pagina = store.query(limit=2, offset=1)
+    assert total == 4 and [result_data['task_id'] for result_data in pagina] == ['c', 'b']
+
+def test_historial_sin_resultados_de_la_cache(store):
+    historial = store.history(10)
+    assert [(worker_id, task_type) for worker_id, task_type, _, _ in historial] == \
+        [('w1', 'benchmark'), ('w2', 'benchmark'), ('w1', 'benchmark_numba')]
+    assert historial[0][2] == {'num_particulas': 100}
+
+def test_importar_archivos_una_vez(tmp_path):
+    (tmp_path / 'result_x_1.json').write_text(json.dumps(_result_data('x')))
+    (tmp_path / 'result_roto.json').write_text('{')
+    store = orchestrator.ResultStore(str(tmp_path / 'results.db'))
+    store.import_files(str(tmp_path))
+    store.import_files(str(tmp_path))
+    assert _ids(store.query()) == ['x']
+
+def test_endpoint_results(monkeypatch, scheduler, store):
+    scheduler.store = store
+    monkeypatch.setattr(orchestrator, 'task_scheduler', scheduler)
+    cliente = orchestrator.app.test_client()
+    respuesta = cliente.get('/results?task_type=benchmark&param.num_particulas=100&limit=1').get_json()
+    assert (respuesta['total'], respuesta['limit']) == (2, 1)
+    assert [result_data['task_id'] for result_data in respuesta['results']] == ['s_lote0']
+    assert cliente.get('/results?limit=mucho').status_code == 400
+
+def test_reintento_que_avanzo_no_cuenta(scheduler):
+    scheduler.retry_delay = 0
+    scheduler.max_retries = 1
+    scheduler._retry(_item('a', intentos=1), avanzo=True)
+    reintento = scheduler.queue.get(timeout=5)
+    assert reintento['intentos'] == 1
+
+def test_tarea_reanudada_desde_su_checkpoint(scheduler, monkeypatch):
+    tarea = dict(_tarea('larga', 100), checkpoint_every=10)
+    checkpoint = scheduler._checkpoint_path(tarea)
+    assert scheduler._checkpoint_path(_tarea('corta', 100)) is None
+    os.makedirs(os.path.dirname(checkpoint))
+    with open(checkpoint, 'wb') as f:
+        f.write(b'estado')
+
+    enviadas = []
+    def ejecutar(worker_id, task, task_timeout, checkpoint_path=None):
+        enviadas.append((task, checkpoint_path))
+        return {'success': True, 'task_type': 'benchmark', 'parameters': task['parameters'],
+                'duration_seconds': 1.0, 'metrics': {'options': {'resumed_from_step': 50}}}
+    monkeypatch.setattr(scheduler.worker_manager, 'execute_task_on_worker', ejecutar)
+
+    assert scheduler._execute_task('w1', tarea)
+    task, checkpoint_path = enviadas[0]
+    assert base64.b64decode(task['resume']['data']) == b'estado' and checkpoint_path == checkpoint
+    # Terminada la tarea se borra el checkpoint; la duración parcial no entrena el modelo
+    assert not os.path.exists(checkpoint)
+    assert scheduler.cost_model.throughput == {}
+
+class _Sesion:
+    """Sesión falsa: responde el /ping de los workers de vivos y falla con el resto"""
+
+    def __init__(self, vivos):
+        self.vivos = vivos
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        if not any(url.startswith(f'http://{host}:') for host in self.vivos):
+            raise orchestrator.requests.exceptions.ConnectionError(url)
+        respuesta = orchestrator.requests.Response()
+        respuesta.status_code = 200
+        respuesta._content = json.dumps({'pool': {'processes': 2}, 'engine_versions': {}}).encode()
+        return respuesta
+
+@pytest.fixture
+def manager():
+    manager = orchestrator.WorkerManager()
+    for numero in (1, 2, 3):
+        manager.register_worker(f'w{numero}', f'h{numero}', 8000)
+    manager.session = _Sesion({'h1', 'h2'})
+    return manager
+
+def test_ping_a_todos_los_workers(manager):
+    assert manager.ping_all_workers() == 2
+    assert manager.worker_status == {'w1': 'online', 'w2': 'online', 'w3': 'offline'}
+    assert manager.workers['w1']['pool'] == {'processes': 2}
+    assert manager.last_check is not None
+
+def test_backoff_de_un_worker_caido(manager, monkeypatch):
+    ahora = 1000.0
+    monkeypatch.setattr(orchestrator.time, 'time', lambda: ahora)
+    manager.ping_all_workers()
+    assert manager.workers['w3']['next_ping'] == ahora + manager.BACKOFF_INICIAL
+    # Mientras dura la espera, la ronda no lo prueba
+    manager.session.urls.clear()
+    manager.ping_all_workers()
+    assert sorted(manager.session.urls) == ['http://h1:8000/ping', 'http://h2:8000/ping']
+    # La espera se duplica con cada fallo hasta el máximo
+    for fallos in range(2, 8):
+        manager.ping_worker('w3')
+        assert manager.workers['w3']['next_ping'] - ahora == min(
+            manager.BACKOFF_MAXIMO, manager.BACKOFF_INICIAL * 2 ** (fallos - 1))
+    # Forzada, la ronda lo prueba igual; al responder se reinicia el backoff
+    manager.session.vivos.add('h3')
+    assert manager.ping_all_workers(forzar=True) == 3
+    assert (manager.workers['w3']['failures'], manager.workers['w3']['next_ping']) == (0, 0.0)
+
+def test_ping_all_en_segundo_plano(manager, monkeypatch):
+    monkeypatch.setattr(orchestrator, 'worker_manager', manager)
+    cliente = orchestrator.app.test_client()
+    datos = cliente.get('/ping_all?wait=true').get_json()
+    assert datos['check_started'] and not datos['checking']
+    assert datos['online_workers'] == 2 and datos['last_check'] is not None
+
+def _heartbeat(worker_id, url, **datos):
+    return dict({'worker_id': worker_id, 'url': url, 'capacity': {'processes': 2},
+                 'pool': {'processes': 2, 'running': 0, 'available_slots': 4},
+                 'engine_versions': {'benchmark': 'v1'}}, **datos)
+
+@pytest.fixture
+def registro(scheduler, monkeypatch):
+    monkeypatch.setattr(orchestrator, 'worker_manager', scheduler.worker_manager)
+    monkeypatch.setattr(orchestrator, 'task_scheduler', scheduler)
+    monkeypatch.setattr(scheduler, 'start_dispatchers', lambda: None)
+    return orchestrator.app.test_client()
+
+def test_registro_por_heartbeat(registro, scheduler):
+    respuesta = registro.post('/workers/register', json=_heartbeat('w1', 'http://vm1:8001'))
+    assert respuesta.status_code == 201 and respuesta.get_json()['registered']
+    worker = scheduler.worker_manager.workers['w1']
+    assert (worker['host'], worker['port'], worker['dynamic']) == ('vm1', 8001, True)
+    assert scheduler.worker_manager.worker_status['w1'] == 'online'
+    # Los siguientes heartbeats sólo actualizan la capacidad
+    respuesta = registro.post('/workers/register', json=_heartbeat('w1', 'http://vm1:8001', capacity={'processes': 4}))
+    assert respuesta.status_code == 200 and not respuesta.get_json()['registered']
+    assert worker['capacity'] == {'processes': 4}
+
+@pytest.mark.parametrize('datos', [{'worker_id': 'w1'}, {'url': 'http://vm1:8001'},
+                                   _heartbeat('w1', 'ftp://vm1:8001')])
+def test_heartbeat_invalido(registro, datos):
+    assert registro.post('/workers/register', json=datos).status_code == 400
+
+def test_baja_de_un_worker_replanifica_su_cola(registro, scheduler):
+    for worker_id in ('w1', 'w2'):
+        registro.post('/workers/register', json=_heartbeat(worker_id, f'http://{worker_id}:8000'))
+    scheduler._worker_queue('w1').put({'task': _tarea('a', 5), 'intentos': 0, 'costo': 5})
+    assert registro.delete('/workers/w1').get_json()['removed']
+    assert 'w1' not in scheduler.worker_manager.workers
+    assert [task['id'] for task in scheduler.worker_queues['w2'].pending()] == ['a']
+    assert registro.delete('/workers/w1').status_code == 404
+
+def test_workers_sin_heartbeat(scheduler, monkeypatch):
+    manager = scheduler.worker_manager
+    manager.heartbeat('w1', 'http://vm1:8001', {})
+    manager.register_worker('fijo', 'vm2', 8002)
+    assert manager.expired_workers() == []
+    ahora = time.time()
+    monkeypatch.setattr(orchestrator.time, 'time', lambda: ahora + manager.HEARTBEAT_TIMEOUT + 1)
+    # Los workers de la configuración nunca vencen
+    assert manager.expired_workers() == ['w1']
+
+def test_tareas_sin_worker_con_su_motor(scheduler):
+    manager = scheduler.worker_manager
+    manager.heartbeat('w1', 'http://vm1:8001', {'engine_versions': {'benchmark': 'v1'}})
+    assert manager.supports('w1', _tarea('a', 1))
+    assert not manager.supports('w1', dict(_tarea('b', 1), type='benchmark_numba'))
+    scheduler.queue.put({'task': dict(_tarea('b', 1), type='benchmark_numba'), 'intentos': 0, 'costo': 1})
+    scheduler.queue.put(_item('a'))
+    # w1 salta la tarea que no puede ejecutar
+    assert scheduler.queue.take(lambda item: manager.supports('w1', item['task']))['task']['id'] == 'a'
+    assert scheduler.queue.take(lambda item: manager.supports('w1', item['task'])) is None
+
+def test_configuracion_de_red(tmp_path, monkeypatch):
+    manager = orchestrator.WorkerManager()
+    monkeypatch.setattr(orchestrator, 'worker_manager', manager)
+    monkeypatch.setenv('WORKER1_IP', '10.0.0.1')
+    config = tmp_path / 'network.yaml'
+    config.write_text("network:\n"
+                      "  workers:\n"
+                      "    worker1: {ip: vm1, port: 8001}\n"
+                      "    worker2: {ip: vm2}\n"
+                      "  timeouts: {ping_timeout: 5}\n")
+    assert orchestrator.load_network_config(str(config)) == {'ping_timeout': 5}
+    assert {worker_id: worker['url'] for worker_id, worker in manager.workers.items()} == {
+        'worker1': 'http://10.0.0.1:8001', 'worker2': 'http://vm2:8000'}
+    assert orchestrator.load_network_config('') == {}
+
+def _respuesta(codigo, datos):
+    respuesta = orchestrator.requests.Response()
+    respuesta.status_code = codigo
+    respuesta._content = json.dumps(datos).encode()
+    return respuesta
+
+def test_worker_quitado_durante_la_tarea(scheduler, monkeypatch):
+    manager = scheduler.worker_manager
+    manager.heartbeat('w1', 'http://vm1:8001', {})
+    urls = []
+    def post(url, json=None, timeout=None):
+        urls.append(url)
+        return _respuesta(202, {'job_id': 'j1'})
+    def get(url, timeout=None):
+        # DELETE /workers/w1 mientras el worker ejecuta el job
+        manager.remove_worker('w1')
+        urls.append(url)
+        return _respuesta(200, {'status': 'completed', 'result': {'success': True}})
+    monkeypatch.setattr(orchestrator.requests, 'post', post)
+    monkeypatch.setattr(orchestrator.requests, 'get', get)
+    assert manager.execute_task_on_worker('w1', _tarea('a', 1), poll_interval=0) == {'success': True}
+    assert urls == ['http://vm1:8001/jobs', 'http://vm1:8001/jobs/j1']
+
+def test_franjas_reservan_slots(scheduler):
+    manager = scheduler.worker_manager
+    manager.heartbeat('w1', 'http://vm1:8001', {'pool': {'processes': 2}})
+    manager.heartbeat('w2', 'http://vm2:8002', {'pool': {'processes': 1}})
+    tarea = dict(_tarea('d', 10), type='distributed')
+    scheduler.running['d'] = 'w1'
+    # Hay un slot libre en cada worker: dos de las tres franjas extra
+    reservas = scheduler._reservar_franjas('w1', tarea, 3)
+    assert reservas == [('w2', 'http://vm2:8002'), ('w1', 'http://vm1:8001')]
+    assert scheduler.running == {'d': 'w1', 'd#1': 'w2', 'd#2': 'w1'}
+    assert set(scheduler._fin_previsto) == {'d#1', 'd#2'}
+    assert scheduler._reservar_franjas('w1', tarea, 1) == []
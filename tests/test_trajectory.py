@@ -0,0 +1,57 @@
+"""
+Escritura y lectura de trayectorias
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+import engines
+import trajectory
+
+def test_ida_y_vuelta(tmp_path):
+    rng = np.random.default_rng(3)
+    estados = [(rng.random((5, 2)), rng.random((5, 2))) for _ in range(3)]
+    with trajectory.TrajectoryWriter(str(tmp_path), 5, 25, 10, dtype='float64', meta={'engine': 'x'}) as writer:
+        for cuadro, (posiciones, velocidades) in enumerate(estados):
+            writer.write(cuadro * 10, posiciones, velocidades)
+    assert writer.info()['frames_written'] == 3
+
+    leida = trajectory.load_trajectory(str(tmp_path))
+    assert leida['meta']['engine'] == 'x' and leida['meta']['num_frames'] == 3
+    assert isinstance(leida['posiciones'], np.memmap)
+    for cuadro, (posiciones, velocidades) in enumerate(estados):
+        np.testing.assert_array_equal(leida['posiciones'][cuadro], posiciones)
+        np.testing.assert_array_equal(leida['velocidades'][cuadro], velocidades)
+    assert leida['pasos'].tolist() == [0, 10, 20]
+
+def test_float32_sin_velocidades(tmp_path):
+    writer = trajectory.TrajectoryWriter(str(tmp_path), 4, 30, 10, velocidades=False)
+    writer.write(10, np.full((4, 2), 1.5), None)
+    writer.close()
+    leida = trajectory.load_trajectory(str(tmp_path))
+    assert 'velocidades' not in leida and leida['posiciones'].dtype == np.float32
+    # Los cuadros que no se escribieron quedan con paso -1
+    assert leida['pasos'].tolist() == [-1, 10, -1, -1]
+    assert json.loads((tmp_path / 'meta.json').read_text())['velocidades'] is False
+
+@pytest.mark.parametrize('every, dtype', [(0, 'float32'), (10, 'float16')])
+def test_parametros_invalidos(tmp_path, every, dtype):
+    with pytest.raises(ValueError):
+        trajectory.TrajectoryWriter(str(tmp_path), 4, 30, every, dtype=dtype)
+
+def test_trayectoria_de_una_simulacion(tmp_path):
+    motor = engines.get_engine('benchmark')
+    params = {'num_particulas': 50, 'num_pasos': 30, 'semilla': 4, 'broadphase': 'grid'}
+    with trajectory.TrajectoryWriter(str(tmp_path / 'completa'), 50, 30, 10, dtype='float64') as writer:
+        motor.run(params, trajectory=writer)
+    leida = trajectory.load_trajectory(str(tmp_path / 'completa'))
+    assert leida['pasos'].tolist() == [0, 10, 20, 30]
+
+    # El cuadro del paso k es el estado final de la misma simulación con k pasos
+    with trajectory.TrajectoryWriter(str(tmp_path / 'corta'), 50, 20, 20, dtype='float64') as writer:
+        motor.run(dict(params, num_pasos=20), trajectory=writer)
+    corta = trajectory.load_trajectory(str(tmp_path / 'corta'))
+    np.testing.assert_array_equal(corta['posiciones'][1], leida['posiciones'][2])
+    np.testing.assert_array_equal(corta['velocidades'][0], leida['velocidades'][0])
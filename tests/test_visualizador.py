@@ -0,0 +1,50 @@
+"""
+Visualizador: producción de cuadros y modo headless
+"""
+
+import queue
+import threading
+
+import pytest
+
+import engines
+import trajectory
+
+pytest.importorskip('pygame')
+import simulacion_partic  # noqa: E402
+
+FUENTE = {'motor': 'benchmark', 'parameters': {'num_particulas': 40, 'num_pasos': 25, 'semilla': 42}}
+
+def _cuadros(fuente, every):
+    cola = queue.Queue()
+    simulacion_partic._producir(fuente, every, 0, False, cola, threading.Event())
+    mensajes = []
+    while not cola.empty():
+        mensajes.append(cola.get())
+    return mensajes
+
+def test_cuadros_de_la_simulacion():
+    mensajes = _cuadros(FUENTE, 10)
+    # Cada `every` pasos y siempre el último
+    assert [mensaje[1] for mensaje in mensajes[:-1]] == [0, 10, 20, 25]
+    assert mensajes[-1][0] == 'fin'
+    veinte = engines.get_engine('benchmark').run(dict(FUENTE['parameters'], num_pasos=20))
+    assert mensajes[2][3:] == (veinte.particle_collisions, veinte.wall_collisions)
+
+def test_cuadros_de_una_trayectoria(tmp_path):
+    with trajectory.TrajectoryWriter(str(tmp_path), 40, 25, 5) as writer:
+        engines.get_engine('benchmark').run(FUENTE['parameters'], trajectory=writer)
+    mensajes = _cuadros({'trayectoria': str(tmp_path)}, 10)
+    assert [mensaje[1] for mensaje in mensajes[:-1]] == [0, 10, 20]
+    assert mensajes[-2][3:] == (None, None)
+
+def test_motor_desconocido():
+    assert _cuadros(dict(FUENTE, motor='no_existe'), 10)[-1][0] == 'error'
+
+def test_grabar_secuencia_png(tmp_path, monkeypatch):
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    cola = queue.Queue()
+    simulacion_partic._producir(FUENTE, 10, 0, False, cola, threading.Event())
+    ultimo, fin = simulacion_partic.grabar(cola, str(tmp_path / 'cuadros'), 0.5, 42, 25)
+    assert (ultimo[1], fin[0]) == (25, 'fin')
+    assert len(list((tmp_path / 'cuadros').glob('cuadro_*.png'))) == 4
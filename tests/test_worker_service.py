@@ -0,0 +1,287 @@
+"""
+Pool de simulación del worker y endpoint /execute
+"""
+
+import base64
+import multiprocessing
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import domain
+import engines
+import metrics
+import trajectory
+import worker_service
+
+PEQUENA = {'num_particulas': 120, 'num_pasos': 30, 'semilla': 42}
+LENTA = {'num_particulas': 300, 'num_pasos': 20, 'semilla': 42, 'broadphase': 'bruteforce'}
+
+@pytest.fixture(scope='module')
+def forkserver():
+    # Otras pruebas ya usaron Numba en este proceso; un fork después de eso
+    # deja al intérprete colgado al salir
+    metodo = multiprocessing.get_start_method()
+    multiprocessing.set_start_method('forkserver', force=True)
+    yield
+    multiprocessing.set_start_method(metodo, force=True)
+
+@pytest.fixture(scope='module')
+def pool(forkserver):
+    pool = worker_service.SimulationPool(1, 0)
+    yield pool
+    pool.shutdown()
+
+class _PoolRoto:
+    def submit(self, *args):
+        raise BrokenProcessPool("proceso muerto")
+
+    def shutdown(self, *args, **kwargs):
+        pass
+
+def test_pool_libera_el_lugar_si_falla_el_reintento(forkserver, monkeypatch):
+    pool = worker_service.SimulationPool(1, 0)
+    pool._executor.shutdown()
+    monkeypatch.setattr(pool, '_executor', _PoolRoto())
+    monkeypatch.setattr(pool, '_crear_executor', _PoolRoto)
+    with pytest.raises(BrokenProcessPool):
+        pool.submit('benchmark', PEQUENA, 'j0')
+    assert pool.occupancy()['available_slots'] == 1
+
+@pytest.fixture
+def cliente(pool, monkeypatch, tmp_path):
+    monkeypatch.setattr(worker_service, 'worker', worker_service.SimulationWorker(
+        'w-prueba', pool, str(tmp_path / 'checkpoints'), str(tmp_path / 'trayectorias')))
+    return worker_service.app.test_client()
+
+def test_pool_ejecuta_la_simulacion(pool):
+    resultado = pool.submit('benchmark', PEQUENA, 'j1').result()
+    assert resultado.total_particles == PEQUENA['num_particulas']
+    assert pool.occupancy()['available_slots'] == 1
+
+def test_pool_rechaza_tareas_con_la_cola_llena(pool):
+    future = pool.submit('benchmark', LENTA, 'j2')
+    try:
+        assert pool.occupancy()['available_slots'] == 0
+        with pytest.raises(worker_service.QueueFullError):
+            pool.submit('benchmark', PEQUENA, 'j3')
+    finally:
+        future.result()
+    assert pool.occupancy()['available_slots'] == 1
+
+def test_execute(cliente):
+    respuesta = cliente.post('/execute', json={'id': 't1', 'type': 'benchmark', 'parameters': PEQUENA})
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert datos['success'] and datos['task_id'] == 't1'
+    assert datos['metrics']['total_particles'] == PEQUENA['num_particulas']
+    assert datos['metrics']['pair_checks'] > 0
+    assert 'Total colisiones' in datos['stdout']
+    assert datos['engine_version'] == cliente.get('/ping').get_json()['engine_versions']['benchmark']
+
+def test_metricas_del_worker(cliente):
+    cliente.post('/execute', json={'id': 't13', 'type': 'benchmark', 'parameters': PEQUENA})
+    respuesta = cliente.get('/metrics')
+    assert respuesta.content_type == metrics.CONTENT_TYPE
+    lineas = respuesta.get_data(as_text=True).splitlines()
+    assert 'worker_tasks_completed_total{type="benchmark"} 1' in lineas
+    assert f'worker_simulation_steps_total{{type="benchmark"}} {PEQUENA["num_pasos"]}' in lineas
+    assert 'worker_task_duration_seconds_count{type="benchmark",size="1000"} 1' in lineas
+    assert 'worker_pool_processes 1' in lineas
+
+def test_heartbeat_con_la_capacidad(cliente):
+    datos = worker_service.worker.heartbeat('http://vm1:8001')
+    assert (datos['worker_id'], datos['url']) == ('w-prueba', 'http://vm1:8001')
+    assert datos['capacity']['processes'] == 1 and datos['capacity']['free_slots'] == 1
+    assert 'benchmark' in datos['capacity']['engines'] and 'benchmark' in datos['engine_versions']
+
+def test_execute_sin_resumen_de_texto(cliente):
+    datos = cliente.post('/execute', json={'id': 't4', 'type': 'benchmark', 'parameters': PEQUENA,
+                                           'include_output': False}).get_json()
+    assert datos['success'] and 'stdout' not in datos
+
+def test_execute_con_la_cola_llena(cliente, pool):
+    future = pool.submit('benchmark', LENTA, 'j4')
+    try:
+        respuesta = cliente.post('/execute', json={'id': 't2', 'type': 'benchmark', 'parameters': PEQUENA})
+    finally:
+        future.result()
+    assert respuesta.status_code == 503
+    assert respuesta.get_json()['queue_full']
+
+def test_execute_con_motor_desconocido(cliente):
+    datos = cliente.post('/execute', json={'id': 't3', 'type': 'no_existe'}).get_json()
+    assert not datos['success']
+
+def _esperar(cliente, job_id, condicion, limite=60):
+    fin = time.time() + limite
+    while time.time() < fin:
+        job = cliente.get(f'/jobs/{job_id}').get_json()
+        if condicion(job):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'El job {job_id} no llegó al estado esperado: {job}')
+
+def test_job_asincrono(cliente):
+    respuesta = cliente.post('/jobs', json={'id': 't5', 'type': 'benchmark', 'parameters': PEQUENA})
+    assert respuesta.status_code == 202
+    job = _esperar(cliente, respuesta.get_json()['job_id'], lambda job: job['status'] == 'completed')
+    assert job['result']['success'] and job['result']['task_id'] == 't5'
+    assert job['progress']['total_steps'] == PEQUENA['num_pasos']
+
+def test_cancelar_job_en_ejecucion(cliente):
+    parametros = dict(LENTA, num_pasos=5000)
+    job_id = cliente.post('/jobs', json={'id': 't6', 'type': 'benchmark', 'parameters': parametros}).get_json()['job_id']
+    _esperar(cliente, job_id, lambda job: job['progress']['steps_done'])
+    assert cliente.delete(f'/jobs/{job_id}').get_json()['status'] in ('cancelling', 'cancelled')
+    job = _esperar(cliente, job_id, lambda job: job['status'] == 'cancelled', limite=30)
+    assert not job['result']['success']
+    assert 't6' not in cliente.get('/status').get_json()['current_tasks']
+
+def test_borrar_job_terminado(cliente):
+    job_id = cliente.post('/jobs', json={'id': 't7', 'type': 'benchmark', 'parameters': PEQUENA}).get_json()['job_id']
+    _esperar(cliente, job_id, lambda job: job['status'] == 'completed')
+    assert cliente.delete(f'/jobs/{job_id}').get_json()['deleted']
+    assert cliente.get(f'/jobs/{job_id}').status_code == 404
+
+def test_job_con_motor_desconocido(cliente):
+    assert cliente.post('/jobs', json={'id': 't8', 'type': 'no_existe'}).status_code == 400
+
+def test_lote_de_simulaciones(cliente):
+    runs = [{'type': 'benchmark', 'parameters': dict(PEQUENA, semilla=semilla)} for semilla in (1, 2)]
+    runs.append({'type': 'benchmark', 'parameters': dict(PEQUENA, num_particulas=0)})
+    job_id = cliente.post('/jobs', json={'id': 't9', 'type': 'batch', 'parameters': {'runs': runs}}).get_json()['job_id']
+    job = _esperar(cliente, job_id, lambda job: job['status'] == 'completed')
+    assert job['progress']['total_steps'] == 3 * PEQUENA['num_pasos']
+    resultados = job['result']['results']
+    assert [entrada['success'] for entrada in resultados] == [True, True, False]
+    assert [entrada['metrics']['seed'] for entrada in resultados[:2]] == [1, 2]
+
+def test_execute_con_perfil(cliente):
+    respuesta = cliente.post('/execute', json={'id': 't11', 'type': 'benchmark', 'parameters': PEQUENA,
+                                               'profile': True})
+    perfil = respuesta.get_json()['metrics']['profile']
+    assert perfil['counters']['pairs_colliding'] == respuesta.get_json()['metrics']['particle_collisions']
+
+def test_lote_con_perfil(cliente):
+    runs = [{'type': 'benchmark', 'parameters': PEQUENA}]
+    respuesta = cliente.post('/jobs', json={'id': 't12', 'type': 'batch', 'parameters': {'runs': runs},
+                                            'profile': True})
+    assert respuesta.status_code == 400
+
+def test_lote_vacio(cliente):
+    assert cliente.post('/jobs', json={'id': 't10', 'type': 'batch', 'parameters': {'runs': []}}).status_code == 400
+
+def _checkpoint_interrumpido(ruta):
+    """Checkpoint en el paso 10 de una simulación de PEQUENA cortada en el paso 20"""
+    def cortar(paso, *_):
+        if paso == 20:
+            raise RuntimeError('corte')
+    with pytest.raises(RuntimeError):
+        engines.get_engine('benchmark').run(PEQUENA, cortar, progress_every=10, checkpoint_every=10,
+                                            checkpoint_path=str(ruta))
+
+def test_job_reanudado_desde_un_checkpoint(cliente, tmp_path):
+    checkpoint = tmp_path / 'previo.npz'
+    motor = engines.get_engine('benchmark')
+    _checkpoint_interrumpido(checkpoint)
+
+    tarea = {'id': 't11', 'type': 'benchmark', 'parameters': PEQUENA, 'checkpoint_every': 10,
+             'resume': {'data': base64.b64encode(checkpoint.read_bytes()).decode()}}
+    job_id = cliente.post('/jobs', json=tarea).get_json()['job_id']
+    job = _esperar(cliente, job_id, lambda job: job['status'] == 'completed')
+    metricas = job['result']['metrics']
+    assert metricas['options']['resumed_from_step'] == 10
+    assert metricas['particle_collisions'] == motor.run(PEQUENA).particle_collisions
+
+def test_reanudar_despues_de_reiniciar_el_worker(pool, tmp_path, monkeypatch):
+    compartido = tmp_path / 'compartido'
+    (compartido / 'de-otro').mkdir(parents=True)
+    (compartido / 'ajeno.txt').write_text('no es un checkpoint')
+    anterior = worker_service.SimulationWorker('w-prueba', pool, str(compartido), str(tmp_path / 'trayectorias'))
+    checkpoint = anterior._ruta_checkpoint({'task_id': 't21', 'job_id': 'j-anterior'})
+    _checkpoint_interrumpido(checkpoint)
+    a_medias = compartido / 'w-prueba' / 'otro.npz.tmp'
+    a_medias.write_bytes(b'')
+
+    # El worker reinicia: sólo se borran las escrituras a medias de su subdirectorio
+    monkeypatch.setattr(worker_service, 'worker', worker_service.SimulationWorker(
+        'w-prueba', pool, str(compartido), str(tmp_path / 'trayectorias')))
+    assert not a_medias.exists()
+    assert (compartido / 'ajeno.txt').exists() and (compartido / 'de-otro').is_dir()
+
+    cliente = worker_service.app.test_client()
+    tarea = {'id': 't21', 'type': 'benchmark', 'parameters': PEQUENA, 'checkpoint_every': 10}
+    job_id = cliente.post('/jobs', json=tarea).get_json()['job_id']
+    job = _esperar(cliente, job_id, lambda job: job['status'] == 'completed')
+    assert job['result']['metrics']['options']['resumed_from_step'] == 10
+
+def test_descargar_checkpoint_de_un_job(cliente):
+    parametros = dict(LENTA, num_particulas=150, num_pasos=5000)
+    tarea = {'id': 't12', 'type': 'benchmark', 'parameters': parametros, 'checkpoint_every': 100}
+    job_id = cliente.post('/jobs', json=tarea).get_json()['job_id']
+    try:
+        _esperar(cliente, job_id, lambda job: job.get('checkpoint_step'))
+        respuesta = cliente.get(f'/jobs/{job_id}/checkpoint')
+        assert respuesta.status_code == 200
+        assert int(respuesta.headers['X-Checkpoint-Step']) % 100 == 0
+    finally:
+        cliente.delete(f'/jobs/{job_id}')
+        _esperar(cliente, job_id, lambda job: job['status'] == 'cancelled')
+    assert cliente.get(f'/jobs/{job_id}/checkpoint').status_code == 404
+
+def test_checkpoint_invalido(cliente):
+    tarea = {'id': 't13', 'type': 'benchmark', 'parameters': PEQUENA, 'checkpoint_every': 10,
+             'resume': {'data': 12}}
+    assert cliente.post('/jobs', json=tarea).status_code == 400
+
+def test_job_con_trayectoria(cliente):
+    tarea = {'id': 't14', 'type': 'benchmark', 'parameters': PEQUENA, 'trajectory': {'every': 10}}
+    job_id = cliente.post('/jobs', json=tarea).get_json()['job_id']
+    job = _esperar(cliente, job_id, lambda job: job['status'] == 'completed')
+    info = job['result']['trajectory']
+    assert (info['every'], info['dtype'], info['frames_written']) == (10, 'float32', 4)
+    leida = trajectory.load_trajectory(info['path'])
+    assert leida['meta']['task_id'] == 't14' and leida['pasos'].tolist() == [0, 10, 20, 30]
+
+def test_trayectoria_con_task_id_inseguro(cliente, tmp_path):
+    tarea = {'id': '../../fuera', 'type': 'benchmark', 'parameters': PEQUENA, 'trajectory': {'every': 10}}
+    job_id = cliente.post('/jobs', json=tarea).get_json()['job_id']
+    job = _esperar(cliente, job_id, lambda job: job['status'] == 'completed')
+    ruta = job['result']['trajectory']['path']
+    assert os.path.dirname(ruta) == str(tmp_path / 'trayectorias')
+    assert os.path.basename(ruta).startswith('______fuera-')
+
+@pytest.mark.parametrize('config', [{'every': 0}, {'every': 10, 'dtype': 'int8'}])
+def test_trayectoria_invalida(cliente, config):
+    tarea = {'id': 't15', 'type': 'benchmark', 'parameters': PEQUENA, 'trajectory': config}
+    assert cliente.post('/jobs', json=tarea).status_code == 400
+
+def test_trayectoria_invalida_no_deja_checkpoint(cliente, tmp_path):
+    previo = tmp_path / 'previo.npz'
+    _checkpoint_interrumpido(previo)
+    tarea = {'id': 't16', 'type': 'benchmark', 'parameters': PEQUENA, 'checkpoint_every': 10,
+             'resume': {'data': base64.b64encode(previo.read_bytes()).decode()}, 'trajectory': {'every': 0}}
+    assert cliente.post('/jobs', json=tarea).status_code == 400
+    assert list((tmp_path / 'checkpoints').rglob('*.npz')) == []
+
+def test_franja_sin_secreto(cliente):
+    assert cliente.post('/strips', json={'coordinator': '127.0.0.1:1'}).status_code == 403
+
+@pytest.mark.parametrize('cuerpo, firma, codigo', [
+    (b'{"coordinator": "127.0.0.1:1"}', None, 403),
+    (b'{"coordinator": "10.9.9.9:1", "nonce": "00", "timestamp": 0}', 'ok', 403),
+    (b'{"coordinator": "127.0.0.1:1"}', 'ok', 400),
+])
+def test_solicitud_de_franja_rechazada(cliente, monkeypatch, cuerpo, firma, codigo):
+    monkeypatch.setattr(worker_service.worker, 'strip_secret', 'secreto')
+    monkeypatch.setattr(worker_service.worker, 'coordinator_hosts', ['127.0.0.1'])
+    if firma == 'ok':
+        cuerpo = cuerpo.replace(b'"timestamp": 0', f'"timestamp": {time.time()}'.encode())
+        firma = domain.firmar('secreto', cuerpo)
+    respuesta = cliente.post('/strips', data=cuerpo, content_type='application/json',
+                             headers={domain.CABECERA_FIRMA: firma} if firma else {})
+    assert respuesta.status_code == codigo
+    assert worker_service.worker.pool.occupancy()['available_slots'] == 1
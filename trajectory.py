@@ -0,0 +1,123 @@
+"""
+Escritura de trayectorias en archivos mapeados en memoria
+
+Una trayectoria es un directorio con:
+    posiciones.npy   (cuadros, N, 2)
+    velocidades.npy  (cuadros, N, 2), opcional
+    pasos.npy        (cuadros,) paso de cada cuadro, -1 si no se escribió
+    meta.json        parámetros de la simulación y de la escritura
+
+Los .npy se reservan completos al crear el writer y se escriben con
+np.lib.format.open_memmap, así que se pueden leer con
+np.load(..., mmap_mode='r') sin cargarlos en RAM. La escritura usa doble
+buffer: el bucle de pasos copia el estado a un buffer libre y un hilo lo
+vuelca al memmap mientras la simulación sigue; sólo espera si el disco va
+más de un cuadro atrasado.
+"""
+
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+DTYPES = ('float32', 'float64')
+
+class TrajectoryWriter:
+    """Guarda posiciones (y velocidades) cada `every` pasos en un directorio de trayectoria"""
+
+    def __init__(self, directorio, num_particulas, num_pasos, every, dtype='float32', velocidades=True, meta=None):
+        if every <= 0:
+            raise ValueError("every debe ser un número positivo de pasos")
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype debe ser uno de {', '.join(DTYPES)}")
+
+        self.directorio = directorio
+        self.every = int(every)
+        self.num_frames = int(num_pasos) // self.every + 1
+        self.frames_written = 0
+        os.makedirs(directorio, exist_ok=True)
+
+        forma = (self.num_frames, num_particulas, 2)
+        self._destinos = [np.lib.format.open_memmap(
+            os.path.join(directorio, 'posiciones.npy'), mode='w+', dtype=dtype, shape=forma)]
+        if velocidades:
+            self._destinos.append(np.lib.format.open_memmap(
+                os.path.join(directorio, 'velocidades.npy'), mode='w+', dtype=dtype, shape=forma))
+        self._pasos = np.lib.format.open_memmap(
+            os.path.join(directorio, 'pasos.npy'), mode='w+', dtype=np.int64, shape=(self.num_frames,))
+        self._pasos[:] = -1
+
+        with open(os.path.join(directorio, 'meta.json'), 'w') as f:
+            json.dump(dict(meta or {}, every=self.every, dtype=dtype, num_frames=self.num_frames,
+                           num_particulas=num_particulas, velocidades=velocidades), f, indent=2)
+
+        # Doble buffer: uno se llena en el bucle de pasos mientras el otro se escribe
+        self._libres = queue.Queue()
+        for _ in range(2):
+            self._libres.put([np.empty((num_particulas, 2), dtype=dtype) for _ in self._destinos])
+        self._pendientes = queue.Queue()
+        self._error = None
+        self._hilo = threading.Thread(target=self._escribir, daemon=True)
+        self._hilo.start()
+
+    def wants(self, paso):
+        """¿Hay que guardar el cuadro de este paso?"""
+        return paso % self.every == 0
+
+    def write(self, paso, posiciones, velocidades=None):
+        """Encolar el estado del paso (múltiplo de every); vuelve en cuanto copió los arreglos"""
+        if self._error is not None:
+            raise self._error
+        buffers = self._libres.get()
+        np.copyto(buffers[0], posiciones, casting='same_kind')
+        if len(buffers) > 1:
+            np.copyto(buffers[1], velocidades, casting='same_kind')
+        self._pendientes.put((paso // self.every, paso, buffers))
+
+    def _escribir(self):
+        while True:
+            trabajo = self._pendientes.get()
+            if trabajo is None:
+                break
+            cuadro, paso, buffers = trabajo
+            try:
+                for destino, buffer in zip(self._destinos, buffers):
+                    destino[cuadro] = buffer
+                self._pasos[cuadro] = paso
+                self.frames_written += 1
+            except Exception as e:
+                self._error = e
+            finally:
+                self._libres.put(buffers)
+
+    def close(self):
+        """Esperar a que se escriban los cuadros pendientes y bajar los memmaps a disco"""
+        self._pendientes.put(None)
+        self._hilo.join()
+        for destino in self._destinos + [self._pasos]:
+            destino.flush()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def info(self):
+        """Resumen para incluir en el resultado de la tarea"""
+        return {'path': self.directorio, 'every': self.every, 'num_frames': self.num_frames,
+                'frames_written': self.frames_written}
+
+def load_trajectory(directorio):
+    """Abrir una trayectoria sin cargarla: dict con meta y memmaps de sólo lectura"""
+    with open(os.path.join(directorio, 'meta.json')) as f:
+        trayectoria = {'meta': json.load(f)}
+    for nombre in ('posiciones', 'velocidades', 'pasos'):
+        archivo = os.path.join(directorio, f'{nombre}.npy')
+        if os.path.exists(archivo):
+            trayectoria[nombre] = np.load(archivo, mmap_mode='r')
+    return trayectoria
@@ -3,15 +3,33 @@
 Servicio Worker para ejecutar simulaciones
 """
 
+import base64
+import glob
+import hashlib
+import io
 import json
-import subprocess
 import tempfile
 import os
+import re
+import signal
+import socket
 import sys
 import argparse
-from flask import Flask, jsonify, request
+import threading
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
+import requests
+from flask import Flask, Response, jsonify, request
 import logging
 from datetime import datetime
+from urllib.parse import urlparse
+
+import domain
+import engines
+import metrics
+import trajectory
 
 # Configuración de logging
 logging.basicConfig(
@@ -20,10 +38,318 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class QueueFullError(Exception):
+    """La cola local del pool de simulación está llena"""
+    pass
+
+# Estado compartido con los procesos del pool (proxies de multiprocessing.Manager)
+_PROGRESO = None
+_CANCELADOS = None
+
+def _inicializar_proceso(engine_modules, progreso, cancelados):
+    """Precargar NumPy, los motores y sus backends en cada proceso del pool"""
+    global _PROGRESO, _CANCELADOS
+    _PROGRESO = progreso
+    _CANCELADOS = cancelados
+
+    engines.load_engine_modules(engine_modules)
+    import numpy
+    try:
+        import engine_cython
+    except ImportError:
+        pass
+    try:
+        import engine_numba
+        engine_numba.precompilar()
+    except ImportError:
+        pass
+
+def _calentar():
+    return os.getpid()
+
+# Tipo de tarea que agrupa varias simulaciones en una sola llamada al worker
+TIPO_LOTE = 'batch'
+
+def _ejecutar_motor(task_type, parameters, job_id, checkpoint=None, trayectoria=None, perfil=False):
+    """Punto de entrada en los procesos del pool.
+
+    checkpoint, si se pasa, es {'every', 'path', 'resume'}: guardar el estado
+    cada 'every' pasos en 'path' y, si 'resume' no es None, continuar desde
+    ese archivo. trayectoria, si se pasa, son los argumentos de
+    trajectory.TrajectoryWriter salvo el tamaño de la simulación. Con perfil,
+    el resultado incluye el desglose por fases (ver Engine.run).
+    """
+    # Un job cancelado después de pasar a la cola interna del executor
+    if job_id in _CANCELADOS:
+        raise engines.SimulationCancelled(f"Job {job_id} cancelado antes de empezar")
+
+    _PROGRESO[job_id] = 0
+    try:
+        if task_type == TIPO_LOTE:
+            return _ejecutar_lote(parameters['runs'], job_id)
+        return _simular(task_type, parameters, job_id, checkpoint=checkpoint, trayectoria=trayectoria,
+                        perfil=perfil)
+    finally:
+        _PROGRESO.pop(job_id, None)
+
+def _simular(task_type, parameters, job_id, pasos_previos=0, checkpoint=None, trayectoria=None, perfil=False):
+    num_pasos = int(parameters.get('num_pasos', engines.NUM_PASOS))
+
+    def reportar(paso, colisiones_particula_particula, colisiones_con_pared):
+        # Cada 1% de los pasos: publicar el progreso y atender cancelaciones
+        _PROGRESO[job_id] = pasos_previos + paso
+        if job_id in _CANCELADOS:
+            raise engines.SimulationCancelled(f"Job {job_id} cancelado en el paso {paso}")
+
+    engine = engines.get_engine(task_type)
+    opciones = {}
+    if checkpoint:
+        opciones = {
+            'checkpoint_every': checkpoint['every'],
+            'checkpoint_path': checkpoint['path'],
+            'resume_path': checkpoint.get('resume')
+        }
+    if perfil:
+        opciones['profile'] = True
+    writer = None
+    if trayectoria:
+        num_particulas = int(parameters.get('num_particulas', engines.NUM_PARTICULAS))
+        writer = trajectory.TrajectoryWriter(num_particulas=num_particulas, num_pasos=num_pasos, **trayectoria)
+        opciones['trajectory'] = writer
+    try:
+        try:
+            resultado = engine.run(parameters, callback=reportar, progress_every=max(1, num_pasos // 100), **opciones)
+        except engines.CheckpointMismatch as e:
+            # Un checkpoint de otra versión del motor no sirve: empezar de cero
+            logger.warning(f"Job {job_id}: {e}; se reinicia desde el paso 0")
+            opciones['resume_path'] = None
+            resultado = engine.run(parameters, callback=reportar, progress_every=max(1, num_pasos // 100), **opciones)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        resultado.options['trajectory_frames'] = writer.frames_written
+    return resultado
+
+def _ejecutar_lote(runs, job_id):
+    """Ejecutar las simulaciones de un lote.
+
+    Las simulaciones consecutivas que sólo difieren en la semilla van juntas
+    a Engine.run_batch, que en los motores con simular_lote las avanza en un
+    único arreglo (B, N, 2). Devuelve un SimulationResult por simulación, o
+    el ValueError de las que tenían parámetros inválidos (no hacen fallar al
+    resto del lote).
+    """
+    resultados = []
+    pasos_previos = 0
+    for task_type, parameters, semillas in _agrupar_por_semilla(runs):
+        def reportar(paso, colisiones_particula_particula, colisiones_con_pared, previos=pasos_previos):
+            _PROGRESO[job_id] = previos + paso
+            if job_id in _CANCELADOS:
+                raise engines.SimulationCancelled(f"Job {job_id} cancelado")
+
+        try:
+            num_pasos = int(parameters.get('num_pasos', engines.NUM_PASOS))
+            resultados.extend(engines.get_engine(task_type).run_batch(
+                parameters, semillas, callback=reportar, progress_every=max(1, num_pasos // 100)))
+        except ValueError as e:
+            resultados.extend([e] * len(semillas))
+        pasos_previos += sum(pasos_totales({'type': task_type, 'parameters': parameters}) for _ in semillas)
+    return resultados
+
+def _agrupar_por_semilla(runs):
+    """(tipo, parámetros sin semilla, semillas) de cada tramo de simulaciones que sólo difieren en la semilla"""
+    grupos = []
+    for run in runs:
+        task_type = run.get('type', 'benchmark')
+        parameters = dict(run.get('parameters', {}))
+        semilla = parameters.pop('semilla', engines.SEMILLA)
+        if grupos and grupos[-1][0] == task_type and grupos[-1][1] == parameters:
+            grupos[-1][2].append(semilla)
+        else:
+            grupos.append((task_type, parameters, [semilla]))
+    return grupos
+
+def pasos_totales(task: dict):
+    """Pasos que simula una tarea (la suma de sus simulaciones si es un lote)"""
+    if task.get('type') == TIPO_LOTE:
+        return sum(pasos_totales(run) for run in task.get('parameters', {}).get('runs', []))
+    try:
+        return int(task.get('parameters', {}).get('num_pasos', engines.NUM_PASOS))
+    except (TypeError, ValueError):
+        return 0
+
+def procesos_disponibles():
+    """Núcleos que puede usar este proceso (respeta la afinidad de CPU)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+class SimulationPool:
+    """Procesos de simulación precargados, con una cola local acotada"""
+
+    def __init__(self, num_procesos: int, max_cola: int, engine_modules: list = None):
+        self.num_procesos = num_procesos
+        self.max_cola = max_cola
+        self.engine_modules = engine_modules or []
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._manager = multiprocessing.Manager()
+        self.progreso = self._manager.dict()
+        self.cancelados = self._manager.dict()
+        self._executor = self._crear_executor()
+
+    def _crear_executor(self):
+        executor = ProcessPoolExecutor(
+            max_workers=self.num_procesos,
+            initializer=_inicializar_proceso,
+            initargs=(self.engine_modules, self.progreso, self.cancelados)
+        )
+        # Arrancar todos los procesos ahora y no con la primera tarea
+        pids = {f.result() for f in [executor.submit(_calentar) for _ in range(self.num_procesos)]}
+        logger.info(f"Pool de simulación listo: {len(pids)} procesos precargados")
+        return executor
+
+    def submit(self, task_type: str, parameters: dict, job_id: str, checkpoint: dict = None,
+               trayectoria: dict = None, perfil: bool = False):
+        """Encolar una simulación; lanza QueueFullError si no hay lugar"""
+        return self._encolar(_ejecutar_motor, task_type, parameters, job_id, checkpoint, trayectoria, perfil)
+
+    def submit_strip(self, direccion: tuple, clave: bytes):
+        """Encolar una franja de una simulación distribuida (domain.run_strip); ocupa un proceso hasta terminar"""
+        return self._encolar(domain.run_strip, direccion, clave)
+
+    def _encolar(self, funcion, *args):
+        with self._lock:
+            if self._pendientes >= self.num_procesos + self.max_cola:
+                raise QueueFullError(
+                    f"Cola llena: {self._pendientes} tareas pendientes "
+                    f"({self.num_procesos} procesos, cola de {self.max_cola})")
+            self._pendientes += 1
+
+        try:
+            try:
+                future = self._executor.submit(funcion, *args)
+            except BrokenProcessPool:
+                self._reiniciar()
+                future = self._executor.submit(funcion, *args)
+        except BaseException:
+            # También si falla el reintento o la recreación del pool
+            self._liberar(None)
+            raise
+        future.add_done_callback(self._liberar)
+        return future
+
+    def _liberar(self, future):
+        with self._lock:
+            self._pendientes -= 1
+
+    def _reiniciar(self):
+        # Un proceso que muere (p. ej. por falta de memoria) rompe el executor
+        logger.warning("Pool de simulación roto, recreando procesos")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._crear_executor()
+
+    def occupancy(self):
+        """Ocupación del pool para /status y /ping"""
+        with self._lock:
+            pendientes = self._pendientes
+        return {
+            'processes': self.num_procesos,
+            'running': min(pendientes, self.num_procesos),
+            'queued': max(0, pendientes - self.num_procesos),
+            'queue_size': self.max_cola,
+            'available_slots': max(0, self.num_procesos + self.max_cola - pendientes)
+        }
+
+    def cancel(self, job_id: str, future):
+        """Cancelar un job: se descarta si sigue en cola, o se avisa al proceso que lo ejecuta"""
+        if future.cancel():
+            return True
+        if not future.done():
+            self.cancelados[job_id] = True
+        return False
+
+    def forget(self, job_id: str):
+        self.cancelados.pop(job_id, None)
+
+    def steps_done(self, job_id: str):
+        """Pasos completados por un job en ejecución (None si no empezó o ya terminó)"""
+        return self.progreso.get(job_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self._manager.shutdown()
+
+# Jobs terminados que se conservan para GET /jobs/<id>
+MAX_JOBS_TERMINADOS = 1000
+
+ESTADOS_TERMINALES = ('completed', 'failed', 'cancelled')
+
 class SimulationWorker:
-    def __init__(self, worker_id: str):
+    def __init__(self, worker_id: str, pool: SimulationPool, checkpoint_dir: str = None,
+                 trajectory_dir: str = None, strip_secret: str = None, coordinator_hosts: list = None):
         self.worker_id = worker_id
-        self.current_task = None
+        self.pool = pool
+        # Franjas de simulaciones distribuidas: sólo con solicitudes firmadas y
+        # coordinadores en estos hosts (ver domain.abrir_solicitud)
+        self.strip_secret = strip_secret
+        self.coordinator_hosts = list(coordinator_hosts or [])
+        self.jobs = {}
+        # Un subdirectorio propio del worker: checkpoint_dir puede ser compartido
+        self.checkpoint_dir = os.path.join(
+            checkpoint_dir or os.path.join(tempfile.gettempdir(), 'simulation_checkpoints'), worker_id)
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        # Los checkpoints de una ejecución anterior se conservan: si la misma
+        # tarea vuelve a este worker, se reanuda desde ellos. Sólo se borran
+        # las escrituras a medias (ver engines.save_checkpoint)
+        for archivo in glob.glob(os.path.join(self.checkpoint_dir, '*.npz.tmp')):
+            os.remove(archivo)
+        previos = len(glob.glob(os.path.join(self.checkpoint_dir, '*.npz')))
+        if previos:
+            logger.info(f"{previos} checkpoints de una ejecución anterior en {self.checkpoint_dir}")
+        # Las trayectorias son resultados: se conservan entre ejecuciones
+        self.trajectory_dir = trajectory_dir or os.path.join(tempfile.gettempdir(), 'simulation_trajectories')
+        # El orquestador usa la versión del código de cada motor en la clave de su caché
+        self.engine_versions = engines.engine_versions()
+        self._lock = threading.Lock()
+        self.metrics = metrics.Registry()
+        self._crear_metricas()
+
+    def _crear_metricas(self):
+        """Contadores e histogramas de /metrics; la ocupación del pool se lee al exponerlas"""
+        m = self.metrics
+        self.m_iniciadas = m.counter('worker_tasks_started_total', 'Tareas aceptadas por el pool', ('type',))
+        self.m_rechazadas = m.counter('worker_tasks_rejected_total', 'Tareas rechazadas por cola llena')
+        self.m_completadas = m.counter('worker_tasks_completed_total', 'Tareas completadas', ('type',))
+        self.m_fallidas = m.counter('worker_tasks_failed_total', 'Tareas que terminaron con error', ('type',))
+        self.m_canceladas = m.counter('worker_tasks_cancelled_total', 'Tareas canceladas', ('type',))
+        self.m_duracion = m.histogram('worker_task_duration_seconds',
+                                      'Segundos desde que se aceptó la tarea hasta que terminó',
+                                      metrics.BUCKETS_DURACION, ('type', 'size'))
+        self.m_pasos = m.counter('worker_simulation_steps_total', 'Pasos simulados', ('type',))
+        self.m_pasos_por_segundo = m.histogram('worker_simulation_steps_per_second',
+                                               'Pasos por segundo de cada simulación',
+                                               metrics.BUCKETS_PASOS_POR_SEGUNDO, ('type', 'size'))
+        m.gauge('worker_pool_processes', 'Procesos de simulación', funcion=lambda: self.pool.num_procesos)
+        m.gauge('worker_pool_running', 'Tareas ejecutándose en el pool',
+                funcion=lambda: self.pool.occupancy()['running'])
+        m.gauge('worker_queue_depth', 'Tareas esperando un proceso libre',
+                funcion=lambda: self.pool.occupancy()['queued'])
+        m.gauge('worker_pool_utilization', 'Fracción de procesos ocupados',
+                funcion=lambda: self.pool.occupancy()['running'] / self.pool.num_procesos)
+
+    @property
+    def current_tasks(self):
+        """Tareas en cola o en ejecución"""
+        with self._lock:
+            return [job['task_id'] for job in self.jobs.values() if job['status'] not in ESTADOS_TERMINALES]
+
+    @property
+    def current_task(self):
+        """Última tarea en curso (compatibilidad con clientes de un solo hilo)"""
+        tareas = self.current_tasks
+        return tareas[-1] if tareas else None
         
     def ping(self):
         """Responder a ping de salud"""
@@ -31,137 +357,406 @@ class SimulationWorker:
             'status': 'online',
             'worker_id': self.worker_id,
             'timestamp': datetime.now().isoformat(),
-            'current_task': self.current_task
+            'current_task': self.current_task,
+            'pool': self.pool.occupancy(),
+            'engine_versions': self.engine_versions
+        }
+
+    def heartbeat(self, url: str):
+        """Cuerpo del heartbeat al orquestador: dónde encontrar al worker y su capacidad"""
+        pool = self.pool.occupancy()
+        return dict(self.ping(), url=url, capacity={
+            'cores': os.cpu_count(),
+            'usable_cores': procesos_disponibles(),
+            'processes': pool['processes'],
+            'free_slots': pool['available_slots'],
+            'engines': engines.available_engines()
+        })
+
+    def submit_job(self, task: dict):
+        """Encolar una tarea y devolver su job sin esperar el resultado.
+
+        Lanza ValueError si el tipo de tarea no existe y QueueFullError si la
+        cola del pool está llena.
+        """
+        task_type = task.get('type', 'benchmark')
+        parameters = task.get('parameters', {})
+        
+        # El tipo de tarea es el nombre del motor registrado, o un lote de simulaciones
+        if task_type == TIPO_LOTE:
+            runs = parameters.get('runs')
+            if not isinstance(runs, list) or not runs:
+                raise ValueError("Un lote necesita una lista 'runs' con al menos una simulación")
+            for run in runs:
+                engines.get_engine(run.get('type', 'benchmark'))
+        else:
+            engines.get_engine(task_type)
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'task': task,
+            'task_id': task.get('id', 'unknown'),
+            'status': 'queued',
+            'submitted_at': datetime.now(),
+            'finished_at': None,
+            'response': None,
+            'future': None,
+            'checkpoint': None,
+            'trajectory': None
+        }
+        perfil = bool(task.get('profile'))
+        if perfil and task_type == TIPO_LOTE:
+            raise ValueError("Los lotes no tienen perfil por fases")
+        # La trayectoria sólo valida: va antes de escribir el checkpoint de 'resume'
+        trayectoria = self._preparar_trayectoria(job, task)
+        checkpoint = self._preparar_checkpoint(job, task)
+        with self._lock:
+            self.jobs[job_id] = job
+        try:
+            job['future'] = self.pool.submit(task_type, parameters, job_id, checkpoint, trayectoria, perfil)
+        except Exception as e:
+            with self._lock:
+                del self.jobs[job_id]
+            self._borrar_checkpoint(job)
+            if isinstance(e, QueueFullError):
+                self.m_rechazadas.inc()
+            raise
+        self.m_iniciadas.inc(type=task_type)
+
+        if task_type == TIPO_LOTE:
+            logger.info(f"Job {job_id} (tarea {job['task_id']}): lote de {len(parameters['runs'])} simulaciones")
+        else:
+            logger.info(f"Job {job_id} (tarea {job['task_id']}): motor {task_type} con parámetros {parameters}")
+        job['future'].add_done_callback(lambda future: self._terminar_job(job))
+        return self._resumen_job(job)
+
+    def start_strip(self, cuerpo: bytes, firma: str):
+        """Ejecutar en el pool una franja de una simulación distribuida.
+
+        cuerpo y firma son los de la solicitud de domain.solicitar_franjas; la
+        franja se conecta al coordinador, que la maneja hasta el final de la
+        simulación. Lanza PermissionError si la solicitud no está firmada con
+        el secreto compartido o el coordinador no está en un host permitido,
+        ValueError si está mal formada y QueueFullError si el pool no tiene
+        lugar.
+        """
+        direccion, clave = domain.abrir_solicitud(cuerpo, firma, self.strip_secret, self.coordinator_hosts)
+        coordinador = f"{direccion[0]}:{direccion[1]}"
+        future = self.pool.submit_strip(direccion, clave)
+
+        def terminar(future):
+            if not future.cancelled() and future.exception() is not None:
+                logger.error(f"Franja coordinada desde {coordinador} falló: {future.exception()}")
+        future.add_done_callback(terminar)
+        logger.info(f"Franja de una simulación distribuida coordinada desde {coordinador}")
+
+    def _preparar_checkpoint(self, job: dict, task: dict):
+        """Archivo de checkpoint del job si la tarea pide checkpoint_every; con 'resume', lo llena"""
+        checkpoint_every = int(task.get('checkpoint_every') or 0)
+        if checkpoint_every <= 0 or task.get('type') == TIPO_LOTE:
+            return None
+
+        job['checkpoint'] = self._ruta_checkpoint(job)
+        checkpoint = {'every': checkpoint_every, 'path': job['checkpoint'], 'resume': None}
+        local = self._paso_checkpoint(job['checkpoint'])
+        if task.get('resume'):
+            try:
+                datos = base64.b64decode(task['resume']['data'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("'resume' debe tener 'data' con el checkpoint en base64")
+            # Uno local más avanzado (de antes de reiniciar el worker) gana
+            if local is None or self._paso_checkpoint(io.BytesIO(datos)) > local:
+                with open(job['checkpoint'], 'wb') as f:
+                    f.write(datos)
+            # No conservar el checkpoint en base64 junto al job
+            job['task'] = {clave: valor for clave, valor in task.items() if clave != 'resume'}
+        if os.path.exists(job['checkpoint']):
+            checkpoint['resume'] = job['checkpoint']
+        return checkpoint
+
+    def _ruta_checkpoint(self, job: dict):
+        """Checkpoint de la tarea del job: el mismo entre reinicios del worker, salvo que otro job lo use"""
+        nombre = hashlib.sha256(str(job['task_id']).encode()).hexdigest()[:32]
+        ruta = os.path.join(self.checkpoint_dir, f"{nombre}.npz")
+        with self._lock:
+            en_uso = any(otro.get('checkpoint') == ruta for otro in self.jobs.values())
+        if en_uso:
+            ruta = os.path.join(self.checkpoint_dir, f"{job['job_id']}.npz")
+        return ruta
+
+    @staticmethod
+    def _paso_checkpoint(origen):
+        """Paso de un checkpoint (ruta o archivo), o None si no existe o no se puede leer"""
+        if isinstance(origen, str) and not os.path.exists(origen):
+            return None
+        try:
+            return engines.checkpoint_step(origen)
+        except Exception:
+            return None
+
+    def _preparar_trayectoria(self, job: dict, task: dict):
+        """Argumentos del TrajectoryWriter del job si la tarea pide 'trajectory'"""
+        config = task.get('trajectory')
+        if not config:
+            return None
+        if task.get('type') == TIPO_LOTE:
+            raise ValueError("Los lotes no guardan trayectorias")
+        every = int(config.get('every', 0))
+        dtype = config.get('dtype', 'float32')
+        if every <= 0:
+            raise ValueError("'trajectory.every' debe ser un número positivo de pasos")
+        if dtype not in trajectory.DTYPES:
+            raise ValueError(f"'trajectory.dtype' debe ser uno de {', '.join(trajectory.DTYPES)}")
+
+        # task_id viene del cliente: sólo caracteres seguros en el nombre (job_id ya lo hace único)
+        nombre = re.sub(r'[^A-Za-z0-9_-]', '_', str(job['task_id']))[:64]
+        directorio = os.path.join(self.trajectory_dir, f"{nombre}-{job['job_id']}")
+        raiz = os.path.realpath(self.trajectory_dir)
+        if os.path.commonpath([raiz, os.path.realpath(directorio)]) != raiz:
+            raise ValueError(f"Directorio de trayectoria fuera de {self.trajectory_dir}")
+        job['trajectory'] = {'path': directorio, 'every': every, 'dtype': dtype}
+        return {
+            'directorio': directorio,
+            'every': every,
+            'dtype': dtype,
+            'velocidades': bool(config.get('velocities', True)),
+            'meta': {
+                'engine': task.get('type', 'benchmark'),
+                'parameters': task.get('parameters', {}),
+                'task_id': job['task_id'],
+                'job_id': job['job_id'],
+                'worker_id': self.worker_id
+            }
+        }
+
+    def _borrar_checkpoint(self, job: dict):
+        if job.get('checkpoint') and os.path.exists(job['checkpoint']):
+            os.remove(job['checkpoint'])
+
+    def checkpoint(self, job_id: str):
+        """(paso, contenido .npz) del último checkpoint de un job, o None"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if not job or not job.get('checkpoint') or not os.path.exists(job['checkpoint']):
+            return None
+        with open(job['checkpoint'], 'rb') as f:
+            datos = f.read()
+        return engines.checkpoint_step(io.BytesIO(datos)), datos
+
+    def _terminar_job(self, job: dict):
+        """Guardar la respuesta de un job cuando su future termina"""
+        future = job['future']
+        job['finished_at'] = datetime.now()
+        task = job['task']
+        try:
+            resultado = future.result()
+            job['response'] = self._respuesta_exitosa(task, resultado, job['submitted_at'], job['finished_at'])
+            if job.get('trajectory'):
+                job['response']['trajectory'] = dict(
+                    job['trajectory'], frames_written=resultado.options.get('trajectory_frames'))
+            job['status'] = 'completed'
+            self._medir_job(job, resultado)
+            logger.info(f"Tarea {job['task_id']} completada exitosamente")
+        except (CancelledError, engines.SimulationCancelled):
+            job['status'] = 'cancelled'
+            job['response'] = self._respuesta_error(task, 'Simulación cancelada')
+            self.m_canceladas.inc(type=task.get('type', 'benchmark'))
+            logger.info(f"Tarea {job['task_id']} cancelada")
+        except Exception as e:
+            job['status'] = 'failed'
+            job['response'] = self._respuesta_error(task, str(e))
+            self.m_fallidas.inc(type=task.get('type', 'benchmark'))
+            logger.error(f"Error ejecutando tarea {job['task_id']}: {e}")
+        finally:
+            # El orquestador ya descargó los checkpoints mientras el job corría
+            self._borrar_checkpoint(job)
+            self.pool.forget(job['job_id'])
+            self._purgar_jobs()
+
+    def _medir_job(self, job: dict, resultado):
+        """Actualizar las métricas de un job completado (resultado es una lista en los lotes)"""
+        task = job['task']
+        task_type = task.get('type', 'benchmark')
+        if task_type == TIPO_LOTE:
+            runs = task['parameters']['runs']
+            simulaciones = [(run.get('type', 'benchmark'), r) for run, r in zip(runs, resultado)
+                            if not isinstance(r, Exception)]
+            num_particulas = max(int(run.get('parameters', {}).get('num_particulas', engines.NUM_PARTICULAS))
+                                 for run in runs)
+        else:
+            simulaciones = [(task_type, resultado)]
+            num_particulas = task.get('parameters', {}).get('num_particulas', engines.NUM_PARTICULAS)
+
+        self.m_completadas.inc(type=task_type)
+        self.m_duracion.observe((job['finished_at'] - job['submitted_at']).total_seconds(),
+                                type=task_type, size=metrics.size_label(num_particulas))
+        for tipo, simulacion in simulaciones:
+            # Una simulación reanudada sólo avanzó desde el checkpoint
+            pasos = simulacion.total_steps - simulacion.options.get('resumed_from_step', 0)
+            self.m_pasos.inc(pasos, type=tipo)
+            if simulacion.execution_time > 0:
+                self.m_pasos_por_segundo.observe(pasos / simulacion.execution_time, type=tipo,
+                                                 size=metrics.size_label(simulacion.total_particles))
+
+    def _purgar_jobs(self):
+        with self._lock:
+            terminados = [job_id for job_id, job in self.jobs.items() if job['status'] in ESTADOS_TERMINALES]
+            for job_id in terminados[:max(0, len(terminados) - MAX_JOBS_TERMINADOS)]:
+                del self.jobs[job_id]
+
+    def get_job(self, job_id: str):
+        """Estado de un job (None si no existe)"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        return self._resumen_job(job) if job else None
+
+    def cancel_job(self, job_id: str):
+        """Cancelar un job en cola o en ejecución; un job terminado se olvida"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        if job['status'] in ESTADOS_TERMINALES:
+            with self._lock:
+                self.jobs.pop(job_id, None)
+            resumen = self._resumen_job(job)
+            resumen['deleted'] = True
+            return resumen
+
+        if not self.pool.cancel(job_id, job['future']) and job['status'] not in ESTADOS_TERMINALES:
+            # Se detiene en el próximo reporte de progreso del proceso
+            job['status'] = 'cancelling'
+        logger.info(f"Cancelación pedida para el job {job_id} (tarea {job['task_id']})")
+        return self._resumen_job(job)
+
+    def _resumen_job(self, job: dict):
+        task = job['task']
+        pasos = self.pool.steps_done(job['job_id']) if job['status'] not in ESTADOS_TERMINALES else None
+        if job['status'] == 'queued' and pasos is not None:
+            job['status'] = 'running'
+        resumen = {
+            'job_id': job['job_id'],
+            'task_id': job['task_id'],
+            'task_type': task.get('type', 'benchmark'),
+            'status': job['status'],
+            'submitted_at': job['submitted_at'].isoformat(),
+            'finished_at': job['finished_at'].isoformat() if job['finished_at'] else None,
+            'progress': {
+                'steps_done': pasos,
+                'total_steps': pasos_totales(task)
+            }
+        }
+        if job.get('checkpoint'):
+            try:
+                resumen['checkpoint_step'] = engines.checkpoint_step(job['checkpoint'])
+            except OSError:
+                # Todavía no se guardó ninguno, o ya se borró
+                resumen['checkpoint_step'] = None
+        if job['status'] in ESTADOS_TERMINALES:
+            resumen['result'] = job['response']
+        return resumen
+
+    def _respuesta_exitosa(self, task: dict, resultado, start_time, end_time):
+        response = {
+            'success': True,
+            'worker_id': self.worker_id,
+            'task_id': task.get('id'),
+            'task_type': task.get('type', 'benchmark'),
+            'parameters': task.get('parameters', {}),
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            'duration_seconds': (end_time - start_time).total_seconds()
+        }
+        if task.get('type') == TIPO_LOTE:
+            return self._respuesta_lote(task, resultado, response)
+
+        response['engine_version'] = self.engine_versions.get(response['task_type'])
+        response['metrics'] = resultado.to_dict()
+        # El resumen de texto es opcional: las métricas ya van estructuradas
+        if task.get('include_output', True):
+            response['stdout'] = resultado.reporte()
+        return response
+
+    def _respuesta_lote(self, task: dict, resultados: list, response: dict):
+        """Un resultado por simulación del lote, en el mismo orden que 'runs'"""
+        response['results'] = []
+        for run, resultado in zip(task['parameters']['runs'], resultados):
+            task_type = run.get('type', 'benchmark')
+            entrada = {
+                'task_type': task_type,
+                'parameters': run.get('parameters', {}),
+                'engine_version': self.engine_versions.get(task_type)
+            }
+            if isinstance(resultado, Exception):
+                entrada.update(success=False, error=str(resultado))
+            else:
+                entrada.update(success=True, metrics=resultado.to_dict())
+            response['results'].append(entrada)
+        if task.get('include_output', True):
+            response['stdout'] = '\n\n'.join(
+                resultado.reporte() for resultado in resultados if not isinstance(resultado, Exception))
+        return response
+
+    def _respuesta_error(self, task: dict, error: str):
+        return {
+            'success': False,
+            'worker_id': self.worker_id,
+            'task_id': task.get('id'),
+            'error': error
         }
     
     def execute_simulation(self, task: dict):
-        """Ejecutar simulación basada en parámetros de tarea"""
+        """Ejecutar simulación basada en parámetros de tarea (esperando el resultado)"""
+        task_id = task.get('id', 'unknown')
         try:
-            self.current_task = task.get('id', 'unknown')
-            logger.info(f"Ejecutando tarea: {self.current_task}")
-            
-            task_type = task.get('type', 'benchmark')
-            parameters = task.get('parameters', {})
-            
-            # Construir comando
-            if task_type == 'benchmark':
-                script = 'benchmark.py'
-            elif task_type == 'benchmark_cython':
-                script = 'benchmark_cython.py'
-            else:
-                raise ValueError(f"Tipo de tarea desconocido: {task_type}")
-            
-            # Parámetros de la simulación
-            num_particulas = parameters.get('num_particulas', 100)
-            num_pasos = parameters.get('num_pasos', 1000)
-            semilla = parameters.get('semilla', 42)
-            
-            # Ejecutar comando
-            cmd = ['python', script, str(num_particulas), str(num_pasos), str(semilla)]
-            logger.info(f"Ejecutando comando: {' '.join(cmd)}")
-            
-            start_time = datetime.now()
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10 minutos timeout
-            )
-            end_time = datetime.now()
-            
-            # Procesar resultado
-            if result.returncode == 0:
-                # Parsear salida para extraer métricas
-                output_lines = result.stdout.strip().split('\n')
-                metrics = self._parse_simulation_output(output_lines)
-                
-                response = {
-                    'success': True,
-                    'worker_id': self.worker_id,
-                    'task_id': task.get('id'),
-                    'task_type': task_type,
-                    'parameters': parameters,
-                    'start_time': start_time.isoformat(),
-                    'end_time': end_time.isoformat(),
-                    'duration_seconds': (end_time - start_time).total_seconds(),
-                    'metrics': metrics,
-                    'stdout': result.stdout,
-                    'stderr': result.stderr
-                }
-                
-                logger.info(f"Tarea {self.current_task} completada exitosamente")
-                return response
-            else:
-                logger.error(f"Error ejecutando tarea: {result.stderr}")
-                return {
-                    'success': False,
-                    'worker_id': self.worker_id,
-                    'task_id': task.get('id'),
-                    'error': result.stderr,
-                    'stdout': result.stdout,
-                    'returncode': result.returncode
-                }
+            job = self.submit_job(task)
+            with self._lock:
+                future = self.jobs[job['job_id']]['future']
+            try:
+                future.result()
+            except Exception:
+                pass
+            return self.get_job(job['job_id'])['result']
                 
-        except subprocess.TimeoutExpired:
-            logger.error(f"Timeout ejecutando tarea {self.current_task}")
-            return {
-                'success': False,
-                'worker_id': self.worker_id,
-                'task_id': task.get('id'),
-                'error': 'Timeout ejecutando simulación'
-            }
+        except QueueFullError as e:
+            logger.warning(f"Tarea {task_id} rechazada: {e}")
+            response = self._respuesta_error(task, str(e))
+            response['queue_full'] = True
+            return response
         except Exception as e:
             logger.error(f"Error inesperado: {e}")
-            return {
-                'success': False,
-                'worker_id': self.worker_id,
-                'task_id': task.get('id'),
-                'error': str(e)
-            }
-        finally:
-            self.current_task = None
-    
-    def _parse_simulation_output(self, output_lines):
-        """Parsear salida de simulación para extraer métricas"""
-        metrics = {}
-        
-        for line in output_lines:
-            if 'completada en' in line and 'segundos' in line:
-                # Extraer tiempo de ejecución
-                parts = line.split()
-                for i, part in enumerate(parts):
-                    if 'segundos' in part and i > 0:
-                        try:
-                            metrics['execution_time'] = float(parts[i-1])
-                        except ValueError:
-                            pass
-            elif 'Total colisiones Partícula-Partícula:' in line:
-                try:
-                    metrics['particle_collisions'] = int(line.split(':')[1].strip())
-                except (ValueError, IndexError):
-                    pass
-            elif 'Total colisiones con Pared:' in line:
-                try:
-                    metrics['wall_collisions'] = int(line.split(':')[1].strip())
-                except (ValueError, IndexError):
-                    pass
-            elif 'Total pasos:' in line:
-                try:
-                    parts = line.split(',')
-                    steps_part = parts[0].split(':')[1].strip()
-                    metrics['total_steps'] = int(steps_part)
-                    
-                    if len(parts) > 1 and 'Partículas:' in parts[1]:
-                        particles_part = parts[1].split(':')[1].strip()
-                        metrics['total_particles'] = int(particles_part)
-                except (ValueError, IndexError):
-                    pass
-        
-        return metrics
+            return self._respuesta_error(task, str(e))
 
 # Crear instancia global del worker
 worker = None
 
+def enviar_heartbeats(orchestrator_url: str, url: str, intervalo: float, detener: threading.Event):
+    """Registrarse en el orquestador y repetir el heartbeat cada intervalo segundos hasta detener"""
+    session = requests.Session()
+    conectado = None
+    while not detener.is_set():
+        try:
+            response = session.post(f"{orchestrator_url}/workers/register", json=worker.heartbeat(url), timeout=5)
+            response.raise_for_status()
+            if not conectado:
+                logger.info(f"Registrado en el orquestador {orchestrator_url} como {url}")
+            conectado = True
+        except requests.exceptions.RequestException as e:
+            # Avisar una vez por desconexión, no en cada intento
+            if conectado is not False:
+                logger.warning(f"No se pudo enviar el heartbeat a {orchestrator_url}: {e}")
+            conectado = False
+        detener.wait(intervalo)
+
+def dar_de_baja(orchestrator_url: str, worker_id: str):
+    """Avisar al orquestador que el worker se detiene (si no responde, lo quita por falta de heartbeats)"""
+    try:
+        requests.delete(f"{orchestrator_url}/workers/{worker_id}", timeout=5)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"No se pudo dar de baja el worker en {orchestrator_url}: {e}")
+
 # Flask app
 app = Flask(__name__)
 
@@ -179,12 +774,71 @@ def execute():
             return jsonify({'error': 'No se proporcionó tarea'}), 400
         
         result = worker.execute_simulation(task)
+        if result.get('queue_full'):
+            return jsonify(result), 503
         return jsonify(result)
         
     except Exception as e:
         logger.error(f"Error procesando request: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Encolar una simulación y devolver su job id sin esperar"""
+    task = request.get_json(silent=True)
+    if not task:
+        return jsonify({'error': 'No se proporcionó tarea'}), 400
+    try:
+        return jsonify(worker.submit_job(task)), 202
+    except QueueFullError as e:
+        return jsonify({'error': str(e), 'queue_full': True}), 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Estado, progreso y (al terminar) resultado de un job"""
+    job = worker.get_job(job_id)
+    if job is None:
+        return jsonify({'error': f'Job desconocido: {job_id}'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/checkpoint', methods=['GET'])
+def get_checkpoint(job_id):
+    """Último checkpoint (.npz) de un job, para reanudarlo en otro worker"""
+    checkpoint = worker.checkpoint(job_id)
+    if checkpoint is None:
+        return jsonify({'error': f'El job {job_id} no tiene checkpoint'}), 404
+    paso, datos = checkpoint
+    return Response(datos, mimetype='application/octet-stream', headers={'X-Checkpoint-Step': str(paso)})
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancelar un job en cola o en ejecución, o descartar uno terminado"""
+    job = worker.cancel_job(job_id)
+    if job is None:
+        return jsonify({'error': f'Job desconocido: {job_id}'}), 404
+    return jsonify(job)
+
+@app.route('/strips', methods=['POST'])
+def start_strip():
+    """Ejecutar una franja de una simulación distribuida (ver domain.py)"""
+    try:
+        worker.start_strip(request.get_data(), request.headers.get(domain.CABECERA_FIRMA))
+        return jsonify({'accepted': True}), 202
+    except PermissionError as e:
+        logger.warning(f"Solicitud de franja rechazada desde {request.remote_addr}: {e}")
+        return jsonify({'error': str(e)}), 403
+    except QueueFullError as e:
+        return jsonify({'error': str(e), 'queue_full': True}), 503
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/metrics')
+def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(worker.metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/status')
 def status():
     """Endpoint de estado del worker"""
@@ -192,6 +846,9 @@ def status():
         'worker_id': worker.worker_id,
         'status': 'running',
         'current_task': worker.current_task,
+        'current_tasks': worker.current_tasks,
+        'pool': worker.pool.occupancy(),
+        'engines': engines.available_engines(),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -202,16 +859,67 @@ def main():
     parser = argparse.ArgumentParser(description='Worker de simulación')
     parser.add_argument('--port', type=int, default=8000, help='Puerto del servidor')
     parser.add_argument('--worker-id', required=True, help='ID del worker')
+    parser.add_argument('--engine-module', action='append', default=[],
+                        help='Módulo adicional que registra motores (repetible)')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='Procesos de simulación (0 = núcleos disponibles)')
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help='Tareas en espera además de las que se ejecutan (por defecto, una por proceso)')
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help='Directorio de checkpoints de los jobs (por defecto, uno temporal)')
+    parser.add_argument('--trajectory-dir', default=None,
+                        help='Directorio donde se guardan las trayectorias (por defecto, uno temporal)')
+    parser.add_argument('--orchestrator-url', default=os.getenv('ORCHESTRATOR_URL'),
+                        help='Orquestador al que enviar heartbeats (por defecto, $ORCHESTRATOR_URL; sin él, ninguno)')
+    parser.add_argument('--advertise-url', default=None,
+                        help='URL con la que el orquestador llega a este worker (por defecto, http://<hostname>:<port>)')
+    parser.add_argument('--heartbeat-interval', type=float, default=10,
+                        help='Segundos entre heartbeats')
+    parser.add_argument('--strip-secret', default=os.getenv('STRIP_SECRET'),
+                        help='Secreto compartido con el orquestador para las franjas de simulaciones distribuidas '
+                             '(por defecto, $STRIP_SECRET; sin él, el worker no acepta franjas)')
+    parser.add_argument('--coordinator-host', action='append', default=[],
+                        help='Host adicional donde se aceptan coordinadores de franjas (repetible; '
+                             'el del orquestador siempre se acepta)')
     
     args = parser.parse_args()
     
+    engines.load_engine_modules(args.engine_module)
+    logger.info(f"Motores disponibles: {', '.join(engines.available_engines())}")
+    
+    num_procesos = args.processes if args.processes > 0 else procesos_disponibles()
+    max_cola = args.queue_size if args.queue_size is not None else num_procesos
+    pool = SimulationPool(num_procesos, max_cola, args.engine_module)
+    
     # Crear worker
-    worker = SimulationWorker(args.worker_id)
+    coordinadores = list(args.coordinator_host)
+    if args.orchestrator_url:
+        coordinadores.append(urlparse(args.orchestrator_url).hostname)
+    worker = SimulationWorker(args.worker_id, pool, args.checkpoint_dir, args.trajectory_dir,
+                              args.strip_secret, coordinadores)
     
-    logger.info(f"Iniciando worker {args.worker_id} en puerto {args.port}")
+    logger.info(f"Iniciando worker {args.worker_id} en puerto {args.port} "
+                f"({num_procesos} procesos, cola de {max_cola})")
     
-    # Iniciar servidor Flask
-    app.run(host='0.0.0.0', port=args.port, debug=False)
+    # docker stop manda SIGTERM: salir por el finally para darse de baja y cerrar el pool
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    detener = threading.Event()
+    if args.orchestrator_url:
+        orchestrator_url = args.orchestrator_url.rstrip('/')
+        url = args.advertise_url or f"http://{socket.gethostname()}:{args.port}"
+        hilo = threading.Thread(target=enviar_heartbeats,
+                                args=(orchestrator_url, url, args.heartbeat_interval, detener), daemon=True)
+        hilo.start()
+
+    # Iniciar servidor Flask (un hilo por request; la simulación corre en el pool)
+    try:
+        app.run(host='0.0.0.0', port=args.port, debug=False, threaded=True)
+    finally:
+        detener.set()
+        if args.orchestrator_url:
+            dar_de_baja(args.orchestrator_url.rstrip('/'), args.worker_id)
+        pool.shutdown()
 
 if __name__ == '__main__':
     main()